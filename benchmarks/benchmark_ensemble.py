@@ -0,0 +1,75 @@
+"""Throughput of an ensemble of small 2D models, run one by one or vmapped.
+
+Each member is a small block of elastic particles falling under gravity, with
+its own Young's modulus. The members are run with one `run_solver` call each,
+and all at once with `run_solver_ensemble`, vectorized with `vmap` or looped
+over on device.
+
+Run with:
+    python benchmarks/benchmark_ensemble.py -o ensemble.json
+"""
+
+import jax
+import jax.numpy as jnp
+import pyperf
+
+import pymudokon as pm
+
+
+def create_member(E, num_particles):
+    position_stack = (
+        jax.random.uniform(jax.random.key(0), (num_particles, 2)) * 0.4 + 0.3
+    )
+
+    particles = pm.Particles.create(position_stack=position_stack)
+
+    nodes = pm.Nodes.create(origin=jnp.zeros(2), end=jnp.ones(2), node_spacing=0.05)
+
+    shapefunctions = pm.LinearShapeFunction.create(num_particles, 2)
+
+    particles, nodes, shapefunctions = pm.discretize(
+        particles, nodes, shapefunctions, ppc=1, density_ref=1000
+    )
+
+    return (
+        pm.USL.create(alpha=0.99, dt=0.0001),
+        particles,
+        nodes,
+        shapefunctions,
+        [pm.LinearIsotropicElastic.create(E=E, nu=0.3)],
+        [pm.Gravity.create(gravity=jnp.array([0.0, -9.8]))],
+    )
+
+
+runner = pyperf.Runner(loops=2)
+
+runner.warmups = 2  # Number of warm-up runs
+runner.samples = 2  # Number of benchmark runs
+
+num_steps = 100
+
+for ensemble_size in [64]:
+    for num_particles in [256]:
+        members = [
+            create_member(E, num_particles)
+            for E in jnp.linspace(1e4, 1e6, ensemble_size)
+        ]
+
+        runner.bench_func(
+            f"sequential/{ensemble_size}/{num_particles}",
+            lambda: jax.block_until_ready(
+                [pm.run_solver(*member, num_steps=num_steps) for member in members]
+            ),
+        )
+
+        ensemble = pm.stack_ensemble(members)
+
+        for vectorize in [True, False]:
+            runner.bench_func(
+                f"ensemble/{ensemble_size}/{num_particles}/vectorize={vectorize}",
+                lambda: jax.block_until_ready(
+                    pm.run_solver_ensemble(
+                        *ensemble, num_steps=num_steps, vectorize=vectorize
+                    )
+                ),
+            )
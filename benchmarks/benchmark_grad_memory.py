@@ -0,0 +1,94 @@
+"""Memory and time of gradients through a solver run against the step count.
+
+The gradient of a loss on the final particle positions with respect to the
+Young's modulus is taken through `run_solver`, which keeps the state of every
+step, and through `run_solver_checkpointed`, which keeps the states at the
+start of 10 blocks of steps only. The memory kept for the backward pass (the
+residuals of `jax.vjp`) is stored as metadata, e.g.,
+`residual_bytes/checkpointed/400`.
+
+Run with:
+    python benchmarks/benchmark_grad_memory.py -o grad_memory.json
+"""
+
+from functools import partial
+
+import jax
+import jax.numpy as jnp
+import pyperf
+
+import pymudokon as pm
+
+
+def create_system(num_particles):
+    position_stack = (
+        jax.random.uniform(jax.random.key(0), (num_particles, 2)) * 0.4 + 0.3
+    )
+
+    particles = pm.Particles.create(position_stack=position_stack)
+
+    nodes = pm.Nodes.create(origin=jnp.zeros(2), end=jnp.ones(2), node_spacing=0.02)
+
+    shapefunctions = pm.CubicShapeFunction.create(num_particles, 2)
+
+    return pm.discretize(particles, nodes, shapefunctions, ppc=1, density_ref=1000)
+
+
+def get_loss(E, run_solver, particles, nodes, shapefunctions, **kwargs):
+    (_, _, particles, *_), _ = run_solver(
+        pm.USL.create(alpha=0.99, dt=0.0001),
+        particles,
+        nodes,
+        shapefunctions,
+        [pm.LinearIsotropicElastic.create(E=E, nu=0.3)],
+        [pm.Gravity.create(gravity=jnp.array([0.0, -9.8]))],
+        **kwargs,
+    )
+    return jnp.sum(particles.position_stack[:, 1])
+
+
+def get_residual_bytes(vjp_fn):
+    leaves = jax.tree_util.tree_leaves(vjp_fn)
+    return sum(jnp.asarray(leaf).nbytes for leaf in leaves)
+
+
+runner = pyperf.Runner(loops=2)
+
+runner.warmups = 1  # Number of warm-up runs
+runner.samples = 2  # Number of benchmark runs
+
+particles, nodes, shapefunctions = create_system(1024)
+
+for num_steps in [100, 200, 400]:
+    checkpoint_every = (num_steps // 10,)
+
+    for name, run_solver, kwargs in [
+        ("run_solver", pm.run_solver, {}),
+        (
+            "checkpointed",
+            pm.run_solver_checkpointed,
+            dict(checkpoint_every=checkpoint_every),
+        ),
+    ]:
+        loss_fn = partial(
+            get_loss,
+            run_solver=run_solver,
+            particles=particles,
+            nodes=nodes,
+            shapefunctions=shapefunctions,
+            num_steps=num_steps,
+            **kwargs,
+        )
+
+        grad_fn = jax.jit(jax.value_and_grad(loss_fn))
+
+        _, vjp_fn = jax.vjp(loss_fn, 1e4)
+
+        runner.metadata[f"residual_bytes/{name}/{num_steps}"] = str(
+            get_residual_bytes(vjp_fn)
+        )
+
+        runner.bench_func(
+            f"grad/{name}/{num_steps}",
+            lambda: jax.block_until_ready(grad_fn(1e4)),
+        )
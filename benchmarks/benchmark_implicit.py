@@ -0,0 +1,79 @@
+"""Time to settle an elastic column under gravity, explicit against implicit.
+
+The column is run for the same simulated time with `USL` at its stable time
+step, and with `USL_Implicit` at 10 and 100 times that time step.
+
+Run with:
+    python benchmarks/benchmark_implicit.py -o implicit.json
+"""
+
+import jax
+import jax.numpy as jnp
+import pyperf
+
+import pymudokon as pm
+
+
+def create_column(solver):
+    nodes = pm.Nodes.create(
+        origin=jnp.array([0.0, 0.0]), end=jnp.array([0.5, 1.0]), node_spacing=0.05
+    )
+
+    x_stack, y_stack = jnp.meshgrid(
+        jnp.arange(0.1125, 0.4, 0.025), jnp.arange(0.0625, 0.55, 0.025)
+    )
+
+    position_stack = jnp.stack([x_stack.reshape(-1), y_stack.reshape(-1)], axis=-1)
+
+    particles = pm.Particles.create(position_stack=position_stack)
+
+    shapefunctions = pm.LinearShapeFunction.create(position_stack.shape[0], 2)
+
+    particles, nodes, shapefunctions = pm.discretize(
+        particles, nodes, shapefunctions, ppc=4, density_ref=1000
+    )
+
+    box = pm.DirichletBox.create(
+        nodes,
+        boundary_types=(
+            ("slip_negative_normal", "slip_positive_normal"),
+            ("stick", "stick"),
+        ),
+        width=2,
+    )
+
+    return (
+        solver,
+        particles,
+        nodes,
+        shapefunctions,
+        [pm.LinearIsotropicElastic.create(E=1e6, nu=0.0)],
+        [pm.Gravity.create(gravity=jnp.array([0.0, -9.8])), box],
+    )
+
+
+runner = pyperf.Runner(loops=1)
+
+runner.warmups = 1  # Number of warm-up runs
+runner.samples = 2  # Number of benchmark runs
+
+total_time = 0.5
+
+# stable time step of the elastic wave speed
+dt = 0.1 * 0.05 / (1e6 / 1000) ** 0.5
+
+run_solver = jax.jit(pm.run_solver, static_argnums=6)
+
+for name, solver, factor in [
+    ("explicit", pm.USL.create(alpha=0.0, dt=dt), 1),
+    ("implicit", pm.USL_Implicit.create(alpha=0.0, dt=10 * dt), 10),
+    ("implicit", pm.USL_Implicit.create(alpha=0.0, dt=100 * dt), 100),
+]:
+    state = create_column(solver)
+
+    num_steps = round(total_time / (factor * dt))
+
+    runner.bench_func(
+        f"{name}/dt={factor}x/{num_steps}",
+        lambda: jax.block_until_ready(run_solver(*state, num_steps)),
+    )
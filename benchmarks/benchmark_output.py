@@ -0,0 +1,110 @@
+"""Time per stored frame of the host output paths of the solver.
+
+Compares passing the full state to a `run_solver_io` callback, streaming
+selected outputs with `run_solver_io(output_writer=...)`, and the
+asynchronous double-buffered `run_solver_stream` with positions in float16.
+All variants write positions to `.npy` files in a temporary directory.
+
+Run with:
+    python benchmarks/benchmark_output.py -o output.json
+"""
+
+import tempfile
+
+import jax
+import jax.numpy as jnp
+import numpy as np
+import pyperf
+
+import pymudokon as pm
+
+
+def create_system(num_particles):
+    key = jax.random.key(0)
+    position_stack = jax.random.uniform(key, (num_particles, 3)) * 0.8 + 0.1
+
+    particles = pm.Particles.create(position_stack=position_stack)
+
+    nodes = pm.Nodes.create(
+        origin=jnp.zeros(3),
+        end=jnp.ones(3),
+        node_spacing=0.02,
+    )
+
+    shapefunctions = pm.LinearShapeFunction.create(num_particles, 3)
+
+    particles, nodes, shapefunctions = pm.discretize(
+        particles, nodes, shapefunctions, ppc=8, density_ref=1000
+    )
+
+    material = pm.LinearIsotropicElastic.create(E=1000.0, nu=0.3)
+
+    gravity = pm.Gravity.create(gravity=jnp.array([0.0, 0.0, -9.8]))
+
+    return dict(
+        solver=pm.USL.create(alpha=0.99, dt=0.0001),
+        particles=particles,
+        nodes=nodes,
+        shapefunctions=shapefunctions,
+        material_stack=[material],
+        forces_stack=[gravity],
+        num_steps=num_steps,
+        store_every=store_every,
+    )
+
+
+def run_full_carry(system):
+    with tempfile.TemporaryDirectory() as directory:
+
+        def callback(carry, step):
+            particles = jax.tree_util.tree_map(np.asarray, carry[1])
+            np.save(f"{directory}/{step}.npy", particles.position_stack)
+
+        carry = pm.run_solver_io(**system, callback=callback)
+        jax.block_until_ready(carry)
+        jax.effects_barrier()
+
+
+def run_output_writer(system):
+    with tempfile.TemporaryDirectory() as directory:
+        with pm.OutputWriter.create(directory) as writer:
+            carry = pm.run_solver_io(
+                **system, particles_output=("position_stack",), output_writer=writer
+            )
+            jax.block_until_ready(carry)
+
+
+def run_stream(system):
+    output_spec = pm.OutputSpec.create(
+        particles_output=("position_stack",),
+        dtype={"particles.position_stack": jnp.float16},
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        with pm.OutputWriter.create(directory) as writer:
+            carry = pm.run_solver_stream(
+                **system, output_spec=output_spec, callback=writer
+            )
+            jax.block_until_ready(carry)
+
+
+runner = pyperf.Runner(loops=1)
+
+runner.warmups = 1  # Number of warm-up runs
+runner.samples = 2  # Number of benchmark runs
+
+num_steps = 100
+
+store_every = 10
+
+for num_particles in [2**16]:
+    system = create_system(num_particles)
+    for name, run in [
+        ("full_carry", run_full_carry),
+        ("output_writer", run_output_writer),
+        ("stream", run_stream),
+    ]:
+        runner.bench_func(
+            f"output_{name}/{num_particles}",
+            lambda: run(system),
+            inner_loops=num_steps // store_every,
+        )
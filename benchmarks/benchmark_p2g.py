@@ -0,0 +1,72 @@
+"""Compare the scatter-add and segment sum P2G backends.
+
+Benchmarks `USL.p2g` for linear and cubic shape functions in 2D and 3D.
+
+Run with:
+    python benchmarks/benchmark_p2g.py -o p2g.json
+"""
+
+import jax
+import jax.numpy as jnp
+import pyperf
+
+import pymudokon as pm
+
+
+def create_system(num_particles, cell_size, dim, shapefunction_cls):
+    key = jax.random.key(0)
+    position_stack = jax.random.uniform(key, (num_particles, dim)) * 0.8 + 0.1
+
+    particles = pm.Particles.create(position_stack=position_stack)
+
+    nodes = pm.Nodes.create(
+        origin=jnp.zeros(dim),
+        end=jnp.ones(dim),
+        node_spacing=cell_size,
+    )
+
+    shapefunctions = shapefunction_cls.create(num_particles, dim)
+
+    particles, nodes, shapefunctions = pm.discretize(
+        particles, nodes, shapefunctions, ppc=2**dim, density_ref=1000
+    )
+
+    shapefunctions, _ = shapefunctions.calculate_shapefunction(
+        origin=nodes.origin,
+        inv_node_spacing=nodes.inv_node_spacing,
+        grid_size=nodes.grid_size,
+        position_stack=particles.position_stack,
+        species_stack=nodes.species_stack,
+    )
+
+    return particles, nodes, shapefunctions
+
+
+@jax.jit
+def run_p2g(solver, particles, nodes, shapefunctions):
+    return solver.p2g(particles=particles, nodes=nodes, shapefunctions=shapefunctions)
+
+
+runner = pyperf.Runner(loops=2)
+
+runner.warmups = 2  # Number of warm-up runs
+runner.samples = 2  # Number of benchmark runs
+
+systems = [
+    (2, 100000, 0.005),
+    (3, 100000, 0.02),
+]
+
+for dim, num_particles, cell_size in systems:
+    for shapefunction_cls in [pm.LinearShapeFunction, pm.CubicShapeFunction]:
+        particles, nodes, shapefunctions = create_system(
+            num_particles, cell_size, dim, shapefunction_cls
+        )
+        for p2g_backend in ["scatter_add", "segment_sum"]:
+            solver = pm.USL.create(alpha=0.99, dt=0.0001, p2g_backend=p2g_backend)
+            runner.bench_func(
+                f"p2g_{p2g_backend}/{shapefunction_cls.__name__}/{dim}D/{num_particles}",
+                lambda: jax.block_until_ready(
+                    run_p2g(solver, particles, nodes, shapefunctions)
+                ),
+            )
@@ -0,0 +1,187 @@
+"""Stress update with a small plastic zone, with and without compaction.
+
+A fraction of the particles is sheared beyond the yield surface, all others
+stay elastic. The full update runs the return mapping of every particle, the
+compacted update (see `Material.compact`) only that of yielding particles.
+
+The closed-form Drucker-Prager return mapping is also compared with the
+previous Optax minimiser of the yield function, on fewer particles.
+
+Run with:
+    python benchmarks/benchmark_return_mapping.py -o return_mapping.json
+"""
+
+from typing import Tuple
+
+import chex
+import jax
+import jax.numpy as jnp
+import optax
+import optimistix as optx
+import pyperf
+
+import pymudokon as pm
+from pymudokon.materials.common import get_lin_elas_dev, get_lin_elas_vol
+from pymudokon.materials.druckerprager import yield_function
+from pymudokon.utils.math_helpers import (
+    get_dev_strain,
+    get_dev_stress,
+    get_pressure,
+    get_q_vm,
+    get_volumetric_strain,
+)
+
+
+@chex.dataclass
+class DruckerPragerMinimiser(pm.DruckerPrager):
+    """Drucker-Prager with the previous return mapping, minimising |f|."""
+
+    def update_stress(
+        self, deps_next, stress_ref, eps_e_prev, eps_p_acc_prev, is_plastic=None
+    ):
+        dim = deps_next.shape[0]
+
+        p_ref = get_pressure(stress_ref, dim)
+        s_ref = get_dev_stress(stress_ref, p_ref, dim)
+
+        eps_e_tr = eps_e_prev + deps_next
+        eps_e_v_tr = get_volumetric_strain(eps_e_tr)
+        eps_e_d_tr = get_dev_strain(eps_e_tr, eps_e_v_tr, 3)
+
+        s_tr = get_lin_elas_dev(eps_e_d_tr, self.G) + s_ref
+        p_tr = get_lin_elas_vol(eps_e_v_tr, self.K) + p_ref
+        q_tr = get_q_vm(dev_stress=s_tr, pressure=p_tr)
+
+        c = self.c0 + self.H * eps_p_acc_prev
+
+        is_ep = yield_function(q_tr, p_tr, self.M, self.M2, c=c) > 0
+
+        def elastic_update(_) -> Tuple[chex.Array, chex.Array, chex.Array]:
+            return s_tr - p_tr * jnp.eye(3), eps_e_tr, eps_p_acc_prev
+
+        def pull_to_ys(_) -> Tuple[chex.Array, chex.Array, chex.Array]:
+            def residuals(pmulti, args):
+                deps_p_v = -pmulti * self.M_hat
+                deps_p_dev = ((pmulti * jnp.sqrt(3)) / 2.0) * (s_tr / q_tr)
+
+                p_next = p_tr - self.K * deps_p_v
+                s_next = s_tr - 2.0 * self.G * deps_p_dev
+                q_next = get_q_vm(dev_stress=s_next, pressure=p_next)
+
+                eps_p_acc_next = eps_p_acc_prev + self.M2 * deps_p_v
+
+                c = self.c0 + self.H * eps_p_acc_next
+
+                R = yield_function(q_next, p_next, self.M, self.M2, c=c)
+
+                return jnp.abs(R), (p_next, s_next, eps_p_acc_next)
+
+            solver = optx.OptaxMinimiser(
+                optax.adabelief(learning_rate=0.0001), rtol=1e-11, atol=1e-11
+            )
+
+            sol = optx.minimise(residuals, solver, 0.0, throw=False, has_aux=True)
+
+            p_next, s_next, eps_p_acc_next = sol.aux
+
+            eps_e_next = (s_next - s_ref) / (2.0 * self.G) - (p_next - p_ref) / (
+                3.0 * self.K
+            ) * jnp.eye(3)
+
+            return s_next - p_next * jnp.eye(3), eps_e_next, eps_p_acc_next
+
+        if is_plastic is None:
+            outputs = jax.lax.cond(is_ep, pull_to_ys, elastic_update, None)
+        elif is_plastic:
+            outputs = pull_to_ys(None)
+        else:
+            outputs = elastic_update(None)
+
+        return *outputs, is_ep
+
+
+def create_system(num_particles, plastic_fraction):
+    num_plastic = int(num_particles * plastic_fraction)
+
+    L_stack = jnp.zeros((num_particles, 3, 3)).at[:num_plastic, 0, 1].set(10.0)
+
+    stress_ref_stack = jnp.stack([-1e5 * jnp.eye(3)] * num_particles)
+
+    particles = pm.Particles.create(position_stack=jnp.zeros((num_particles, 3)))
+    particles = particles.replace(L_stack=L_stack, stress_stack=stress_ref_stack)
+
+    drucker_prager = pm.DruckerPrager.create(
+        E=1e7,
+        nu=0.2,
+        M=1.2,
+        M2=1.0,
+        M_hat=0.8,
+        num_particles=num_particles,
+        stress_ref_stack=stress_ref_stack,
+    )
+
+    modified_cam_clay = pm.ModifiedCamClay.create(
+        nu=0.2,
+        M=1.2,
+        R=1.5,
+        lam=0.8,
+        kap=0.1,
+        Vs=2.0,
+        phi_c=0.6,
+        rho_p=1000.0,
+        stress_ref_stack=stress_ref_stack,
+    )
+
+    return particles, drucker_prager, modified_cam_clay
+
+
+@jax.jit
+def update(material, particles):
+    return material.update_from_particles(particles, 0.01)
+
+
+runner = pyperf.Runner(loops=2)
+
+runner.warmups = 2  # Number of warm-up runs
+runner.samples = 2  # Number of benchmark runs
+
+num_particles = 100000
+
+for plastic_fraction in [0.01, 0.1]:
+    particles, drucker_prager, modified_cam_clay = create_system(
+        num_particles, plastic_fraction
+    )
+
+    capacity = int(num_particles * 0.05)
+
+    for name, material in [
+        ("drucker_prager", drucker_prager),
+        ("modified_cam_clay", modified_cam_clay),
+    ]:
+        runner.bench_func(
+            f"{name}_full/{num_particles}/{plastic_fraction}",
+            lambda: jax.block_until_ready(update(material, particles)),
+        )
+
+        compacted_material = material.compact(capacity)
+
+        runner.bench_func(
+            f"{name}_compacted/{num_particles}/{plastic_fraction}/{capacity}",
+            lambda: jax.block_until_ready(update(compacted_material, particles)),
+        )
+
+# closed-form return mapping against the previous minimiser
+num_particles = 10000
+
+particles, drucker_prager, _ = create_system(num_particles, 0.1)
+
+minimiser = DruckerPragerMinimiser(**dict(drucker_prager.items()))
+
+for name, material in [
+    ("drucker_prager_closed_form", drucker_prager),
+    ("drucker_prager_minimiser", minimiser),
+]:
+    runner.bench_func(
+        f"{name}/{num_particles}/0.1",
+        lambda: jax.block_until_ready(update(material, particles)),
+    )
@@ -0,0 +1,150 @@
+"""Compare shape functions and their evaluation.
+
+Benchmarks separable and per-interaction evaluation of
+`CubicShapeFunction.calculate_shapefunction`, incremental
+`ShapeFunction.update_shapefunction` against a recalculation when 1% of
+the particles change their cell, and one `USL.update` step (shape
+functions, P2G and G2P) with linear, quadratic and cubic shape functions,
+in 2D and 3D.
+
+Run with:
+    python benchmarks/benchmark_shapefunctions.py -o shapefunctions.json
+"""
+
+from functools import partial
+
+import jax
+import jax.numpy as jnp
+import pyperf
+
+import pymudokon as pm
+
+
+@partial(jax.jit, static_argnames=("separable",))
+def run_shapefunction(shapefunctions, nodes, position_stack, separable):
+    return shapefunctions.calculate_shapefunction(
+        origin=nodes.origin,
+        inv_node_spacing=nodes.inv_node_spacing,
+        grid_size=nodes.grid_size,
+        position_stack=position_stack,
+        species_stack=nodes.species_stack,
+        separable=separable,
+    )
+
+
+@jax.jit
+def run_update_shapefunction(shapefunctions, nodes, position_stack):
+    return shapefunctions.update_shapefunction(
+        origin=nodes.origin,
+        inv_node_spacing=nodes.inv_node_spacing,
+        grid_size=nodes.grid_size,
+        position_stack=position_stack,
+        species_stack=nodes.species_stack,
+    )
+
+
+@jax.jit
+def run_update(solver, particles, nodes, shapefunctions, material_stack):
+    return solver.update(
+        particles=particles,
+        nodes=nodes,
+        shapefunctions=shapefunctions,
+        material_stack=material_stack,
+        forces_stack=[],
+        step=0,
+    )
+
+
+runner = pyperf.Runner(loops=2)
+
+runner.warmups = 2  # Number of warm-up runs
+runner.samples = 2  # Number of benchmark runs
+
+systems = [
+    (2, 100000, 0.005),
+    (3, 100000, 0.02),
+]
+
+for dim, num_particles, cell_size in systems:
+    key = jax.random.key(0)
+    position_stack = jax.random.uniform(key, (num_particles, dim)) * 0.8 + 0.1
+
+    nodes = pm.Nodes.create(
+        origin=jnp.zeros(dim), end=jnp.ones(dim), node_spacing=cell_size
+    )
+
+    shapefunctions = pm.CubicShapeFunction.create(num_particles, dim)
+
+    for separable in [False, True]:
+        runner.bench_func(
+            f"cubic_{'separable' if separable else 'per_interaction'}/{dim}D/{num_particles}",
+            lambda: jax.block_until_ready(
+                run_shapefunction(shapefunctions, nodes, position_stack, separable)
+            ),
+        )
+
+for dim, num_particles, cell_size in systems:
+    key = jax.random.key(0)
+    position_stack = jax.random.uniform(key, (num_particles, dim)) * 0.8 + 0.1
+
+    nodes = pm.Nodes.create(
+        origin=jnp.zeros(dim), end=jnp.ones(dim), node_spacing=cell_size
+    )
+
+    # 1% of the particles move to the next cell
+    num_moved = num_particles // 100
+    next_position_stack = position_stack.at[:num_moved, 0].add(cell_size)
+
+    for shapefunction_cls in [
+        pm.LinearShapeFunction,
+        pm.QuadraticShapeFunction,
+        pm.CubicShapeFunction,
+    ]:
+        shapefunctions = shapefunction_cls.create(num_particles, dim)
+
+        shapefunctions_incremental, _ = run_update_shapefunction(
+            shapefunctions.incremental(num_particles, 2 * num_moved),
+            nodes,
+            position_stack,
+        )
+
+        for name, _shapefunctions in [
+            ("calculate", shapefunctions),
+            ("incremental", shapefunctions_incremental),
+        ]:
+            runner.bench_func(
+                f"update_shapefunction_{name}/{shapefunction_cls.__name__}/{dim}D/{num_particles}",
+                lambda: jax.block_until_ready(
+                    run_update_shapefunction(_shapefunctions, nodes, next_position_stack)
+                ),
+            )
+
+for dim, num_particles, cell_size in systems:
+    key = jax.random.key(0)
+    position_stack = jax.random.uniform(key, (num_particles, dim)) * 0.8 + 0.1
+
+    for shapefunction_cls in [
+        pm.LinearShapeFunction,
+        pm.QuadraticShapeFunction,
+        pm.CubicShapeFunction,
+    ]:
+        particles, nodes, shapefunctions = pm.discretize(
+            pm.Particles.create(position_stack=position_stack),
+            pm.Nodes.create(
+                origin=jnp.zeros(dim), end=jnp.ones(dim), node_spacing=cell_size
+            ),
+            shapefunction_cls.create(num_particles, dim),
+            ppc=2**dim,
+            density_ref=1000,
+        )
+
+        solver = pm.USL.create(alpha=0.99, dt=0.0001)
+
+        material_stack = [pm.LinearIsotropicElastic.create(E=1000.0, nu=0.3)]
+
+        runner.bench_func(
+            f"usl_update/{shapefunction_cls.__name__}/{dim}D/{num_particles}",
+            lambda: jax.block_until_ready(
+                run_update(solver, particles, nodes, shapefunctions, material_stack)
+            ),
+        )
@@ -0,0 +1,93 @@
+"""Strong and weak scaling of `run_solver_sharded` against device count.
+
+Strong scaling keeps the total number of particles fixed, weak scaling keeps
+the number of particles per device fixed. Timings are per step, so steps/s is
+the inverse of the reported value.
+
+On CPU, devices are emulated with `--xla_force_host_platform_device_count`,
+which is set below if `XLA_FLAGS` is not given.
+
+Run with:
+    python benchmarks/benchmark_sharded.py -o sharded.json
+"""
+
+import os
+
+os.environ.setdefault("XLA_FLAGS", "--xla_force_host_platform_device_count=8")
+
+import jax  # noqa: E402
+import jax.numpy as jnp  # noqa: E402
+import numpy as np  # noqa: E402
+import pyperf  # noqa: E402
+from jax.sharding import Mesh  # noqa: E402
+
+import pymudokon as pm  # noqa: E402
+
+
+def create_system(num_particles):
+    key = jax.random.key(0)
+    position_stack = jax.random.uniform(key, (num_particles, 3)) * 0.8 + 0.1
+
+    particles = pm.Particles.create(position_stack=position_stack)
+
+    nodes = pm.Nodes.create(
+        origin=jnp.zeros(3),
+        end=jnp.ones(3),
+        node_spacing=0.02,
+    )
+
+    shapefunctions = pm.LinearShapeFunction.create(num_particles, 3)
+
+    particles, nodes, shapefunctions = pm.discretize(
+        particles, nodes, shapefunctions, ppc=8, density_ref=1000
+    )
+
+    material = pm.LinearIsotropicElastic.create(E=1000.0, nu=0.3)
+
+    gravity = pm.Gravity.create(gravity=jnp.array([0.0, 0.0, -9.8]))
+
+    return particles, nodes, shapefunctions, [material], [gravity]
+
+
+runner = pyperf.Runner(loops=1)
+
+runner.warmups = 1  # Number of warm-up runs
+runner.samples = 2  # Number of benchmark runs
+
+solver = pm.USL.create(alpha=0.99, dt=0.0001)
+
+num_steps = 10
+
+num_particles_per_device = 2**15
+
+device_counts = [d for d in [1, 2, 4, 8] if d <= jax.device_count()]
+
+for scaling in ["strong", "weak"]:
+    for num_devices in device_counts:
+        if scaling == "strong":
+            num_particles = num_particles_per_device * device_counts[-1]
+        else:
+            num_particles = num_particles_per_device * num_devices
+
+        particles, nodes, shapefunctions, material_stack, forces_stack = (
+            create_system(num_particles)
+        )
+
+        mesh = Mesh(np.array(jax.devices()[:num_devices]), ("particles",))
+
+        runner.bench_func(
+            f"sharded_{scaling}/{num_devices}/{num_particles}",
+            lambda: jax.block_until_ready(
+                pm.run_solver_sharded(
+                    solver,
+                    particles,
+                    nodes,
+                    shapefunctions,
+                    material_stack,
+                    forces_stack,
+                    num_steps,
+                    mesh=mesh,
+                )
+            ),
+            inner_loops=num_steps,
+        )
@@ -0,0 +1,80 @@
+"""Scatter throughput of P2G/G2P before and after sorting particles by cell.
+
+Particles are created in random order on a 3D grid, which is the worst case for
+the `.at[intr_hash_stack].add(...)` scatter in `USL.p2g`. The same particles are
+then sorted with `Solver.sort_particles` and the transfers are timed again.
+
+Run with:
+    python benchmarks/benchmark_sort.py -o sort.json
+"""
+
+import jax
+import jax.numpy as jnp
+import pyperf
+
+import pymudokon as pm
+
+
+def create_system(num_particles, cell_size):
+    key = jax.random.key(0)
+    position_stack = jax.random.uniform(key, (num_particles, 3))
+
+    particles = pm.Particles.create(position_stack=position_stack)
+
+    nodes = pm.Nodes.create(
+        origin=jnp.array([0.0, 0.0, 0.0]),
+        end=jnp.array([1.0, 1.0, 1.0]),
+        node_spacing=cell_size,
+    )
+
+    shapefunctions = pm.LinearShapeFunction.create(num_particles, 3)
+
+    particles, nodes, shapefunctions = pm.discretize(
+        particles, nodes, shapefunctions, ppc=8, density_ref=1000
+    )
+
+    return particles, nodes, shapefunctions
+
+
+@jax.jit
+def run_p2g_g2p(solver, particles, nodes, shapefunctions):
+    shapefunctions, _ = shapefunctions.calculate_shapefunction(
+        origin=nodes.origin,
+        inv_node_spacing=nodes.inv_node_spacing,
+        grid_size=nodes.grid_size,
+        position_stack=particles.position_stack,
+        species_stack=nodes.species_stack,
+    )
+    nodes = solver.p2g(particles=particles, nodes=nodes, shapefunctions=shapefunctions)
+    particles = solver.g2p(
+        particles=particles, nodes=nodes, shapefunctions=shapefunctions
+    )
+    return particles, nodes
+
+
+runner = pyperf.Runner(loops=2)
+
+runner.warmups = 2  # Number of warm-up runs
+runner.samples = 2  # Number of benchmark runs
+
+solver = pm.USL.create(alpha=0.99, dt=0.0001)
+
+for num_particles in [1000000]:
+    for cell_size in [0.02, 0.01]:
+        particles, nodes, shapefunctions = create_system(num_particles, cell_size)
+
+        runner.bench_func(
+            f"p2g_g2p_unsorted/{num_particles}/{cell_size}",
+            lambda: jax.block_until_ready(
+                run_p2g_g2p(solver, particles, nodes, shapefunctions)
+            ),
+        )
+
+        _, sorted_particles, _ = solver.sort_particles(particles, nodes, [])
+
+        runner.bench_func(
+            f"p2g_g2p_sorted/{num_particles}/{cell_size}",
+            lambda: jax.block_until_ready(
+                run_p2g_g2p(solver, sorted_particles, nodes, shapefunctions)
+            ),
+        )
@@ -0,0 +1,70 @@
+"""Per-step time of the dense and sparse grid for a mostly empty domain.
+
+Particles fill a small column in the corner of a 3D box, similar to a
+granular runout before collapse. `Nodes` allocates the whole box, while
+`SparseNodes` only stores the 4x4x4 blocks touched by particles.
+
+Run with:
+    python benchmarks/benchmark_sparse.py -o sparse.json
+"""
+
+import jax
+import jax.numpy as jnp
+import pyperf
+
+import pymudokon as pm
+
+
+def create_system(num_particles, domain_length, sparse):
+    key = jax.random.key(0)
+    position_stack = jax.random.uniform(key, (num_particles, 3)) * 0.2 + 0.1
+
+    particles = pm.Particles.create(position_stack=position_stack)
+
+    kwargs = dict(
+        origin=jnp.zeros(3),
+        end=jnp.ones(3) * domain_length,
+        node_spacing=0.01,
+    )
+    if sparse:
+        # column of 0.2^3 with cell size 0.01 activates at most 7^3 blocks
+        nodes = pm.SparseNodes.create(**kwargs, block_size=4, num_blocks=7**3)
+    else:
+        nodes = pm.Nodes.create(**kwargs)
+
+    shapefunctions = pm.LinearShapeFunction.create(num_particles, 3)
+
+    particles, nodes, shapefunctions = pm.discretize(
+        particles, nodes, shapefunctions, ppc=8, density_ref=1000
+    )
+
+    material = pm.LinearIsotropicElastic.create(E=1000.0, nu=0.3)
+
+    gravity = pm.Gravity.create(gravity=jnp.array([0.0, 0.0, -9.8]))
+
+    return particles, nodes, shapefunctions, [material], [gravity]
+
+
+@jax.jit
+def run_update(solver, particles, nodes, shapefunctions, material_stack, forces_stack):
+    return solver.update(
+        particles, nodes, shapefunctions, material_stack, forces_stack, 0
+    )
+
+
+runner = pyperf.Runner(loops=2)
+
+runner.warmups = 2  # Number of warm-up runs
+runner.samples = 2  # Number of benchmark runs
+
+solver = pm.USL.create(alpha=0.99, dt=0.0001)
+
+for num_particles in [100000]:
+    for domain_length in [1.0, 2.0]:
+        for sparse in [False, True]:
+            system = create_system(num_particles, domain_length, sparse)
+            grid = "sparse" if sparse else "dense"
+            runner.bench_func(
+                f"usl_update_{grid}/{num_particles}/{domain_length}",
+                lambda: jax.block_until_ready(run_update(solver, *system)),
+            )
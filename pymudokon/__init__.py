@@ -14,6 +14,8 @@ from .forces.forces import Forces
 from .forces.gravity import Gravity
 from .forces.nodelevelset import NodeLevelSet
 from .forces.nodewall import NodeWall
+from .forces.particleemitter import ParticleEmitter
+from .forces.particlesink import ParticleSink
 from .forces.rigidparticles import RigidParticles
 from .materials.druckerprager import DruckerPrager
 from .materials.experimental.mcc_mrm import MCC_MRM
@@ -25,7 +27,7 @@ from .materials.material import Material
 from .materials.modifiedcamclay import ModifiedCamClay
 from .materials.mu_i_rheology_incompressible import MuI_incompressible
 from .materials.newtonfluid import NewtonFluid
-from .materials_analysis.mix_control import mix_control
+from .materials_analysis.mix_control import mix_control, mix_control_sweep
 from .materials_analysis.mp_benchmarks import MPBenchmark
 from .materials_analysis.plot import (
     add_plot,
@@ -36,16 +38,40 @@ from .materials_analysis.plot import (
 )
 from .materials_analysis.plot_sets import plot_set1, plot_set2, plot_set3
 from .nodes.nodes import Nodes
+from .nodes.slabnodes import SlabNodes
+from .nodes.sparsenodes import SparseNodes
 from .particles.particles import Particles
 from .shapefunctions.cubic import CubicShapeFunction
 from .shapefunctions.cubic_old import CubicShapeFunction2
 from .shapefunctions.linear import LinearShapeFunction
+from .shapefunctions.quadratic import QuadraticShapeFunction
 from .shapefunctions.shapefunctions import ShapeFunction
-from .solvers.run_solver import run_solver, run_solver_io
+from .solvers.run_solver import (
+    run_solver,
+    run_solver_adaptive,
+    run_solver_checkpointed,
+    run_solver_ensemble,
+    run_solver_io,
+    run_solver_sharded,
+    run_solver_stream,
+    run_solver_until,
+)
+from .solvers.run_solver_slab import run_solver_slab
+from .solvers.termination import Termination
 from .solvers.usl import USL
 from .solvers.usl_apic import USL_APIC
 from .solvers.usl_asflip import USL_ASFLIP
-from .utils.jax_helpers import dump_restart_files, save_object, set_default_gpu
+from .solvers.usl_implicit import USL_Implicit
+from .utils.checkpoint_helpers import CheckpointManager
+from .utils.compile_helpers import compile_solver, enable_compilation_cache
+from .utils.jax_helpers import (
+    dump_restart_files,
+    permute_particle_stacks,
+    save_object,
+    set_default_gpu,
+    stack_ensemble,
+    unsort_particle_stack,
+)
 from .utils.math_helpers import (
     e_to_phi,
     e_to_phi_stack,
@@ -94,6 +120,12 @@ from .utils.mpm_postprocessing_helpers import (
     post_processes_grid_gradient_stack,
     post_processes_stress_stack,
 )
+from .utils.output_helpers import (
+    LazyFrameStack,
+    OutputReader,
+    OutputSpec,
+    OutputWriter,
+)
 from .utils.stl_helpers import (
     get_stl_bounds,
     sample_points_in_volume,
@@ -103,15 +135,20 @@ from .utils.stl_helpers import (
 
 __all__ = [
     "Nodes",
+    "SparseNodes",
+    "SlabNodes",
     "Particles",
     "ShapeFunction",
     "LinearShapeFunction",
     "CubicShapeFunction",
+    "QuadraticShapeFunction",
     "DirichletBox",
     "RigidParticles",
     "Forces",
     "Gravity",
     "NodeWall",
+    "ParticleEmitter",
+    "ParticleSink",
     "Material",
     "LinearIsotropicElastic",
     "NewtonFluid",
@@ -120,10 +157,29 @@ __all__ = [
     "MCC_MRM",
     "MuI",
     "mix_control",
+    "mix_control_sweep",
     "MPBenchmark",
     "USL",
     "USL_APIC",
+    "USL_Implicit",
     "run_solver",
+    "run_solver_adaptive",
+    "run_solver_checkpointed",
+    "run_solver_ensemble",
+    "run_solver_sharded",
+    "run_solver_slab",
+    "run_solver_io",
+    "run_solver_stream",
+    "run_solver_until",
+    "Termination",
+    "OutputSpec",
+    "CheckpointManager",
+    "OutputWriter",
+    "OutputReader",
+    "LazyFrameStack",
+    "permute_particle_stacks",
+    "stack_ensemble",
+    "unsort_particle_stack",
     "discretize",
     "e_to_phi",
     "e_to_phi_stack",
@@ -1,7 +1,7 @@
 """Module for imposing zero/non-zero boundaries via rigid particles."""
 
 from functools import partial
-from typing import Tuple
+from typing import ClassVar, Tuple
 from typing_extensions import Self
 
 import chex
@@ -23,6 +23,9 @@ class NodeLevelSet:
     velocity_stack: Array
     mu: jnp.float32
 
+    # Reads the interactions of the solver step, see `ShapeFunction.fuse`
+    uses_interactions: ClassVar[bool] = True
+
     @classmethod
     def create(
         cls: Self,
@@ -118,9 +121,13 @@ class NodeLevelSet:
             velocity
         ):
 
-            node_moment_nt = nodes.moment_nt_stack.at[hash_id].get()
-            node_mass = nodes.mass_stack.at[hash_id].get()
-            node_normals = nodes_normal_stack.at[hash_id].get()
+            node_moment_nt = nodes.moment_nt_stack.at[hash_id].get(
+                mode="fill", fill_value=0.0
+            )
+            node_mass = nodes.mass_stack.at[hash_id].get(mode="fill", fill_value=0.0)
+            node_normals = nodes_normal_stack.at[hash_id].get(
+                mode="fill", fill_value=0.0
+            )
             
             # skip the nodes with small mass, due to numerical instability
             nodes_vel_nt = jax.lax.cond(
@@ -202,13 +209,16 @@ class NodeLevelSet:
             node_moments_nt = new_nodes_vel_nt * node_mass
             return node_moments_nt
     
+        # map tagged nodes to the node arrays, e.g., slots of `SparseNodes`
+        node_id_stack = nodes.get_node_index_stack(self.id_stack)
+
         levelset_moment_nt_stack= vmap_nodes(
-            self.id_stack,
+            node_id_stack,
             self.velocity_stack
         )
 
-        moment_nt_stack = nodes.moment_nt_stack.at[self.id_stack].set(
-            levelset_moment_nt_stack
+        moment_nt_stack = nodes.moment_nt_stack.at[node_id_stack].set(
+            levelset_moment_nt_stack, mode="drop"
         )
 
         return nodes.replace(moment_nt_stack=moment_nt_stack), self
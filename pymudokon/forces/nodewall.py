@@ -51,20 +51,21 @@ class NodeWall:
         step: jnp.int32 = 0
     ) -> Tuple[Nodes, Self]:
         """Apply the boundary conditions on the nodes moments."""
+        node_id_stack = nodes.get_node_index_stack(self.node_id_stack)
 
         def stick_all(moment_nt):
             """Stick all directions."""
-            moment_nt = moment_nt.at[self.node_id_stack].set(0.0)
+            moment_nt = moment_nt.at[node_id_stack].set(0.0, mode="drop")
             return moment_nt
 
         def slip_positive_normal(moment_nt):
             """Slip in min direction of inward normal."""
-            moment_nt = moment_nt.at[self.node_id_stack, self.wall_dim].min(0.0)
+            moment_nt = moment_nt.at[node_id_stack, self.wall_dim].min(0.0, mode="drop")
             return moment_nt
 
         def slip_negative_normal(moment_nt):
             """Slip in max direction of outward normal."""
-            moment_nt = moment_nt.at[self.node_id_stack, self.wall_dim].max(0.0)
+            moment_nt = moment_nt.at[node_id_stack, self.wall_dim].max(0.0, mode="drop")
             return moment_nt
 
         moment_nt_stack = jax.lax.switch(
@@ -0,0 +1,126 @@
+"""Module for the inflow of particles into a fixed-capacity particle pool."""
+
+from typing import List, Tuple
+from typing_extensions import Self
+
+import chex
+import jax.numpy as jnp
+
+from ..materials.material import Material
+from ..nodes.nodes import Nodes
+from ..particles.particles import Particles
+from ..shapefunctions.shapefunctions import ShapeFunction
+from ..utils.jax_helpers import scatter_particle_stacks
+
+
+@chex.dataclass
+class ParticleEmitter:
+    """Inflow of particles into inactive slots of the particle pool.
+
+    Every `emit_every` steps, a copy of the template particles is written to
+    inactive slots of `Particles` created with a `capacity`, which are then
+    activated. Template particles without a free slot are dropped and
+    counted in `num_dropped`.
+
+    Attributes:
+        particles: Template of the emitted particles, e.g., a layer of
+            particles at the inlet with an inflow velocity.
+        material_stack: Templates of the per-particle material state of the
+            emitted particles, one per material of the solver. Entries may be
+            `None` to keep the material state of the slot.
+        emit_every: Emit the template particles every nth step.
+        num_dropped: Number of template particles dropped so far.
+
+    Example for a continuous feed from a hopper:
+    >>> import pymudokon as pm
+    >>> import jax.numpy as jnp
+    >>> inlet = pm.Particles.create(
+    ...     position_stack=jnp.array([[0.5, 0.95], [0.55, 0.95]]),
+    ...     velocity_stack=jnp.array([[0.0, -1.0], [0.0, -1.0]]),
+    ... )
+    >>> # ... set masses and volumes of the inlet particles
+    >>> emitter = pm.ParticleEmitter.create(particles=inlet, emit_every=100)
+    >>> # add emitter to the forces of the solver
+    """
+
+    particles: Particles
+    material_stack: List[Material]
+    emit_every: jnp.int32
+    num_dropped: jnp.int32
+
+    @classmethod
+    def create(
+        cls: Self,
+        particles: Particles,
+        material_stack: List[Material] = None,
+        emit_every: jnp.int32 = 1,
+    ) -> Self:
+        """Create a particle emitter."""
+        return cls(
+            particles=particles,
+            material_stack=material_stack,
+            emit_every=emit_every,
+            num_dropped=jnp.int32(0),
+        )
+
+    def apply_on_nodes_moments(
+        self: Self,
+        nodes: Nodes,
+        particles: Particles = None,
+        shapefunctions: ShapeFunction = None,
+        dt: jnp.float32 = 0.0,
+        step: jnp.int32 = 0,
+    ) -> Tuple[Nodes, Self]:
+        """Emitters do not act on the nodes."""
+        return nodes, self
+
+    def apply_on_particles(
+        self: Self,
+        particles: Particles,
+        material_stack: List[Material],
+        dt: jnp.float32 = 0.0,
+        step: jnp.int32 = 0,
+    ) -> Tuple[Particles, List[Material], Self]:
+        """Write the template particles to inactive slots and activate them."""
+        num_emit = self.particles.position_stack.shape[0]
+        num_slots = particles.active_mask_stack.shape[0]
+
+        is_emit_step = step % self.emit_every == 0
+
+        (free_id_stack,) = jnp.nonzero(
+            ~particles.active_mask_stack,
+            size=num_emit,
+            fill_value=num_slots,
+        )
+
+        # Out of range ids are dropped by the scatters below
+        slot_id_stack = jnp.where(is_emit_step, free_id_stack, num_slots)
+
+        particles = scatter_particle_stacks(
+            particles, slot_id_stack, self.particles
+        ).replace(
+            id_stack=particles.id_stack,
+            active_mask_stack=particles.active_mask_stack.at[slot_id_stack].set(
+                True, mode="drop"
+            ),
+        )
+
+        if self.material_stack is not None:
+            material_stack = [
+                material
+                if template is None
+                else scatter_particle_stacks(material, slot_id_stack, template)
+                for material, template in zip(material_stack, self.material_stack)
+            ]
+
+        num_dropped = jnp.where(
+            is_emit_step,
+            jnp.sum(free_id_stack == num_slots),
+            0,
+        )
+
+        return (
+            particles,
+            material_stack,
+            self.replace(num_dropped=self.num_dropped + num_dropped),
+        )
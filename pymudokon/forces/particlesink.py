@@ -0,0 +1,79 @@
+"""Module for the outflow of particles from a fixed-capacity particle pool."""
+
+from typing import List, Tuple
+from typing_extensions import Self
+
+import chex
+import jax.numpy as jnp
+
+from ..materials.material import Material
+from ..nodes.nodes import Nodes
+from ..particles.particles import Particles
+from ..shapefunctions.shapefunctions import ShapeFunction
+
+
+@chex.dataclass
+class ParticleSink:
+    """Outflow of particles leaving a box.
+
+    Active particles outside the box `[origin, end]` are deactivated, which
+    frees their slots for a `ParticleEmitter`. Requires `Particles` created
+    with a `capacity`.
+
+    Attributes:
+        origin: Start coordinates of the box `(dim,)`.
+        end: End coordinates of the box `(dim,)`.
+        num_removed: Number of particles removed so far.
+
+    Example for particles leaving the domain:
+    >>> import pymudokon as pm
+    >>> import jax.numpy as jnp
+    >>> sink = pm.ParticleSink.create(origin=jnp.zeros(2), end=jnp.ones(2))
+    >>> # add sink to the forces of the solver
+    """
+
+    origin: chex.Array
+    end: chex.Array
+    num_removed: jnp.int32
+
+    @classmethod
+    def create(cls: Self, origin: chex.Array, end: chex.Array) -> Self:
+        """Create a particle sink."""
+        return cls(origin=origin, end=end, num_removed=jnp.int32(0))
+
+    def apply_on_nodes_moments(
+        self: Self,
+        nodes: Nodes,
+        particles: Particles = None,
+        shapefunctions: ShapeFunction = None,
+        dt: jnp.float32 = 0.0,
+        step: jnp.int32 = 0,
+    ) -> Tuple[Nodes, Self]:
+        """Sinks do not act on the nodes."""
+        return nodes, self
+
+    def apply_on_particles(
+        self: Self,
+        particles: Particles,
+        material_stack: List[Material],
+        dt: jnp.float32 = 0.0,
+        step: jnp.int32 = 0,
+    ) -> Tuple[Particles, List[Material], Self]:
+        """Deactivate particles outside the box."""
+        is_inside_stack = jnp.all(
+            (particles.position_stack >= self.origin)
+            & (particles.position_stack <= self.end),
+            axis=1,
+        )
+
+        is_removed_stack = particles.active_mask_stack & ~is_inside_stack
+
+        return (
+            particles.replace(
+                active_mask_stack=particles.active_mask_stack & is_inside_stack
+            ),
+            material_stack,
+            self.replace(
+                num_removed=self.num_removed + jnp.sum(is_removed_stack).astype(jnp.int32)
+            ),
+        )
@@ -1,7 +1,7 @@
 """Module for imposing zero/non-zero boundaries via rigid particles."""
 
 from functools import partial
-from typing import Tuple
+from typing import ClassVar, Tuple
 from typing_extensions import Self
 
 import chex
@@ -46,6 +46,9 @@ class RigidParticles:
     velocity_stack: Array
     shapefunction: ShapeFunction
 
+    # Reads the interactions of the solver step, see `ShapeFunction.fuse`
+    uses_interactions: ClassVar[bool] = True
+
     @classmethod
     def create(
         cls: Self,
@@ -37,8 +37,12 @@ def get_flattened_triu(A):
     return A.at[jnp.triu_indices(A.shape[0])].get()
 
 
+def get_wave_speed(bulk_modulus, shear_modulus, density):
+    return jnp.sqrt((bulk_modulus + shear_modulus * (4.0 / 3.0)) / density)
+
+
 def get_timestep(cell_size, bulk_modulus, shear_modulus, density, factor=0.1):
-    c = jnp.sqrt((bulk_modulus + shear_modulus * (4.0 / 3.0)) / density)
+    c = get_wave_speed(bulk_modulus, shear_modulus, density)
     dt = factor * cell_size / c
     return dt
 
@@ -5,15 +5,12 @@ and linear hardening.
 plasticity.
 """
 
-from functools import partial
 from typing import Tuple
 from typing_extensions import Self
 
 import chex
 import jax
 import jax.numpy as jnp
-import optax
-import optimistix as optx
 
 from ..particles.particles import Particles
 from ..utils.math_helpers import (
@@ -29,6 +26,7 @@ from .common import (
     get_lin_elas_dev,
     get_lin_elas_vol,
     get_shear_modulus,
+    get_wave_speed,
 )
 from .material import Material
 
@@ -68,6 +66,8 @@ class DruckerPrager(Material):
         eps_acc_stack: Accumulated plastic strain for linear hardening
         eps_e_stack: Elastic strain tensor.
         H: Hardening modulus
+        plastic_id_buffer: Ids of yielding particles, if the return mapping
+            is compacted, see `Material.compact`.
     """
 
     E: jnp.float32
@@ -86,6 +86,8 @@ class DruckerPrager(Material):
 
     H: jnp.float32 = 0.0
 
+    plastic_id_buffer: chex.Array = None
+
     @classmethod
     def create(
         cls: Self,
@@ -147,6 +149,10 @@ class DruckerPrager(Material):
 
         return particles.replace(stress_stack=stress_stack), self
 
+    def get_wave_speed_stack(self: Self, particles: Particles) -> chex.Array:
+        """Get the elastic P-wave speed at each particle, see `Material`."""
+        return get_wave_speed(self.K, self.G, particles.get_density_stack())
+
     def update(
         self: Self,
         stress_prev_stack: chex.Array,
@@ -159,24 +165,28 @@ class DruckerPrager(Material):
 
         deps_stack = get_sym_tensor_stack(L_stack) * dt
 
-        stress_next_stack, eps_e_next_stack, eps_p_acc_next_stack = (
-            self.vmap_update_stress(
-                deps_stack,
-                self.stress_ref_stack,
-                self.eps_e_stack,
-                self.eps_p_acc_stack,
-            )
+        outputs, plastic_id_buffer = self.vmap_return_mapping(
+            self.update_stress,
+            deps_stack,
+            self.stress_ref_stack,
+            self.eps_e_stack,
+            self.eps_p_acc_stack,
         )
+        stress_next_stack, eps_e_next_stack, eps_p_acc_next_stack = outputs
 
         return (
             stress_next_stack,
             self.replace(
-                eps_e_stack=eps_e_next_stack, eps_p_acc_stack=eps_p_acc_next_stack
+                eps_e_stack=eps_e_next_stack,
+                eps_p_acc_stack=eps_p_acc_next_stack,
+                plastic_id_buffer=plastic_id_buffer,
             ),
         )
 
-    @partial(jax.vmap, in_axes=(None, 0, 0, 0, 0), out_axes=(0, 0, 0))
-    def vmap_update_stress(self, deps_next, stress_ref, eps_e_prev, eps_p_acc_prev):
+    def update_stress(
+        self, deps_next, stress_ref, eps_e_prev, eps_p_acc_prev, is_plastic=None
+    ):
+        """Update the stress of a single particle, see `vmap_return_mapping`."""
         dim = deps_next.shape[0]
 
         # Reference pressure and deviatoric stress
@@ -215,69 +225,61 @@ class DruckerPrager(Material):
             return stress, eps_e_tr, eps_p_acc_prev
 
         def pull_to_ys(is_ep) -> Tuple[chex.Array, chex.Array, chex.Array, chex.Array]:
-            """If yield function is negative, return elastic solution."""
-
-            def residuals(sol, args):
-                """Reduced system for non-associated flow rule."""
-                pmulti = sol
-
-                # solve non associated flow rules
-                # volumetric plastic strain increment
-                deps_p_v = -pmulti * self.M_hat
-
-                # deviatoric plastic strain increment
-                # flow vector is coaxial to deviatoric stress
-                deps_p_dev = ((pmulti * jnp.sqrt(3)) / 2.0) * (s_tr / q_tr)
-
-                # Trail isotropic linear elastic law
-                p_next = p_tr - self.K * deps_p_v
-                s_next = s_tr - 2.0 * self.G * deps_p_dev
-                q_next = get_q_vm(dev_stress=s_next, pressure=p_next)
-
-                # linear hardening
-                eps_p_acc_next = eps_p_acc_prev + self.M2 * deps_p_v
-
-                c = self.c0 + self.H * eps_p_acc_next
-
-                aux = p_next, s_next, eps_p_acc_next
-
-                R = yield_function(q_next, p_next, self.M, self.M2, c=c)
+            """If yield function is positive, return to the cone or the apex.
+
+            The yield function is linear in the plastic multiplier, so both
+            returns are closed form, see [1] Box 8.9.
+            """
+            # Cone return, following the non-associated flow rule
+            # deps_p_v = -pmulti * M_hat, deps_p_dev = sqrt(3)/2 pmulti s_tr / q_tr
+            # which gives q_next = q_tr - sqrt(3) G pmulti
+            # and p_next = p_tr + K M_hat pmulti
+            pmulti = yf / (
+                jnp.sqrt(3.0) * self.G
+                + self.M * self.K * self.M_hat
+                - self.M2 * self.M2 * self.H * self.M_hat
+            )
 
-                return jnp.abs(R), aux
+            # Apex return if the cone return gives a negative q
+            is_apex = jnp.sqrt(3.0) * self.G * pmulti > q_tr
 
-            solver = optx.OptaxMinimiser(
-                optax.adabelief(learning_rate=0.0001), rtol=1e-11, atol=1e-11
+            # volumetric plastic strain increment
+            deps_p_v = jnp.where(
+                is_apex,
+                (self.M * p_tr + self.M2 * c) / (self.M * self.K - self.M2**2 * self.H),
+                -pmulti * self.M_hat,
             )
 
-            sol = optx.minimise(
-                residuals,
-                solver,
-                0.0,
-                throw=False,
-                has_aux=True,
+            # Trail isotropic linear elastic law
+            p_next = p_tr - self.K * deps_p_v
+            s_next = jnp.where(
+                is_apex,
+                jnp.zeros((3, 3)),
+                (1.0 - jnp.sqrt(3.0) * self.G * pmulti / q_tr) * s_tr,
             )
 
-            # jax.debug.print("sol {} is_ep {}", sol.result, is_ep)
-            p_next, s_next, eps_p_acc_next = sol.aux
+            # linear hardening
+            eps_p_acc_next = eps_p_acc_prev + self.M2 * deps_p_v
 
             stress_next = s_next - p_next * jnp.eye(3)
 
             eps_e_next = (s_next - s_ref) / (2.0 * self.G) - (p_next - p_ref) / (
                 3.0 * self.K
             ) * jnp.eye(3)
-            # jax.debug.print("plastic step")
-            return stress_next, eps_e_next, eps_p_acc_next
-            # return 1
 
-            # stress = s_tr - p_tr * jnp.eye(3)
-            # return stress, eps_e_tr, eps_p_acc_prev
+            return stress_next, eps_e_next, eps_p_acc_next
 
-        # stress_next = s_tr - p_tr * jnp.eye(3)
-        stress_next, eps_e_next, eps_p_acc_next = jax.lax.cond(
-            is_ep, pull_to_ys, elastic_update, None
-        )
+        if is_plastic is None:
+            # stress_next = s_tr - p_tr * jnp.eye(3)
+            stress_next, eps_e_next, eps_p_acc_next = jax.lax.cond(
+                is_ep, pull_to_ys, elastic_update, None
+            )
+        elif is_plastic:
+            stress_next, eps_e_next, eps_p_acc_next = pull_to_ys(is_ep)
+        else:
+            stress_next, eps_e_next, eps_p_acc_next = elastic_update(is_ep)
 
-        return stress_next, eps_e_next, eps_p_acc_next
+        return stress_next, eps_e_next, eps_p_acc_next, is_ep
         # jax.debug.print("is_ep_result {}", is_ep_result)
         # return stress_next, eps_e_tr, eps_p_acc_prev
 
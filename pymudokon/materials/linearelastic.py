@@ -9,7 +9,12 @@ import jax.numpy as jnp
 
 from ..particles.particles import Particles
 from ..utils.math_helpers import get_sym_tensor_stack
-from .common import get_bulk_modulus, get_lame_modulus, get_shear_modulus
+from .common import (
+    get_bulk_modulus,
+    get_lame_modulus,
+    get_shear_modulus,
+    get_wave_speed,
+)
 from .material import Material
 
 
@@ -56,6 +61,10 @@ class LinearIsotropicElastic(Material):
 
         return particles.replace(stress_stack=stress_stack), self
 
+    def get_wave_speed_stack(self: Self, particles: Particles) -> chex.Array:
+        """Get the P-wave speed at each particle, see `Material`."""
+        return get_wave_speed(self.K, self.G, particles.get_density_stack())
+
     def update(
         self: Self,
         stress_prev_stack: chex.Array,
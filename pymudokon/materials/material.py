@@ -1,6 +1,12 @@
 """Base class for materials in the simulation."""
 
+import dataclasses
+from functools import partial
+from typing import Callable, ClassVar, Tuple
+from typing_extensions import Self
+
 import chex
+import jax
 import jax.numpy as jnp
 
 
@@ -10,6 +16,152 @@ class Material:
 
     Attributes:
         absolute_density: Absolute density e.g., particle density.
+        particle_id_stack: Ids of the particles owned by the material
+            `(num_material_particles,)`, or `None` if the material updates all
+            particles. See `assign_particles`.
+        written_particle_keys: Per-particle entries of the particles that
+            `update_from_particles` writes, scattered back to the owned
+            particles by `Solver.update_materials`. Class constant, override
+            in materials that write other entries than the stress.
     """
 
+    written_particle_keys: ClassVar[Tuple[str, ...]] = ("stress_stack",)
+
     absolute_density: jnp.float32
+    _: dataclasses.KW_ONLY
+    particle_id_stack: chex.Array = None
+
+    def assign_particles(self: Self, particles, material_id: int) -> Self:
+        """Own the particles with `particles.material_id_stack == material_id`.
+
+        Solvers then update the material on its own particles only, gathered
+        into a contiguous sub-batch, see `Solver.update_materials`. The
+        per-particle state of the material (e.g., `eps_e_stack`) must hold
+        one entry per owned particle, in order of the particle ids.
+
+        Called before running a solver, outside of jitted functions.
+
+        Args:
+            particles: Particles with `material_id_stack`.
+            material_id: Index of the material in the material stack.
+
+        Returns:
+            Material: Material owning its particles.
+        """
+        particle_id_stack = particles.id_stack[
+            particles.material_id_stack == material_id
+        ].astype(jnp.int32)
+
+        num_particles = particle_id_stack.shape[0]
+
+        for key in self:
+            stack = self[key]
+            if not key.endswith("_stack") or not hasattr(stack, "shape"):
+                continue
+            if key == "particle_id_stack" or stack.ndim == 0:
+                continue
+            if stack.shape[0] != num_particles:
+                raise ValueError(
+                    f"{key} has {stack.shape[0]} entries, but material "
+                    f"{material_id} owns {num_particles} particles"
+                )
+
+        return self.replace(particle_id_stack=particle_id_stack)
+
+    def get_wave_speed_stack(self: Self, particles) -> chex.Array:
+        """Get the elastic wave speed at each particle.
+
+        Used to find the stable time step, see `Solver.get_stable_dt`.
+
+        Args:
+            particles: Particles state.
+
+        Returns:
+            chex.Array: Wave speeds `(num_particles,)`.
+        """
+        raise NotImplementedError(
+            f"{type(self).__name__} does not provide a wave speed"
+        )
+
+    def compact(self: Self, capacity: jnp.int32) -> Self:
+        """Run the plastic return mapping on yielding particles only.
+
+        Supported by materials with a `plastic_id_buffer`, e.g.,
+        `ModifiedCamClay` and `DruckerPrager`. See `vmap_return_mapping`.
+
+        Args:
+            capacity: Maximum number of yielding particles per step. Steps
+                with more yielding particles update all particles.
+
+        Returns:
+            Material: Material with a plastic id buffer of size `capacity`.
+        """
+        return self.replace(plastic_id_buffer=jnp.zeros(capacity, dtype=jnp.int32))
+
+    def vmap_return_mapping(
+        self: Self, update_stress: Callable, *args
+    ) -> Tuple[Tuple[chex.Array, ...], chex.Array]:
+        """Vectorize a single particle stress update over particles.
+
+        `update_stress(*args, is_plastic)` returns the updated state of a
+        particle, and whether its elastic trial state yields. If `is_plastic`
+        is `None`, the yield function selects the elastic or plastic update.
+        Under `vmap` this is a select, so the return mapping runs for every
+        particle. If `is_plastic` is `True` or `False`, the plastic or
+        elastic update is done.
+
+        Compacted materials (see `compact`) do the elastic update of all
+        particles, gather yielding particles into the plastic id buffer, do
+        the return mapping on the buffer only and scatter the results back.
+        If the buffer is too small, all particles are updated as without
+        compaction.
+
+        Args:
+            update_stress: Single particle stress update.
+            *args: Per-particle arguments of `update_stress`.
+
+        Returns:
+            Tuple: Updated per-particle state, and the plastic id buffer
+            holding the ids of yielding particles, padded with the number of
+            particles (or `None` if not compacted).
+        """
+        plastic_id_buffer = getattr(self, "plastic_id_buffer", None)
+
+        def full_update():
+            *outputs, _ = jax.vmap(partial(update_stress, is_plastic=None))(*args)
+            return tuple(outputs)
+
+        if plastic_id_buffer is None:
+            return full_update(), None
+
+        num_particles = args[0].shape[0]
+        capacity = plastic_id_buffer.shape[0]
+
+        *elastic_outputs, is_ep_stack = jax.vmap(
+            partial(update_stress, is_plastic=False)
+        )(*args)
+
+        (plastic_id_buffer,) = jnp.nonzero(
+            is_ep_stack, size=capacity, fill_value=num_particles
+        )
+
+        def compacted_update():
+            plastic_args = [
+                arg.at[plastic_id_buffer].get(mode="clip") for arg in args
+            ]
+
+            *plastic_outputs, _ = jax.vmap(partial(update_stress, is_plastic=True))(
+                *plastic_args
+            )
+
+            # padded ids are out of range and dropped
+            return tuple(
+                output.at[plastic_id_buffer].set(plastic_output, mode="drop")
+                for output, plastic_output in zip(elastic_outputs, plastic_outputs)
+            )
+
+        outputs = jax.lax.cond(
+            jnp.sum(is_ep_stack) <= capacity, compacted_update, full_update
+        )
+
+        return outputs, plastic_id_buffer.astype(jnp.int32)
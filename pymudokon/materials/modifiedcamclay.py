@@ -1,6 +1,5 @@
 """Implementation, state and functions for isotropic linear elastic material."""
 
-from functools import partial
 from typing import Tuple
 from typing_extensions import Self
 
@@ -19,7 +18,7 @@ from ..utils.math_helpers import (
     get_sym_tensor_stack,
     get_volumetric_strain,
 )
-from .common import get_timestep
+from .common import get_timestep, get_wave_speed
 from .material import Material
 
 from jax.sharding import Sharding
@@ -77,12 +76,32 @@ def get_G(nu, K):
     return (3.0 * (1.0 - 2.0 * nu)) / (2.0 * (1.0 + nu)) * K
 
 
-@chex.dataclass
-class ModifiedCamClay(Material):
+class NewtonIterations(int):
+    """Number of Newton iterations of the `ModifiedCamClay` return mapping.
+
+    Static pytree node, so the iterations are unrolled when traced.
     """
-    Return mapping follows implementation of
 
 
+jax.tree_util.register_static(NewtonIterations)
+
+
+@chex.dataclass
+class ModifiedCamClay(Material):
+    """Modified Cam Clay material with non-linear hardening.
+
+    The return mapping solves for the plastic multiplier and volumetric plastic
+    strain increment with a fixed number of Newton iterations, using an
+    analytic Jacobian.
+
+    Attributes:
+        newton_failed_stack: Particles whose return mapping did not converge
+            in the last step `(num_particles,)`.
+        newton_iterations: Number of Newton iterations of the return mapping.
+        newton_rtol: Relative tolerance of the residuals, for
+            `newton_failed_stack`.
+        plastic_id_buffer: Ids of yielding particles, if the return mapping
+            is compacted, see `Material.compact`.
     """
 
     p_c_stack: chex.Array
@@ -96,6 +115,10 @@ class ModifiedCamClay(Material):
     Vs: jnp.float32
     phi_c: jnp.float32
     rho_p: jnp.float32
+    newton_failed_stack: chex.Array = None
+    newton_iterations: NewtonIterations = NewtonIterations(20)
+    newton_rtol: jnp.float32 = 1e-4
+    plastic_id_buffer: chex.Array = None
 
     @classmethod
     def create(
@@ -111,6 +134,7 @@ class ModifiedCamClay(Material):
         stress_ref_stack: chex.Array = None,
         absolute_density: jnp.float32 = 1.0,
         dim: jnp.int16 = 3,
+        newton_iterations: int = 20,
     ) -> Self:
         # Check if kappa less than lambda
 
@@ -137,6 +161,8 @@ class ModifiedCamClay(Material):
             phi_c=phi_c,
             rho_p=rho_p,
             absolute_density=absolute_density,
+            newton_failed_stack=jnp.zeros(num_particles, dtype=jnp.bool_),
+            newton_iterations=NewtonIterations(newton_iterations),
         )
 
     def distributed(self: Self, device: Sharding):
@@ -197,6 +223,20 @@ class ModifiedCamClay(Material):
 
         return particles.replace(stress_stack=stress_stack), self
 
+    def get_wave_speed_stack(self: Self, particles: Particles) -> chex.Array:
+        """Get the elastic P-wave speed at each particle, see `Material`.
+
+        The moduli depend on the current pressure of the particles, as in
+        `estimate_timestep`.
+        """
+        p_stack = jnp.maximum(get_pressure_stack(particles.stress_stack), 0.0)
+
+        K_stack = get_K(self.kap, p_stack)
+
+        G_stack = get_G(self.nu, K_stack)
+
+        return get_wave_speed(K_stack, G_stack, particles.get_density_stack())
+
     def update(
         self: Self,
         stress_prev_stack: chex.Array,
@@ -206,23 +246,30 @@ class ModifiedCamClay(Material):
         dt: jnp.float32,
     ) -> Tuple[chex.Array, Self]:
         deps_stack = get_sym_tensor_stack(L_stack) * dt
-        stress_next_stack, eps_e_next_stack, p_c_next_stack = self.vmap_update_stress(
+        outputs, plastic_id_buffer = self.vmap_return_mapping(
+            self.update_stress,
             deps_stack,
             self.stress_ref_stack,
             stress_prev_stack,
             self.eps_e_stack,
             self.p_c_stack,
         )
+        stress_next_stack, eps_e_next_stack, p_c_next_stack, is_failed_stack = outputs
 
         return (
             stress_next_stack,
-            self.replace(eps_e_stack=eps_e_next_stack, p_c_stack=p_c_next_stack),
+            self.replace(
+                eps_e_stack=eps_e_next_stack,
+                p_c_stack=p_c_next_stack,
+                newton_failed_stack=is_failed_stack,
+                plastic_id_buffer=plastic_id_buffer,
+            ),
         )
 
-    @partial(jax.vmap, in_axes=(None, 0, 0, 0, 0, 0), out_axes=(0, 0, 0))
-    def vmap_update_stress(
-        self, deps_next, stress_ref, stress_prev, eps_e_prev, p_c_prev
+    def update_stress(
+        self, deps_next, stress_ref, stress_prev, eps_e_prev, p_c_prev, is_plastic=None
     ):
+        """Update the stress of a single particle, see `vmap_return_mapping`."""
         dim = deps_next.shape[0]
 
         p_prev = get_pressure(stress_prev, dim)
@@ -261,7 +308,7 @@ class ModifiedCamClay(Material):
 
             stress_next = s_tr - p_tr * jnp.eye(3)
 
-            return stress_next, eps_e_tr, p_c_prev
+            return stress_next, eps_e_tr, p_c_prev, False
 
         def pull_to_ys():
             stress_next = s_tr - p_tr * jnp.eye(3)
@@ -301,26 +348,108 @@ class ModifiedCamClay(Material):
 
                 return R, aux
 
-            def find_roots():
-                init_val = jnp.array([0.0, 0.0])
-
-                solver = optx.Newton(rtol=1e-8, atol=1e-8)
-                sol = optx.root_find(
-                    residuals,
-                    solver,
-                    init_val,
-                    throw=False,
-                    has_aux=True,
-                    max_steps=20,
+            def jacobian(sol):
+                """Analytic Jacobian of the residuals."""
+                pmulti, deps_p_v = sol
+
+                p_next = get_elas_non_linear_pressure(
+                    deps_e_v - deps_p_v, self.kap, p_prev
+                )
+
+                G_next = get_G(self.nu, get_K(self.kap, p_next))
+
+                p_c_next = get_non_linear_hardening_pressure(
+                    deps_p_v,
+                    self.lam,
+                    self.kap,
+                    p_c_prev,
+                )
+
+                scale = self.M**2 + 6.0 * G_next * pmulti
+
+                q_next = (self.M**2 / scale) * q_tr
+
+                # Derivatives with respect to the volumetric plastic strain,
+                # the shear modulus is linear in the pressure
+                dp_dv = -(p_next**2) / (self.kap * p_prev)
+
+                dG_dv = get_G(self.nu, get_K(self.kap, dp_dv))
+
+                dp_c_dv = p_c_next**2 / ((self.lam - self.kap) * p_c_prev)
+
+                dq_dpmulti = -6.0 * G_next * q_next / scale
+
+                dq_dv = -6.0 * pmulti * dG_dv * q_next / scale
+
+                # Derivatives of the yield function
+                dyf_dq = 2.0 * q_next / self.M**2
+
+                dyf_dp = 2.0 * p_next - p_c_next
+
+                dyf_dp_c = -p_next
+
+                J00 = dyf_dq * dq_dpmulti / (K_tr * self.kap)
+
+                J01 = (dyf_dq * dq_dv + dyf_dp * dp_dv + dyf_dp_c * dp_c_dv) / (
+                    K_tr * self.kap
+                )
+
+                J10 = -dyf_dp
+
+                J11 = 1.0 - pmulti * (2.0 * dp_dv - dp_c_dv)
+
+                return J00, J01, J10, J11
+
+            def newton_step(_, sol):
+                R, _ = residuals(sol, None)
+
+                J00, J01, J10, J11 = jacobian(sol)
+
+                # 2x2 linear system by Cramer's rule
+                det = J00 * J11 - J01 * J10
+
+                return sol - jnp.array(
+                    [J11 * R[0] - J01 * R[1], J00 * R[1] - J10 * R[0]]
+                ) / det
+
+            def find_roots(_, sol):
+                # Same number of iterations for all particles
+                return jax.lax.fori_loop(
+                    0, self.newton_iterations, newton_step, sol, unroll=True
                 )
 
-                return sol.value
+            def tangent_solve(linear_fn, R):
+                J = jax.jacfwd(linear_fn)(R)
 
-            pmulti, deps_p_v_next = jax.lax.stop_gradient(find_roots())
+                det = J[0, 0] * J[1, 1] - J[0, 1] * J[1, 0]
+
+                return jnp.array(
+                    [J[1, 1] * R[0] - J[0, 1] * R[1], J[0, 0] * R[1] - J[1, 0] * R[0]]
+                ) / det
+
+            # Gradients of the roots follow from the implicit function theorem,
+            # rather than differentiating through the Newton iterations
+            pmulti, deps_p_v_next = jax.lax.custom_root(
+                lambda sol: residuals(sol, None)[0],
+                jnp.array([0.0, 0.0]),
+                find_roots,
+                tangent_solve,
+            )
 
             R, aux = residuals((pmulti, deps_p_v_next), None)
             p_next, s_next, p_c_next, G_next = aux
 
+            # Relative residuals of the yield function and the flow rule
+            is_failed = (
+                ~jnp.all(jnp.isfinite(R))
+                | (jnp.abs(R[0]) * K_tr * self.kap > self.newton_rtol * p_c_next**2)
+                | (
+                    jnp.abs(R[1])
+                    > self.newton_rtol
+                    * (jnp.abs(deps_p_v_next) + jnp.abs(deps_p_v_next - R[1]))
+                )
+            )
+
             stress_next = s_next - p_next * jnp.eye(3)
 
             eps_e_v_next = eps_e_v_tr - deps_p_v_next
@@ -329,9 +458,15 @@ class ModifiedCamClay(Material):
 
             eps_e_next = eps_e_d_next - (1.0 / 3) * eps_e_v_next * jnp.eye(3)
 
-            return stress_next, eps_e_next, p_c_next
+            return stress_next, eps_e_next, p_c_next, is_failed
+
+        if is_plastic is None:
+            return *jax.lax.cond(is_ep, pull_to_ys, elastic_update), is_ep
+
+        if is_plastic:
+            return *pull_to_ys(), is_ep
 
-        return jax.lax.cond(is_ep, pull_to_ys, elastic_update)
+        return *elastic_update(), is_ep
 
     def get_timestep(self, cell_size, density, pressure=None, factor=0.1):
         if pressure is None:
@@ -15,6 +15,7 @@ from ..utils.math_helpers import (
     get_scalar_shear_strain,
     get_sym_tensor_stack,
 )
+from .common import get_wave_speed
 from .material import Material
 
 
@@ -99,6 +100,18 @@ class MuI_incompressible(Material):
 
         return particles.replace(stress_stack=stress_stack), self
 
+    def get_wave_speed_stack(self: Self, particles: Particles) -> chex.Array:
+        """Get the speed of sound at each particle, see `Material`.
+
+        Uses the tangent bulk modulus of the pressure `K (phi - 1)`, i.e.,
+        `K phi`. The viscous shear stress carries no elastic waves.
+        """
+        phi_stack = particles.volume0_stack / particles.volume_stack
+
+        return get_wave_speed(
+            self.K * phi_stack, 0.0, particles.get_density_stack()
+        )
+
     def update(
         self: Self,
         stress_prev_stack: chex.Array,
@@ -8,6 +8,7 @@ import jax
 import jax.numpy as jnp
 
 from ..particles.particles import Particles
+from .common import get_wave_speed
 from .material import Material
 
 
@@ -64,6 +65,18 @@ class NewtonFluid(Material):
 
         return particles.replace(stress_stack=stress_stack), self
 
+    def get_wave_speed_stack(self: Self, particles: Particles) -> chex.Array:
+        """Get the speed of sound at each particle, see `Material`.
+
+        Uses the tangent bulk modulus of the equation of state,
+        `K gamma phi**gamma`.
+        """
+        phi_stack = particles.volume0_stack / particles.volume_stack
+
+        K_stack = self.K * self.gamma * phi_stack**self.gamma
+
+        return get_wave_speed(K_stack, 0.0, particles.get_density_stack())
+
     def update(
         self: Self,
         stress_prev_stack: chex.Array,
@@ -1,7 +1,7 @@
 """Base class for single integration point benchmark module"""
 
 from functools import partial
-from typing import Tuple
+from typing import Callable, Tuple
 
 import chex
 import jax
@@ -14,7 +14,29 @@ from ..utils.math_helpers import (
 )
 
 
-@partial(jax.jit, static_argnames=("output"))
+def get_reduce_fn(reduce: str, dtype) -> Tuple[Callable, Callable]:
+    """Get the initial value and the update of a running reduction.
+
+    Supported reductions:
+        "min": elementwise minimum over steps.
+        "max": elementwise maximum over steps.
+        "final": value of the last step.
+    """
+    if jnp.issubdtype(dtype, jnp.inexact):
+        lowest, highest = -jnp.inf, jnp.inf
+    else:
+        lowest, highest = jnp.iinfo(dtype).min, jnp.iinfo(dtype).max
+
+    if reduce == "min":
+        return partial(jnp.full, fill_value=highest, dtype=dtype), jnp.minimum
+    elif reduce == "max":
+        return partial(jnp.full, fill_value=lowest, dtype=dtype), jnp.maximum
+    elif reduce == "final":
+        return partial(jnp.zeros, dtype=dtype), lambda _, value: value
+    raise ValueError("Invalid reduction")
+
+
+@partial(jax.jit, static_argnames=("output", "store_every", "output_reduce"))
 def mix_control(
     material: Material,
     dt: jnp.float32,
@@ -25,7 +47,39 @@ def mix_control(
     F_ref: chex.Array = None,
     phi_ref: jnp.float32 = None,
     output: Tuple[str] = None,
+    store_every: int = 1,
+    output_reduce: Tuple[str] = None,
 ) -> Material:
+    """Drive a single material point along a mixed strain-stress control path.
+
+    Outputs are stored every `store_every` steps only, i.e., for steps 0,
+    `store_every`, `2 store_every`, ..., as `accumulate[::store_every]` of
+    a run storing every step, so memory is proportional to the stored
+    frames. Steps are scanned in blocks of `store_every` steps.
+
+    Output keys with a reduction in `output_reduce` (`"min"`, `"max"` or
+    `"final"`, see `get_reduce_fn`) are reduced over all steps instead,
+    e.g., `output=("stress", "phi")` with `output_reduce=(None, "max")`
+    stores the stresses and the peak solid volume fraction.
+
+    Args:
+        material: Material with a single material point.
+        dt: Time step.
+        L_control_stack: Velocity gradients `(num_steps, 3, 3)`.
+        stress_control_stack: Target stresses `(num_steps, 3, 3)`.
+        stress_mask_indices: Indices of the stress controlled components.
+        stress_ref: Initial stress.
+        F_ref: Initial deformation gradient.
+        phi_ref: Initial solid volume fraction.
+        output: Output keys, e.g., `stress`, `F`, `L`, `phi` or material
+            entries.
+        store_every: Store outputs every nth step. Defaults to 1.
+        output_reduce: Reduction of each output key, or `None` to store
+            it. Defaults to storing all keys.
+
+    Returns:
+        Tuple: Final state, and the outputs in the order of `output`.
+    """
     chex.assert_shape(phi_ref, ())
     chex.assert_shape(stress_ref, (3, 3))
     chex.assert_shape(L_control_stack, (None, 3, 3))
@@ -138,10 +192,181 @@ def mix_control(
                 accumulate.append(jnp.squeeze(material_next[key]))
         return carry, accumulate
 
-    carry, accumulate = jax.lax.scan(
-        scan_fn,
-        (material, stress_ref, F_ref, phi_ref, 0, servo_params),  # carry
-        (L_control_stack, stress_control_stack),  # control
+    if output_reduce is None:
+        output_reduce = (None,) * len(output)
+
+    if len(output_reduce) != len(output):
+        raise ValueError("output_reduce must have one entry per output key")
+
+    stored_ids = [i for i, reduce in enumerate(output_reduce) if reduce is None]
+    reduced_ids = [i for i, reduce in enumerate(output_reduce) if reduce is not None]
+
+    init = (material, stress_ref, F_ref, phi_ref, 0, servo_params)
+
+    controls = (L_control_stack, stress_control_stack)
+
+    _, accumulate_shape = jax.eval_shape(
+        scan_fn, init, jax.tree_util.tree_map(lambda stack: stack[0], controls)
+    )
+
+    reduce_fns = []
+    reduced = []
+    for i in reduced_ids:
+        shape = accumulate_shape[i]
+        init_fn, reduce_fn = get_reduce_fn(output_reduce[i], shape.dtype)
+        reduce_fns.append(reduce_fn)
+        reduced.append(init_fn(shape.shape))
+
+    def step_fn(carry, control):
+        carry, reduced = carry
+
+        carry, accumulate = scan_fn(carry, control)
+
+        reduced = [
+            reduce_fn(value, accumulate[i])
+            for reduce_fn, value, i in zip(reduce_fns, reduced, reduced_ids)
+        ]
+
+        return (carry, reduced), [accumulate[i] for i in stored_ids]
+
+    def block_fn(carry, controls):
+        carry, stored = jax.lax.scan(step_fn, carry, controls)
+        return carry, [stack[0] for stack in stored]
+
+    num_steps = L_control_stack.shape[0]
+
+    num_blocks, rem = divmod(num_steps, store_every)
+
+    block_controls = jax.tree_util.tree_map(
+        lambda stack: stack[: num_blocks * store_every].reshape(
+            num_blocks, store_every, *stack.shape[1:]
+        ),
+        controls,
     )
 
+    carry, stored = jax.lax.scan(block_fn, (init, reduced), block_controls)
+
+    # the remaining steps are a shorter block
+    if rem:
+        carry, stored_rem = block_fn(
+            carry,
+            jax.tree_util.tree_map(
+                lambda stack: stack[num_blocks * store_every :], controls
+            ),
+        )
+        stored = [
+            jnp.concatenate([stack, stack_rem[None]])
+            for stack, stack_rem in zip(stored, stored_rem)
+        ]
+
+    carry, reduced = carry
+
+    accumulate = [None] * len(output)
+    for i, stack in zip(stored_ids, stored):
+        accumulate[i] = stack
+    for i, value in zip(reduced_ids, reduced):
+        accumulate[i] = value
+
     return carry, accumulate
+
+
+@partial(
+    jax.jit, static_argnames=("output", "store_every", "output_reduce", "chunk_size")
+)
+def mix_control_sweep(
+    material: Material,
+    dt: jnp.float32,
+    L_control_stack: chex.Array,
+    stress_control_stack: chex.Array = None,
+    stress_mask_indices: chex.Array = None,
+    stress_ref: chex.Array = None,
+    F_ref: chex.Array = None,
+    phi_ref: jnp.float32 = None,
+    output: Tuple[str] = None,
+    store_every: int = 1,
+    output_reduce: Tuple[str] = None,
+    chunk_size: int = None,
+) -> Tuple:
+    """Run `mix_control` over a batch of materials and load paths.
+
+    The material is batched, i.e., every entry has a leading batch axis, e.g.,
+    created with `jax.vmap` over `create`:
+
+    >>> import jax
+    >>> import jax.numpy as jnp
+    >>> import pymudokon as pm
+    >>> material = jax.vmap(
+    ...     lambda M: pm.LinearIsotropicElastic.create(E=M, nu=0.3)
+    ... )(jnp.array([1e6, 1e7]))
+
+    Load paths and initial states are either shared by all materials, or
+    batched with a leading batch axis, e.g., `L_control_stack` of shape
+    `(num_steps, 3, 3)` or `(batch_size, num_steps, 3, 3)`. The stress mask
+    is shared.
+
+    The `mix_control` scan is vectorized over the batch in one compiled
+    program. With `chunk_size`, at most `chunk_size` load paths are run at
+    once, bounding the memory of the outputs and intermediates. The last
+    chunk is padded with copies of the last load path.
+
+    Args:
+        material: Batched material.
+        chunk_size: Number of load paths run at once. Defaults to all.
+
+    See `mix_control` for the remaining arguments.
+
+    Returns:
+        Tuple: Final states and outputs of `mix_control`, with a leading
+        batch axis. E.g., `accumulate[0][i]` is the output of load path `i`,
+        ready for `plot_set1`.
+    """
+    batch_size = jax.tree_util.tree_leaves(material)[0].shape[0]
+
+    if chunk_size is None:
+        chunk_size = batch_size
+
+    num_chunks = -(-batch_size // chunk_size)
+
+    # (argument, whether it is batched)
+    args = {
+        "material": (material, True),
+        "L_control_stack": (L_control_stack, L_control_stack.ndim == 4),
+        "stress_control_stack": (
+            stress_control_stack,
+            stress_control_stack is not None and stress_control_stack.ndim == 4,
+        ),
+        "stress_ref": (stress_ref, stress_ref is not None and stress_ref.ndim == 3),
+        "F_ref": (F_ref, F_ref is not None and F_ref.ndim == 3),
+        "phi_ref": (phi_ref, phi_ref is not None and jnp.ndim(phi_ref) == 1),
+    }
+
+    batched_args = {key: arg for key, (arg, is_batched) in args.items() if is_batched}
+
+    shared_args = {
+        key: arg for key, (arg, is_batched) in args.items() if not is_batched
+    }
+
+    def to_chunks(stack):
+        pad = num_chunks * chunk_size - batch_size
+        stack = jnp.pad(stack, [(0, pad)] + [(0, 0)] * (stack.ndim - 1), mode="edge")
+        return stack.reshape(num_chunks, chunk_size, *stack.shape[1:])
+
+    def from_chunks(stack):
+        return stack.reshape(num_chunks * chunk_size, *stack.shape[2:])[:batch_size]
+
+    def run(batched_args):
+        return mix_control(
+            dt=dt,
+            stress_mask_indices=stress_mask_indices,
+            output=output,
+            store_every=store_every,
+            output_reduce=output_reduce,
+            **shared_args,
+            **batched_args,
+        )
+
+    outputs = jax.lax.map(
+        jax.vmap(run), jax.tree_util.tree_map(to_chunks, batched_args)
+    )
+
+    return jax.tree_util.tree_map(from_chunks, outputs)
@@ -5,7 +5,7 @@ import jax
 import jax.numpy as jnp
 
 from ..materials.material import Material
-from .mix_control import mix_control
+from .mix_control import mix_control, mix_control_sweep
 
 
 @chex.dataclass
@@ -35,20 +35,50 @@ class MPBenchmark:
             F_ref=self.F_ref,
             phi_ref=self.phi_ref,
             output=self.output,
+            store_every=self.store_every,
         )
         (material_next, stress_next, F_next, phi_next, step, servo_params) = carry
 
-        accumulated_next = []
+        return self.replace(
+            material=material_next,
+            stress_ref=stress_next,
+            F_ref=F_next,
+            phi_ref=phi_next,
+            accumulated=accumulated,
+        )
+
+    def run_sweep(self, material: Material, chunk_size: int = None):
+        """Run the benchmark for a batch of materials, see `mix_control_sweep`.
+
+        Args:
+            material: Batched material, e.g., created with `jax.vmap`.
+            chunk_size: Number of materials run at once. Defaults to all.
 
-        for i, _ in enumerate(self.output):
-            accumulated_next.append(accumulated[i].at[0 :: self.store_every].get())
+        Returns:
+            MPBenchmark: Benchmark with the batched final states and
+            outputs, with a leading batch axis.
+        """
+        carry, accumulated = mix_control_sweep(
+            material=material,
+            dt=self.dt,
+            L_control_stack=self.L_control_stack,
+            stress_control_stack=self.stress_control_stack,
+            stress_mask_indices=self.stress_mask_indices,
+            stress_ref=self.stress_ref,
+            F_ref=self.F_ref,
+            phi_ref=self.phi_ref,
+            output=self.output,
+            store_every=self.store_every,
+            chunk_size=chunk_size,
+        )
+        (material_next, stress_next, F_next, phi_next, step, servo_params) = carry
 
         return self.replace(
             material=material_next,
             stress_ref=stress_next,
             F_ref=F_next,
             phi_ref=phi_next,
-            accumulated=accumulated_next,
+            accumulated=accumulated,
         )
 
     def get_time_stack(self):
@@ -1,6 +1,6 @@
 """State and functions for the background MPM grid nodes."""
-# TODO: Add support for Sparse grid. This feature is currently experimental in JAX.
 
+from typing import Tuple
 from typing_extensions import Self
 
 import chex
@@ -8,6 +8,94 @@ import jax
 import jax.numpy as jnp
 from jax.sharding import Sharding
 
+from ..shapefunctions.shapefunctions import ShapeFunction
+
+
+def get_hash_from_index(index_stack: chex.Array, grid_size: chex.Array) -> chex.Array:
+    """Get the Cartesian hash of grid indices.
+
+    Uses the same layout as `ShapeFunction.vmap_intr`.
+
+    Args:
+        index_stack: Grid indices `(..., dim)`.
+        grid_size: Grid size about each axis `(dim,)`.
+
+    Returns:
+        chex.Array: Hashes `(...)`.
+    """
+    dim = index_stack.shape[-1]
+    if dim == 1:
+        hash_stack = index_stack[..., 0]
+    elif dim == 2:
+        hash_stack = index_stack[..., 1] + index_stack[..., 0] * grid_size[1]
+    else:
+        hash_stack = (
+            index_stack[..., 2]
+            + index_stack[..., 0] * grid_size[2]
+            + index_stack[..., 1] * grid_size[2] * grid_size[0]
+        )
+    return hash_stack.astype(jnp.int32)
+
+
+def get_index_from_hash(
+    hash_stack: chex.Array, grid_size: chex.Array, dim: int
+) -> chex.Array:
+    """Get grid indices from Cartesian hashes, inverse of `get_hash_from_index`.
+
+    Args:
+        hash_stack: Hashes `(...)`.
+        grid_size: Grid size about each axis `(dim,)`.
+        dim: Dimension of the grid.
+
+    Returns:
+        chex.Array: Grid indices `(..., dim)`.
+    """
+    if dim == 1:
+        index_stack = [hash_stack]
+    elif dim == 2:
+        index_stack = [hash_stack // grid_size[1], hash_stack % grid_size[1]]
+    else:
+        index_stack = [
+            (hash_stack // grid_size[2]) % grid_size[0],
+            hash_stack // (grid_size[2] * grid_size[0]),
+            hash_stack % grid_size[2],
+        ]
+    return jnp.stack(index_stack, axis=-1).astype(jnp.int32)
+
+
+def get_species_from_index(index_stack: chex.Array, grid_size: chex.Array) -> chex.Array:
+    """Get node types from grid indices, same as `Nodes.create`.
+
+    Args:
+        index_stack: Grid indices `(num_nodes, dim)`.
+        grid_size: Grid size about each axis `(dim,)`.
+
+    Returns:
+        chex.Array: Node types `(num_nodes,)`.
+    """
+    num_nodes, dim = index_stack.shape
+
+    species_stack = jnp.zeros(num_nodes, dtype=jnp.int16)
+
+    if dim == 2:
+        ix, iy = index_stack[:, 0], index_stack[:, 1]
+
+        # boundary layers
+        is_boundary = (
+            (ix == 0) | (iy == 0) | (ix == grid_size[0] - 1) | (iy == grid_size[1] - 1)
+        )
+        species_stack = jnp.where(is_boundary, 1, species_stack)
+
+        # boundary layers 0 + h
+        species_stack = jnp.where((ix == 1) | (iy == 1), 2, species_stack)
+
+        # boundary layer N-h
+        species_stack = jnp.where(
+            (ix == grid_size[0] - 2) | (iy == grid_size[1] - 2), 3, species_stack
+        )
+
+    return species_stack.astype(jnp.int16)
+
 
 @chex.dataclass
 class Nodes:
@@ -137,6 +225,25 @@ class Nodes:
             species_stack = species_stack
         )
 
+    def psum(self: Self, axis_name: str) -> Self:
+        """Sum nodal masses and moments over a mapped device axis.
+
+        Used after P2G when particles are split over devices, so each device
+        holds the nodal quantities of all particles.
+
+        Args:
+            self: Nodes state.
+            axis_name: Name of the mapped axis, e.g., of a `shard_map` mesh.
+
+        Returns:
+            Nodes: Updated node state.
+        """
+        return self.replace(
+            mass_stack=jax.lax.psum(self.mass_stack, axis_name),
+            moment_stack=jax.lax.psum(self.moment_stack, axis_name),
+            moment_nt_stack=jax.lax.psum(self.moment_nt_stack, axis_name),
+        )
+
     def refresh(self: Self) -> Self:
         """Reset background MPM node states.
 
@@ -152,6 +259,51 @@ class Nodes:
             moment_nt_stack=self.moment_nt_stack.at[:].set(0.0),
         )
     
+    def activate(
+        self: Self, shapefunctions: ShapeFunction
+    ) -> Tuple[Self, ShapeFunction]:
+        """Activate nodes touched by particles.
+
+        All nodes of the dense grid are active, see `SparseNodes.activate`
+        for the sparse grid.
+
+        Args:
+            self: Nodes state.
+            shapefunctions: Shape functions after `calculate_shapefunction`.
+
+        Returns:
+            Tuple: Unchanged nodes and shape functions.
+        """
+        return self, shapefunctions
+
+    def activate_cells(
+        self: Self, base_cell_stack: chex.Array, stencil: chex.Array
+    ) -> Self:
+        """Activate nodes of stencils placed on the base cells of particles.
+
+        Used with fused shape functions, which hold no interaction hashes,
+        see `ShapeFunction.fuse`. All nodes of the dense grid are active, see
+        `SparseNodes.activate_cells` for the sparse grid.
+
+        Args:
+            self: Nodes state.
+            base_cell_stack: Base cells of the particles `(num_particles, dim)`,
+                see `ShapeFunction.get_base_cell_stack`.
+            stencil: Node offsets of the stencil `(stencil_size, dim)`.
+
+        Returns:
+            Nodes: Unchanged nodes.
+        """
+        return self
+
+    def get_node_index_stack(self: Self, node_hash_stack: chex.Array) -> chex.Array:
+        """Map hashes on the dense grid to indices of the node arrays.
+
+        This is the identity for the dense grid, see
+        `SparseNodes.get_node_index_stack` for the sparse grid.
+        """
+        return node_hash_stack
+
     def get_coordinate_stack(self,dim=3):
         
         if dim ==2:
@@ -0,0 +1,191 @@
+"""State and functions for a slab of the background grid owned by one device."""
+
+from typing import List
+from typing_extensions import Self
+
+import chex
+import jax
+import jax.numpy as jnp
+
+from .nodes import (
+    get_hash_from_index,
+    get_index_from_hash,
+    get_species_from_index,
+    Nodes,
+)
+
+
+@chex.dataclass
+class SlabNodes(Nodes):
+    """Slab of background grid nodes owned by one device.
+
+    The global grid is split into slabs of equal width along the x axis. Each
+    slab holds the nodes it owns plus a halo of `halo_width` nodes on each
+    side, so particles in the owned region have their full stencil on the
+    slab. The inherited attributes (`origin`, `grid_size`, `mass_stack`, etc.)
+    describe the local grid including halos, so shape functions, solvers and
+    forces work on it unchanged.
+
+    Nodes in the two layers of width `2 * halo_width` at each slab boundary
+    are shared with the neighbouring slab. After P2G these layers are summed
+    between neighbours by `SlabNodes.psum`, which only exchanges the layers.
+
+    Attributes:
+        global_grid_size: Size of the global grid `(dim,)`.
+        slab_offset: Global x index of the first local node.
+        slab_lower: Lower x coordinate of the owned region.
+        slab_upper: Upper x coordinate of the owned region.
+        lower_layer_id_stack: Local ids of the nodes shared with the lower
+            neighbour.
+        upper_layer_id_stack: Local ids of the nodes shared with the upper
+            neighbour.
+
+    See `Nodes` for the remaining attributes.
+    """
+
+    global_grid_size: chex.Array
+    slab_offset: jnp.int32
+    slab_lower: jnp.float32
+    slab_upper: jnp.float32
+    lower_layer_id_stack: chex.Array
+    upper_layer_id_stack: chex.Array
+
+    @classmethod
+    def create_slabs(
+        cls: Self, nodes: Nodes, num_slabs: int, halo_width: int
+    ) -> List[Self]:
+        """Split a grid into slabs along the x axis.
+
+        Args:
+            cls: Self type reference
+            nodes: Global grid nodes.
+            num_slabs: Number of slabs, e.g., number of devices.
+            halo_width: Number of halo nodes on each side of a slab, i.e., the
+                reach of the shape function stencil.
+
+        Returns:
+            List[SlabNodes]: Node state of each slab.
+        """
+        dim = nodes.origin.shape[0]
+
+        global_grid_size = nodes.grid_size.astype(jnp.int32)
+
+        slab_width = -(-int(global_grid_size[0]) // num_slabs)
+
+        if slab_width < 2 * halo_width:
+            raise ValueError("Slabs must be at least two halo widths wide")
+
+        grid_size = global_grid_size.at[0].set(slab_width + 2 * halo_width)
+
+        num_nodes_total = int(jnp.prod(grid_size))
+
+        index_stack = get_index_from_hash(
+            jnp.arange(num_nodes_total), grid_size, dim
+        )
+
+        lower_layer_id_stack = jnp.nonzero(index_stack[:, 0] < 2 * halo_width)[0]
+        upper_layer_id_stack = jnp.nonzero(index_stack[:, 0] >= slab_width)[0]
+
+        slab_stack = []
+        for slab_id in range(num_slabs):
+            slab_offset = slab_id * slab_width - halo_width
+
+            origin = nodes.origin.at[0].add(slab_offset * nodes.node_spacing)
+
+            end = origin + (grid_size - 1) * nodes.node_spacing
+
+            slab_lower = nodes.origin[0] + slab_id * slab_width * nodes.node_spacing
+            slab_upper = slab_lower + slab_width * nodes.node_spacing
+
+            if slab_id == 0:
+                slab_lower = -jnp.inf
+
+            if slab_id == num_slabs - 1:
+                slab_upper = jnp.inf
+
+            species_stack = get_species_from_index(
+                index_stack.at[:, 0].add(slab_offset), global_grid_size
+            )
+
+            slab_stack.append(
+                cls(
+                    origin=origin,
+                    end=end,
+                    node_spacing=nodes.node_spacing,
+                    small_mass_cutoff=nodes.small_mass_cutoff,
+                    num_nodes_total=num_nodes_total,
+                    grid_size=grid_size,
+                    inv_node_spacing=nodes.inv_node_spacing,
+                    mass_stack=jnp.zeros((num_nodes_total)).astype(jnp.float32),
+                    moment_stack=jnp.zeros((num_nodes_total, dim)).astype(
+                        jnp.float32
+                    ),
+                    moment_nt_stack=jnp.zeros((num_nodes_total, dim)).astype(
+                        jnp.float32
+                    ),
+                    species_stack=species_stack,
+                    global_grid_size=global_grid_size,
+                    slab_offset=slab_offset,
+                    slab_lower=jnp.float32(slab_lower),
+                    slab_upper=jnp.float32(slab_upper),
+                    lower_layer_id_stack=lower_layer_id_stack,
+                    upper_layer_id_stack=upper_layer_id_stack,
+                )
+            )
+        return slab_stack
+
+    def psum(self: Self, axis_name: str) -> Self:
+        """Sum nodal masses and moments of the shared layers with neighbours.
+
+        Args:
+            self: SlabNodes state.
+            axis_name: Name of the mapped axis the slabs are split over.
+
+        Returns:
+            SlabNodes: Updated node state.
+        """
+        num_slabs = jax.lax.psum(1, axis_name)
+
+        if num_slabs == 1:
+            return self
+
+        to_upper = [(i, i + 1) for i in range(num_slabs - 1)]
+        to_lower = [(i + 1, i) for i in range(num_slabs - 1)]
+
+        def exchange_layers(stack):
+            from_lower = jax.lax.ppermute(
+                stack.at[self.upper_layer_id_stack].get(), axis_name, to_upper
+            )
+            from_upper = jax.lax.ppermute(
+                stack.at[self.lower_layer_id_stack].get(), axis_name, to_lower
+            )
+            stack = stack.at[self.lower_layer_id_stack].add(from_lower)
+            return stack.at[self.upper_layer_id_stack].add(from_upper)
+
+        return self.replace(
+            mass_stack=exchange_layers(self.mass_stack),
+            moment_stack=exchange_layers(self.moment_stack),
+            moment_nt_stack=exchange_layers(self.moment_nt_stack),
+        )
+
+    def get_node_index_stack(self: Self, node_hash_stack: chex.Array) -> chex.Array:
+        """Map hashes on the global grid to local node ids.
+
+        Nodes outside the slab are mapped to the out-of-range id
+        `num_nodes_total`.
+        """
+        dim = self.origin.shape[0]
+
+        index_stack = get_index_from_hash(node_hash_stack, self.global_grid_size, dim)
+
+        index_stack = index_stack.at[..., 0].add(-self.slab_offset)
+
+        is_on_slab = (index_stack[..., 0] >= 0) & (
+            index_stack[..., 0] < self.grid_size[0]
+        )
+
+        return jnp.where(
+            is_on_slab,
+            get_hash_from_index(index_stack, self.grid_size),
+            self.mass_stack.shape[0],
+        ).astype(jnp.int32)
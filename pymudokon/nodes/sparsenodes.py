@@ -0,0 +1,374 @@
+"""State and functions for a sparse background grid of active node blocks."""
+
+import itertools
+from typing import Tuple
+from typing_extensions import Self
+
+import chex
+import jax.numpy as jnp
+
+from ..shapefunctions.shapefunctions import ShapeFunction
+from ..utils.jax_helpers import simple_warning
+from .nodes import (
+    get_hash_from_index,
+    get_index_from_hash,
+    get_species_from_index,
+    Nodes,
+)
+
+BLOCK_HASH_FILL = jnp.iinfo(jnp.int32).max
+
+
+def get_unique_stack(hash_stack: chex.Array, size: int) -> Tuple[chex.Array, int]:
+    """Get sorted unique hashes, padded or truncated to a static size.
+
+    Args:
+        hash_stack: Hashes, entries equal to `BLOCK_HASH_FILL` are ignored.
+        size: Size of the output.
+
+    Returns:
+        Tuple: Sorted unique hashes padded with `BLOCK_HASH_FILL` `(size,)`,
+        and the number of unique hashes before truncation.
+    """
+    sorted_hash_stack = jnp.sort(hash_stack)
+
+    is_unique_stack = jnp.concatenate(
+        [
+            jnp.ones(1, dtype=jnp.bool_),
+            sorted_hash_stack[1:] != sorted_hash_stack[:-1],
+        ]
+    )
+
+    unique_hash_stack = (
+        jnp.full(size, BLOCK_HASH_FILL, dtype=jnp.int32)
+        .at[jnp.cumsum(is_unique_stack) - 1]
+        .set(sorted_hash_stack, mode="drop")
+    )
+
+    num_unique = jnp.sum(is_unique_stack & (sorted_hash_stack != BLOCK_HASH_FILL))
+
+    return unique_hash_stack, num_unique.astype(jnp.int32)
+
+
+@chex.dataclass
+class SparseNodes(Nodes):
+    """Sparse background grid nodes of MPM solver.
+
+    The grid covers the same box as `Nodes`, but is split into cubic blocks of
+    `block_size` nodes about each axis. Only blocks touched by particles are
+    stored. Blocks are activated every step by `SparseNodes.activate`, which
+    builds a sorted table of active block hashes and maps interaction hashes
+    from the dense grid to node slots.
+
+    Node arrays are of shape `(num_blocks * block_size**dim, ...)`, where
+    `num_blocks` is the static capacity of the block table. Slot `i` holds
+    node `i % block_size**dim` of the block with hash `block_hash_stack[i //
+    block_size**dim]`. Memory and per-step time scale with the occupied
+    volume instead of the domain volume.
+
+    `block_size` should be at least the stencil width of the shape functions
+    (2 for linear, 4 for cubic). The block of the lowest stencil node of each
+    particle is activated together with its neighbours in positive direction
+    about each axis, which covers the full stencil. Particle-node interactions
+    in blocks beyond the capacity are mapped to an out-of-range slot. They are
+    dropped in P2G, and read zero mass and momentum in G2P, so these particles
+    do not move with the grid. A warning is printed when this happens; compare
+    `num_active_blocks` to `num_blocks` to detect it.
+
+    Attributes:
+        block_size: Number of nodes about each axis of a block.
+        block_grid_size: Number of blocks about each axis `(dim,)`.
+        block_hash_stack: Sorted hashes of the active blocks, padded with
+            the maximum int32 value `(num_blocks,)`.
+        block_offset_stack: Grid indices of the nodes within a block
+            `(block_size**dim, dim)`.
+        num_active_blocks: Number of blocks touched by particles in the last
+            activation, may exceed `num_blocks`.
+
+    See `Nodes` for the remaining attributes.
+
+    Example:
+    >>> import pymudokon as pm
+    >>> import jax.numpy as jnp
+    >>> nodes = pm.SparseNodes.create(
+    ...     origin=jnp.zeros(3), end=jnp.ones(3) * 10.0, node_spacing=0.01,
+    ...     block_size=4, num_blocks=2048
+    ... )
+    >>> # ... use nodes in MPM solver
+    """
+
+    block_size: jnp.int32
+    block_grid_size: chex.Array
+    block_hash_stack: chex.Array
+    block_offset_stack: chex.Array
+    num_active_blocks: jnp.int32
+
+    @classmethod
+    def create(
+        cls: Self,
+        origin: chex.Array,
+        end: chex.Array,
+        node_spacing: jnp.float32,
+        small_mass_cutoff: jnp.float32 = 1e-12,
+        block_size: int = 4,
+        num_blocks: int = None,
+    ) -> Self:
+        """Initialize the state for the sparse background MPM nodes.
+
+        Args:
+            cls: Self type reference
+            origin: Start coordinates of domain box `(dim,)`.
+            end: End coordinates of domain box `(dim,)`.
+            node_spacing: Spacing between each node in the grid.
+            small_mass_cutoff (optional):
+                Small masses threshold to avoid unphysical large velocities,
+                defaults to 1e-12.
+            block_size (optional): Number of nodes about each axis of a block,
+                defaults to 4.
+            num_blocks (optional): Capacity of active blocks, defaults to
+                all blocks of the domain.
+
+        Returns:
+            SparseNodes: Initialized node state.
+        """
+        inv_node_spacing = 1.0 / node_spacing
+
+        grid_size = ((end - origin) / node_spacing + 1).astype(jnp.int32)
+
+        num_nodes_total = jnp.prod(grid_size).astype(jnp.int32)
+
+        dim = origin.shape[0]
+
+        block_grid_size = (-(-grid_size // block_size)).astype(jnp.int32)
+
+        if num_blocks is None:
+            num_blocks = int(jnp.prod(block_grid_size))
+
+        block_volume = block_size**dim
+
+        block_offset_stack = get_index_from_hash(
+            jnp.arange(block_volume), jnp.full(dim, block_size), dim
+        )
+
+        num_slots = num_blocks * block_volume
+
+        return cls(
+            origin=origin,
+            end=end,
+            node_spacing=node_spacing,
+            small_mass_cutoff=small_mass_cutoff,
+            num_nodes_total=num_nodes_total,
+            grid_size=grid_size,
+            inv_node_spacing=inv_node_spacing,
+            mass_stack=jnp.zeros((num_slots)).astype(jnp.float32),
+            moment_stack=jnp.zeros((num_slots, dim)).astype(jnp.float32),
+            moment_nt_stack=jnp.zeros((num_slots, dim)).astype(jnp.float32),
+            species_stack=jnp.zeros(num_slots).astype(jnp.int16),
+            block_size=block_size,
+            block_grid_size=block_grid_size,
+            block_hash_stack=jnp.full(num_blocks, BLOCK_HASH_FILL, dtype=jnp.int32),
+            block_offset_stack=block_offset_stack,
+            num_active_blocks=jnp.int32(0),
+        )
+
+    def activate(
+        self: Self, shapefunctions: ShapeFunction
+    ) -> Tuple[Self, ShapeFunction]:
+        """Activate blocks touched by particles and map interactions to slots.
+
+        Args:
+            self: SparseNodes state.
+            shapefunctions: Shape functions with interaction hashes on the
+                dense grid, i.e., after `calculate_shapefunction`.
+
+        Returns:
+            Tuple: Nodes with the rebuilt block table, and shape functions with
+            interaction hashes pointing to node slots.
+        """
+        stencil_size, dim = shapefunctions.stencil.shape
+
+        intr_index_stack = get_index_from_hash(
+            shapefunctions.intr_hash_stack, self.grid_size, dim
+        )
+
+        # Stencil nodes outside the grid have the out-of-range hash, see
+        # `ShapeFunction.vmap_intr`, which does not decode to a valid index
+        is_on_grid_stack = self.is_on_grid(shapefunctions.intr_hash_stack).reshape(
+            -1, stencil_size
+        )
+
+        intr_index_stack = jnp.where(
+            is_on_grid_stack[..., None],
+            intr_index_stack.reshape(-1, stencil_size, dim),
+            jnp.iinfo(jnp.int32).max,
+        )
+
+        nodes = self.activate_blocks(
+            jnp.min(intr_index_stack, axis=1), jnp.any(is_on_grid_stack, axis=1)
+        )
+
+        return nodes, shapefunctions.replace(
+            intr_hash_stack=nodes.get_node_index_stack(shapefunctions.intr_hash_stack)
+        )
+
+    def activate_cells(
+        self: Self, base_cell_stack: chex.Array, stencil: chex.Array
+    ) -> Self:
+        """Activate blocks of stencils placed on the base cells of particles.
+
+        Used with fused shape functions, which hold no interaction hashes,
+        see `Nodes.activate_cells`.
+
+        Args:
+            self: SparseNodes state.
+            base_cell_stack: Base cells of the particles `(num_particles, dim)`,
+                see `ShapeFunction.get_base_cell_stack`.
+            stencil: Node offsets of the stencil `(stencil_size, dim)`.
+
+        Returns:
+            SparseNodes: Nodes with the rebuilt block table.
+        """
+        lower_index_stack = base_cell_stack + jnp.min(stencil, axis=0).astype(jnp.int32)
+        upper_index_stack = base_cell_stack + jnp.max(stencil, axis=0).astype(jnp.int32)
+
+        is_on_grid_stack = jnp.all(
+            (upper_index_stack >= 0) & (lower_index_stack < self.grid_size), axis=1
+        )
+
+        return self.activate_blocks(jnp.maximum(lower_index_stack, 0), is_on_grid_stack)
+
+    def activate_blocks(
+        self: Self, lower_index_stack: chex.Array, is_on_grid_stack: chex.Array
+    ) -> Self:
+        """Activate the blocks of particle stencils, see `activate`.
+
+        Args:
+            self: SparseNodes state.
+            lower_index_stack: Lowest stencil node on the grid of each particle
+                `(num_particles, dim)`.
+            is_on_grid_stack: Particles with stencil nodes on the grid
+                `(num_particles,)`.
+
+        Returns:
+            SparseNodes: Nodes with the rebuilt block table.
+        """
+        dim = lower_index_stack.shape[1]
+        num_blocks = self.block_hash_stack.shape[0]
+
+        # Blocks of the lowest stencil node on the grid of each particle. A
+        # stencil is not wider than a block, so it reaches at most the next
+        # block about each axis.
+        base_block_hash_stack, num_base_blocks = get_unique_stack(
+            jnp.where(
+                is_on_grid_stack,
+                get_hash_from_index(
+                    lower_index_stack // self.block_size, self.block_grid_size
+                ),
+                BLOCK_HASH_FILL,
+            ),
+            num_blocks,
+        )
+
+        # Dilate the unique base blocks only, which is cheaper than sorting
+        # the blocks of all stencil corners of all particles.
+        is_base_block_stack = base_block_hash_stack != BLOCK_HASH_FILL
+        base_block_index_stack = get_index_from_hash(
+            base_block_hash_stack, self.block_grid_size, dim
+        )
+
+        neighbour_block_hash_stack = []
+        for offset in itertools.product([0, 1], repeat=dim):
+            block_index_stack = base_block_index_stack + jnp.array(offset)
+            is_valid_stack = is_base_block_stack & jnp.all(
+                block_index_stack < self.block_grid_size, axis=1
+            )
+            neighbour_block_hash_stack.append(
+                jnp.where(
+                    is_valid_stack,
+                    get_hash_from_index(block_index_stack, self.block_grid_size),
+                    BLOCK_HASH_FILL,
+                )
+            )
+
+        block_hash_stack, num_active_blocks = get_unique_stack(
+            jnp.concatenate(neighbour_block_hash_stack), num_blocks
+        )
+
+        num_active_blocks = jnp.maximum(num_base_blocks, num_active_blocks)
+
+        simple_warning(
+            num_active_blocks > num_blocks,
+            "SparseNodes.activate",
+            "more active blocks than num_blocks, interactions are dropped",
+        )
+
+        nodes = self.replace(
+            block_hash_stack=block_hash_stack,
+            num_active_blocks=num_active_blocks,
+        )
+
+        return nodes.replace(
+            species_stack=get_species_from_index(
+                nodes.get_slot_index_stack(), nodes.grid_size
+            )
+        )
+
+    def get_node_index_stack(self: Self, node_hash_stack: chex.Array) -> chex.Array:
+        """Map hashes on the dense grid to node slots.
+
+        Nodes in inactive blocks, and hashes outside the dense grid, are
+        mapped to the out-of-range slot `num_blocks * block_size**dim`.
+
+        Args:
+            self: SparseNodes state.
+            node_hash_stack: Dense grid hashes of any shape.
+
+        Returns:
+            chex.Array: Node slots of the same shape.
+        """
+        num_blocks = self.block_hash_stack.shape[0]
+        block_volume, dim = self.block_offset_stack.shape
+
+        node_index_stack = get_index_from_hash(node_hash_stack, self.grid_size, dim)
+
+        block_hash_stack = get_hash_from_index(
+            node_index_stack // self.block_size, self.block_grid_size
+        )
+        local_hash_stack = get_hash_from_index(
+            node_index_stack % self.block_size, jnp.full(dim, self.block_size)
+        )
+
+        block_slot_stack = jnp.searchsorted(self.block_hash_stack, block_hash_stack)
+
+        is_active_stack = (
+            self.block_hash_stack.at[block_slot_stack].get(mode="clip")
+            == block_hash_stack
+        ) & self.is_on_grid(node_hash_stack)
+
+        return jnp.where(
+            is_active_stack,
+            block_slot_stack * block_volume + local_hash_stack,
+            num_blocks * block_volume,
+        ).astype(jnp.int32)
+
+    def is_on_grid(self: Self, node_hash_stack: chex.Array) -> chex.Array:
+        """Check if hashes are nodes of the dense grid, see `get_node_index_stack`."""
+        return (node_hash_stack >= 0) & (node_hash_stack < self.num_nodes_total)
+
+    def get_slot_index_stack(self: Self) -> chex.Array:
+        """Get grid indices of the node slots `(num_blocks * block_size**dim, dim)`."""
+        num_blocks = self.block_hash_stack.shape[0]
+        block_volume, dim = self.block_offset_stack.shape
+
+        block_index_stack = get_index_from_hash(
+            self.block_hash_stack, self.block_grid_size, dim
+        )
+        return block_index_stack.repeat(
+            block_volume, axis=0
+        ) * self.block_size + jnp.tile(self.block_offset_stack, (num_blocks, 1))
+
+    def get_coordinate_stack(self: Self, dim: int = 3) -> chex.Array:
+        """Get coordinates of the node slots, including inactive blocks."""
+        return (self.origin + self.get_slot_index_stack() * self.node_spacing).astype(
+            jnp.float32
+        )
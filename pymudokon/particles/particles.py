@@ -24,6 +24,12 @@ class Particles:
         stress_stack: Cauchy stress tensors `(num_particles, 3, 3)`.
         F_stack: Deformation gradient tensors `(num_particles, 3, 3)`.
         id_stack: Particle IDs `(num_particles,)`.
+        active_mask_stack: Active slots of a fixed-capacity pool
+            `(num_particles,)`, or `None` if all particles are active. Inactive
+            slots do not interact with the grid and keep their state.
+        material_id_stack: Index of the material of each particle in the
+            material stack `(num_particles,)`, or `None` if every material
+            updates all particles. See `Material.assign_particles`.
 
     Example usage:
             >>> # create two particles with constant velocities in 2D plane strain
@@ -59,6 +65,8 @@ class Particles:
     id_stack: chex.Array
     dim: int
     num_particles: int
+    active_mask_stack: chex.Array = None
+    material_id_stack: chex.Array = None
 
     @classmethod
     def create(
@@ -71,8 +79,17 @@ class Particles:
         stress_stack: chex.Array = None,
         force_stack: chex.Array = None,
         F_stack: chex.Array = None,
+        capacity: int = None,
+        material_id_stack: chex.Array = None,
     ) -> Self:
-        """Create the initial state of the particles."""
+        """Create the initial state of the particles.
+
+        If `capacity` is given, arrays are padded to `capacity` slots, of which
+        only the first `num_particles` are active. Particles can then be added
+        or removed inside a simulation without changing array shapes, see
+        `ParticleEmitter` and `ParticleSink`. Padded slots belong to material
+        0 if `material_id_stack` is given.
+        """
         num_particles, dim = position_stack.shape
 
         if velocity_stack is None:
@@ -98,6 +115,32 @@ class Particles:
         if F_stack is None:
             F_stack = jnp.stack([jnp.eye(3)] * num_particles)
 
+        active_mask_stack = None
+
+        if capacity is not None:
+            num_free = capacity - num_particles
+
+            def pad(stack, fill):
+                return jnp.concatenate(
+                    [stack, jnp.broadcast_to(fill, (num_free,) + stack.shape[1:])]
+                ).astype(stack.dtype)
+
+            position_stack = pad(position_stack, 0.0)
+            velocity_stack = pad(velocity_stack, 0.0)
+            force_stack = pad(force_stack, 0.0)
+            mass_stack = pad(mass_stack, 0.0)
+            volume_stack = pad(volume_stack, 0.0)
+            volume0_stack = pad(volume0_stack, 0.0)
+            L_stack = pad(L_stack, 0.0)
+            stress_stack = pad(stress_stack, 0.0)
+            F_stack = pad(F_stack, jnp.eye(3))
+
+            if material_id_stack is not None:
+                material_id_stack = pad(material_id_stack, 0)
+
+            active_mask_stack = jnp.arange(capacity) < num_particles
+            num_particles = capacity
+
         return cls(
             position_stack=position_stack,
             velocity_stack=velocity_stack,
@@ -110,7 +153,9 @@ class Particles:
             F_stack=F_stack,
             id_stack=jnp.arange(num_particles),
             num_particles=num_particles,
-            dim = dim
+            dim = dim,
+            active_mask_stack=active_mask_stack,
+            material_id_stack=material_id_stack,
         )
     
     def distributed(self: Self, device: Sharding):
@@ -182,6 +227,45 @@ class Particles:
         """
         return self.replace(L_stack=self.L_stack.at[:].set(0.0))
 
+    def get_cell_hash_stack(
+        self: Self,
+        origin: chex.Array,
+        inv_node_spacing: jnp.float32,
+        grid_size: chex.Array,
+    ) -> chex.Array:
+        """Get the Cartesian hash of the cell each particle is in.
+
+        The hash is of the node at the lower corner of the cell, and follows the
+        same layout as the particle-node interaction hashes in `ShapeFunction`.
+
+        Args:
+            origin: Grid origin `(dim,)`.
+            inv_node_spacing: Inverse of the node spacing.
+            grid_size: Number of nodes about each axis `(dim,)`.
+
+        Returns:
+            chex.Array: Cell hashes `(num_particles,)`.
+        """
+        dim = self.position_stack.shape[1]
+
+        cell_pos_stack = jnp.floor((self.position_stack - origin) * inv_node_spacing)
+
+        if dim == 1:
+            cell_hash_stack = cell_pos_stack[:, 0]
+        elif dim == 2:
+            cell_hash_stack = cell_pos_stack[:, 1] + cell_pos_stack[:, 0] * grid_size[1]
+        else:
+            cell_hash_stack = (
+                cell_pos_stack[:, 2]
+                + cell_pos_stack[:, 0] * grid_size[2]
+                + cell_pos_stack[:, 1] * grid_size[2] * grid_size[0]
+            )
+        return cell_hash_stack.astype(jnp.int32)
+
+    def get_density_stack(self: Self) -> chex.Array:
+        """Get the particle densities `(num_particles,)`."""
+        return self.mass_stack / self.volume_stack
+
     def get_phi_stack(self, rho_p):
         
         density_stack = self.mass_stack/self.volume_stack
@@ -17,6 +17,136 @@ from jax import Array
 from .shapefunctions import ShapeFunction
 
 
+def get_cubic_basis(intr_dist: Array, h: jnp.float32) -> Tuple[Array, Array]:
+    """Evaluate the 1D cubic B-spline basis and its derivative elementwise.
+
+    Args:
+        intr_dist: Particle-node distances along each axis, scaled by the
+            inverse node spacing. Any shape.
+        h: Inverse node spacing.
+
+    Returns:
+        Tuple: Basis and derivative, of the same shape as `intr_dist`.
+    """
+    condlist = [
+                (intr_dist >= -2)*(intr_dist < -1),
+                (intr_dist >= -1)*(intr_dist < 0), 
+                (intr_dist >= 0)*(intr_dist < 1),
+                (intr_dist >=1)*(intr_dist < 2)
+            ]
+    
+    _piecewise = partial(jnp.piecewise,
+                x = intr_dist,
+                condlist = condlist
+                )
+    
+    def middle_splines():
+        basis = _piecewise(funclist=[
+                # (1/6)x**3 + x**2 + 2x + 4/3
+                lambda x: ((1.0 / 6.0 * x + 1.0) * x + 2.0) * x + 4.0 / 3.0,
+                # -1/2 x**3 - x**2 +2/3
+                lambda x: (-0.5 * x - 1) * x * x + 2.0 / 3.0,
+                # 1/2 x**3 - x**2 + 2/3
+                lambda x: (0.5 * x - 1) * x * x + 2.0 / 3.0,
+                # -1/6 x**3 + x**2 -2x + 4/3
+                lambda x: ((-1.0 / 6.0 * x + 1.0) * x - 2.0) * x + 4.0 / 3.0
+                ])
+        dbasis = _piecewise(funclist=[
+                # (1/2)x**2 + 2x + 2
+                lambda x: h * ((0.5 * x + 2) * x + 2.0),
+                # -3/2 x**2 - 2x
+                lambda x: h * (-3.0 / 2.0 * x - 2.0) * x,
+                # 3/2 x**2 - 2x
+                lambda x: h * (3.0 / 2.0 * x - 2.0) * x,
+                # -1/2 x**2 + 2x -2
+                lambda x: h * ((-0.5 * x + 2) * x - 2.0)
+                ])
+        return basis, dbasis
+    
+    def boundary_splines():
+        basis = _piecewise(funclist=[
+                # 1/6 x**3 + x**2 + 2x + 4/3
+                lambda x: ((1.0 / 6.0 * x + 1.0) * x + 2.0) * x + 4.0 / 3.0,
+                # -1/6 x**3 +x + 1
+                lambda x: (-1.0 / 6.0 * x * x + 1.0) * x + 1.0, 
+                # 1/6 x**3 - x  + 1
+                lambda x:  ((1.0 / 6.0 )*x*x -1.0)*x  +1.0,
+                # -1/6 x**3 + x**2 -2x + 4/3
+                lambda x: ((-1.0 / 6.0 * x + 1.0) * x - 2.0) * x + 4.0 / 3.0
+                ])
+        dbasis = _piecewise(funclist=[
+                # 1/2 x**2 + 2x + 2
+                lambda x: h * ((0.5 * x + 2) * x + 2.0),
+                # -1/2 x**2 +1
+                lambda x: h * (-0.5 * x * x + 1.0), 
+                # 1/2 x**2 - 1
+                lambda x: h * (0.5 * x * x - 1.0),
+                # -1/2 x**2 + 2x -2
+                lambda x: h * ((-0.5 * x + 2) * x - 2.0)
+                ])
+        return basis, dbasis
+    
+    def boundary_0_p_h():
+        basis = _piecewise(funclist=[
+                lambda x:  jnp.float32(0.0),
+                # -1/3 x**3 -x**2 + 2/3
+                lambda x: (-1.0 / 3.0 * x - 1.0) * x * x + 2.0 / 3.0,
+                # 1/2 x**3 -x**2 + 2/3
+                lambda x: (0.5 * x - 1) * x * x + 2.0 / 3.0,
+                # -1/6 x**3 + x**2 -2x + 4/3
+                lambda x: ((-1.0 / 6.0 * x + 1.0) * x - 2.0) * x + 4.0 / 3.0,
+                ])
+        dbasis = _piecewise(funclist=[
+                lambda x:  jnp.float32(0.0),
+                # -x**2 -2x 
+                lambda x: h * (-x - 2) * x,
+                # 3/2 x**2 -2x 
+                lambda x: h * (3.0 / 2.0 * x - 2.0) * x,
+                # -1/2 x**2 + 2x -2
+                lambda x: h * ((-0.5 * x + 2) * x - 2.0),
+                ])
+        return basis, dbasis
+        
+    def boundary_N_m_h():
+        basis = _piecewise(funclist=[
+                # (1/6) x**3 + x**2 + 2x + 4/3
+                lambda x: ((1.0 / 6.0 * x + 1.0) * x + 2.0) * x + 4.0 / 3.0,
+                # -1/2 x**3 - x**2 + 2/3 
+                lambda x: (-0.5 * x - 1) * x * x + 2.0 / 3.0,
+                # 1/3 x**3 -x**2 + 2/3
+                lambda x: (1.0 / 3.0 * x - 1.0) * x * x + 2.0 / 3.0,
+                lambda x:  jnp.float32(0.0),
+                ])
+        dbasis = _piecewise(funclist=[
+                # (1/2) x**2 + 2x + 2
+                lambda x: h * ((0.5 * x + 2) * x + 2.0),
+                # -3/2 x**2 - 2x 
+                lambda x: h * (-3.0 / 2.0 * x - 2.0) * x,
+                #  x**2 -2x
+                lambda x: h * (x - 2.0) * x,
+                lambda x:  jnp.float32(0.0),
+                ])
+        return basis, dbasis    
+        
+
+    # 0th index is middle
+    # 1st index is boundary 0 or N
+    # 3rd index is left side of closes boundary 0 + h
+    # 4th index is right side of closes boundary N -h
+
+    basis, dbasis = jax.lax.switch(
+        # index= intr_node_type,
+        index = 0,
+        branches =[
+        middle_splines,
+        boundary_splines, 
+        boundary_0_p_h, 
+        boundary_N_m_h,
+        ]
+    )
+    return basis, dbasis
+
+
 @chex.dataclass(mappable_dataclass=False, frozen=True)
 class CubicShapeFunction(ShapeFunction):
     """Cubic B-spline shape functions for the particle-node interactions."""
@@ -157,9 +287,18 @@ class CubicShapeFunction(ShapeFunction):
         inv_node_spacing: jnp.float32,
         grid_size: chex.Array,
         position_stack: chex.Array,
-        species_stack: chex.Array
+        species_stack: chex.Array,
+        separable: bool = True,
     ) -> Tuple[Self, Array]:
-        """Calculate shape functions and its gradients."""
+        """Calculate shape functions and its gradients.
+
+        Args:
+            separable (optional): Evaluate the 1D basis once per particle and
+                axis, and form the stencil weights and gradients as tensor
+                products, see `separable_intr_shp`. Otherwise, evaluate the
+                basis for each interaction, see `vmap_intr_shp`. Both give the
+                same results. Defaults to True.
+        """
         stencil_size, dim = self.stencil.shape
 
         num_particles = position_stack.shape[0]
@@ -175,9 +314,14 @@ class CubicShapeFunction(ShapeFunction):
         # intr_node_type = jnp.zeros(intr_id_stack).astype(jnp.int16)
         # from here we can calculate intr hash type node_type[intr_hash] 
         # same as gather....
-        intr_shapef_stack, intr_shapef_grad_stack = self.vmap_intr_shp(
-            intr_dist_stack, intr_hash_stack, species_stack, inv_node_spacing
-        )
+        if separable:
+            intr_shapef_stack, intr_shapef_grad_stack = self.separable_intr_shp(
+                position_stack, origin, inv_node_spacing
+            )
+        else:
+            intr_shapef_stack, intr_shapef_grad_stack = self.vmap_intr_shp(
+                intr_dist_stack, intr_hash_stack, species_stack, inv_node_spacing
+            )
         # intr_shapef_stack = self.intr_shapef_stack
         # intr_shapef_grad_stack = self.intr_shapef_grad_stack
         # print(intr_dist_stack.shape)
@@ -195,7 +339,107 @@ class CubicShapeFunction(ShapeFunction):
             intr_id_stack=intr_id_stack,
             intr_hash_stack=intr_hash_stack,
         ), intr_dist_3d_stack
-        
+
+    def separable_intr_shp(
+        self: Self,
+        position_stack: chex.Array,
+        origin: chex.Array,
+        inv_node_spacing: jnp.float32,
+    ) -> Tuple[Array, Array]:
+        """Tensor-product cubic shape function calculation.
+
+        The 1D basis and its derivative are evaluated for the 4 nodes along
+        each axis of a particle, i.e., `4*dim` evaluations instead of
+        `4**dim*dim` for `vmap_intr_shp`. The stencil weights and gradients are
+        products of the 1D values, see `get_intr_shapef_stack`.
+
+        Args:
+            position_stack: Particle coordinates `(num_particles, dim)`.
+            origin: Grid origin `(dim,)`.
+            inv_node_spacing: Inverse node spacing.
+
+        Returns:
+            Tuple[Array, Array]:
+                Shape functions `(num_particles*stencil_size,)` and gradients
+                `(num_particles*stencil_size, 3)`.
+        """
+        rel_pos_stack = (position_stack - origin) * inv_node_spacing
+
+        intr_shapef_stack, intr_shapef_grad_stack, _ = self.get_intr_shapef_stack(
+            rel_pos_stack,
+            self.get_base_cell_stack(rel_pos_stack),
+            inv_node_spacing,
+            None,
+        )
+        return intr_shapef_stack, intr_shapef_grad_stack
+
+    def get_intr_shapef_stack(
+        self: Self,
+        rel_pos_stack: chex.Array,
+        base_cell_stack: chex.Array,
+        inv_node_spacing: jnp.float32,
+        grid_size: chex.Array,
+    ) -> Tuple[Array, Array, Array]:
+        """Get the shape functions from the base cells, see `ShapeFunction`.
+
+        Evaluated as tensor products, see `separable_intr_shp`.
+        """
+        stencil_size, dim = self.stencil.shape
+
+        # Same distances as `ShapeFunction.vmap_intr`, one row per axis
+        axis_dist_stack = rel_pos_stack[..., None] - (
+            base_cell_stack[..., None] + jnp.arange(-1, 3)
+        )
+
+        # (num_particles, dim, 4)
+        axis_basis_stack, axis_dbasis_stack = get_cubic_basis(
+            axis_dist_stack, inv_node_spacing
+        )
+
+        # (num_particles, stencil_size, dim)
+        axis_id_stack = jnp.arange(dim)
+        basis_stack = axis_basis_stack[:, axis_id_stack, self.stencil + 1]
+        dbasis_stack = axis_dbasis_stack[:, axis_id_stack, self.stencil + 1]
+        intr_dist_stack = axis_dist_stack[:, axis_id_stack, self.stencil + 1]
+
+        basis = [basis_stack[..., axis] for axis in range(dim)]
+        dbasis = [dbasis_stack[..., axis] for axis in range(dim)]
+        zeros = jnp.zeros_like(basis[0])
+
+        intr_shapef_stack = jnp.prod(basis_stack, axis=-1)
+
+        if dim == 2:
+            intr_shapef_grad_stack = jnp.stack(
+                [dbasis[0] * basis[1], dbasis[1] * basis[0], zeros], axis=-1
+            )
+        elif dim == 3:
+            intr_shapef_grad_stack = jnp.stack(
+                [
+                    dbasis[0] * basis[1] * basis[2],
+                    dbasis[1] * basis[0] * basis[2],
+                    dbasis[2] * basis[0] * basis[1],
+                ],
+                axis=-1,
+            )
+        else:
+            intr_shapef_grad_stack = jnp.stack([dbasis[0], zeros, zeros], axis=-1)
+
+        return (
+            intr_shapef_stack.reshape(-1),
+            intr_shapef_grad_stack.reshape(-1, 3),
+            intr_dist_stack.reshape(-1, dim),
+        )
+
+    def get_axis_basis(
+        self: Self,
+        axis_dist_stack: Array,
+        axis_n_pos_stack: Array,
+        inv_node_spacing: jnp.float32,
+        axis_grid_size: Array,
+    ) -> Tuple[Array, Array]:
+        """Evaluate the 1D cubic basis, see `ShapeFunction`."""
+        return get_cubic_basis(axis_dist_stack, inv_node_spacing)
+
     @partial(jax.vmap, in_axes=(None, 0, 0, None, None))
     def vmap_intr_shp(
         self,
@@ -223,122 +467,7 @@ class CubicShapeFunction(ShapeFunction):
         """
         # intr_node_type = node_species_stack.at[intr_hash].get()
         
-        condlist = [
-                    (intr_dist >= -2)*(intr_dist < -1),
-                    (intr_dist >= -1)*(intr_dist < 0), 
-                    (intr_dist >= 0)*(intr_dist < 1),
-                    (intr_dist >=1)*(intr_dist < 2)
-                ]
-        
-        _piecewise = partial(jnp.piecewise,
-                    x = intr_dist,
-                    condlist = condlist
-                    )
-        
-        def middle_splines():
-            basis = _piecewise(funclist=[
-                    # (1/6)x**3 + x**2 + 2x + 4/3
-                    lambda x: ((1.0 / 6.0 * x + 1.0) * x + 2.0) * x + 4.0 / 3.0,
-                    # -1/2 x**3 - x**2 +2/3
-                    lambda x: (-0.5 * x - 1) * x * x + 2.0 / 3.0,
-                    # 1/2 x**3 - x**2 + 2/3
-                    lambda x: (0.5 * x - 1) * x * x + 2.0 / 3.0,
-                    # -1/6 x**3 + x**2 -2x + 4/3
-                    lambda x: ((-1.0 / 6.0 * x + 1.0) * x - 2.0) * x + 4.0 / 3.0
-                    ])
-            dbasis = _piecewise(funclist=[
-                    # (1/2)x**2 + 2x + 2
-                    lambda x: h * ((0.5 * x + 2) * x + 2.0),
-                    # -3/2 x**2 - 2x
-                    lambda x: h * (-3.0 / 2.0 * x - 2.0) * x,
-                    # 3/2 x**2 - 2x
-                    lambda x: h * (3.0 / 2.0 * x - 2.0) * x,
-                    # -1/2 x**2 + 2x -2
-                    lambda x: h * ((-0.5 * x + 2) * x - 2.0)
-                    ])
-            return basis, dbasis
-        
-        def boundary_splines():
-            basis = _piecewise(funclist=[
-                    # 1/6 x**3 + x**2 + 2x + 4/3
-                    lambda x: ((1.0 / 6.0 * x + 1.0) * x + 2.0) * x + 4.0 / 3.0,
-                    # -1/6 x**3 +x + 1
-                    lambda x: (-1.0 / 6.0 * x * x + 1.0) * x + 1.0, 
-                    # 1/6 x**3 - x  + 1
-                    lambda x:  ((1.0 / 6.0 )*x*x -1.0)*x  +1.0,
-                    # -1/6 x**3 + x**2 -2x + 4/3
-                    lambda x: ((-1.0 / 6.0 * x + 1.0) * x - 2.0) * x + 4.0 / 3.0
-                    ])
-            dbasis = _piecewise(funclist=[
-                    # 1/2 x**2 + 2x + 2
-                    lambda x: h * ((0.5 * x + 2) * x + 2.0),
-                    # -1/2 x**2 +1
-                    lambda x: h * (-0.5 * x * x + 1.0), 
-                    # 1/2 x**2 - 1
-                    lambda x: h * (0.5 * x * x - 1.0),
-                    # -1/2 x**2 + 2x -2
-                    lambda x: h * ((-0.5 * x + 2) * x - 2.0)
-                    ])
-            return basis, dbasis
-        
-        def boundary_0_p_h():
-            basis = _piecewise(funclist=[
-                    lambda x:  jnp.float32(0.0),
-                    # -1/3 x**3 -x**2 + 2/3
-                    lambda x: (-1.0 / 3.0 * x - 1.0) * x * x + 2.0 / 3.0,
-                    # 1/2 x**3 -x**2 + 2/3
-                    lambda x: (0.5 * x - 1) * x * x + 2.0 / 3.0,
-                    # -1/6 x**3 + x**2 -2x + 4/3
-                    lambda x: ((-1.0 / 6.0 * x + 1.0) * x - 2.0) * x + 4.0 / 3.0,
-                    ])
-            dbasis = _piecewise(funclist=[
-                    lambda x:  jnp.float32(0.0),
-                    # -x**2 -2x 
-                    lambda x: h * (-x - 2) * x,
-                    # 3/2 x**2 -2x 
-                    lambda x: h * (3.0 / 2.0 * x - 2.0) * x,
-                    # -1/2 x**2 + 2x -2
-                    lambda x: h * ((-0.5 * x + 2) * x - 2.0),
-                    ])
-            return basis, dbasis
-            
-        def boundary_N_m_h():
-            basis = _piecewise(funclist=[
-                    # (1/6) x**3 + x**2 + 2x + 4/3
-                    lambda x: ((1.0 / 6.0 * x + 1.0) * x + 2.0) * x + 4.0 / 3.0,
-                    # -1/2 x**3 - x**2 + 2/3 
-                    lambda x: (-0.5 * x - 1) * x * x + 2.0 / 3.0,
-                    # 1/3 x**3 -x**2 + 2/3
-                    lambda x: (1.0 / 3.0 * x - 1.0) * x * x + 2.0 / 3.0,
-                    lambda x:  jnp.float32(0.0),
-                    ])
-            dbasis = _piecewise(funclist=[
-                    # (1/2) x**2 + 2x + 2
-                    lambda x: h * ((0.5 * x + 2) * x + 2.0),
-                    # -3/2 x**2 - 2x 
-                    lambda x: h * (-3.0 / 2.0 * x - 2.0) * x,
-                    #  x**2 -2x
-                    lambda x: h * (x - 2.0) * x,
-                    lambda x:  jnp.float32(0.0),
-                    ])
-            return basis, dbasis    
-            
-
-        # 0th index is middle
-        # 1st index is boundary 0 or N
-        # 3rd index is left side of closes boundary 0 + h
-        # 4th index is right side of closes boundary N -h
-
-        basis, dbasis = jax.lax.switch(
-            # index= intr_node_type,
-            index = 0,
-            branches =[
-            middle_splines,
-            boundary_splines, 
-            boundary_0_p_h, 
-            boundary_N_m_h,
-            ]
-        )
+        basis, dbasis = get_cubic_basis(intr_dist, h)
         intr_shapef = jnp.prod(basis)
 
         dim = basis.shape[0]
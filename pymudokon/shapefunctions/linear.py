@@ -131,6 +131,41 @@ class LinearShapeFunction(ShapeFunction):
             intr_hash_stack=intr_hash_stack,
         ), intr_dist_3d_stack
 
+    def get_intr_shapef_stack(
+        self: Self,
+        rel_pos_stack: chex.Array,
+        base_cell_stack: chex.Array,
+        inv_node_spacing: jnp.float32,
+        grid_size: chex.Array,
+    ) -> Tuple[chex.Array, chex.Array, chex.Array]:
+        """Get the shape functions from the base cells, see `ShapeFunction`."""
+        dim = self.stencil.shape[1]
+
+        intr_dist_stack = (
+            rel_pos_stack[:, None, :] - (base_cell_stack[:, None, :] + self.stencil)
+        ).reshape(-1, dim)
+
+        intr_shapef_stack, intr_shapef_grad_stack = self.vmap_intr_shp(
+            intr_dist_stack, inv_node_spacing
+        )
+
+        return intr_shapef_stack, intr_shapef_grad_stack, intr_dist_stack
+
+    def get_axis_basis(
+        self: Self,
+        axis_dist_stack: chex.Array,
+        axis_n_pos_stack: chex.Array,
+        inv_node_spacing: jnp.float32,
+        axis_grid_size: chex.Array,
+    ) -> Tuple[chex.Array, chex.Array]:
+        """Evaluate the 1D linear basis, see `ShapeFunction`."""
+        abs_dist_stack = jnp.abs(axis_dist_stack)
+        basis_stack = jnp.where(abs_dist_stack < 1.0, 1.0 - abs_dist_stack, 0.0)
+        dbasis_stack = jnp.where(
+            abs_dist_stack < 1.0, -jnp.sign(axis_dist_stack) * inv_node_spacing, 0.0
+        )
+        return basis_stack, dbasis_stack
+
     @partial(jax.vmap, in_axes=(None, 0, None), out_axes=(0))
     def vmap_intr_shp(
         self: Self,
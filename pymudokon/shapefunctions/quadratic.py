@@ -0,0 +1,320 @@
+"""Module for containing the quadratic shape functions.
+
+References:
+    - Steffen, Michael, Robert M. Kirby, and Martin Berzins. 'Analysis and
+    reduction of quadrature errors in the material point method (MPM).'
+    - De Vaucorbeil, Alban, et al. 'Material point method after 25 years: theory,
+    implementation, and applications.'
+"""
+
+import itertools
+from typing import Tuple
+from typing_extensions import Self
+
+import chex
+import jax.numpy as jnp
+from jax import Array
+
+from ..nodes.nodes import get_hash_from_index
+from .shapefunctions import ShapeFunction
+
+
+def get_quadratic_basis(
+    intr_dist: Array, intr_species: Array, h: jnp.float32
+) -> Tuple[Array, Array]:
+    """Evaluate the 1D quadratic B-spline basis and its derivative elementwise.
+
+    Node types follow `Nodes.species_stack`, but are given about each axis:
+    0 for middle nodes, 1 for boundary nodes 0 or N, 2 for nodes 0 + h and
+    3 for nodes N - h. Boundary splines are the clamped B-splines of the
+    domain, so the basis sums to one up to the boundary.
+
+    Args:
+        intr_dist: Particle-node distances along each axis, scaled by the
+            inverse node spacing. Any shape.
+        intr_species: Node types about each axis, same shape as `intr_dist`.
+        h: Inverse node spacing.
+
+    Returns:
+        Tuple: Basis and derivative, of the same shape as `intr_dist`.
+    """
+    abs_dist = jnp.abs(intr_dist)
+    sign = jnp.sign(intr_dist)
+
+    # middle nodes
+    # 3/4 - x**2, 1/2 (3/2 - |x|)**2
+    middle_basis = jnp.where(
+        abs_dist < 0.5, 0.75 - abs_dist * abs_dist, 0.5 * (1.5 - abs_dist) ** 2
+    )
+    middle_dbasis = jnp.where(
+        abs_dist < 0.5, -2.0 * intr_dist, -sign * (1.5 - abs_dist)
+    )
+
+    # boundary nodes 0 or N, particles are on the inner side
+    # 1 - 4/3 x**2, 2/3 (3/2 - |x|)**2
+    boundary_basis = jnp.where(
+        abs_dist < 0.5,
+        1.0 - 4.0 / 3.0 * abs_dist * abs_dist,
+        2.0 / 3.0 * (1.5 - abs_dist) ** 2,
+    )
+    boundary_dbasis = jnp.where(
+        abs_dist < 0.5,
+        -8.0 / 3.0 * intr_dist,
+        -4.0 / 3.0 * sign * (1.5 - abs_dist),
+    )
+
+    # nodes 0 + h, the boundary is at x = -1. Nodes N - h are mirrored.
+    inner_dist = jnp.where(intr_species == 3, -intr_dist, intr_dist)
+    inner_sign = jnp.where(intr_species == 3, -1.0, 1.0)
+
+    # 4/3 (x + 1)**2, -7/6 x**2 + 1/6 x + 17/24, 1/2 (3/2 - x)**2
+    inner_basis = jnp.select(
+        [inner_dist < -0.5, inner_dist < 0.5],
+        [
+            4.0 / 3.0 * (inner_dist + 1.0) ** 2,
+            (-7.0 / 6.0 * inner_dist + 1.0 / 6.0) * inner_dist + 17.0 / 24.0,
+        ],
+        0.5 * (1.5 - inner_dist) ** 2,
+    )
+    inner_dbasis = inner_sign * jnp.select(
+        [inner_dist < -0.5, inner_dist < 0.5],
+        [
+            8.0 / 3.0 * (inner_dist + 1.0),
+            -7.0 / 3.0 * inner_dist + 1.0 / 6.0,
+        ],
+        -(1.5 - inner_dist),
+    )
+
+    basis = jnp.select(
+        [intr_species == 0, intr_species == 1],
+        [middle_basis, boundary_basis],
+        inner_basis,
+    )
+    dbasis = jnp.select(
+        [intr_species == 0, intr_species == 1],
+        [middle_dbasis, boundary_dbasis],
+        inner_dbasis,
+    )
+
+    is_support = abs_dist < 1.5
+
+    return jnp.where(is_support, basis, 0.0), jnp.where(is_support, h * dbasis, 0.0)
+
+
+@chex.dataclass(mappable_dataclass=False, frozen=True)
+class QuadraticShapeFunction(ShapeFunction):
+    """Quadratic B-spline shape functions for the particle-node interactions.
+
+    C1 continuous, with a stencil of 3 nodes about each axis (27 in 3D)
+    compared to 4 for cubic B-splines (64 in 3D). Splines of nodes at and
+    next to the domain boundary are modified, so particles may approach the
+    boundary.
+
+    Example:
+    >>> import pymudokon as pm
+    >>> shapefunctions = pm.QuadraticShapeFunction.create(num_particles=100, dim=3)
+    >>> # use with USL, or USL_APIC / USL_ASFLIP created with
+    >>> # shapefunction="quadratic"
+    """
+
+    @classmethod
+    def create(cls: Self, num_particles: jnp.int32, dim: jnp.int16) -> Self:
+        """Initializes quadratic B-splines.
+
+        Args:
+            cls: Self type reference
+            num_particles: Number of particles
+            dim: Dimension of the problem
+
+        Returns:
+            ShapeFunction: Quadratic shape function state
+        """
+        # Node offsets from the lower node of the stencil about each axis.
+        stencil = jnp.array(list(itertools.product(range(3), repeat=dim)))
+
+        stencil_size = stencil.shape[0]
+
+        intr_id_stack = jnp.arange(num_particles * stencil_size).astype(jnp.int32)
+
+        return cls(
+            intr_id_stack=intr_id_stack,
+            intr_hash_stack=jnp.zeros((num_particles * stencil_size), dtype=jnp.int32),
+            intr_shapef_stack=jnp.zeros(
+                (num_particles * stencil_size), dtype=jnp.float32
+            ),
+            intr_shapef_grad_stack=jnp.zeros(
+                (num_particles * stencil_size, 3), dtype=jnp.float32
+            ),
+            stencil=stencil,
+        )
+
+    def get_base_cell_stack(self: Self, rel_pos_stack: chex.Array) -> chex.Array:
+        """Get the lower stencil node of each particle, see `ShapeFunction`."""
+        return jnp.floor(rel_pos_stack - 0.5).astype(jnp.int32)
+
+    def get_intr_hash_stack(
+        self: Self, base_cell_stack: chex.Array, grid_size: chex.Array
+    ) -> chex.Array:
+        """Get the interaction hashes from the base cells, see `ShapeFunction`.
+
+        Stencil nodes outside the grid are mapped to the nearest node, as in
+        `calculate_shapefunction`.
+        """
+        dim = base_cell_stack.shape[1]
+
+        intr_n_pos_stack = jnp.clip(
+            base_cell_stack[:, None, :] + self.stencil,
+            0,
+            jnp.asarray(grid_size)[:dim] - 1,
+        )
+
+        return get_hash_from_index(intr_n_pos_stack, grid_size).reshape(-1)
+
+    def calculate_shapefunction(
+        self: Self,
+        origin: chex.Array,
+        inv_node_spacing: jnp.float32,
+        grid_size: chex.Array,
+        position_stack: chex.Array,
+        species_stack: chex.Array,
+    ) -> Tuple[Self, chex.Array]:
+        """Calculate shape functions and its gradients.
+
+        The 1D basis is evaluated once per particle and axis, and the stencil
+        weights and gradients are formed as products, as in
+        `CubicShapeFunction.separable_intr_shp`. Node types about each axis
+        are derived from the grid indices, see `get_quadratic_basis`.
+        Stencil nodes outside the grid get zero weight and are mapped to the
+        nearest node.
+
+        Args:
+            self: Shape function at previous state
+            origin: start coordinates of the grid
+            inv_node_spacing: 1/node_spacing (inverse node spacing/ grid spacing)
+            grid_size: Number of nodes in each axis
+            position_stack: All coordinates on the grid
+            species_stack: Node types, unused as types are derived about each
+                axis.
+
+        Returns:
+            Tuple:
+                - Updated shape function state
+                - Interaction distances
+        """
+        stencil_size, dim = self.stencil.shape
+
+        num_particles = position_stack.shape[0]
+
+        intr_id_stack = jnp.arange(num_particles * stencil_size).astype(jnp.int32)
+
+        rel_pos_stack = (position_stack - origin) * inv_node_spacing
+        base_cell_stack = self.get_base_cell_stack(rel_pos_stack)
+
+        intr_shapef_stack, intr_shapef_grad_stack, intr_dist_stack = (
+            self.get_intr_shapef_stack(
+                rel_pos_stack, base_cell_stack, inv_node_spacing, grid_size
+            )
+        )
+
+        intr_dist_3d_stack = jnp.pad(
+            intr_dist_stack,
+            [(0, 0), (0, 3 - dim)],
+            mode="constant",
+            constant_values=0,
+        )
+
+        return self.replace(
+            intr_shapef_stack=intr_shapef_stack,
+            intr_shapef_grad_stack=intr_shapef_grad_stack,
+            intr_id_stack=intr_id_stack,
+            intr_hash_stack=self.get_intr_hash_stack(base_cell_stack, grid_size),
+        ), intr_dist_3d_stack
+
+    def get_intr_shapef_stack(
+        self: Self,
+        rel_pos_stack: chex.Array,
+        base_cell_stack: chex.Array,
+        inv_node_spacing: jnp.float32,
+        grid_size: chex.Array,
+    ) -> Tuple[Array, Array, Array]:
+        """Get the shape functions from the base cells, see `ShapeFunction`."""
+        dim = self.stencil.shape[1]
+
+        # (num_particles, dim, 3)
+        axis_n_pos_stack = base_cell_stack[..., None] + jnp.arange(3)
+        axis_dist_stack = rel_pos_stack[..., None] - axis_n_pos_stack
+
+        axis_basis_stack, axis_dbasis_stack = self.get_axis_basis(
+            axis_dist_stack,
+            axis_n_pos_stack,
+            inv_node_spacing,
+            jnp.asarray(grid_size)[:dim, None],
+        )
+
+        # (num_particles, stencil_size, dim)
+        axis_id_stack = jnp.arange(dim)
+        basis_stack = axis_basis_stack[:, axis_id_stack, self.stencil]
+        dbasis_stack = axis_dbasis_stack[:, axis_id_stack, self.stencil]
+        intr_dist_stack = axis_dist_stack[:, axis_id_stack, self.stencil]
+
+        basis = [basis_stack[..., axis] for axis in range(dim)]
+        dbasis = [dbasis_stack[..., axis] for axis in range(dim)]
+        zeros = jnp.zeros_like(basis[0])
+
+        intr_shapef_stack = jnp.prod(basis_stack, axis=-1)
+
+        if dim == 2:
+            intr_shapef_grad_stack = jnp.stack(
+                [dbasis[0] * basis[1], dbasis[1] * basis[0], zeros], axis=-1
+            )
+        elif dim == 3:
+            intr_shapef_grad_stack = jnp.stack(
+                [
+                    dbasis[0] * basis[1] * basis[2],
+                    dbasis[1] * basis[0] * basis[2],
+                    dbasis[2] * basis[0] * basis[1],
+                ],
+                axis=-1,
+            )
+        else:
+            intr_shapef_grad_stack = jnp.stack([dbasis[0], zeros, zeros], axis=-1)
+
+        return (
+            intr_shapef_stack.reshape(-1),
+            intr_shapef_grad_stack.reshape(-1, 3),
+            intr_dist_stack.reshape(-1, dim),
+        )
+
+    def get_axis_basis(
+        self: Self,
+        axis_dist_stack: Array,
+        axis_n_pos_stack: Array,
+        inv_node_spacing: jnp.float32,
+        axis_grid_size: Array,
+    ) -> Tuple[Array, Array]:
+        """Evaluate the 1D quadratic basis, see `ShapeFunction`.
+
+        Node types about each axis are derived from the grid indices, see
+        `get_quadratic_basis`. Nodes outside the grid get zero weight.
+        """
+        axis_species_stack = jnp.select(
+            [
+                (axis_n_pos_stack == 0) | (axis_n_pos_stack == axis_grid_size - 1),
+                axis_n_pos_stack == 1,
+                axis_n_pos_stack == axis_grid_size - 2,
+            ],
+            [1, 2, 3],
+            0,
+        )
+
+        axis_basis_stack, axis_dbasis_stack = get_quadratic_basis(
+            axis_dist_stack, axis_species_stack, inv_node_spacing
+        )
+
+        is_inside_stack = (axis_n_pos_stack >= 0) & (
+            axis_n_pos_stack < axis_grid_size
+        )
+        return (
+            jnp.where(is_inside_stack, axis_basis_stack, 0.0),
+            jnp.where(is_inside_stack, axis_dbasis_stack, 0.0),
+        )
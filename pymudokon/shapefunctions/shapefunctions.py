@@ -11,6 +11,41 @@ import jax.numpy as jnp
 from jax.sharding import Sharding
 import jax
 
+def get_node_hash_stack(n_pos_stack: chex.Array, grid_size: chex.Array) -> chex.Array:
+    """Get the hashes of nodes from their grid indices.
+
+    Gives the same hashes as `ShapeFunction.vmap_intr`, including the
+    out-of-range hash `prod(grid_size)` of nodes outside the grid.
+
+    Args:
+        n_pos_stack: Grid indices of nodes `(..., dim)`.
+        grid_size: Grid size about each axis `(dim,)`.
+
+    Returns:
+        chex.Array: Node hashes `(...)`.
+    """
+    dim = n_pos_stack.shape[-1]
+
+    grid_size = jnp.asarray(grid_size)
+
+    if dim == 1:
+        hash_stack = n_pos_stack[..., 0]
+    elif dim == 2:
+        hash_stack = n_pos_stack[..., 1] + n_pos_stack[..., 0] * grid_size[1]
+    else:
+        hash_stack = (
+            n_pos_stack[..., 2]
+            + n_pos_stack[..., 0] * grid_size[2]
+            + n_pos_stack[..., 1] * grid_size[2] * grid_size[0]
+        )
+
+    is_on_grid_stack = jnp.all((n_pos_stack >= 0) & (n_pos_stack < grid_size), axis=-1)
+
+    return jnp.where(is_on_grid_stack, hash_stack, jnp.prod(grid_size)).astype(
+        jnp.int32
+    )
+
+
 @chex.dataclass(mappable_dataclass=False, frozen=True)
 class ShapeFunction:
     """Contains base method to calculate relative distances between particles and nodes.
@@ -28,6 +63,16 @@ class ShapeFunction:
         intr_shapef_grad_stack: Shape function gradients for the particle-node
             interactions `(num_particles, stencil_size, dim)`
         intr_id_stack: Particle-node pair interaction ids `(num_particles*stencil_size)`
+        base_cell_stack: Base cell of each particle in the previous step
+            `(num_particles, dim)`, or `None` if not incremental,
+            see `ShapeFunction.incremental`.
+        cell_id_stack: Particle ids in the order of `base_cell_stack`
+            `(num_particles,)`.
+        num_cell_changes: Number of particles that changed their base cell
+            in the last step.
+        cell_change_id_stack: Stack positions of the particles that changed
+            their base cell in the last step, padded with `num_particles`
+            `(max_cell_changes,)`, see `ShapeFunction.incremental`.
     """
 
     intr_hash_stack: chex.Array
@@ -35,6 +80,10 @@ class ShapeFunction:
     intr_shapef_grad_stack: chex.Array
     intr_id_stack: chex.Array
     stencil: chex.Array
+    base_cell_stack: chex.Array = None
+    cell_id_stack: chex.Array = None
+    num_cell_changes: jnp.int32 = None
+    cell_change_id_stack: chex.Array = None
 
     @partial(jax.vmap, in_axes=(None, 0, None, None, None, None), out_axes=(0, 0))
     def vmap_intr(
@@ -90,9 +139,516 @@ class ShapeFunction:
                 + intr_n_pos[0] * grid_size[2]
                 + intr_n_pos[1] * grid_size[2] * grid_size[0]
             ).astype(jnp.int32)
-                
+
+        # Nodes outside the grid, e.g., beyond the halo of a slab, get the
+        # out-of-range hash, so they are dropped in P2G and read as zero in G2P
+        # instead of aliasing another node
+        is_on_grid = jnp.all((intr_n_pos >= 0) & (intr_n_pos < grid_size))
+
+        intr_hashes = jnp.where(
+            is_on_grid, intr_hashes, jnp.prod(grid_size).astype(jnp.int32)
+        )
+
         return intr_dist, intr_hashes
 
+    def fuse(self: Self) -> Self:
+        """Drop the stored particle-node pair interactions.
+
+        Fused solver kernels evaluate the shape functions, gradients and
+        hashes of one stencil node of all particles at a time, see
+        `get_stencil_shapefunction`, and scatter or gather them before the
+        next stencil node. No `(num_particles*stencil_size, ...)` arrays are
+        built, neither within a step nor between steps, so the memory of P2G
+        and G2P is `O(num_particles + num_nodes)`. The shape functions are
+        evaluated once in P2G and once in G2P.
+
+        `SparseNodes` are activated from the base cells of the particles, see
+        `Nodes.activate_cells`. Forces that read the interactions
+        (`uses_interactions`, e.g., `NodeLevelSet`) still get the interactions
+        of the step calculated for them, and only then are the base cells of
+        `incremental` shape functions tracked. Only `USL` and `USL_Implicit`
+        support fused shape functions.
+
+        Returns:
+            ShapeFunction: Shape functions without interaction arrays.
+        """
+        return self.replace(
+            intr_id_stack=jnp.zeros(0, dtype=jnp.int32),
+            intr_hash_stack=jnp.zeros(0, dtype=jnp.int32),
+            intr_shapef_stack=jnp.zeros(0, dtype=jnp.float32),
+            intr_shapef_grad_stack=jnp.zeros((0, 3), dtype=jnp.float32),
+        )
+
+    def is_fused(self: Self) -> bool:
+        """Check if the interaction arrays are dropped between steps, see `fuse`."""
+        return self.intr_hash_stack.shape[0] == 0
+
+    def incremental(
+        self: Self, num_particles: jnp.int32, max_cell_changes: int = None
+    ) -> Self:
+        """Track the base cell of each particle between steps.
+
+        Each step, `update_shapefunction` counts the particles whose base cell
+        changed (`num_cell_changes`, e.g., output with `run_solver`). The
+        interaction hashes of the previous step are reused for the particles
+        that stayed in their cell, and are only recalculated for up to
+        `max_cell_changes` particles that changed their cell. Shape functions
+        and gradients are calculated from the base cells, without hashing.
+
+        Args:
+            num_particles: Number of particles.
+            max_cell_changes (optional): Number of particles whose hashes are
+                recalculated per step. If more particles change their cell,
+                the hashes of all particles are recalculated. Defaults to a
+                quarter of the particles.
+
+        Returns:
+            ShapeFunction: Shape functions with base cell tracking. All
+            particles are counted as changed in the first step.
+        """
+        dim = self.stencil.shape[1]
+
+        if max_cell_changes is None:
+            max_cell_changes = max(num_particles // 4, 1)
+
+        return self.replace(
+            base_cell_stack=jnp.full(
+                (num_particles, dim), jnp.iinfo(jnp.int32).min, dtype=jnp.int32
+            ),
+            cell_id_stack=jnp.arange(num_particles, dtype=jnp.int32),
+            num_cell_changes=jnp.int32(0),
+            cell_change_id_stack=jnp.full(
+                max_cell_changes, num_particles, dtype=jnp.int32
+            ),
+        )
+
+    def is_incremental(self: Self) -> bool:
+        """Check if base cells are tracked between steps, see `incremental`."""
+        return self.base_cell_stack is not None
+
+    def get_base_cell_stack(self: Self, rel_pos_stack: chex.Array) -> chex.Array:
+        """Get the cell of each particle that the stencil is placed on.
+
+        Args:
+            rel_pos_stack: Particle positions relative to the grid origin,
+                scaled by the inverse node spacing `(num_particles, dim)`.
+
+        Returns:
+            chex.Array: Base cell indices `(num_particles, dim)`.
+        """
+        return jnp.floor(rel_pos_stack).astype(jnp.int32)
+
+    def get_intr_hash_stack(
+        self: Self, base_cell_stack: chex.Array, grid_size: chex.Array
+    ) -> chex.Array:
+        """Get the interaction hashes of particles from their base cells.
+
+        Gives the same hashes as `vmap_intr`, including the out-of-range hash
+        of stencil nodes outside the grid.
+
+        Args:
+            base_cell_stack: Base cell indices `(num_particles, dim)`, see
+                `get_base_cell_stack`.
+            grid_size: Grid size about each axis `(dim,)`.
+
+        Returns:
+            chex.Array: Interaction hashes `(num_particles*stencil_size,)`.
+        """
+        intr_n_pos_stack = base_cell_stack[:, None, :] + self.stencil.astype(
+            jnp.int32
+        )
+
+        return get_node_hash_stack(intr_n_pos_stack, grid_size).reshape(-1)
+
+    def get_intr_shapef_stack(
+        self: Self,
+        rel_pos_stack: chex.Array,
+        base_cell_stack: chex.Array,
+        inv_node_spacing: jnp.float32,
+        grid_size: chex.Array,
+    ) -> Tuple[chex.Array, chex.Array, chex.Array]:
+        """Get the shape functions of particles from their base cells.
+
+        Gives the same shape functions and gradients as
+        `calculate_shapefunction`, without calculating interaction hashes.
+
+        Args:
+            rel_pos_stack: Particle positions relative to the grid origin,
+                scaled by the inverse node spacing `(num_particles, dim)`.
+            base_cell_stack: Base cell indices `(num_particles, dim)`, see
+                `get_base_cell_stack`.
+            inv_node_spacing: Inverse of the node spacing.
+            grid_size: Grid size about each axis `(dim,)`.
+
+        Returns:
+            Tuple:
+                - Shape functions `(num_particles*stencil_size,)`
+                - Shape function gradients `(num_particles*stencil_size, 3)`
+                - Interaction distances `(num_particles*stencil_size, dim)`
+        """
+        raise NotImplementedError
+
+    def update_shapefunction(
+        self: Self,
+        origin: chex.Array,
+        inv_node_spacing: jnp.float32,
+        grid_size: chex.Array,
+        position_stack: chex.Array,
+        species_stack: chex.Array,
+        id_stack: chex.Array = None,
+    ) -> Tuple[Self, chex.Array]:
+        """Calculate shape functions of a step, see `calculate_shapefunction`.
+
+        Incremental shape functions (see `incremental`) count the particles
+        that changed their base cell. The interaction hashes of the other
+        particles are taken from the previous step, and only those of the
+        changed particles are recalculated, see `get_intr_hash_stack`. Shape
+        functions and gradients are calculated from the base cells, see
+        `get_intr_shapef_stack`.
+
+        Args:
+            origin: Grid origin `(dim,)`.
+            inv_node_spacing: Inverse of the node spacing.
+            grid_size: Grid size about each axis `(dim,)`.
+            position_stack: Particle coordinates `(num_particles, dim)`.
+            species_stack: Node types.
+            id_stack (optional): Particle ids, e.g., `particles.id_stack`,
+                to compare the cells of sorted particles. Defaults to the
+                stack order.
+
+        Returns:
+            Tuple:
+                - Updated shape function state
+                - Interaction distances
+        """
+        if not self.is_incremental():
+            return self.calculate_shapefunction(
+                origin=origin,
+                inv_node_spacing=inv_node_spacing,
+                grid_size=grid_size,
+                position_stack=position_stack,
+                species_stack=species_stack,
+            )
+
+        num_particles, dim = position_stack.shape
+
+        stencil_size = self.stencil.shape[0]
+
+        max_cell_changes = self.cell_change_id_stack.shape[0]
+
+        if id_stack is None:
+            id_stack = jnp.arange(num_particles)
+
+        rel_pos_stack = (position_stack - origin) * inv_node_spacing
+
+        base_cell_stack = self.get_base_cell_stack(rel_pos_stack)
+
+        # Base cells and hashes of the previous step in the current particle
+        # order, gathered in one array so that rows of duplicate ids match
+        prev_stack = self.base_cell_stack
+
+        if not self.is_fused():
+            prev_stack = jnp.concatenate(
+                [prev_stack, self.intr_hash_stack.reshape(num_particles, -1)], axis=1
+            )
+
+        def reorder(prev_stack):
+            fill_value = jnp.iinfo(jnp.int32).min
+            return (
+                jnp.full_like(prev_stack, fill_value)
+                .at[self.cell_id_stack]
+                .set(prev_stack, mode="drop")
+                .at[id_stack]
+                .get(mode="fill", fill_value=fill_value)
+            )
+
+        # Only reordered if the particles were sorted since the previous step
+        prev_stack = jax.lax.cond(
+            jnp.all(id_stack == self.cell_id_stack),
+            lambda prev_stack: prev_stack,
+            reorder,
+            prev_stack,
+        )
+
+        is_changed_stack = jnp.any(base_cell_stack != prev_stack[:, :dim], axis=1)
+
+        num_cell_changes = jnp.sum(is_changed_stack).astype(jnp.int32)
+
+        cell_change_id_stack = jnp.nonzero(
+            is_changed_stack, size=max_cell_changes, fill_value=num_particles
+        )[0].astype(jnp.int32)
+
+        def get_all_hash_stack(prev_hash_stack):
+            return self.get_intr_hash_stack(base_cell_stack, grid_size).reshape(
+                num_particles, stencil_size
+            )
+
+        def get_changed_hash_stack(prev_hash_stack):
+            # Hashes only depend on the base cell, so they are recalculated for
+            # the compacted changed particles and scattered into the previous
+            change_hash_stack = self.get_intr_hash_stack(
+                base_cell_stack.at[cell_change_id_stack].get(
+                    mode="fill", fill_value=0
+                ),
+                grid_size,
+            )
+            return prev_hash_stack.at[cell_change_id_stack].set(
+                change_hash_stack.reshape(max_cell_changes, stencil_size),
+                mode="drop",
+            )
+
+        if self.is_fused():
+            # No hashes are kept between steps
+            intr_hash_stack = get_all_hash_stack(None)
+        else:
+            intr_hash_stack = jax.lax.cond(
+                num_cell_changes > max_cell_changes,
+                get_all_hash_stack,
+                get_changed_hash_stack,
+                prev_stack[:, dim:],
+            )
+
+        intr_shapef_stack, intr_shapef_grad_stack, intr_dist_stack = (
+            self.get_intr_shapef_stack(
+                rel_pos_stack, base_cell_stack, inv_node_spacing, grid_size
+            )
+        )
+
+        intr_dist_3d_stack = jnp.pad(
+            intr_dist_stack,
+            [(0, 0), (0, 3 - dim)],
+            mode="constant",
+            constant_values=0,
+        )
+
+        return self.replace(
+            intr_shapef_stack=intr_shapef_stack,
+            intr_shapef_grad_stack=intr_shapef_grad_stack,
+            intr_id_stack=jnp.arange(num_particles * stencil_size).astype(jnp.int32),
+            intr_hash_stack=intr_hash_stack.reshape(-1),
+            base_cell_stack=base_cell_stack,
+            cell_id_stack=id_stack.astype(jnp.int32),
+            num_cell_changes=num_cell_changes,
+            cell_change_id_stack=cell_change_id_stack,
+        ), intr_dist_3d_stack
+
+    def get_next_step(
+        self: Self, shapefunctions_calc: Self, is_fused: bool
+    ) -> Self:
+        """Get the shape functions passed on to the next step of a solver.
+
+        Args:
+            self: Shape functions used in the step, e.g., after `Nodes.activate`.
+            shapefunctions_calc: Shape functions as calculated in the step,
+                before the nodes remapped the interaction hashes.
+            is_fused: Whether the shape functions passed into the step were
+                fused, see `fuse`.
+
+        Returns:
+            ShapeFunction: Fused shape functions if `is_fused`, the calculated
+            interactions to be reused if incremental, or else `self`.
+        """
+        if is_fused:
+            return self.fuse()
+
+        if self.is_incremental():
+            return shapefunctions_calc
+
+        return self
+
+    def get_axis_basis(
+        self: Self,
+        axis_dist_stack: chex.Array,
+        axis_n_pos_stack: chex.Array,
+        inv_node_spacing: jnp.float32,
+        axis_grid_size: chex.Array,
+    ) -> Tuple[chex.Array, chex.Array]:
+        """Evaluate the 1D basis and its derivative about each axis elementwise.
+
+        Args:
+            axis_dist_stack: Particle-node distances about each axis, scaled
+                by the inverse node spacing. Any shape.
+            axis_n_pos_stack: Grid indices of the nodes about each axis, same
+                shape as `axis_dist_stack`.
+            inv_node_spacing: Inverse of the node spacing.
+            axis_grid_size: Grid size about the axis of each entry,
+                broadcastable to `axis_dist_stack`.
+
+        Returns:
+            Tuple: Basis and derivative, of the same shape as
+            `axis_dist_stack`.
+        """
+        raise NotImplementedError
+
+    def get_stencil_shapefunction(
+        self: Self,
+        rel_pos_stack: chex.Array,
+        base_cell_stack: chex.Array,
+        stencil_id: jnp.int32,
+        inv_node_spacing: jnp.float32,
+        grid_size: chex.Array,
+    ) -> Tuple[chex.Array, chex.Array, chex.Array]:
+        """Calculate the shape functions of one stencil node of each particle.
+
+        Used by fused solver kernels, which loop over the stencil nodes, see
+        `fuse`. Gives the same shape functions and gradients as
+        `calculate_shapefunction`. Nodes outside the grid get zero weight and
+        the out-of-range hash.
+
+        Args:
+            rel_pos_stack: Particle positions relative to the grid origin,
+                scaled by the inverse node spacing `(num_particles, dim)`.
+            base_cell_stack: Base cell indices `(num_particles, dim)`, see
+                `get_base_cell_stack`.
+            stencil_id: Index of the stencil node.
+            inv_node_spacing: Inverse of the node spacing.
+            grid_size: Grid size about each axis `(dim,)`.
+
+        Returns:
+            Tuple: Shape functions `(num_particles,)`, gradients
+            `(num_particles, 3)` and node hashes `(num_particles,)`.
+        """
+        dim = self.stencil.shape[1]
+
+        n_pos_stack = base_cell_stack + self.stencil.astype(jnp.int32)[stencil_id]
+
+        grid_size = jnp.asarray(grid_size)[:dim]
+
+        is_on_grid_stack = (n_pos_stack >= 0) & (n_pos_stack < grid_size)
+
+        basis_stack, dbasis_stack = self.get_axis_basis(
+            rel_pos_stack - n_pos_stack, n_pos_stack, inv_node_spacing, grid_size
+        )
+        basis_stack = jnp.where(is_on_grid_stack, basis_stack, 0.0)
+        dbasis_stack = jnp.where(is_on_grid_stack, dbasis_stack, 0.0)
+
+        basis = [basis_stack[:, axis] for axis in range(dim)]
+        dbasis = [dbasis_stack[:, axis] for axis in range(dim)]
+        zeros = jnp.zeros_like(basis[0])
+
+        if dim == 2:
+            shapef_grad_stack = jnp.stack(
+                [dbasis[0] * basis[1], dbasis[1] * basis[0], zeros], axis=-1
+            )
+        elif dim == 3:
+            shapef_grad_stack = jnp.stack(
+                [
+                    dbasis[0] * basis[1] * basis[2],
+                    dbasis[1] * basis[0] * basis[2],
+                    dbasis[2] * basis[0] * basis[1],
+                ],
+                axis=-1,
+            )
+        else:
+            shapef_grad_stack = jnp.stack([dbasis[0], zeros, zeros], axis=-1)
+
+        return (
+            jnp.prod(basis_stack, axis=1),
+            shapef_grad_stack,
+            get_node_hash_stack(n_pos_stack, grid_size),
+        )
+
+    def deactivate_particles(
+        self: Self, active_mask_stack: chex.Array, num_nodes: int
+    ) -> Self:
+        """Map interactions of inactive particles to the out-of-range node.
+
+        Interactions with node id `num_nodes` are dropped when summing to the
+        nodes, so inactive particles do not contribute to the grid.
+
+        Args:
+            active_mask_stack: Active particles `(num_particles,)`, or `None`
+                if all particles are active.
+            num_nodes: Number of nodes on the grid.
+
+        Returns:
+            ShapeFunction: Updated shape functions.
+        """
+        if active_mask_stack is None:
+            return self
+
+        stencil_size = self.stencil.shape[0]
+
+        return self.replace(
+            intr_hash_stack=jnp.where(
+                jnp.repeat(active_mask_stack, stencil_size),
+                self.intr_hash_stack,
+                num_nodes,
+            ).astype(jnp.int32)
+        )
+
+    def p2g_scatter_add(
+        self: Self,
+        num_nodes: int,
+        intr_mass_stack: chex.Array,
+        intr_moment_stack: chex.Array,
+        intr_force_stack: chex.Array,
+    ) -> Tuple[chex.Array, chex.Array, chex.Array]:
+        """Sum interaction masses, moments and forces to the nodes.
+
+        Each quantity is summed with its own unsorted scatter-add.
+
+        Args:
+            num_nodes: Number of nodes on the grid.
+            intr_mass_stack: Scaled interaction masses `(num_interactions,)`.
+            intr_moment_stack: Scaled interaction moments `(num_interactions, dim)`.
+            intr_force_stack: Scaled interaction forces `(num_interactions, dim)`.
+
+        Returns:
+            Tuple: Nodal masses, moments and forces.
+        """
+        dim = intr_moment_stack.shape[1]
+
+        nodes_mass_stack = (
+            jnp.zeros(num_nodes).at[self.intr_hash_stack].add(intr_mass_stack)
+        )
+        nodes_moment_stack = (
+            jnp.zeros((num_nodes, dim))
+            .at[self.intr_hash_stack]
+            .add(intr_moment_stack)
+        )
+        nodes_force_stack = (
+            jnp.zeros((num_nodes, dim)).at[self.intr_hash_stack].add(intr_force_stack)
+        )
+        return nodes_mass_stack, nodes_moment_stack, nodes_force_stack
+
+    def p2g_segment_sum(
+        self: Self,
+        num_nodes: int,
+        intr_mass_stack: chex.Array,
+        intr_moment_stack: chex.Array,
+        intr_force_stack: chex.Array,
+    ) -> Tuple[chex.Array, chex.Array, chex.Array]:
+        """Sum interaction masses, moments and forces to the nodes.
+
+        Interactions are sorted by hash once, and all quantities are packed
+        into a single `(num_interactions, 1 + 2 * dim)` array which is reduced
+        by one sorted segment sum.
+
+        See `ShapeFunction.p2g_scatter_add` for arguments.
+        """
+        dim = intr_moment_stack.shape[1]
+
+        sort_id_stack = jnp.argsort(self.intr_hash_stack)
+
+        intr_packed_stack = jnp.concatenate(
+            [intr_mass_stack.reshape(-1, 1), intr_moment_stack, intr_force_stack],
+            axis=1,
+        )
+
+        nodes_packed_stack = jax.ops.segment_sum(
+            intr_packed_stack.at[sort_id_stack].get(),
+            self.intr_hash_stack.at[sort_id_stack].get(),
+            num_segments=num_nodes,
+            indices_are_sorted=True,
+        )
+
+        return (
+            nodes_packed_stack[:, 0],
+            nodes_packed_stack[:, 1 : 1 + dim],
+            nodes_packed_stack[:, 1 + dim :],
+        )
+
     def distributed(self: Self, device: Sharding):    
 
         intr_hash_stack = jax.device_put(self.intr_hash_stack,device)
@@ -1,5 +1,6 @@
 """Module to run solver and store its state."""
 
+import math
 from functools import partial
 from typing import Callable, List, Tuple
 
@@ -7,17 +8,92 @@ import chex
 import jax
 import jax.experimental
 import jax.numpy as jnp
+import numpy as np
+from jax.experimental.shard_map import shard_map
+from jax.sharding import Mesh
+from jax.sharding import PartitionSpec as P
 
 from ..forces.forces import Forces
 from ..materials.material import Material
 from ..nodes.nodes import Nodes
+from ..nodes.sparsenodes import SparseNodes
 from ..particles.particles import Particles
 from ..shapefunctions.shapefunctions import ShapeFunction
-from ..utils.jax_helpers import scan_kth
+from ..utils.jax_helpers import (
+    get_particle_partition_spec,
+    is_sorted_particle_stack,
+    scan_kth,
+    unsort_particle_stack,
+)
+from ..utils.output_helpers import get_output_frame, OutputSpec, OutputWriter
 from .solver import Solver
+from .termination import Termination
 
 
-@partial(jax.jit, static_argnums=(6, 7, 8, 9, 10, 11))
+def get_outputs(
+    particles: Particles,
+    nodes: Nodes,
+    shapefunctions: ShapeFunction,
+    material_stack: List[Material],
+    forces_stack: List[Forces],
+    particles_output: Tuple[str],
+    nodes_output: Tuple[str],
+    materials_output: Tuple[str],
+    forces_output: Tuple[str],
+    shapefunctions_output: Tuple[str],
+    id_stack: chex.Array = None,
+) -> List[chex.Array]:
+    """Get the selected outputs of the solver state, see `run_solver`.
+
+    If the particles are sorted (see `Solver.sort_particles`), `id_stack`
+    holds their original ids, and per-particle outputs are restored to the
+    original order, see `is_sorted_particle_stack`.
+    """
+
+    def get_particle_stack(obj, key):
+        stack = obj.get(key)
+        if id_stack is not None and is_sorted_particle_stack(obj, key):
+            return unsort_particle_stack(stack, id_stack)
+        return stack
+
+    accumulate = []
+
+    for key in particles_output:
+        accumulate.append(get_particle_stack(particles, key))
+
+    for key in nodes_output:
+        accumulate.append(nodes.get(key))
+
+    for key in materials_output:
+        for material in material_stack:
+            if key in material:
+                accumulate.append(get_particle_stack(material, key))
+
+    for key in forces_output:
+        for force in forces_stack:
+            if key in force:
+                accumulate.append(force.get(key))
+
+    for key in shapefunctions_output:
+        accumulate.append(getattr(shapefunctions, key))
+
+    return accumulate
+
+
+def cast_to_update(update_fn: Callable, carry):
+    """Cast a state to the (non weak) types of its update.
+
+    Loop carries must keep their types, e.g., in a `while_loop`, but initial
+    states are often created with weakly typed Python scalars.
+    """
+    carry_shape = jax.eval_shape(update_fn, carry)
+
+    return jax.tree_util.tree_map(
+        lambda stack, shape: jnp.asarray(stack, dtype=shape.dtype), carry, carry_shape
+    )
+
+
+@partial(jax.jit, static_argnums=(6, 7, 8, 9, 10, 11, 12))
 def run_solver(
     solver: Solver,
     particles: Particles,
@@ -31,6 +107,7 @@ def run_solver(
     nodes_output: Tuple[str] = None,
     materials_output: Tuple[str] = None,
     forces_output: Tuple[str] = None,
+    shapefunctions_output: Tuple[str] = None,
 ) -> Tuple[
     Tuple[Particles, Nodes, ShapeFunction, List[Material], List[Forces]],
     Tuple[Solver, chex.Array],
@@ -59,9 +136,53 @@ def run_solver(
             e.g., `eps_e_stack`. Defaults to None.
         forces_output: Force properties to output.
             Defaults to None.
+        shapefunctions_output: Shape function entries to output e.g.,
+            `num_cell_changes` of incremental shape functions, see
+            `ShapeFunction.incremental`. Defaults to None.
 
     Returns:
         Tuple: Updated state, and output data.
+
+    If the solver sorts particles by cell (see `Solver.sort_particles`),
+    per-particle outputs are stored in the original `particles.id_stack` order.
+    """
+    return scan_solver(
+        solver,
+        particles,
+        nodes,
+        shapefunctions,
+        material_stack,
+        forces_stack,
+        num_steps,
+        store_every,
+        particles_output,
+        nodes_output,
+        materials_output,
+        forces_output,
+        shapefunctions_output,
+    )
+
+
+def scan_solver(
+    solver: Solver,
+    particles: Particles,
+    nodes: Nodes,
+    shapefunctions: ShapeFunction,
+    material_stack: List[Material],
+    forces_stack: List[Forces] = None,
+    num_steps: jnp.int32 = 1,
+    store_every: jnp.int32 = 1,
+    particles_output: Tuple[str] = None,
+    nodes_output: Tuple[str] = None,
+    materials_output: Tuple[str] = None,
+    forces_output: Tuple[str] = None,
+    shapefunctions_output: Tuple[str] = None,
+    axis_name: str = None,
+):
+    """Scan solver updates and accumulate outputs, see `run_solver`.
+
+    If `axis_name` is given, this runs on particles local to one device of the
+    mapped axis, see `run_solver_sharded`.
     """
     if forces_stack is None:
         forces_stack = []
@@ -78,6 +199,9 @@ def run_solver(
     if forces_output is None:
         forces_output = ()
 
+    if shapefunctions_output is None:
+        shapefunctions_output = ()
+
     def scan_fn(carry, control):
         step, solver, particles, nodes, shapefunctions, material_stack, forces_stack = (
             carry
@@ -85,11 +209,29 @@ def run_solver(
 
         solver, particles, nodes, shapefunctions, material_stack, forces_stack = (
             solver.update(
-                particles, nodes, shapefunctions, material_stack, forces_stack
+                particles,
+                nodes,
+                shapefunctions,
+                material_stack,
+                forces_stack,
+                step,
+                axis_name=axis_name,
             )
         )
         # jax.debug.print("step {} ",step)
 
+        is_sorted = solver.sort_every is not None
+
+        id_stack = None
+        if is_sorted:
+            id_stack = particles.id_stack
+
+            # ids are global, particles of each device start at an offset
+            if axis_name is not None:
+                id_stack = id_stack - (
+                    jax.lax.axis_index(axis_name) * particles.id_stack.shape[0]
+                )
+
         carry = (
             step+1,
             solver,
@@ -100,23 +242,19 @@ def run_solver(
             forces_stack,
         )
 
-        accumulate = []
-
-        for key in particles_output:
-            accumulate.append(particles.get(key))
-
-        for key in nodes_output:
-            accumulate.append(nodes.get(key))
-
-        for key in materials_output:
-            for material in material_stack:
-                if key in material:
-                    accumulate.append(material.get(key))
-
-        for key in forces_output:
-            for force in forces_stack:
-                if key in force:
-                    accumulate.append(force.get(key))
+        accumulate = get_outputs(
+            particles,
+            nodes,
+            shapefunctions,
+            material_stack,
+            forces_stack,
+            particles_output,
+            nodes_output,
+            materials_output,
+            forces_output,
+            shapefunctions_output,
+            id_stack,
+        )
 
         return carry, accumulate
 
@@ -130,7 +268,672 @@ def run_solver(
         unroll=1,
     )
 
-@partial(jax.jit, static_argnums=(6, 7, 8, 9, 10, 11))
+
+@partial(jax.jit, static_argnums=(6, 7, 9, 10, 11, 12, 13, 14))
+def run_solver_adaptive(
+    solver: Solver,
+    particles: Particles,
+    nodes: Nodes,
+    shapefunctions: ShapeFunction,
+    material_stack: List[Material],
+    forces_stack: List[Forces] = None,
+    total_time: float = 1.0,
+    store_interval: float = None,
+    cfl: jnp.float32 = 0.5,
+    particles_output: Tuple[str] = None,
+    nodes_output: Tuple[str] = None,
+    materials_output: Tuple[str] = None,
+    forces_output: Tuple[str] = None,
+    shapefunctions_output: Tuple[str] = None,
+    callback: Callable = None,
+) -> Tuple[
+    Tuple[
+        jnp.int32,
+        jnp.float32,
+        Solver,
+        Particles,
+        Nodes,
+        ShapeFunction,
+        List[Material],
+        List[Forces],
+    ],
+    List[chex.Array],
+]:
+    """Run a MPM solver with CFL adaptive time steps up to a simulated time.
+
+    Every step, the time step is the stable time step of the current state
+    (see `Solver.get_stable_dt`), at most the time step the solver was
+    created with. Steps are taken in a `while_loop` until the next output
+    time, and the last step before it is shortened to end on it, so outputs
+    are stored at fixed intervals of simulated time.
+
+    All materials must provide a wave speed, see
+    `Material.get_wave_speed_stack`.
+
+    Args:
+        total_time: Simulated time to run. Defaults to 1.0.
+        store_interval: Simulated time between outputs. Must evenly divide
+            `total_time`. Defaults to `total_time`.
+        cfl: Courant number. Defaults to 0.5.
+        callback: Host function called with the full state and the time
+            after each output interval, as in `run_solver_io`.
+
+    See `run_solver` for the remaining arguments.
+
+    Returns:
+        Tuple: Step count, simulated time and updated state, and the outputs
+        at each output time.
+    """
+    if forces_stack is None:
+        forces_stack = []
+
+    if store_interval is None:
+        store_interval = total_time
+
+    num_frames = round(total_time / store_interval)
+
+    if not math.isclose(num_frames * store_interval, total_time):
+        raise ValueError("store_interval must evenly divide total_time")
+
+    for material in material_stack:
+        if type(material).get_wave_speed_stack is Material.get_wave_speed_stack:
+            raise ValueError(
+                f"{type(material).__name__} does not provide a wave speed for "
+                "the stable time step, see `Material.get_wave_speed_stack`"
+            )
+
+    output_args = (
+        particles_output or (),
+        nodes_output or (),
+        materials_output or (),
+        forces_output or (),
+        shapefunctions_output or (),
+    )
+
+    is_sorted = solver.sort_every is not None
+
+    dt_max = solver.dt
+
+    def step_fn(carry, frame_time):
+        step, time, solver, *state = carry
+
+        particles, nodes, shapefunctions, material_stack, forces_stack = state
+
+        dt = jnp.minimum(
+            solver.get_stable_dt(particles, nodes, material_stack, cfl), dt_max
+        )
+
+        # the last step of an interval ends on the output time
+        is_last = time + dt >= frame_time
+
+        dt = jnp.where(is_last, frame_time - time, dt)
+
+        solver, particles, nodes, shapefunctions, material_stack, forces_stack = (
+            solver.replace(dt=dt).update(
+                particles,
+                nodes,
+                shapefunctions,
+                material_stack,
+                forces_stack,
+                step,
+            )
+        )
+
+        return (
+            step + 1,
+            jnp.where(is_last, frame_time, time + dt),
+            solver,
+            particles,
+            nodes,
+            shapefunctions,
+            material_stack,
+            forces_stack,
+        )
+
+    def scan_fn(carry, frame_time):
+        carry = jax.lax.while_loop(
+            lambda carry: carry[1] < frame_time,
+            partial(step_fn, frame_time=frame_time),
+            carry,
+        )
+
+        _, _, *state = carry
+
+        _, particles, nodes, shapefunctions, material_stack, forces_stack = state
+
+        if callback:
+            jax.debug.callback(callback, tuple(state), frame_time)
+
+        return carry, get_outputs(
+            particles,
+            nodes,
+            shapefunctions,
+            material_stack,
+            forces_stack,
+            *output_args,
+            particles.id_stack if is_sorted else None,
+        )
+
+    carry = (
+        jnp.int32(0),
+        jnp.float32(0.0),
+        solver,
+        particles,
+        nodes,
+        shapefunctions,
+        material_stack,
+        forces_stack,
+    )
+
+    carry = cast_to_update(
+        partial(step_fn, frame_time=jnp.float32(store_interval)), carry
+    )
+
+    frame_time_stack = jnp.arange(1, num_frames + 1) * jnp.float32(store_interval)
+
+    return jax.lax.scan(scan_fn, carry, xs=frame_time_stack)
+
+
+@partial(jax.jit, static_argnums=(6, 8))
+def run_solver_until(
+    solver: Solver,
+    particles: Particles,
+    nodes: Nodes,
+    shapefunctions: ShapeFunction,
+    material_stack: List[Material],
+    forces_stack: List[Forces] = None,
+    num_steps: jnp.int32 = 1,
+    termination: Termination = None,
+    check_every: jnp.int32 = 1,
+) -> Tuple[
+    Tuple[
+        jnp.int32,
+        Solver,
+        Particles,
+        Nodes,
+        ShapeFunction,
+        List[Material],
+        List[Forces],
+    ],
+    Termination,
+]:
+    """Run a MPM solver until a termination criterion is met.
+
+    Steps run in a `while_loop` until `termination` is met (see
+    `Termination`), or `num_steps` steps are done. E.g., a gravity loading
+    phase stops once the particles are at rest. Criteria are checked every
+    `check_every` steps, and the peak kinetic energy is tracked at these
+    steps only.
+
+    Args:
+        num_steps: Maximum number of steps. Defaults to 1.
+        termination: Termination criteria. Defaults to running all steps.
+        check_every: Check the criteria every nth step. Must evenly divide
+            `num_steps`. Defaults to 1.
+
+    See `run_solver` for the remaining arguments.
+
+    Returns:
+        Tuple: Step count reached and updated state, and the termination
+        state with the simulated time.
+    """
+    if forces_stack is None:
+        forces_stack = []
+
+    if termination is None:
+        termination = Termination.create()
+
+    if num_steps % check_every:
+        raise ValueError("check_every must evenly divide num_steps")
+
+    def step_fn(step, carry):
+        solver, *state = carry
+        return solver.update(*state, step)
+
+    def check_fn(carry):
+        step, termination, *state = carry
+
+        state = jax.lax.fori_loop(step, step + check_every, step_fn, tuple(state))
+
+        solver, particles, *_ = state
+
+        step = step + check_every
+
+        termination = termination.update(particles, step * solver.dt)
+
+        return (step, termination, *state)
+
+    def cond_fn(carry):
+        step, termination, _, particles, *_ = carry
+
+        return (step < num_steps) & ~termination.is_done(particles, step)
+
+    carry = cast_to_update(
+        check_fn,
+        (
+            jnp.int32(0),
+            termination,
+            solver,
+            particles,
+            nodes,
+            shapefunctions,
+            material_stack,
+            forces_stack,
+        ),
+    )
+
+    step, termination, *state = jax.lax.while_loop(cond_fn, check_fn, carry)
+
+    return (step, *state), termination
+
+
+def strip_interactions(shapefunctions: ShapeFunction) -> ShapeFunction:
+    """Drop the interaction weights and gradients of the shape functions.
+
+    They are recalculated from the particle positions every step, so they
+    need not be kept, e.g., as residuals for reverse-mode differentiation.
+    See `run_solver_checkpointed`.
+    """
+    return shapefunctions.replace(intr_shapef_stack=None, intr_shapef_grad_stack=None)
+
+
+@partial(jax.jit, static_argnums=(6, 7, 8, 9, 10, 11, 12, 13))
+def run_solver_checkpointed(
+    solver: Solver,
+    particles: Particles,
+    nodes: Nodes,
+    shapefunctions: ShapeFunction,
+    material_stack: List[Material],
+    forces_stack: List[Forces] = None,
+    num_steps: int = 1,
+    checkpoint_every: Tuple[int] = None,
+    particles_output: Tuple[str] = None,
+    nodes_output: Tuple[str] = None,
+    materials_output: Tuple[str] = None,
+    forces_output: Tuple[str] = None,
+    shapefunctions_output: Tuple[str] = None,
+    policy: Callable = None,
+) -> Tuple[
+    Tuple[jnp.int32, Solver, Particles, Nodes, ShapeFunction, List[Material], List],
+    List[chex.Array],
+]:
+    """Run a MPM solver with checkpoints for reverse-mode differentiation.
+
+    Differentiating `run_solver` keeps the state of every step for the
+    backward pass. Here, steps are run in nested blocks of
+    `checkpoint_every` steps, from the outermost to the innermost level, and
+    each block is rematerialized with `jax.checkpoint`. Only the states at
+    the start of each block are kept, and the steps of a block are recomputed
+    in the backward pass. E.g., `checkpoint_every=(100,)` keeps every 100th
+    state (periodic checkpoints), and `checkpoint_every=(1000, 100, 10)`
+    keeps 10 states per level, at the cost of recomputing each step once per
+    level (a multi-level scheme close to binomial checkpoints).
+
+    Interaction weights and gradients of the shape functions are
+    recalculated every step and are not kept at checkpoints (see
+    `strip_interactions`), so the returned shape functions hold none.
+
+    Args:
+        num_steps: Total number of steps to run. Defaults to 1.
+        checkpoint_every: Block sizes from the outermost to the innermost
+            level, each dividing the previous one and `num_steps`. Defaults
+            to `(num_steps,)`.
+        policy: Residuals kept within a step, see `jax.checkpoint_policies`.
+            Defaults to none.
+
+    See `run_solver` for the remaining arguments.
+
+    Returns:
+        Tuple: Updated state, and output data stored at the end of each
+        innermost block.
+    """
+    if forces_stack is None:
+        forces_stack = []
+
+    if checkpoint_every is None:
+        checkpoint_every = (num_steps,)
+
+    block_sizes = (num_steps, *checkpoint_every)
+
+    for size, sub_size in zip(block_sizes[:-1], block_sizes[1:]):
+        if size % sub_size:
+            raise ValueError("checkpoint_every must evenly divide num_steps")
+
+    output_args = (
+        particles_output or (),
+        nodes_output or (),
+        materials_output or (),
+        forces_output or (),
+        shapefunctions_output or (),
+    )
+
+    is_sorted = solver.sort_every is not None
+
+    intr_shapef_stack = shapefunctions.intr_shapef_stack
+    intr_shapef_grad_stack = shapefunctions.intr_shapef_grad_stack
+
+    def restore(carry):
+        step, solver, particles, nodes, shapefunctions, *state = carry
+
+        shapefunctions = shapefunctions.replace(
+            intr_shapef_stack=jnp.zeros_like(intr_shapef_stack),
+            intr_shapef_grad_stack=jnp.zeros_like(intr_shapef_grad_stack),
+        )
+
+        return (step, solver, particles, nodes, shapefunctions, *state)
+
+    def strip(carry):
+        step, solver, particles, nodes, shapefunctions, *state = carry
+
+        shapefunctions = strip_interactions(shapefunctions)
+
+        return (step, solver, particles, nodes, shapefunctions, *state)
+
+    def step_fn(_, carry):
+        step, solver, *state = carry
+
+        return (step + 1, *solver.update(*state, step))
+
+    def run_block(carry, level):
+        if level == len(block_sizes) - 1:
+            carry = jax.lax.fori_loop(0, block_sizes[level], step_fn, carry)
+
+            _, _, particles, nodes, shapefunctions, material_stack, forces_stack = (
+                carry
+            )
+
+            outputs = get_outputs(
+                particles,
+                nodes,
+                shapefunctions,
+                material_stack,
+                forces_stack,
+                *output_args,
+                particles.id_stack if is_sorted else None,
+            )
+
+            return carry, [output[None] for output in outputs]
+
+        @partial(jax.checkpoint, policy=policy)
+        def sub_block(carry):
+            carry, outputs = run_block(restore(carry), level + 1)
+            return strip(carry), outputs
+
+        carry, outputs = jax.lax.scan(
+            lambda carry, _: sub_block(carry),
+            strip(carry),
+            length=block_sizes[level] // block_sizes[level + 1],
+        )
+
+        return restore(carry), [
+            output.reshape(-1, *output.shape[2:]) for output in outputs
+        ]
+
+    carry = (
+        0,
+        solver,
+        particles,
+        nodes,
+        shapefunctions,
+        material_stack,
+        forces_stack,
+    )
+
+    carry = cast_to_update(partial(step_fn, 0), carry)
+
+    return run_block(carry, 0)
+
+
+@partial(jax.jit, static_argnums=(6, 7, 8, 9, 10, 11, 12, 13))
+def run_solver_batched(
+    solver: Solver,
+    particles: Particles,
+    nodes: Nodes,
+    shapefunctions: ShapeFunction,
+    material_stack: List[Material],
+    forces_stack: List[Forces] = None,
+    num_steps: jnp.int32 = 1,
+    store_every: jnp.int32 = 1,
+    particles_output: Tuple[str] = None,
+    nodes_output: Tuple[str] = None,
+    materials_output: Tuple[str] = None,
+    forces_output: Tuple[str] = None,
+    shapefunctions_output: Tuple[str] = None,
+    vectorize: bool = True,
+):
+    """Run a batch of independent MPM solvers in one program.
+
+    Every array of the state has a leading batch axis. See
+    `run_solver_ensemble`.
+    """
+    if forces_stack is None:
+        forces_stack = []
+
+    run = partial(
+        scan_solver,
+        num_steps=num_steps,
+        store_every=store_every,
+        particles_output=particles_output,
+        nodes_output=nodes_output,
+        materials_output=materials_output,
+        forces_output=forces_output,
+        shapefunctions_output=shapefunctions_output,
+    )
+
+    state = (solver, particles, nodes, shapefunctions, material_stack, forces_stack)
+
+    if vectorize:
+        return jax.vmap(run)(*state)
+
+    return jax.lax.map(lambda state: run(*state), state)
+
+
+def run_solver_ensemble(
+    solver: Solver,
+    particles: Particles,
+    nodes: Nodes,
+    shapefunctions: ShapeFunction,
+    material_stack: List[Material],
+    forces_stack: List[Forces] = None,
+    num_steps: int = 1,
+    store_every: int = 1,
+    particles_output: Tuple[str] = None,
+    nodes_output: Tuple[str] = None,
+    materials_output: Tuple[str] = None,
+    forces_output: Tuple[str] = None,
+    shapefunctions_output: Tuple[str] = None,
+    chunk_size: int = None,
+    vectorize: bool = True,
+) -> Tuple[
+    Tuple[Particles, Nodes, ShapeFunction, List[Material], List[Forces]],
+    Tuple[Solver, chex.Array],
+]:
+    """Run an ensemble of independent MPM simulations in one program.
+
+    Every array of the solver, particles, nodes, shape functions, materials
+    and forces has a leading ensemble axis, e.g., stacked from the states of
+    each member with `stack_ensemble`. Members may differ in material
+    parameters and initial conditions, but share the shapes of all arrays.
+    The members are run in one compiled program rather than one launch
+    each. The solver update is vectorized over the members with `vmap`, or
+    with `vectorize=False`, the members are looped over on device with
+    `lax.map`. Vectorizing pays off on accelerators, while on CPU the loop
+    is usually faster.
+
+    With `chunk_size`, at most `chunk_size` members are run at once, in
+    sequential launches of the same compiled program, to bound the device
+    memory. The last chunk is padded with copies of the last member.
+
+    Args:
+        chunk_size: Number of members run at once. Defaults to all.
+        vectorize: Whether to `vmap` over the members. Defaults to True.
+
+    See `run_solver` for the remaining arguments.
+
+    Returns:
+        Tuple: Updated state, and output data, with a leading ensemble axis.
+    """
+    state = (solver, particles, nodes, shapefunctions, material_stack, forces_stack)
+
+    ensemble_size = jax.tree_util.tree_leaves(particles)[0].shape[0]
+
+    if chunk_size is None:
+        chunk_size = ensemble_size
+
+    num_chunks = -(-ensemble_size // chunk_size)
+
+    pad = num_chunks * chunk_size - ensemble_size
+
+    state = jax.tree_util.tree_map(
+        lambda stack: jnp.pad(
+            stack, [(0, pad)] + [(0, 0)] * (stack.ndim - 1), mode="edge"
+        ),
+        state,
+    )
+
+    chunk_outputs = []
+    for chunk_id in range(num_chunks):
+        chunk_state = jax.tree_util.tree_map(
+            lambda stack: stack[chunk_id * chunk_size : (chunk_id + 1) * chunk_size],
+            state,
+        )
+
+        chunk_outputs.append(
+            run_solver_batched(
+                *chunk_state,
+                num_steps,
+                store_every,
+                particles_output,
+                nodes_output,
+                materials_output,
+                forces_output,
+                shapefunctions_output,
+                vectorize,
+            )
+        )
+
+    return jax.tree_util.tree_map(
+        lambda *stacks: jnp.concatenate(stacks)[:ensemble_size], *chunk_outputs
+    )
+
+
+@partial(jax.jit, static_argnums=(6, 7, 8, 9, 10, 11, 12))
+def run_solver_sharded(
+    solver: Solver,
+    particles: Particles,
+    nodes: Nodes,
+    shapefunctions: ShapeFunction,
+    material_stack: List[Material],
+    forces_stack: List[Forces] = None,
+    num_steps: jnp.int32 = 1,
+    store_every: jnp.int32 = 1,
+    particles_output: Tuple[str] = None,
+    nodes_output: Tuple[str] = None,
+    materials_output: Tuple[str] = None,
+    forces_output: Tuple[str] = None,
+    mesh: Mesh = None,
+) -> Tuple[
+    Tuple[Particles, Nodes, ShapeFunction, List[Material], List[Forces]],
+    Tuple[Solver, chex.Array],
+]:
+    """Run a MPM solver with particles split over multiple devices.
+
+    Per-particle arrays of the particles, shape functions, materials and
+    solver are split over the first axis of `mesh` with `shard_map`. Nodes
+    and forces are replicated. Each step, every device does P2G of its own
+    particles, the nodes are summed over devices (see `Nodes.psum`), and
+    every device applies forces, G2P and the constitutive update of its own
+    particles.
+
+    On CPU, multiple devices can be emulated with
+    `XLA_FLAGS=--xla_force_host_platform_device_count=8`.
+
+    Args:
+        mesh: One dimensional device mesh. Defaults to all devices.
+
+    See `run_solver` for the remaining arguments.
+
+    Returns:
+        Tuple: Updated state, and output data.
+
+    Forces computed from particle-node interactions, e.g., `NodeLevelSet`,
+    only see particles of the same device. `SparseNodes` are not supported,
+    since their block tables differ between devices.
+    """
+    if mesh is None:
+        mesh = Mesh(np.array(jax.devices()), ("particles",))
+
+    axis_name = mesh.axis_names[0]
+
+    num_particles = particles.position_stack.shape[0]
+
+    if num_particles % mesh.size != 0:
+        raise ValueError("Number of particles must be divisible by number of devices")
+
+    if isinstance(nodes, SparseNodes):
+        raise ValueError("SparseNodes are not supported")
+
+    if forces_stack is None:
+        forces_stack = []
+
+    def get_spec(obj):
+        return get_particle_partition_spec(obj, num_particles, axis_name)
+
+    def get_output_spec(stack):
+        if stack.ndim > 0 and stack.shape[0] % num_particles == 0:
+            return P(None, axis_name)
+        return P()
+
+    output_specs = []
+
+    for key in particles_output or ():
+        output_specs.append(get_output_spec(particles.get(key)))
+
+    for key in nodes_output or ():
+        output_specs.append(P())
+
+    for key in materials_output or ():
+        for material in material_stack:
+            if key in material:
+                output_specs.append(get_output_spec(material.get(key)))
+
+    for key in forces_output or ():
+        for force in forces_stack:
+            if key in force:
+                output_specs.append(P())
+
+    state_specs = (
+        get_spec(solver),
+        get_spec(particles),
+        P(),
+        get_spec(shapefunctions),
+        [get_spec(material) for material in material_stack],
+        P(),
+    )
+
+    sharded_scan_solver = shard_map(
+        partial(
+            scan_solver,
+            num_steps=num_steps,
+            store_every=store_every,
+            particles_output=particles_output,
+            nodes_output=nodes_output,
+            materials_output=materials_output,
+            forces_output=forces_output,
+            axis_name=axis_name,
+        ),
+        mesh=mesh,
+        in_specs=state_specs,
+        out_specs=((P(), *state_specs), output_specs),
+        check_rep=False,
+    )
+
+    return sharded_scan_solver(
+        solver, particles, nodes, shapefunctions, material_stack, forces_stack
+    )
+
+
+@partial(jax.jit, static_argnums=(6, 7, 8, 9, 10, 11, 12, 13))
 def run_solver_io(
     solver: Solver,
     particles: Particles,
@@ -145,11 +948,38 @@ def run_solver_io(
     nodes_output: Tuple[str] = None,
     materials_output: Tuple[str] = None,
     forces_output: Tuple[str] = None,
+    output_writer: OutputWriter = None,
+    start_step: jnp.int32 = 0,
 ) -> Tuple[
     Tuple[Particles, Nodes, ShapeFunction, List[Material], List[Forces]],
     Tuple[Solver, chex.Array],
 ]:
-        
+    """Run a MPM solver and pass its state to the host every `store_every` steps.
+
+    Args:
+        callback: Host function called with the full state and the step.
+        output_writer: Streams the selected outputs to disk instead of
+            keeping them in device memory, see `OutputWriter`. Frames are
+            keyed as in `get_output_frame`.
+        start_step: Step of the initial state, e.g., when resuming from a
+            checkpoint, see `CheckpointManager`. Defaults to 0.
+
+    See `run_solver` for the remaining arguments.
+
+    Returns:
+        Tuple: Updated state.
+    """
+    if forces_stack is None:
+        forces_stack = []
+
+    output_kwargs = dict(
+        particles_output=particles_output or (),
+        nodes_output=nodes_output or (),
+        materials_output=materials_output or (),
+        forces_output=forces_output or (),
+        is_sorted=solver.sort_every is not None,
+    )
+
     def main_loop(step,carry):
         solver, particles, nodes, shapefunctions, material_stack, forces_stack = (
             carry
@@ -192,10 +1022,20 @@ def run_solver_io(
 
         if callback:
             jax.debug.callback(callback,carry,step_next)
+
+        if output_writer is not None:
+            jax.debug.callback(
+                output_writer,
+                get_output_frame(
+                    particles, nodes, material_stack, forces_stack, **output_kwargs
+                ),
+                step_next,
+                ordered=True,
+            )
         
         return carry,[]
     
-    xs = jnp.arange(0,num_steps,store_every).astype(jnp.int32)
+    xs = (jnp.arange(0,num_steps,store_every) + start_step).astype(jnp.int32)
     
     carry,accumulate = jax.lax.scan(
         scan_fn,
@@ -204,4 +1044,120 @@ def run_solver_io(
         unroll=1
     )
     
-    return carry
\ No newline at end of file
+    return carry
+
+@partial(jax.jit, static_argnums=(2, 4))
+def run_solver_frame(
+    carry: Tuple,
+    step: jnp.int32,
+    store_every: int,
+    output_spec: OutputSpec,
+    is_sorted: bool,
+):
+    """Run `store_every` solver steps and get the outputs of the last one.
+
+    Args:
+        carry: Solver, particles, nodes, shape functions, materials and forces.
+        step: Step to start from.
+        store_every: Number of steps.
+        output_spec: Outputs to get, see `OutputSpec`.
+        is_sorted: Whether the solver sorts particles.
+
+    Returns:
+        Tuple: Updated carry, and the frame of outputs.
+    """
+
+    def main_loop(step, carry):
+        solver, *state = carry
+        return solver.update(*state, step)
+
+    carry = jax.lax.fori_loop(step, step + store_every, main_loop, carry)
+
+    _, particles, nodes, _, material_stack, forces_stack = carry
+
+    return carry, output_spec.get_frame(
+        particles, nodes, material_stack, forces_stack, is_sorted=is_sorted
+    )
+
+
+def run_solver_stream(
+    solver: Solver,
+    particles: Particles,
+    nodes: Nodes,
+    shapefunctions: ShapeFunction,
+    material_stack: List[Material],
+    forces_stack: List[Forces] = None,
+    num_steps: int = 1,
+    store_every: int = 1,
+    output_spec: OutputSpec = None,
+    callback: Callable = None,
+) -> Tuple[Solver, Particles, Nodes, ShapeFunction, List[Material], List[Forces]]:
+    """Run a MPM solver and transfer selected outputs to the host asynchronously.
+
+    Unlike `run_solver_io`, the loop over stored frames runs in Python and
+    each frame of `store_every` steps is dispatched asynchronously. While the
+    device computes frame `i`, frame `i - 1` is copied to the host and passed
+    to `callback` (double buffering), so the device keeps stepping while the
+    host serializes. Only the outputs in `output_spec` are transferred.
+
+    Args:
+        output_spec: Outputs to transfer, their data types and particle
+            subset, see `OutputSpec`. Defaults to no outputs.
+        callback: Host function called with each frame, a dictionary of
+            numpy arrays keyed as in `get_output_frame`, and the step,
+            e.g., `OutputWriter`.
+
+    See `run_solver` for the remaining arguments.
+
+    Returns:
+        Tuple: Updated state.
+    """
+    if forces_stack is None:
+        forces_stack = []
+
+    if output_spec is None:
+        output_spec = OutputSpec.create()
+
+    num_frames, rem = divmod(num_steps, store_every)
+
+    if rem:
+        raise ValueError("store_every must evenly divide num_steps")
+
+    is_sorted = solver.sort_every is not None
+
+    def consume(frame, step):
+        if callback is not None:
+            callback({key: np.asarray(stack) for key, stack in frame.items()}, step)
+
+    carry = (solver, particles, nodes, shapefunctions, material_stack, forces_stack)
+
+    # Cast the initial state to the (non weak) types of the updated state, so
+    # the frame function is only compiled once
+    carry = cast_to_update(
+        lambda carry: run_solver_frame(
+            carry, jnp.int32(0), store_every, output_spec, is_sorted
+        )[0],
+        carry,
+    )
+
+    pending = None
+    for frame_id in range(num_frames):
+        step = frame_id * store_every
+
+        carry, frame = run_solver_frame(
+            carry, jnp.int32(step), store_every, output_spec, is_sorted
+        )
+
+        for stack in frame.values():
+            stack.copy_to_host_async()
+
+        # blocks on the previous frame only, the current one is still running
+        if pending is not None:
+            consume(*pending)
+
+        pending = (frame, step + store_every)
+
+    if pending is not None:
+        consume(*pending)
+
+    return carry
@@ -0,0 +1,550 @@
+"""Module to run a solver with the grid split into slabs across devices."""
+
+from functools import partial
+from typing import List, Tuple
+
+import chex
+import jax
+import jax.numpy as jnp
+import numpy as np
+from jax.experimental.shard_map import shard_map
+from jax.sharding import Mesh
+from jax.sharding import PartitionSpec as P
+
+from ..forces.forces import Forces
+from ..materials.material import Material
+from ..nodes.nodes import Nodes
+from ..nodes.slabnodes import SlabNodes
+from ..particles.particles import Particles
+from ..shapefunctions.shapefunctions import ShapeFunction
+from ..utils.jax_helpers import (
+    get_particle_partition_spec,
+    permute_particle_stacks,
+    scan_kth,
+    scatter_particle_stacks,
+    simple_warning,
+)
+from .solver import Solver
+
+
+def park_particles(
+    particles: Particles, park_mask_stack: chex.Array, park_position: chex.Array
+) -> Particles:
+    """Park empty particle slots, e.g., in the middle of a slab.
+
+    Parked particles have zero mass and volume, so they do not contribute
+    to P2G.
+
+    Args:
+        particles: Particles state.
+        park_mask_stack: Slots to park `(num_particles,)`.
+        park_position: Position of parked particles `(dim,)` or
+            `(num_particles, dim)`.
+
+    Returns:
+        Particles: Updated particles state.
+    """
+
+    def park(stack, value):
+        mask = park_mask_stack.reshape(-1, *([1] * (stack.ndim - 1)))
+        return jnp.where(mask, value, stack)
+
+    return particles.replace(
+        position_stack=park(particles.position_stack, park_position),
+        velocity_stack=park(particles.velocity_stack, 0.0),
+        force_stack=park(particles.force_stack, 0.0),
+        mass_stack=park(particles.mass_stack, 0.0),
+        volume_stack=park(particles.volume_stack, 0.0),
+        volume0_stack=park(particles.volume0_stack, 0.0),
+    )
+
+
+def migrate_particles(
+    solver: Solver,
+    particles: Particles,
+    material_stack: List[Material],
+    nodes: SlabNodes,
+    axis_name: str,
+    buffer_size: int,
+) -> Tuple[Solver, Particles, List[Material], jnp.int32]:
+    """Move particles that left the owned region of a slab to its neighbours.
+
+    Up to `buffer_size` particles per direction are sent each call, the rest
+    stay and are sent in a later step. Until then, their stencil nodes beyond
+    the halo are dropped in P2G and read as zero in G2P (see
+    `ShapeFunction.vmap_intr`), and a warning is printed. Received particles
+    are written to empty slots. Empty slots are those with zero mass.
+
+    Args:
+        solver: Solver state.
+        particles: Particles state.
+        material_stack: List of materials with per-particle state.
+        nodes: Nodes of the slab.
+        axis_name: Name of the mapped axis the slabs are split over.
+        buffer_size: Capacity of the send and receive buffers.
+
+    Returns:
+        Tuple: Updated solver, particles, materials and number of received
+        particles dropped due to a lack of empty slots.
+    """
+    num_slabs = jax.lax.psum(1, axis_name)
+
+    if num_slabs == 1:
+        return solver, particles, material_stack, jnp.int32(0)
+
+    num_particles = particles.position_stack.shape[0]
+
+    is_active_stack = particles.mass_stack > 0.0
+
+    position_x_stack = particles.position_stack[:, 0]
+
+    state = (solver, particles, material_stack)
+
+    def send(send_mask_stack, perm):
+        send_id_stack = jnp.nonzero(
+            send_mask_stack, size=buffer_size, fill_value=num_particles
+        )[0]
+
+        buffer = jax.tree_util.tree_map(
+            lambda obj: permute_particle_stacks(obj, send_id_stack, num_particles),
+            state,
+            is_leaf=lambda obj: isinstance(obj, (Solver, Particles, Material)),
+        )
+
+        buffer, is_valid_stack = jax.tree_util.tree_map(
+            lambda x: jax.lax.ppermute(x, axis_name, perm),
+            (buffer, send_id_stack < num_particles),
+        )
+        return send_id_stack, buffer, is_valid_stack
+
+    is_to_lower_stack = is_active_stack & (position_x_stack < nodes.slab_lower)
+    is_to_upper_stack = is_active_stack & (position_x_stack >= nodes.slab_upper)
+
+    to_lower_id_stack, from_upper, is_from_upper_stack = send(
+        is_to_lower_stack,
+        [(i + 1, i) for i in range(num_slabs - 1)],
+    )
+    to_upper_id_stack, from_lower, is_from_lower_stack = send(
+        is_to_upper_stack,
+        [(i, i + 1) for i in range(num_slabs - 1)],
+    )
+
+    is_sent_stack = (
+        jnp.zeros(num_particles, dtype=jnp.bool_)
+        .at[jnp.concatenate([to_lower_id_stack, to_upper_id_stack])]
+        .set(True, mode="drop")
+    )
+
+    simple_warning(
+        jnp.any((is_to_lower_stack | is_to_upper_stack) & ~is_sent_stack),
+        "migrate_particles",
+        "particles wait to be sent with a truncated stencil, increase buffer_size",
+    )
+
+    free_id_stack = jnp.nonzero(
+        ~is_active_stack | is_sent_stack,
+        size=2 * buffer_size,
+        fill_value=num_particles,
+    )[0]
+
+    num_from_lower = jnp.sum(is_from_lower_stack)
+
+    def get_target_id_stack(is_valid_stack, rank_offset):
+        rank_stack = rank_offset + jnp.cumsum(is_valid_stack) - 1
+        return jnp.where(
+            is_valid_stack, free_id_stack.at[rank_stack].get(), num_particles
+        )
+
+    from_lower_id_stack = get_target_id_stack(is_from_lower_stack, 0)
+    from_upper_id_stack = get_target_id_stack(is_from_upper_stack, num_from_lower)
+
+    solver, particles, material_stack = state
+
+    particles = park_particles(
+        particles, is_sent_stack, (nodes.origin + nodes.end) / 2
+    )
+
+    for target_id_stack, received in [
+        (from_lower_id_stack, from_lower),
+        (from_upper_id_stack, from_upper),
+    ]:
+        solver = scatter_particle_stacks(solver, target_id_stack, received[0])
+        particles = scatter_particle_stacks(particles, target_id_stack, received[1])
+        material_stack = [
+            scatter_particle_stacks(material, target_id_stack, material_received)
+            for material, material_received in zip(material_stack, received[2])
+        ]
+
+    num_dropped = jnp.sum(
+        is_from_lower_stack & (from_lower_id_stack == num_particles)
+    ) + jnp.sum(is_from_upper_stack & (from_upper_id_stack == num_particles))
+
+    return solver, particles, material_stack, num_dropped.astype(jnp.int32)
+
+
+@partial(jax.jit, static_argnums=(6, 7, 8, 9, 10, 11))
+def scan_solver_slab(
+    solver: Solver,
+    particles: Particles,
+    nodes: SlabNodes,
+    shapefunctions: ShapeFunction,
+    material_stack: List[Material],
+    forces_stack: List[Forces],
+    num_steps: int,
+    store_every: int,
+    particles_output: Tuple[str],
+    materials_output: Tuple[str],
+    buffer_size: int,
+    mesh: Mesh,
+) -> Tuple[Tuple[Solver, Particles, List[Material], jnp.int32], List[chex.Array]]:
+    """Run the solver on slabs distributed over devices, see `run_solver_slab`.
+
+    Args:
+        solver: Solver with the particle slots of all slabs.
+        particles: Particle slots of all slabs, `particle_capacity` per slab.
+        nodes: Slab nodes stacked along a leading slab axis.
+        shapefunctions: Shape functions of the particle slots.
+        material_stack: Materials with the particle slots of all slabs.
+        forces_stack: List of forces, replicated on all slabs.
+        num_steps: Total number of steps to run.
+        store_every: Store data every nth step.
+        particles_output: Per-particle entries to output of the particles.
+        materials_output: Per-particle material entries to output.
+        buffer_size: Particles sent per step and direction.
+        mesh: One dimensional device mesh.
+
+    Returns:
+        Tuple: Updated solver, particles and materials of the slots, split
+        over the devices, and the number of particles dropped due to a full
+        slab; and output data, see `run_solver_slab`.
+    """
+    axis_name = mesh.axis_names[0]
+
+    num_slots = particles.position_stack.shape[0]
+
+    def get_spec(obj):
+        return get_particle_partition_spec(obj, num_slots, axis_name)
+
+    in_specs = (
+        get_spec(solver),
+        get_spec(particles),
+        P(axis_name),
+        get_spec(shapefunctions),
+        [get_spec(material) for material in material_stack],
+        P(),
+    )
+
+    num_outputs = 2 + len(particles_output) + sum(
+        key in material for key in materials_output for material in material_stack
+    )
+
+    out_specs = (
+        (in_specs[0], in_specs[1], in_specs[4], P()),
+        [P(None, axis_name)] * num_outputs,
+    )
+
+    def run_slab(
+        solver, particles, nodes, shapefunctions, material_stack, forces_stack
+    ):
+        nodes = jax.tree_util.tree_map(lambda x: x[0], nodes)
+
+        def scan_fn(carry, step):
+            (
+                solver,
+                particles,
+                nodes,
+                shapefunctions,
+                material_stack,
+                forces_stack,
+                num_dropped,
+            ) = carry
+
+            solver, particles, nodes, shapefunctions, material_stack, forces_stack = (
+                solver.update(
+                    particles,
+                    nodes,
+                    shapefunctions,
+                    material_stack,
+                    forces_stack,
+                    step,
+                    axis_name=axis_name,
+                )
+            )
+
+            solver, particles, material_stack, num_step_dropped = migrate_particles(
+                solver, particles, material_stack, nodes, axis_name, buffer_size
+            )
+
+            # keep empty slots on the slab
+            particles = park_particles(
+                particles, particles.mass_stack <= 0.0, (nodes.origin + nodes.end) / 2
+            )
+
+            accumulate = [particles.id_stack, particles.mass_stack > 0.0]
+
+            for key in particles_output:
+                accumulate.append(particles.get(key))
+
+            for key in materials_output:
+                for material in material_stack:
+                    if key in material:
+                        accumulate.append(material.get(key))
+
+            carry = (
+                solver,
+                particles,
+                nodes,
+                shapefunctions,
+                material_stack,
+                forces_stack,
+                num_dropped + num_step_dropped,
+            )
+            return carry, accumulate
+
+        carry, accumulate = scan_kth(
+            scan_fn,
+            (
+                solver,
+                particles,
+                nodes,
+                shapefunctions,
+                material_stack,
+                forces_stack,
+                jnp.int32(0),
+            ),
+            xs=jnp.arange(num_steps),
+            store_every=store_every,
+            unroll=1,
+        )
+        solver, particles, _, _, material_stack, _, num_dropped = carry
+
+        num_dropped = jax.lax.psum(num_dropped, axis_name)
+
+        return (solver, particles, material_stack, num_dropped), accumulate
+
+    return shard_map(
+        run_slab,
+        mesh=mesh,
+        in_specs=in_specs,
+        out_specs=out_specs,
+        check_rep=False,
+    )(solver, particles, nodes, shapefunctions, material_stack, forces_stack)
+
+
+@jax.jit
+def gather_slabs(
+    solver: Solver,
+    particles: Particles,
+    material_stack: List[Material],
+    slab_state: Tuple[Solver, Particles, List[Material], jnp.int32],
+    slab_outputs: List[chex.Array],
+) -> Tuple[Tuple[Solver, Particles, List[Material], jnp.int32], List[chex.Array]]:
+    """Gather the particle slots of all slabs back to the original order.
+
+    The result is a global array of all particles, so it is not bounded by the
+    memory of a slab.
+
+    Args:
+        solver: Solver state before the run, for particles that left all slabs.
+        particles: Particles state before the run.
+        material_stack: Materials before the run.
+        slab_state: Updated slab state, see `scan_solver_slab`.
+        slab_outputs: Output data of the slots, see `scan_solver_slab`.
+
+    Returns:
+        Tuple: Updated solver, particles and materials in the original
+        particle order, and the number of dropped particles; and output data
+        `(num_stored, num_particles, ...)`.
+    """
+    num_particles = particles.position_stack.shape[0]
+
+    slab_solver, slab_particles, slab_material_stack, num_dropped = slab_state
+
+    target_id_stack = jnp.where(
+        slab_particles.mass_stack > 0.0, slab_particles.id_stack, num_particles
+    )
+    solver = scatter_particle_stacks(solver, target_id_stack, slab_solver)
+    particles = scatter_particle_stacks(particles, target_id_stack, slab_particles)
+    material_stack = [
+        scatter_particle_stacks(material, target_id_stack, slab_material)
+        for material, slab_material in zip(material_stack, slab_material_stack)
+    ]
+
+    id_output_stack, is_active_output_stack, *outputs = slab_outputs
+
+    @partial(jax.vmap, in_axes=(0, 0, 0))
+    def gather_output(stack, id_stack, is_active_stack):
+        target_id_stack = jnp.where(is_active_stack, id_stack, num_particles)
+        return (
+            jnp.zeros((num_particles, *stack.shape[1:]), dtype=stack.dtype)
+            .at[target_id_stack]
+            .set(stack, mode="drop")
+        )
+
+    outputs = [
+        gather_output(stack, id_output_stack, is_active_output_stack)
+        for stack in outputs
+    ]
+
+    return (solver, particles, material_stack, num_dropped), outputs
+
+
+def run_solver_slab(
+    solver: Solver,
+    particles: Particles,
+    nodes: Nodes,
+    shapefunctions: ShapeFunction,
+    material_stack: List[Material],
+    forces_stack: List[Forces] = None,
+    num_steps: int = 1,
+    store_every: int = 1,
+    particles_output: Tuple[str] = None,
+    materials_output: Tuple[str] = None,
+    halo_width: int = None,
+    particle_capacity: int = None,
+    buffer_size: int = None,
+    mesh: Mesh = None,
+    gather: bool = False,
+) -> Tuple[Tuple[Solver, Particles, List[Material], jnp.int32], List[chex.Array]]:
+    """Run a MPM solver with the grid split into slabs across devices.
+
+    The grid is split along the x axis into one `SlabNodes` per device of the
+    first axis of `mesh`. Each device holds the particles in its owned region
+    in `particle_capacity` slots. Each step, every device runs `solver.update`
+    on its slab, summing the shared node layers with its neighbours after
+    P2G, and then migrates particles that left its owned region through
+    send/receive buffers of `buffer_size` particles (see `migrate_particles`).
+    Per-device memory is bounded by the slab size and the particle capacity,
+    so it stays constant when the domain grows with the number of devices.
+
+    Particles are expected to move less than one slab width per step. Forces
+    are replicated, and map global node ids to slabs through
+    `SlabNodes.get_node_index_stack`.
+
+    Args:
+        solver: Any solver class e.g., USL, USL_APIC
+        particles: MPM particles dataclass
+        nodes: Global nodes dataclass
+        shapefunctions: Shapefunctions dataclass
+            e.g.,`LinearShapeFunction`, `CubicShapeFunction`
+        material_stack:
+            List of material dataclasses e.g., `LinearIsotropicElastic`
+        forces_stack: List of forces. Defaults to None.
+        num_steps: Total number of steps to run. Defaults to 1.
+        store_every: Store data every nth step. Defaults to 1.
+        particles_output: Per-particle entries to output of
+            the particles e.g., `position_stack, velocity_stack`.
+        materials_output: Per-particle material entries to output.
+            e.g., `eps_e_stack`.
+        halo_width: Number of halo nodes on each side of a slab. Defaults to
+            the reach of the stencil, i.e., 1 for linear and 2 for cubic
+            shape functions.
+        particle_capacity: Particle slots per device. Defaults to twice the
+            largest number of particles initially on a slab.
+        buffer_size: Particles sent per step and direction. Defaults to a
+            quarter of `particle_capacity`.
+        mesh: One dimensional device mesh. Defaults to all devices.
+        gather (optional): Gather the state and outputs of all slabs back to
+            the original particle order on a single device, see
+            `gather_slabs`. Defaults to False.
+
+    Returns:
+        Tuple: Updated solver, particles and materials, and the number of
+        particles dropped due to a full slab; and output data. Unless
+        `gather`, the state holds the `particle_capacity` slots of each slab
+        split over the devices, and the output data starts with the particle
+        ids and the active slots `(num_stored, num_slabs*particle_capacity)`,
+        followed by the requested entries of the slots. Empty slots have zero
+        mass, and `particles.id_stack` maps slots to the original particles.
+    """
+    if mesh is None:
+        mesh = Mesh(np.array(jax.devices()), ("slabs",))
+
+    num_slabs = mesh.size
+
+    if forces_stack is None:
+        forces_stack = []
+
+    if particles_output is None:
+        particles_output = ()
+
+    if materials_output is None:
+        materials_output = ()
+
+    if halo_width is None:
+        halo_width = int(jnp.max(jnp.abs(shapefunctions.stencil)))
+
+    slab_stack = SlabNodes.create_slabs(nodes, num_slabs, halo_width)
+
+    # Distribute particles to the slabs that own them
+    num_particles, dim = particles.position_stack.shape
+
+    slab_width = int(slab_stack[0].grid_size[0]) - 2 * halo_width
+
+    slab_id_stack = np.clip(
+        np.floor(
+            (np.asarray(particles.position_stack[:, 0]) - float(nodes.origin[0]))
+            * float(nodes.inv_node_spacing)
+        ).astype(np.int64)
+        // slab_width,
+        0,
+        num_slabs - 1,
+    )
+
+    num_slab_particles = np.bincount(slab_id_stack, minlength=num_slabs)
+
+    if particle_capacity is None:
+        particle_capacity = 2 * int(num_slab_particles.max())
+
+    if num_slab_particles.max() > particle_capacity:
+        raise ValueError("Particle capacity is too small for the initial state")
+
+    if buffer_size is None:
+        buffer_size = max(particle_capacity // 4, 1)
+
+    slot_id_stack = np.full((num_slabs, particle_capacity), num_particles)
+    for slab_id in range(num_slabs):
+        ids = np.nonzero(slab_id_stack == slab_id)[0]
+        slot_id_stack[slab_id, : ids.shape[0]] = ids
+    slot_id_stack = jnp.array(slot_id_stack.reshape(-1))
+
+    is_empty_stack = slot_id_stack == num_particles
+
+    def distribute(obj):
+        return permute_particle_stacks(obj, slot_id_stack, num_particles)
+
+    park_position_stack = jnp.stack(
+        [(slab.origin + slab.end) / 2 for slab in slab_stack]
+    ).repeat(particle_capacity, axis=0)
+
+    slab_particles = park_particles(
+        distribute(particles), is_empty_stack, park_position_stack
+    )
+
+    slab_solver = distribute(solver)
+
+    slab_material_stack = [distribute(material) for material in material_stack]
+
+    slab_shapefunctions = shapefunctions.create(num_slabs * particle_capacity, dim)
+
+    slab_nodes = jax.tree_util.tree_map(lambda *x: jnp.stack(x), *slab_stack)
+
+    slab_state, slab_outputs = scan_solver_slab(
+        slab_solver,
+        slab_particles,
+        slab_nodes,
+        slab_shapefunctions,
+        slab_material_stack,
+        forces_stack,
+        num_steps,
+        store_every,
+        tuple(particles_output),
+        tuple(materials_output),
+        buffer_size,
+        mesh,
+    )
+
+    if not gather:
+        return slab_state, slab_outputs
+
+    return gather_slabs(solver, particles, material_stack, slab_state, slab_outputs)
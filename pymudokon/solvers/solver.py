@@ -1,8 +1,64 @@
 """Base class for MPM solver"""
 
+import dataclasses
+import enum
+from typing import List, Tuple
+from typing_extensions import Self
+
 import chex
+import jax
 import jax.numpy as jnp
 
+from ..materials.material import Material
+from ..nodes.nodes import Nodes
+from ..particles.particles import Particles
+from ..shapefunctions.shapefunctions import ShapeFunction
+from ..utils.jax_helpers import permute_particle_stacks, select_particle_stacks
+
+
+class P2GBackend(enum.IntEnum):
+    """Enumerated P2G backend, see `get_p2g_backend`.
+
+    Static pytree node, so only the selected backend is traced, also under
+    `vmap`.
+    """
+
+    SCATTER_ADD = 0
+    SEGMENT_SUM = 1
+
+
+jax.tree_util.register_static(P2GBackend)
+
+
+def get_p2g_backend(p2g_backend: str) -> P2GBackend:
+    """Get the enumerated P2G backend.
+
+    Supported backends:
+        "scatter_add": unsorted scatter-add per quantity,
+            see `ShapeFunction.p2g_scatter_add`.
+        "segment_sum": sorted and packed segment sum,
+            see `ShapeFunction.p2g_segment_sum`.
+    """
+    if p2g_backend == "scatter_add":
+        return P2GBackend.SCATTER_ADD
+    elif p2g_backend == "segment_sum":
+        return P2GBackend.SEGMENT_SUM
+    raise ValueError("Invalid P2G backend")
+
+
+def get_Dp(cell_size: jnp.float32, shapefunction: str) -> chex.Array:
+    """Get the APIC inertia-like tensor of a shape function.
+
+    Supported shape functions:
+        "quadratic": `Dp = 1/4 h**2 I`, see `QuadraticShapeFunction`.
+        "cubic": `Dp = 1/3 h**2 I`, see `CubicShapeFunction`.
+    """
+    if shapefunction == "quadratic":
+        return (1.0 / 4.0) * cell_size * cell_size * jnp.eye(3)
+    elif shapefunction == "cubic":
+        return (1.0 / 3.0) * cell_size * cell_size * jnp.eye(3)
+    raise ValueError("Invalid shape function for APIC")
+
 
 @chex.dataclass
 class Solver:
@@ -10,6 +66,281 @@ class Solver:
 
     Attributes:
         dt: Time step.
+        sort_every: Sort particles by cell hash every nth step, see
+            `sort_particles`. Sorting is disabled if `None`.
+        p2g_backend: Enumerated backend to sum interactions to nodes, see
+            `get_p2g_backend`.
     """
 
     dt: jnp.float32
+    _: dataclasses.KW_ONLY
+    sort_every: jnp.int32 = None
+    p2g_backend: P2GBackend = P2GBackend.SCATTER_ADD
+
+    def sum_to_nodes(
+        self: Self,
+        nodes: Nodes,
+        shapefunctions: ShapeFunction,
+        intr_mass_stack: chex.Array,
+        intr_moment_stack: chex.Array,
+        intr_force_stack: chex.Array,
+    ) -> Tuple[chex.Array, chex.Array, chex.Array]:
+        """Sum interaction masses, moments and forces to nodes with the P2G backend.
+
+        Returns:
+            Tuple: Nodal masses, moments and forces.
+        """
+        num_nodes = nodes.mass_stack.shape[0]
+
+        if self.p2g_backend == P2GBackend.SEGMENT_SUM:
+            p2g_fn = shapefunctions.p2g_segment_sum
+        else:
+            p2g_fn = shapefunctions.p2g_scatter_add
+
+        return p2g_fn(num_nodes, intr_mass_stack, intr_moment_stack, intr_force_stack)
+
+    def sort_particles(
+        self: Self,
+        particles: Particles,
+        nodes: Nodes,
+        material_stack: List[Material],
+    ) -> Tuple[Self, Particles, List[Material]]:
+        """Sort all per-particle arrays by the hash of the cell they are in.
+
+        Particles in the same cell are then next to each other in memory, which
+        keeps the P2G/G2P scatter and gather over nodes local. The original
+        ordering is kept in `particles.id_stack`.
+
+        Args:
+            particles: Particles state.
+            nodes: Nodes state.
+            material_stack: List of materials with per-particle state.
+
+        Returns:
+            Tuple: Sorted solver, particles and materials.
+        """
+        cell_hash_stack = particles.get_cell_hash_stack(
+            nodes.origin, nodes.inv_node_spacing, nodes.grid_size
+        )
+
+        sort_id_stack = jnp.argsort(cell_hash_stack)
+
+        particles = permute_particle_stacks(particles, sort_id_stack)
+
+        # Materials owning their particles keep the order of the particle ids
+        material_stack = [
+            permute_particle_stacks(material, sort_id_stack)
+            if material.particle_id_stack is None
+            else material
+            for material in material_stack
+        ]
+
+        return permute_particle_stacks(self, sort_id_stack), particles, material_stack
+
+    def sort_particles_every(
+        self: Self,
+        particles: Particles,
+        nodes: Nodes,
+        material_stack: List[Material],
+        step: jnp.int32,
+    ) -> Tuple[Self, Particles, List[Material]]:
+        """Sort particles by cell hash every `sort_every` steps.
+
+        Sorting is skipped if `sort_every` is `None`.
+        """
+        if self.sort_every is None:
+            return self, particles, material_stack
+
+        return jax.lax.cond(
+            step % self.sort_every == 0,
+            lambda args: args[0].sort_particles(*args[1:]),
+            lambda args: (args[0], args[1], args[3]),
+            (self, particles, nodes, material_stack),
+        )
+
+    def keep_inactive(
+        self: Self, active_mask_stack: chex.Array, obj, obj_prev
+    ):
+        """Keep the per-particle state of inactive particles from before an update.
+
+        Args:
+            active_mask_stack: Active particles `(num_particles,)`, or `None`
+                if all particles are active.
+            obj: Updated dataclass (e.g., particles or solver), or a list of
+                dataclasses (e.g., materials).
+            obj_prev: Same as `obj` before the update.
+
+        Returns:
+            Same as `obj`, with the state of inactive particles from `obj_prev`.
+        """
+        if active_mask_stack is None:
+            return obj
+
+        if isinstance(obj, list):
+            # materials owning their particles are handled in `update_materials`
+            return [
+                select_particle_stacks(active_mask_stack, item, item_prev)
+                if item.get("particle_id_stack") is None
+                else item
+                for item, item_prev in zip(obj, obj_prev)
+            ]
+
+        return select_particle_stacks(active_mask_stack, obj, obj_prev)
+
+    def get_position_id_stack(self: Self, particles: Particles) -> chex.Array:
+        """Get the position of each particle id in the (possibly sorted) stacks."""
+        num_particles = particles.id_stack.shape[0]
+
+        return (
+            jnp.zeros(num_particles, dtype=jnp.int32)
+            .at[particles.id_stack]
+            .set(jnp.arange(num_particles, dtype=jnp.int32))
+        )
+
+    def get_stable_dt(
+        self: Self,
+        particles: Particles,
+        nodes: Nodes,
+        material_stack: List[Material],
+        cfl: jnp.float32 = 0.5,
+    ) -> jnp.float32:
+        """Get the largest stable time step from the CFL condition.
+
+        $$
+        \\Delta t = \\mathrm{cfl} \\, h / \\max_p (c_p + |v_p|)
+        $$
+
+        where `h` is the node spacing, `c_p` the largest wave speed of the
+        materials at particle `p` (see `Material.get_wave_speed_stack`), and
+        `v_p` the particle velocity. Particles without mass and inactive
+        particles are ignored, and the time step is infinite if all
+        particles are at rest with zero wave speed.
+
+        Args:
+            particles: Particles state.
+            nodes: Nodes state.
+            material_stack: List of materials.
+            cfl: Courant number. Defaults to 0.5.
+
+        Returns:
+            jnp.float32: Stable time step.
+        """
+        num_particles = particles.id_stack.shape[0]
+
+        wave_speed_stack = jnp.zeros(num_particles)
+
+        position_id_stack = self.get_position_id_stack(particles)
+
+        for material in material_stack:
+            if material.get("particle_id_stack") is None:
+                wave_speed_stack = jnp.maximum(
+                    wave_speed_stack, material.get_wave_speed_stack(particles)
+                )
+                continue
+
+            sub_id_stack = position_id_stack.at[material.particle_id_stack].get()
+
+            sub_particles = permute_particle_stacks(
+                particles, sub_id_stack, num_particles=num_particles
+            )
+
+            wave_speed_stack = wave_speed_stack.at[sub_id_stack].max(
+                material.get_wave_speed_stack(sub_particles)
+            )
+
+        speed_stack = wave_speed_stack + jnp.linalg.norm(
+            particles.velocity_stack, axis=-1
+        )
+
+        is_valid_stack = particles.mass_stack > 0.0
+
+        if particles.active_mask_stack is not None:
+            is_valid_stack = is_valid_stack & particles.active_mask_stack
+
+        max_speed = jnp.max(jnp.where(is_valid_stack, speed_stack, 0.0))
+
+        return cfl * nodes.node_spacing / max_speed
+
+    def update_materials(
+        self: Self, particles: Particles, material_stack: List[Material]
+    ) -> Tuple[Particles, List[Material]]:
+        """Update the particle stresses and the material states.
+
+        Materials update all particles in turn, unless they own their
+        particles (see `Material.assign_particles`). Owned particles are
+        gathered into a contiguous sub-batch, and the entries the material
+        writes (see `Material.written_particle_keys`) are scattered back, so
+        each material costs its share of the particles only.
+
+        Args:
+            particles: Particles state.
+            material_stack: List of materials.
+
+        Returns:
+            Tuple: Updated particles and materials.
+        """
+        new_material_stack = []
+
+        num_particles = particles.id_stack.shape[0]
+
+        position_id_stack = self.get_position_id_stack(particles)
+
+        for material in material_stack:
+            if material.get("particle_id_stack") is None:
+                particles, material = material.update_from_particles(
+                    particles=particles, dt=self.dt
+                )
+                new_material_stack.append(material)
+                continue
+
+            sub_id_stack = position_id_stack.at[material.particle_id_stack].get()
+
+            sub_particles = permute_particle_stacks(
+                particles, sub_id_stack, num_particles=num_particles
+            )
+
+            sub_particles_next, material_next = material.update_from_particles(
+                particles=sub_particles, dt=self.dt
+            )
+
+            if particles.active_mask_stack is not None:
+                material_next = select_particle_stacks(
+                    sub_particles.active_mask_stack, material_next, material
+                )
+
+            # Only scatter the entries the material writes, e.g., stresses
+            particles = particles.replace(
+                **{
+                    key: particles[key].at[sub_id_stack].set(sub_particles_next[key])
+                    for key in material.written_particle_keys
+                }
+            )
+
+            new_material_stack.append(material_next)
+
+        return particles, new_material_stack
+
+    def apply_forces_on_particles(
+        self: Self,
+        particles: Particles,
+        material_stack: List[Material],
+        forces_stack: List,
+        step: jnp.int32,
+    ) -> Tuple[Particles, List[Material], List]:
+        """Apply forces that act on particles directly, e.g., `ParticleEmitter`.
+
+        Called at the end of each step. Only forces with an `apply_on_particles`
+        method are applied, all others are returned unchanged.
+        """
+        new_forces_stack = []
+        for forces in forces_stack:
+            if hasattr(forces, "apply_on_particles"):
+                particles, material_stack, forces = forces.apply_on_particles(
+                    particles=particles,
+                    material_stack=material_stack,
+                    dt=self.dt,
+                    step=step,
+                )
+            new_forces_stack.append(forces)
+
+        return particles, material_stack, new_forces_stack
@@ -0,0 +1,129 @@
+"""Criteria to stop a solver early, e.g., once a settling phase is at rest."""
+
+from typing_extensions import Self
+
+import chex
+import jax.numpy as jnp
+
+from ..particles.particles import Particles
+from ..utils.math_helpers import get_KE_stack
+
+
+@chex.dataclass
+class Termination:
+    """Termination criteria evaluated on device, see `run_solver_until`.
+
+    The solver stops once any of the given criteria is met. Criteria that
+    are `None` are not checked.
+
+    Attributes:
+        ke_ratio: Stop once the kinetic energy of the particles is below
+            `ke_ratio` times its peak so far.
+        max_velocity: Stop once the largest particle speed is below
+            `max_velocity`.
+        end_time: Stop once the simulated time reaches `end_time`.
+        min_steps: Do not stop before `min_steps` steps.
+        ke_peak: Peak kinetic energy so far.
+        time: Simulated time so far.
+
+    Example:
+    >>> import pymudokon as pm
+    >>> # at rest, or 2 s of simulated time at most
+    >>> termination = pm.Termination.create(ke_ratio=1e-4, end_time=2.0)
+    """
+
+    ke_ratio: jnp.float32 = None
+    max_velocity: jnp.float32 = None
+    end_time: jnp.float32 = None
+    min_steps: jnp.int32 = 0
+    ke_peak: jnp.float32 = 0.0
+    time: jnp.float32 = 0.0
+
+    @classmethod
+    def create(
+        cls: Self,
+        ke_ratio: jnp.float32 = None,
+        max_velocity: jnp.float32 = None,
+        end_time: jnp.float32 = None,
+        min_steps: jnp.int32 = 0,
+    ) -> Self:
+        """Create termination criteria.
+
+        Args:
+            ke_ratio: Kinetic energy ratio to its peak. Defaults to None.
+            max_velocity: Largest particle speed. Defaults to None.
+            end_time: Simulated time. Defaults to None.
+            min_steps: Minimum number of steps. Defaults to 0.
+
+        Returns:
+            Termination: Termination state.
+        """
+        return cls(
+            ke_ratio=ke_ratio,
+            max_velocity=max_velocity,
+            end_time=end_time,
+            min_steps=jnp.int32(min_steps),
+            ke_peak=jnp.float32(0.0),
+            time=jnp.float32(0.0),
+        )
+
+    def get_ke(self: Self, particles: Particles) -> jnp.float32:
+        """Get the total kinetic energy of the (active) particles."""
+        ke_stack = get_KE_stack(particles.mass_stack, particles.velocity_stack)
+
+        if particles.active_mask_stack is not None:
+            ke_stack = jnp.where(particles.active_mask_stack, ke_stack, 0.0)
+
+        return jnp.sum(ke_stack)
+
+    def get_max_velocity(self: Self, particles: Particles) -> jnp.float32:
+        """Get the largest speed of the (active) particles."""
+        speed_stack = jnp.linalg.norm(particles.velocity_stack, axis=-1)
+
+        if particles.active_mask_stack is not None:
+            speed_stack = jnp.where(particles.active_mask_stack, speed_stack, 0.0)
+
+        return jnp.max(speed_stack)
+
+    def update(self: Self, particles: Particles, time: jnp.float32) -> Self:
+        """Update the peak kinetic energy and the simulated time.
+
+        Args:
+            particles: Particles state.
+            time: Simulated time.
+
+        Returns:
+            Termination: Updated termination state.
+        """
+        ke_peak = self.ke_peak
+
+        if self.ke_ratio is not None:
+            ke_peak = jnp.maximum(ke_peak, self.get_ke(particles))
+
+        return self.replace(ke_peak=ke_peak, time=time)
+
+    def is_done(self: Self, particles: Particles, step: jnp.int32) -> jnp.bool_:
+        """Check whether any criterion is met.
+
+        Criteria are not checked before the first step, e.g., for particles
+        starting at rest.
+
+        Args:
+            particles: Particles state.
+            step: Number of steps done.
+
+        Returns:
+            jnp.bool_: Whether to stop.
+        """
+        is_done = jnp.bool_(False)
+
+        if self.ke_ratio is not None:
+            is_done |= self.get_ke(particles) <= self.ke_ratio * self.ke_peak
+
+        if self.max_velocity is not None:
+            is_done |= self.get_max_velocity(particles) < self.max_velocity
+
+        if self.end_time is not None:
+            is_done |= self.time >= self.end_time
+
+        return is_done & (step >= jnp.maximum(self.min_steps, 1))
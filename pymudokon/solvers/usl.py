@@ -6,7 +6,7 @@ References:
 """
 
 from functools import partial
-from typing import List, Tuple
+from typing import Callable, List, Tuple
 from typing_extensions import Self
 
 import chex
@@ -18,7 +18,7 @@ from ..materials.material import Material
 from ..nodes.nodes import Nodes
 from ..particles.particles import Particles
 from ..shapefunctions.shapefunctions import ShapeFunction
-from .solver import Solver
+from .solver import get_p2g_backend, Solver
 
 
 @chex.dataclass
@@ -28,6 +28,10 @@ class USL(Solver):
     Attributes:
         alpha: FLIP-PIC ratio
         dt: time step of the solver
+        sort_every: Sort particles by cell hash every nth step, see
+            `Solver.sort_particles`. Sorting is disabled if `None`.
+        p2g_backend: Enumerated backend to sum interactions to nodes,
+            see `get_p2g_backend`.
 
     """
 
@@ -39,9 +43,23 @@ class USL(Solver):
         cls,
         alpha: jnp.float32 = 0.99,
         dt: jnp.float32 = 0.00001,
+        sort_every: jnp.int32 = None,
+        p2g_backend: str = "scatter_add",
     ):
-        """Create a new instance of the USL solver."""
-        return USL(alpha=alpha, dt=dt)
+        """Create a new instance of the USL solver.
+
+        Args:
+            alpha: FLIP-PIC ratio.
+            dt: Time step.
+            sort_every: Sort particles by cell hash every nth step.
+            p2g_backend: "scatter_add" or "segment_sum".
+        """
+        return USL(
+            alpha=alpha,
+            dt=dt,
+            sort_every=sort_every,
+            p2g_backend=get_p2g_backend(p2g_backend),
+        )
 
     def update(
         self: Self,
@@ -50,24 +68,37 @@ class USL(Solver):
         shapefunctions: ShapeFunction,
         material_stack: List[Material],
         forces_stack: List[Forces],
-        step: int
+        step: int,
+        axis_name: str = None,
     ):
-        """Perform a single update step of the USL solver."""
+        """Perform a single update step of the USL solver.
+
+        If `axis_name` is given, particles are split over that mapped device
+        axis and nodes are summed over it after P2G, see `run_solver_sharded`.
+        """
         nodes = nodes.refresh()
         particles = particles.refresh()
 
-        shapefunctions, _ = shapefunctions.calculate_shapefunction(
-            origin=nodes.origin,
-            inv_node_spacing=nodes.inv_node_spacing,
-            grid_size=nodes.grid_size,
-            position_stack=particles.position_stack,
-            species_stack = nodes.species_stack
+        self, particles, material_stack = self.sort_particles_every(
+            particles, nodes, material_stack, step
         )
 
-        nodes = self.p2g(
-            particles=particles, nodes=nodes, shapefunctions=shapefunctions
+        particles_prev = particles
+
+        # Interactions are not kept between steps if fused, see `ShapeFunction.fuse`
+        is_fused = shapefunctions.is_fused()
+
+        nodes, shapefunctions, shapefunctions_calc = self.activate_shapefunctions(
+            particles, nodes, shapefunctions, forces_stack
         )
 
+        p2g, g2p = (self.p2g_fused, self.g2p_fused) if is_fused else (self.p2g, self.g2p)
+
+        nodes = p2g(particles=particles, nodes=nodes, shapefunctions=shapefunctions)
+
+        if axis_name is not None:
+            nodes = nodes.psum(axis_name)
+
         # Apply forces here
         new_forces_stack = []
         for forces in forces_stack:
@@ -80,28 +111,108 @@ class USL(Solver):
             )
             new_forces_stack.append(forces)
 
-        particles = self.g2p(
+        particles = g2p(
             particles=particles,
             nodes=nodes,
             shapefunctions=shapefunctions,
         )
 
-        new_material_stack = []
-        for material in material_stack:
-            particles, material = material.update_from_particles(
-                particles=particles, dt=self.dt
+        particles = self.keep_inactive(
+            particles_prev.active_mask_stack, particles, particles_prev
+        )
+
+        particles, new_material_stack = self.update_materials(
+            particles, material_stack
+        )
+
+        particles = self.keep_inactive(
+            particles_prev.active_mask_stack, particles, particles_prev
+        )
+        new_material_stack = self.keep_inactive(
+            particles_prev.active_mask_stack, new_material_stack, material_stack
+        )
+
+        particles, new_material_stack, new_forces_stack = (
+            self.apply_forces_on_particles(
+                particles, new_material_stack, new_forces_stack, step
             )
-            new_material_stack.append(material)
+        )
 
         return (
             self,
             particles,
             nodes,
-            shapefunctions,
+            shapefunctions.get_next_step(shapefunctions_calc, is_fused),
             new_material_stack,
             new_forces_stack,
         )
 
+    def activate_shapefunctions(
+        self: Self,
+        particles: Particles,
+        nodes: Nodes,
+        shapefunctions: ShapeFunction,
+        forces_stack: List[Forces],
+    ) -> Tuple[Nodes, ShapeFunction, ShapeFunction]:
+        """Calculate the interactions of a step and activate their nodes.
+
+        Fused shape functions (see `ShapeFunction.fuse`) activate the nodes
+        from the base cells of the particles, and only calculate the
+        interactions if forces read them, e.g., `NodeLevelSet`. The fused
+        kernels do not read the interactions.
+
+        Args:
+            particles: Particles state.
+            nodes: Nodes state.
+            shapefunctions: Shape functions of the previous step.
+            forces_stack: Forces applied in the step.
+
+        Returns:
+            Tuple: Activated nodes, shape functions with interaction hashes
+            mapped to the nodes, and shape functions as calculated, see
+            `ShapeFunction.get_next_step`.
+        """
+        is_fused = shapefunctions.is_fused()
+
+        if is_fused:
+            base_cell_stack = shapefunctions.get_base_cell_stack(
+                (particles.position_stack - nodes.origin) * nodes.inv_node_spacing
+            )
+
+            nodes = nodes.activate_cells(base_cell_stack, shapefunctions.stencil)
+
+            if not any(
+                getattr(forces, "uses_interactions", False) for forces in forces_stack
+            ):
+                return nodes, shapefunctions, shapefunctions
+
+        shapefunctions, _ = shapefunctions.update_shapefunction(
+            origin=nodes.origin,
+            inv_node_spacing=nodes.inv_node_spacing,
+            grid_size=nodes.grid_size,
+            position_stack=particles.position_stack,
+            species_stack=nodes.species_stack,
+            id_stack=particles.id_stack,
+        )
+
+        shapefunctions_calc = shapefunctions
+
+        if is_fused:
+            # Nodes are already activated from the same base cells
+            shapefunctions = shapefunctions.replace(
+                intr_hash_stack=nodes.get_node_index_stack(
+                    shapefunctions.intr_hash_stack
+                )
+            )
+        else:
+            nodes, shapefunctions = nodes.activate(shapefunctions)
+
+        shapefunctions = shapefunctions.deactivate_particles(
+            particles.active_mask_stack, nodes.mass_stack.shape[0]
+        )
+
+        return nodes, shapefunctions, shapefunctions_calc
+
     def p2g(
         self: Self,
         particles,
@@ -152,22 +263,89 @@ class USL(Solver):
         )
 
         # Sum all interaction quantities.
-        nodes_mass_stack = (
-            jnp.zeros_like(nodes.mass_stack)
-            .at[shapefunctions.intr_hash_stack]
-            .add(scaled_mass_stack)
+        nodes_mass_stack, nodes_moment_stack, nodes_force_stack = self.sum_to_nodes(
+            nodes,
+            shapefunctions,
+            scaled_mass_stack,
+            scaled_moment_stack,
+            scaled_total_force_stack,
         )
 
-        nodes_moment_stack = (
-            jnp.zeros_like(nodes.moment_stack)
-            .at[shapefunctions.intr_hash_stack]
-            .add(scaled_moment_stack)
+        nodes_moment_nt_stack = nodes_moment_stack + nodes_force_stack * self.dt
+
+        return nodes.replace(
+            mass_stack=nodes_mass_stack,
+            moment_stack=nodes_moment_stack,
+            moment_nt_stack=nodes_moment_nt_stack,
         )
 
-        nodes_force_stack = (
-            jnp.zeros_like(nodes.moment_stack)
-            .at[shapefunctions.intr_hash_stack]
-            .add(scaled_total_force_stack)
+    def p2g_fused(
+        self: Self,
+        particles: Particles,
+        nodes: Nodes,
+        shapefunctions: ShapeFunction,
+    ) -> Nodes:
+        """Particle to grid transfer with fused shape functions.
+
+        Same as `p2g`, but loops over the stencil nodes. Each iteration
+        calculates the shape functions of one stencil node of all particles,
+        see `get_stencil_shapefunction`, and adds the scaled particle
+        quantities to the nodes, so no per-interaction arrays are built. The
+        interaction arrays of `shapefunctions` are not read, and
+        `p2g_backend` does not apply.
+        """
+        stencil_size, dim = shapefunctions.stencil.shape
+
+        num_nodes = nodes.mass_stack.shape[0]
+
+        get_stencil_shapefunction = self.get_stencil_shapefunction(
+            particles, nodes, shapefunctions
+        )
+
+        int_stress_stack = -1.0 * particles.volume_stack[:, None, None] * (
+            particles.stress_stack
+        )
+
+        def add_stencil_node(stencil_id, carry):
+            """Add quantities of one stencil node of all particles to the nodes."""
+            nodes_mass_stack, nodes_moment_stack, nodes_force_stack = carry
+
+            shapef_stack, shapef_grad_stack, node_index_stack = (
+                get_stencil_shapefunction(stencil_id)
+            )
+
+            scaled_mass_stack = shapef_stack * particles.mass_stack
+            scaled_moment_stack = scaled_mass_stack[:, None] * particles.velocity_stack
+            scaled_ext_force_stack = shapef_stack[:, None] * particles.force_stack
+            scaled_int_force_stack = jnp.einsum(
+                "nij,nj->ni", int_stress_stack, shapef_grad_stack
+            )
+
+            scaled_total_force_stack = (
+                scaled_int_force_stack[:, :dim] + scaled_ext_force_stack
+            )
+
+            return (
+                nodes_mass_stack.at[node_index_stack].add(
+                    scaled_mass_stack, mode="drop"
+                ),
+                nodes_moment_stack.at[node_index_stack].add(
+                    scaled_moment_stack, mode="drop"
+                ),
+                nodes_force_stack.at[node_index_stack].add(
+                    scaled_total_force_stack, mode="drop"
+                ),
+            )
+
+        nodes_mass_stack, nodes_moment_stack, nodes_force_stack = jax.lax.fori_loop(
+            0,
+            stencil_size,
+            add_stencil_node,
+            (
+                jnp.zeros(num_nodes),
+                jnp.zeros((num_nodes, dim)),
+                jnp.zeros((num_nodes, dim)),
+            ),
         )
 
         nodes_moment_nt_stack = nodes_moment_stack + nodes_force_stack * self.dt
@@ -196,9 +374,17 @@ class USL(Solver):
             intr_shapef_grad: chex.ArrayBatched,
         ) -> Tuple[chex.ArrayBatched, chex.ArrayBatched, chex.ArrayBatched]:
             """Scatter quantities from nodes to interactions."""
-            intr_masses = nodes.mass_stack.at[intr_hashes].get()
-            intr_moments = nodes.moment_stack.at[intr_hashes].get()
-            intr_moments_nt = nodes.moment_nt_stack.at[intr_hashes].get()
+            # Out-of-range slots (e.g., beyond the capacity of `SparseNodes`)
+            # read zero mass, so these interactions are dropped as in P2G
+            intr_masses = nodes.mass_stack.at[intr_hashes].get(
+                mode="fill", fill_value=0.0
+            )
+            intr_moments = nodes.moment_stack.at[intr_hashes].get(
+                mode="fill", fill_value=0.0
+            )
+            intr_moments_nt = nodes.moment_nt_stack.at[intr_hashes].get(
+                mode="fill", fill_value=0.0
+            )
 
             # Small mass cutoff to avoid unphysical large velocities
             intr_vels = jax.lax.cond(
@@ -234,6 +420,176 @@ class USL(Solver):
 
             return intr_scaled_delta_vels, intr_scaled_vels_nt, intr_scaled_velgrad
 
+        (
+            intr_scaled_delta_vel_stack,
+            intr_scaled_vel_nt_stack,
+            intr_scaled_velgrad_stack,
+        ) = vmap_intr_scatter(
+            shapefunctions.intr_hash_stack,
+            shapefunctions.intr_shapef_stack,
+            shapefunctions.intr_shapef_grad_stack,
+        )
+
+        return self.update_particles(
+            particles,
+            intr_scaled_delta_vel_stack.reshape(-1, stencil_size, dim),
+            intr_scaled_vel_nt_stack.reshape(-1, stencil_size, dim),
+            intr_scaled_velgrad_stack.reshape(-1, stencil_size, 3, 3),
+        )
+
+    def g2p_fused(
+        self: Self,
+        particles: Particles,
+        nodes: Nodes,
+        shapefunctions: ShapeFunction,
+    ) -> Particles:
+        """Grid to particle transfer with fused shape functions.
+
+        Same as `g2p`, but loops over the stencil nodes. Each iteration
+        calculates the shape functions of one stencil node of all particles,
+        see `get_stencil_shapefunction`, gathers the node quantities and adds
+        them to the particle sums, so no per-interaction arrays are built.
+        """
+        stencil_size, dim = shapefunctions.stencil.shape
+
+        num_particles = particles.position_stack.shape[0]
+
+        padding = ((0, 0), (0, 3 - dim))
+
+        get_stencil_shapefunction = self.get_stencil_shapefunction(
+            particles, nodes, shapefunctions
+        )
+
+        def add_stencil_node(stencil_id, carry):
+            """Add quantities of one stencil node of all particles to the sums."""
+            delta_vel_stack, vel_nt_stack, velgrad_stack = carry
+
+            shapef_stack, shapef_grad_stack, node_index_stack = (
+                get_stencil_shapefunction(stencil_id)
+            )
+
+            # Out-of-range slots read zero mass, so they are dropped as in P2G
+            n_mass_stack = nodes.mass_stack.at[node_index_stack].get(
+                mode="fill", fill_value=0.0
+            )
+            n_moment_stack = nodes.moment_stack.at[node_index_stack].get(
+                mode="fill", fill_value=0.0
+            )
+            n_moment_nt_stack = nodes.moment_nt_stack.at[node_index_stack].get(
+                mode="fill", fill_value=0.0
+            )
+
+            # Small mass cutoff to avoid unphysical large velocities
+            is_mass_stack = (n_mass_stack > nodes.small_mass_cutoff)[:, None]
+            safe_mass_stack = jnp.where(is_mass_stack, n_mass_stack[:, None], 1.0)
+
+            n_vel_stack = jnp.where(is_mass_stack, n_moment_stack / safe_mass_stack, 0.0)
+            n_vel_nt_stack = jnp.where(
+                is_mass_stack, n_moment_nt_stack / safe_mass_stack, 0.0
+            )
+
+            # Pad velocities for plane strain
+            n_vel_nt_padded_stack = jnp.pad(n_vel_nt_stack, padding)
+
+            return (
+                delta_vel_stack + shapef_stack[:, None] * (n_vel_nt_stack - n_vel_stack),
+                vel_nt_stack + shapef_stack[:, None] * n_vel_nt_stack,
+                velgrad_stack
+                + shapef_grad_stack[:, :, None] * n_vel_nt_padded_stack[:, None, :],
+            )
+
+        scaled_delta_vel_stack, scaled_vel_nt_stack, scaled_velgrad_stack = (
+            jax.lax.fori_loop(
+                0,
+                stencil_size,
+                add_stencil_node,
+                (
+                    jnp.zeros((num_particles, dim)),
+                    jnp.zeros((num_particles, dim)),
+                    jnp.zeros((num_particles, 3, 3)),
+                ),
+            )
+        )
+
+        return self.update_particles(
+            particles,
+            scaled_delta_vel_stack[:, None],
+            scaled_vel_nt_stack[:, None],
+            scaled_velgrad_stack[:, None],
+        )
+
+    def get_stencil_shapefunction(
+        self: Self,
+        particles: Particles,
+        nodes: Nodes,
+        shapefunctions: ShapeFunction,
+    ) -> Callable[[jnp.int32], Tuple[chex.Array, chex.Array, chex.Array]]:
+        """Get the shape functions of a stencil node for the fused kernels.
+
+        Args:
+            particles: Particles state.
+            nodes: Nodes state, after `Nodes.activate_cells`.
+            shapefunctions: Shape functions, see `ShapeFunction.fuse`.
+
+        Returns:
+            Callable: Function of the stencil node index, that returns the
+            shape functions `(num_particles,)`, gradients
+            `(num_particles, 3)` and node indices `(num_particles,)`.
+            Inactive particles get the out-of-range node index.
+        """
+        num_nodes = nodes.mass_stack.shape[0]
+
+        rel_pos_stack = (particles.position_stack - nodes.origin) * (
+            nodes.inv_node_spacing
+        )
+
+        base_cell_stack = shapefunctions.get_base_cell_stack(rel_pos_stack)
+
+        def get_stencil_shapefunction(stencil_id):
+            shapef_stack, shapef_grad_stack, node_hash_stack = (
+                shapefunctions.get_stencil_shapefunction(
+                    rel_pos_stack,
+                    base_cell_stack,
+                    stencil_id,
+                    nodes.inv_node_spacing,
+                    nodes.grid_size,
+                )
+            )
+
+            node_index_stack = nodes.get_node_index_stack(node_hash_stack)
+
+            if particles.active_mask_stack is not None:
+                node_index_stack = jnp.where(
+                    particles.active_mask_stack, node_index_stack, num_nodes
+                )
+
+            return shapef_stack, shapef_grad_stack, node_index_stack
+
+        return get_stencil_shapefunction
+
+    def update_particles(
+        self: Self,
+        particles: Particles,
+        intr_scaled_delta_vel_stack: chex.Array,
+        intr_scaled_vel_nt_stack: chex.Array,
+        intr_scaled_velgrad_stack: chex.Array,
+    ) -> Particles:
+        """Update particle kinematics from scaled interaction quantities.
+
+        Args:
+            particles: Particles state.
+            intr_scaled_delta_vel_stack: Scaled velocity increments
+                `(num_particles, stencil_size, dim)`.
+            intr_scaled_vel_nt_stack: Scaled forward velocities
+                `(num_particles, stencil_size, dim)`.
+            intr_scaled_velgrad_stack: Scaled velocity gradients
+                `(num_particles, stencil_size, 3, 3)`.
+
+        Returns:
+            Particles: Updated particles.
+        """
+        dim = intr_scaled_delta_vel_stack.shape[-1]
+
         @partial(jax.vmap, in_axes=(0, 0, 0, 0, 0, 0, 0))
         def vmap_particles_update(
             intr_delta_vels_reshaped: chex.ArrayBatched,
@@ -279,16 +635,6 @@ class USL(Solver):
                 p_velgrads_next,
             )
 
-        (
-            intr_scaled_delta_vel_stack,
-            intr_scaled_vel_nt_stack,
-            intr_scaled_velgrad_stack,
-        ) = vmap_intr_scatter(
-            shapefunctions.intr_hash_stack,
-            shapefunctions.intr_shapef_stack,
-            shapefunctions.intr_shapef_grad_stack,
-        )
-
         (
             p_velocity_next_stack,
             p_position_next_stack,
@@ -296,9 +642,9 @@ class USL(Solver):
             p_volume_stack_next,
             p_L_stack_next,
         ) = vmap_particles_update(
-            intr_scaled_delta_vel_stack.reshape(-1, stencil_size, dim),
-            intr_scaled_vel_nt_stack.reshape(-1, stencil_size, dim),
-            intr_scaled_velgrad_stack.reshape(-1, stencil_size, 3, 3),
+            intr_scaled_delta_vel_stack,
+            intr_scaled_vel_nt_stack,
+            intr_scaled_velgrad_stack,
             particles.velocity_stack,
             particles.position_stack,
             particles.F_stack,
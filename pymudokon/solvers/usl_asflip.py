@@ -9,7 +9,7 @@ import jax.numpy as jnp
 from ..nodes.nodes import Nodes
 from ..particles.particles import Particles
 from ..shapefunctions.shapefunctions import ShapeFunction
-from .solver import Solver
+from .solver import get_Dp, get_p2g_backend, Solver
 
 
 @chex.dataclass
@@ -35,9 +35,12 @@ class USL_ASFLIP(Solver):
         beta_min= 0,
         beta_max= 0, 
         dt: jnp.float32 = 0.00001,
+        sort_every: jnp.int32 = None,
+        p2g_backend: str = "scatter_add",
+        shapefunction: str = "cubic",
     ):
         jax.debug.print("USL_APIC solver supported for cubic shape functions only")
-        Dp = (1.0 / 3.0) * cell_size * cell_size * jnp.eye(3)
+        Dp = get_Dp(cell_size, shapefunction)
 
         Dp_inv = jnp.linalg.inv(Dp)
 
@@ -46,20 +49,51 @@ class USL_ASFLIP(Solver):
         return USL_ASFLIP(dt=dt, alpha=alpha, Dp=Dp, Dp_inv=Dp_inv, Bp_stack=Bp_stack,
                 phi_c = phi_c,
                 beta_min= beta_min,
-                beta_max= beta_max,                   
-                          
+                beta_max= beta_max,
+                sort_every=sort_every,
+                p2g_backend=get_p2g_backend(p2g_backend),
                           )
 
-    def update(self, particles, nodes, shapefunctions, material_stack, forces_stack, step):
+    def update(
+        self,
+        particles,
+        nodes,
+        shapefunctions,
+        material_stack,
+        forces_stack,
+        step,
+        axis_name=None,
+    ):
         nodes = nodes.refresh()
         particles = particles.refresh()
 
-        shapefunctions, intr_dist_3d_stack = shapefunctions.calculate_shapefunction(
+        self, particles, material_stack = self.sort_particles_every(
+            particles, nodes, material_stack, step
+        )
+
+        solver_prev, particles_prev = self, particles
+
+        if shapefunctions.is_fused():
+            raise ValueError(
+                "USL_ASFLIP does not support fused shape functions, "
+                "see `ShapeFunction.fuse`"
+            )
+
+        shapefunctions, intr_dist_3d_stack = shapefunctions.update_shapefunction(
             origin=nodes.origin,
             inv_node_spacing=nodes.inv_node_spacing,
             grid_size=nodes.grid_size,
             position_stack=particles.position_stack,
-            species_stack = nodes.species_stack
+            species_stack = nodes.species_stack,
+            id_stack=particles.id_stack,
+        )
+
+        shapefunctions_calc = shapefunctions
+
+        nodes, shapefunctions = nodes.activate(shapefunctions)
+
+        shapefunctions = shapefunctions.deactivate_particles(
+            particles.active_mask_stack, nodes.mass_stack.shape[0]
         )
 
         # transform from grid space to particle space
@@ -72,6 +106,9 @@ class USL_ASFLIP(Solver):
             intr_dist_3d_stack=intr_dist_3d_stack,
         )
 
+        if axis_name is not None:
+            nodes = nodes.psum(axis_name)
+
         new_forces_stack = []
         for forces in forces_stack:
             nodes, forces = forces.apply_on_nodes_moments(
@@ -90,18 +127,33 @@ class USL_ASFLIP(Solver):
             intr_dist_3d_stack=intr_dist_3d_stack,
         )
 
-        new_material_stack = []
-        for material in material_stack:
-            particles, material = material.update_from_particles(
-                particles=particles, dt=self.dt
+        particles = self.keep_inactive(
+            particles_prev.active_mask_stack, particles, particles_prev
+        )
+        self = self.keep_inactive(particles_prev.active_mask_stack, self, solver_prev)
+
+        particles, new_material_stack = self.update_materials(
+            particles, material_stack
+        )
+
+        particles = self.keep_inactive(
+            particles_prev.active_mask_stack, particles, particles_prev
+        )
+        new_material_stack = self.keep_inactive(
+            particles_prev.active_mask_stack, new_material_stack, material_stack
+        )
+
+        particles, new_material_stack, new_forces_stack = (
+            self.apply_forces_on_particles(
+                particles, new_material_stack, new_forces_stack, step
             )
-            new_material_stack.append(material)
+        )
 
         return (
             self,
             particles,
             nodes,
-            shapefunctions,
+            shapefunctions.get_next_step(shapefunctions_calc, False),
             new_material_stack,
             new_forces_stack,
         )
@@ -147,18 +199,12 @@ class USL_ASFLIP(Solver):
             intr_dist_3d_stack,
         )
 
-        nodes_mass_stack = nodes.mass_stack.at[shapefunctions.intr_hash_stack].add(
-            scaled_mass_stack
-        )
-
-        nodes_moment_stack = nodes.moment_stack.at[shapefunctions.intr_hash_stack].add(
-            scaled_moment_stack
-        )
-
-        nodes_force_stack = (
-            jnp.zeros_like(nodes.moment_nt_stack)
-            .at[shapefunctions.intr_hash_stack]
-            .add(scaled_total_force_stack)
+        nodes_mass_stack, nodes_moment_stack, nodes_force_stack = self.sum_to_nodes(
+            nodes,
+            shapefunctions,
+            scaled_mass_stack,
+            scaled_moment_stack,
+            scaled_total_force_stack,
         )
 
         nodes_moment_nt_stack = nodes_moment_stack + nodes_force_stack * self.dt
@@ -182,9 +228,15 @@ class USL_ASFLIP(Solver):
 
         @partial(jax.vmap, in_axes=(0, 0, 0, 0))
         def vmap_intr_scatter(intr_hashes, intr_shapef, intr_shapef_grad, intr_dist_3d):
-            intr_masses = nodes.mass_stack.at[intr_hashes].get()
-            intr_moments = nodes.moment_stack.at[intr_hashes].get()
-            intr_moments_nt = nodes.moment_nt_stack.at[intr_hashes].get()
+            intr_masses = nodes.mass_stack.at[intr_hashes].get(
+                mode="fill", fill_value=0.0
+            )
+            intr_moments = nodes.moment_stack.at[intr_hashes].get(
+                mode="fill", fill_value=0.0
+            )
+            intr_moments_nt = nodes.moment_nt_stack.at[intr_hashes].get(
+                mode="fill", fill_value=0.0
+            )
 
             intr_vels = jax.lax.cond(
                 intr_masses > nodes.small_mass_cutoff,
@@ -0,0 +1,371 @@
+"""Implementation of the implicit Update Stress Last (USL) Material Point Method (MPM).
+
+The nodal velocities at the end of a step are solved for with a matrix-free
+Newton-Krylov method, so that the time step is not limited by the wave speed
+of the materials, e.g., for quasi-static problems.
+
+References:
+    - Charlton, Tobias J., William M. Coombs, and Charles E. Augarde. 'iGIMP:
+    An implicit generalised interpolation material point method for large
+    deformations.'
+    - Knoll, Dana A., and David E. Keyes. 'Jacobian-free Newton-Krylov
+    methods: a survey of approaches and applications.'
+"""
+
+import enum
+from typing import List
+from typing_extensions import Self
+
+import chex
+import jax
+import jax.numpy as jnp
+
+from ..forces.forces import Forces
+from ..materials.material import Material
+from ..nodes.nodes import Nodes
+from ..particles.particles import Particles
+from ..shapefunctions.shapefunctions import ShapeFunction
+from .solver import get_p2g_backend
+from .usl import USL
+
+
+class LinearSolver(enum.IntEnum):
+    """Enumerated Krylov solver, see `get_linear_solver`.
+
+    Static pytree node, so only the selected solver is traced.
+    """
+
+    GMRES = 0
+    CG = 1
+
+
+jax.tree_util.register_static(LinearSolver)
+
+
+def get_linear_solver(linear_solver: str) -> LinearSolver:
+    """Get the enumerated Krylov solver of the Newton iterations.
+
+    Supported solvers:
+        "gmres": GMRES, see `jax.scipy.sparse.linalg.gmres`.
+        "cg": Conjugate gradient, see `jax.scipy.sparse.linalg.cg`. Only
+            converges for symmetric Jacobians, e.g., elastic materials
+            without constrained nodes.
+    """
+    if linear_solver == "gmres":
+        return LinearSolver.GMRES
+    elif linear_solver == "cg":
+        return LinearSolver.CG
+    raise ValueError("Invalid linear solver")
+
+
+@chex.dataclass
+class USL_Implicit(USL):
+    """Implicit Update Stress Last (USL) Material Point Method (MPM) solver.
+
+    Each step solves for the nodal velocities `v` at the end of the step
+    (backward Euler), such that the nodal residual
+
+    $$
+    R(v) = m v - \\Phi(m v_n + \\Delta t f(v))
+    $$
+
+    vanishes, where `f(v)` are the nodal forces from the particle stresses
+    updated with the velocity gradient of `v`, and `\\Phi` applies the forces
+    of the `forces_stack` (e.g., gravity and boundaries) as in `USL`. The
+    residual is evaluated with the `USL` transfers, and Jacobian-vector
+    products are taken through the material updates with `jax.linearize`.
+    The Newton updates are solved with a Krylov method preconditioned by the
+    inverse nodal masses, and are shortened by backtracking until the
+    residual norm decreases.
+
+    The time step is not limited by the wave speed, but by the convergence
+    of the material return mappings for large strain increments, e.g., of
+    `ModifiedCamClay` near zero pressure.
+
+    Attributes:
+        alpha: FLIP-PIC ratio
+        dt: time step of the solver
+        sort_every: Sort particles by cell hash every nth step, see
+            `Solver.sort_particles`. Sorting is disabled if `None`.
+        p2g_backend: Enumerated backend to sum interactions to nodes,
+            see `get_p2g_backend`.
+        linear_solver: Enumerated Krylov solver, see `get_linear_solver`.
+        newton_rtol: Tolerance of the residual norm, relative to the larger
+            of the residual norm at the start of the step and the norm of the
+            nodal impulse of the particle stresses and forces.
+        newton_atol: Absolute tolerance of the residual norm.
+        newton_maxiter: Maximum number of Newton iterations per step.
+        krylov_tol: Relative tolerance of the Krylov solver.
+        krylov_maxiter: Maximum number of Krylov iterations per Newton
+            iteration.
+        line_search_maxiter: Maximum number of halvings of a Newton step,
+            until the residual norm decreases.
+        newton_iterations: Number of Newton iterations of the last step.
+        residual_norm: Residual norm at the end of the last step.
+
+    Example:
+    >>> import pymudokon as pm
+    >>> # time step well above the explicit stable time step
+    >>> solver = pm.USL_Implicit.create(alpha=0.0, dt=0.01)
+    """
+
+    linear_solver: LinearSolver = LinearSolver.GMRES
+    newton_rtol: jnp.float32 = 1e-4
+    newton_atol: jnp.float32 = 0.0
+    newton_maxiter: jnp.int32 = 10
+    krylov_tol: jnp.float32 = 1e-4
+    krylov_maxiter: jnp.int32 = 100
+    line_search_maxiter: jnp.int32 = 8
+    newton_iterations: jnp.int32 = 0
+    residual_norm: jnp.float32 = 0.0
+
+    @classmethod
+    def create(
+        cls,
+        alpha: jnp.float32 = 0.0,
+        dt: jnp.float32 = 0.001,
+        sort_every: jnp.int32 = None,
+        p2g_backend: str = "scatter_add",
+        linear_solver: str = "gmres",
+        newton_rtol: jnp.float32 = 1e-4,
+        newton_atol: jnp.float32 = 0.0,
+        newton_maxiter: jnp.int32 = 10,
+        krylov_tol: jnp.float32 = 1e-4,
+        krylov_maxiter: jnp.int32 = 100,
+        line_search_maxiter: jnp.int32 = 8,
+    ):
+        """Create a new instance of the implicit USL solver.
+
+        Args:
+            alpha: FLIP-PIC ratio. Defaults to 0.0 (PIC), which damps the
+                large time steps.
+            dt: Time step.
+            sort_every: Sort particles by cell hash every nth step.
+            p2g_backend: "scatter_add" or "segment_sum".
+            linear_solver: "gmres" or "cg".
+            newton_rtol: Relative tolerance of the residual norm.
+            newton_atol: Absolute tolerance of the residual norm.
+            newton_maxiter: Maximum number of Newton iterations per step.
+            krylov_tol: Relative tolerance of the Krylov solver.
+            krylov_maxiter: Maximum number of Krylov iterations per Newton
+                iteration.
+            line_search_maxiter: Maximum number of halvings of a Newton step.
+        """
+        return USL_Implicit(
+            alpha=alpha,
+            dt=dt,
+            sort_every=sort_every,
+            p2g_backend=get_p2g_backend(p2g_backend),
+            linear_solver=get_linear_solver(linear_solver),
+            newton_rtol=newton_rtol,
+            newton_atol=newton_atol,
+            newton_maxiter=jnp.int32(newton_maxiter),
+            krylov_tol=krylov_tol,
+            krylov_maxiter=jnp.int32(krylov_maxiter),
+            line_search_maxiter=jnp.int32(line_search_maxiter),
+            newton_iterations=jnp.int32(0),
+            residual_norm=jnp.float32(0.0),
+        )
+
+    def update(
+        self: Self,
+        particles: Particles,
+        nodes: Nodes,
+        shapefunctions: ShapeFunction,
+        material_stack: List[Material],
+        forces_stack: List[Forces],
+        step: int,
+        axis_name: str = None,
+    ):
+        """Perform a single update step of the implicit USL solver.
+
+        If `axis_name` is given, particles are split over that mapped device
+        axis and nodes are summed over it after P2G, see `run_solver_sharded`.
+        """
+        nodes = nodes.refresh()
+        particles = particles.refresh()
+
+        self, particles, material_stack = self.sort_particles_every(
+            particles, nodes, material_stack, step
+        )
+
+        particles_prev = particles
+
+        # Interactions are not kept between steps if fused, see `ShapeFunction.fuse`
+        is_fused = shapefunctions.is_fused()
+
+        nodes, shapefunctions, shapefunctions_calc = self.activate_shapefunctions(
+            particles, nodes, shapefunctions, forces_stack
+        )
+
+        p2g, g2p = (self.p2g_fused, self.g2p_fused) if is_fused else (self.p2g, self.g2p)
+
+        # Masses and moments at the start of the step
+        nodes = p2g(particles=particles, nodes=nodes, shapefunctions=shapefunctions)
+
+        if axis_name is not None:
+            nodes = nodes.psum(axis_name)
+
+        is_mass_stack = (nodes.mass_stack > nodes.small_mass_cutoff)[:, None]
+
+        mass_stack = jnp.where(is_mass_stack, nodes.mass_stack[:, None], 1.0)
+
+        def get_residual(velocity_nt_stack):
+            """Get the nodal residual of forward velocities, and the next state."""
+            particles_next = g2p(
+                particles=particles,
+                nodes=nodes.replace(moment_nt_stack=mass_stack * velocity_nt_stack),
+                shapefunctions=shapefunctions,
+            )
+
+            particles_next = self.keep_inactive(
+                particles_prev.active_mask_stack, particles_next, particles_prev
+            )
+
+            particles_next, material_stack_next = self.update_materials(
+                particles_next, material_stack
+            )
+
+            # Forces at the end of the step, on the interactions of the start
+            nodes_next = p2g(
+                particles=particles.replace(
+                    stress_stack=particles_next.stress_stack,
+                    volume_stack=particles_next.volume_stack,
+                ),
+                nodes=nodes,
+                shapefunctions=shapefunctions,
+            )
+
+            if axis_name is not None:
+                nodes_next = nodes_next.psum(axis_name)
+
+            forces_stack_next = []
+            for forces in forces_stack:
+                nodes_next, forces = forces.apply_on_nodes_moments(
+                    particles=particles,
+                    nodes=nodes_next,
+                    shapefunctions=shapefunctions,
+                    dt=self.dt,
+                    step=step,
+                )
+                forces_stack_next.append(forces)
+
+            # Nodes without mass keep zero velocity
+            residual_stack = jnp.where(
+                is_mass_stack,
+                mass_stack * velocity_nt_stack - nodes_next.moment_nt_stack,
+                velocity_nt_stack,
+            )
+
+            return residual_stack, (
+                particles_next,
+                nodes_next,
+                material_stack_next,
+                forces_stack_next,
+            )
+
+        def get_residual_stack(velocity_nt_stack):
+            return get_residual(velocity_nt_stack)[0]
+
+        def precondition(residual_stack):
+            return residual_stack / mass_stack
+
+        if self.linear_solver == LinearSolver.CG:
+            linear_solver = jax.scipy.sparse.linalg.cg
+        else:
+            linear_solver = jax.scipy.sparse.linalg.gmres
+
+        def newton_step(carry):
+            iteration, velocity_nt_stack, residual_norm = carry
+
+            residual_stack, jvp_fn = jax.linearize(
+                get_residual_stack, velocity_nt_stack
+            )
+
+            delta_velocity_stack, _ = linear_solver(
+                jvp_fn,
+                -residual_stack,
+                tol=self.krylov_tol,
+                maxiter=self.krylov_maxiter,
+                M=precondition,
+            )
+
+            def get_step_norm(step_size):
+                return jnp.linalg.norm(
+                    get_residual_stack(
+                        velocity_nt_stack + step_size * delta_velocity_stack
+                    )
+                )
+
+            def line_search_step(carry):
+                line_search_iteration, step_size, _ = carry
+                step_size = 0.5 * step_size
+                return line_search_iteration + 1, step_size, get_step_norm(step_size)
+
+            def is_insufficient(carry):
+                line_search_iteration, step_size, step_norm = carry
+                # also backtracks from steps with NaN residuals
+                is_decrease = step_norm <= (1.0 - 1e-4 * step_size) * residual_norm
+                return (line_search_iteration < self.line_search_maxiter) & (
+                    ~is_decrease
+                )
+
+            # Backtrack from the full Newton step until the residual decreases
+            _, step_size, residual_norm = jax.lax.while_loop(
+                is_insufficient,
+                line_search_step,
+                (jnp.int32(0), jnp.float32(1.0), get_step_norm(1.0)),
+            )
+
+            velocity_nt_stack = velocity_nt_stack + step_size * delta_velocity_stack
+
+            return iteration + 1, velocity_nt_stack, residual_norm
+
+        # Start from the velocities at the start of the step
+        velocity_stack = jnp.where(is_mass_stack, nodes.moment_stack / mass_stack, 0.0)
+
+        residual_norm = jnp.linalg.norm(get_residual_stack(velocity_stack))
+
+        # Relative to the impulse of the stresses, which does not vanish at rest
+        impulse_norm = jnp.linalg.norm(
+            jnp.where(is_mass_stack, nodes.moment_nt_stack - nodes.moment_stack, 0.0)
+        )
+
+        tolerance = (
+            self.newton_rtol * jnp.maximum(residual_norm, impulse_norm)
+            + self.newton_atol
+        )
+
+        newton_iterations, velocity_nt_stack, residual_norm = jax.lax.while_loop(
+            lambda carry: (carry[0] < self.newton_maxiter) & (carry[2] > tolerance),
+            newton_step,
+            (jnp.int32(0), velocity_stack, residual_norm),
+        )
+
+        _, (particles, nodes, new_material_stack, new_forces_stack) = get_residual(
+            velocity_nt_stack
+        )
+
+        particles = self.keep_inactive(
+            particles_prev.active_mask_stack, particles, particles_prev
+        )
+        new_material_stack = self.keep_inactive(
+            particles_prev.active_mask_stack, new_material_stack, material_stack
+        )
+
+        particles, new_material_stack, new_forces_stack = (
+            self.apply_forces_on_particles(
+                particles, new_material_stack, new_forces_stack, step
+            )
+        )
+
+        return (
+            self.replace(
+                newton_iterations=newton_iterations, residual_norm=residual_norm
+            ),
+            particles,
+            nodes,
+            shapefunctions.get_next_step(shapefunctions_calc, is_fused),
+            new_material_stack,
+            new_forces_stack,
+        )
@@ -0,0 +1,233 @@
+"""Checkpoint and restart the full solver state.
+
+Each checkpoint is a directory `step_<step>/` holding one `.npy` file per
+array leaf of the state pytree and a `manifest.json` with the format
+version, the step, and the path, shape and data type of every leaf.
+Checkpoints are written to a temporary directory first and renamed when
+complete, so an interrupted write never replaces a valid checkpoint.
+"""
+
+import dataclasses
+import json
+import os
+import shutil
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, List, Tuple
+
+import jax
+import numpy as np
+
+CHECKPOINT_FORMAT_VERSION = 1
+
+
+def get_leaf_path_stack(state: Any) -> Tuple[List[str], List[Any], Any]:
+    """Flatten a pytree into leaf paths, leaves and the tree definition."""
+    path_leaf_stack, treedef = jax.tree_util.tree_flatten_with_path(state)
+
+    path_stack = [jax.tree_util.keystr(path) for path, _ in path_leaf_stack]
+    leaf_stack = [leaf for _, leaf in path_leaf_stack]
+
+    return path_stack, leaf_stack, treedef
+
+
+def write_checkpoint(
+    directory: str, step: int, path_stack: List[str], leaf_stack: List[np.ndarray]
+):
+    """Write the leaves of one checkpoint and its manifest."""
+    checkpoint_directory = os.path.join(directory, f"step_{step:09d}")
+    tmp_directory = checkpoint_directory + ".tmp"
+
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    os.makedirs(tmp_directory)
+
+    leaves = []
+    for leaf_id, (path, leaf) in enumerate(zip(path_stack, leaf_stack)):
+        file_name = f"leaf_{leaf_id:05d}.npy"
+        np.save(os.path.join(tmp_directory, file_name), leaf)
+        leaves.append(
+            dict(
+                path=path,
+                file=file_name,
+                shape=list(leaf.shape),
+                dtype=leaf.dtype.str,
+            )
+        )
+
+    with open(os.path.join(tmp_directory, "manifest.json"), "w") as handle:
+        json.dump(
+            dict(version=CHECKPOINT_FORMAT_VERSION, step=step, leaves=leaves),
+            handle,
+            indent=1,
+        )
+
+    shutil.rmtree(checkpoint_directory, ignore_errors=True)
+    os.replace(tmp_directory, checkpoint_directory)
+
+
+@dataclasses.dataclass(eq=False)
+class CheckpointManager:
+    """Write checkpoints of the solver state asynchronously and restore them.
+
+    Can be used as `callback` of `run_solver_io`, which passes the full state
+    `(solver, particles, nodes, shapefunctions, material_stack, forces_stack)`
+    to the host every `store_every` steps. The leaves are written on a host
+    thread, and only the last `max_to_keep` checkpoints are kept.
+
+    Attributes:
+        directory: Checkpoint directory.
+        max_to_keep: Number of checkpoints to keep.
+        save_every: Only save states of steps that are a multiple of this.
+        executor: Single thread writing the checkpoints in order.
+        futures: Pending writes.
+
+    Example:
+    >>> import pymudokon as pm
+    >>> manager = pm.CheckpointManager.create("checkpoints", max_to_keep=2)
+    >>> carry = pm.run_solver_io(..., callback=manager)
+    >>> manager.wait()
+    >>> # ... later, with `carry` of the same structure, e.g., from
+    >>> # `jax.eval_shape`
+    >>> step, carry = manager.restore(carry)
+    >>> carry = pm.run_solver_io(*carry, ..., start_step=step)
+    """
+
+    directory: str
+    max_to_keep: int
+    save_every: int
+    executor: ThreadPoolExecutor
+    futures: List[Future]
+
+    @classmethod
+    def create(cls, directory: str, max_to_keep: int = 3, save_every: int = 1):
+        """Create a checkpoint manager.
+
+        Args:
+            directory: Checkpoint directory, created if it does not exist.
+            max_to_keep (optional): Number of checkpoints to keep, defaults to 3.
+            save_every (optional): Only save states of steps that are a
+                multiple of this, defaults to 1.
+
+        Returns:
+            CheckpointManager: Checkpoint manager.
+        """
+        os.makedirs(directory, exist_ok=True)
+
+        return cls(
+            directory=directory,
+            max_to_keep=max_to_keep,
+            save_every=save_every,
+            executor=ThreadPoolExecutor(max_workers=1),
+            futures=[],
+        )
+
+    def __call__(self, state: Any, step: int):
+        """Save a state if `step` is a multiple of `save_every`."""
+        step = int(step)
+        if step % self.save_every == 0:
+            self.save(step, state)
+
+    def save(self, step: int, state: Any):
+        """Copy the leaves of a state to the host and write them in the background.
+
+        Args:
+            step: Step of the state.
+            state: Any pytree of arrays, e.g., the carry of `run_solver_io`.
+        """
+        path_stack, leaf_stack, _ = get_leaf_path_stack(state)
+
+        # Python scalars are stored with the types JAX converts them to
+        leaf_stack = [
+            np.array(leaf, dtype=jax.dtypes.canonicalize_dtype(np.result_type(leaf)))
+            for leaf in leaf_stack
+        ]
+
+        self.futures = [future for future in self.futures if not future.done()]
+
+        self.futures.append(
+            self.executor.submit(self.write, int(step), path_stack, leaf_stack)
+        )
+
+    def write(self, step: int, path_stack: List[str], leaf_stack: List[np.ndarray]):
+        """Write a checkpoint and remove the oldest ones beyond `max_to_keep`."""
+        write_checkpoint(self.directory, step, path_stack, leaf_stack)
+
+        for old_step in self.get_steps()[: -self.max_to_keep]:
+            shutil.rmtree(os.path.join(self.directory, f"step_{old_step:09d}"))
+
+    def wait(self):
+        """Wait for pending callbacks and writes."""
+        jax.effects_barrier()
+
+        for future in self.futures:
+            future.result()
+
+        self.futures = []
+
+    def get_steps(self) -> List[int]:
+        """Get the steps of all complete checkpoints in ascending order."""
+        return sorted(
+            int(name[len("step_") :])
+            for name in os.listdir(self.directory)
+            if name.startswith("step_") and not name.endswith(".tmp")
+        )
+
+    def restore(self, state: Any, step: int = None) -> Tuple[int, Any]:
+        """Restore a checkpoint into a pytree of the same structure.
+
+        Array leaves are memory-mapped and checked against the shape and
+        data type of the leaves of `state`, so a jitted solver compiled for
+        `state` is reused. Python scalars in `state` are restored as Python
+        scalars.
+
+        Args:
+            state: Pytree of the same structure as the saved state. Leaves
+                may be arrays or `jax.ShapeDtypeStruct`, e.g., from
+                `jax.eval_shape`.
+            step (optional): Step to restore, defaults to the latest.
+
+        Returns:
+            Tuple: Step, and the restored state.
+        """
+        if step is None:
+            step_stack = self.get_steps()
+            if not step_stack:
+                raise FileNotFoundError(f"No checkpoints in {self.directory}")
+            step = step_stack[-1]
+
+        checkpoint_directory = os.path.join(self.directory, f"step_{step:09d}")
+
+        with open(os.path.join(checkpoint_directory, "manifest.json")) as handle:
+            manifest = json.load(handle)
+
+        if manifest["version"] != CHECKPOINT_FORMAT_VERSION:
+            raise ValueError(
+                f"Checkpoint format version {manifest['version']} is not supported"
+            )
+
+        path_stack, leaf_stack, treedef = get_leaf_path_stack(state)
+
+        if path_stack != [leaf["path"] for leaf in manifest["leaves"]]:
+            raise ValueError("Checkpoint does not match the structure of the state")
+
+        restored_leaf_stack = []
+        for leaf, leaf_manifest in zip(leaf_stack, manifest["leaves"]):
+            stack = np.load(
+                os.path.join(checkpoint_directory, leaf_manifest["file"]),
+                mmap_mode="r",
+            )
+
+            if isinstance(leaf, (bool, int, float)):
+                restored_leaf_stack.append(type(leaf)(stack))
+                continue
+
+            if stack.shape != tuple(leaf.shape) or stack.dtype != leaf.dtype:
+                raise ValueError(
+                    f"Checkpoint leaf {leaf_manifest['path']} of shape "
+                    f"{stack.shape} and type {stack.dtype} does not match "
+                    f"{tuple(leaf.shape)} and {leaf.dtype}"
+                )
+            restored_leaf_stack.append(stack)
+
+        return manifest["step"], jax.tree_util.tree_unflatten(
+            treedef, restored_leaf_stack
+        )
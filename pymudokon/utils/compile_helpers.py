@@ -0,0 +1,162 @@
+"""Ahead-of-time compilation of solver runs with an executable cache.
+
+Compiled executables are serialized to `<cache_dir>/<function>-<key>.pkl`,
+where the key hashes the signature of the run: the tree structure (solver,
+shape function, material and forces classes), shape and data type of every
+array leaf (e.g., the number of particles), the static arguments, the JAX
+version and the device.
+"""
+
+import hashlib
+import os
+import pickle
+import warnings
+from typing import Any, Callable, Dict
+
+import jax
+import numpy as np
+from jax.api_util import shaped_abstractify
+from jax.experimental import serialize_executable
+
+
+def enable_compilation_cache(
+    cache_dir: str, min_compile_time_secs: float = 1.0
+):
+    """Enable the persistent XLA compilation cache of JAX.
+
+    Every jitted function that takes longer than `min_compile_time_secs` to
+    compile is cached on disk, so later runs skip its compilation.
+
+    Args:
+        cache_dir: Cache directory.
+        min_compile_time_secs (optional): Minimum compile time of cached
+            functions, defaults to 1 second.
+    """
+    jax.config.update("jax_compilation_cache_dir", cache_dir)
+    jax.config.update(
+        "jax_persistent_cache_min_compile_time_secs", min_compile_time_secs
+    )
+
+
+def get_static_signature(value: Any) -> str:
+    """Get a signature of a static argument that is stable across processes."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return repr(value)
+    if isinstance(value, (tuple, list)):
+        return "(" + ",".join(get_static_signature(item) for item in value) + ")"
+    if callable(value) and hasattr(value, "__qualname__"):
+        return f"{value.__module__}.{value.__qualname__}"
+    # Objects with the default repr include their address, so they are never
+    # matched between processes rather than matched by type only
+    return f"{type(value).__module__}.{type(value).__qualname__}:{value!r}"
+
+
+def get_run_signature(
+    run_fn: Callable, args: tuple, static_kwargs: Dict[str, Any]
+) -> str:
+    """Get the signature of a solver run, see `compile_solver`.
+
+    Array leaves of `args` are keyed by their shape and data type. Other
+    leaves, e.g., static arguments passed by position such as `num_steps`,
+    are keyed by their value, since `run_fn` may be specialized on them.
+
+    Args:
+        run_fn: Jitted run function, e.g., `run_solver`.
+        args: Positional arguments, e.g., solver, particles, nodes, shape
+            functions, materials and forces.
+        static_kwargs: Keyword arguments, e.g., `num_steps`.
+
+    Returns:
+        str: Hash of the signature.
+    """
+    path_leaf_stack, treedef = jax.tree_util.tree_flatten_with_path(args)
+
+    device = jax.devices()[0]
+
+    signature = [
+        getattr(run_fn, "__qualname__", repr(run_fn)),
+        str(treedef),
+        jax.__version__,
+        device.platform,
+        device.device_kind,
+    ]
+
+    for path, leaf in path_leaf_stack:
+        if isinstance(leaf, (jax.Array, np.ndarray, np.generic)):
+            leaf_signature = shaped_abstractify(leaf)
+        else:
+            leaf_signature = get_static_signature(leaf)
+        signature.append(f"{jax.tree_util.keystr(path)}:{leaf_signature}")
+
+    for key in sorted(static_kwargs):
+        signature.append(f"{key}={get_static_signature(static_kwargs[key])}")
+
+    return hashlib.sha256("\n".join(signature).encode()).hexdigest()[:32]
+
+
+def compile_solver(
+    run_fn: Callable, *args, cache_dir: str = None, **static_kwargs
+) -> jax.stages.Compiled:
+    """Lower and compile a solver run ahead of time, or load it from a cache.
+
+    The compiled executable is called with the non-static positional
+    arguments only, e.g., `compiled(solver, particles, nodes, shapefunctions,
+    material_stack, forces_stack)`. Calling it with arguments of a different structure,
+    shape or data type raises an error instead of recompiling.
+
+    Executables with host callbacks cannot be serialized, and are compiled
+    without caching. This includes `run_solver` with `store_every > 1`, which
+    prints the progress, and `run_solver_io` with a `callback`.
+
+    Args:
+        run_fn: Jitted run function, e.g., `run_solver` or `run_solver_io`.
+        *args: Positional arguments of `run_fn`, e.g., solver, particles,
+            nodes, shape functions, materials and forces.
+        cache_dir (optional): Directory of serialized executables, defaults
+            to no caching.
+        **static_kwargs: Static arguments of `run_fn`, e.g., `num_steps`,
+            `store_every` or `particles_output`.
+
+    Returns:
+        jax.stages.Compiled: Compiled executable.
+
+    Example:
+    >>> import pymudokon as pm
+    >>> run = pm.compile_solver(
+    ...     pm.run_solver, solver, particles, nodes, shapefunctions,
+    ...     material_stack, forces_stack, cache_dir="cache", num_steps=1000,
+    ... )
+    >>> carry, accumulate = run(
+    ...     solver, particles, nodes, shapefunctions, material_stack, forces_stack
+    ... )
+    """
+    if cache_dir is not None:
+        key = get_run_signature(run_fn, args, static_kwargs)
+
+        file_path = os.path.join(
+            cache_dir, f"{getattr(run_fn, '__name__', 'run')}-{key}.pkl"
+        )
+
+        if os.path.exists(file_path):
+            with open(file_path, "rb") as handle:
+                return serialize_executable.deserialize_and_load(*pickle.load(handle))
+
+    compiled = run_fn.lower(*args, **static_kwargs).compile()
+
+    if cache_dir is None:
+        return compiled
+
+    try:
+        payload = pickle.dumps(serialize_executable.serialize(compiled))
+    except TypeError:
+        warnings.warn("Executables with host callbacks are not cached")
+        return compiled
+
+    os.makedirs(cache_dir, exist_ok=True)
+
+    with open(file_path + ".tmp", "wb") as handle:
+        handle.write(payload)
+
+    os.replace(file_path + ".tmp", file_path)
+
+    return compiled
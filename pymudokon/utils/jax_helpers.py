@@ -1,12 +1,16 @@
+import dataclasses
 import operator
 import jax.numpy as jnp
 import jax
+from jax.sharding import PartitionSpec
 
 
 def simple_warning(condition: jnp.bool_, place: str, message: str):
+    # strings are not valid JAX types, so they go into the format string
+    text = f"{place}: {message}".replace("{", "{{").replace("}", "}}")
     jax.lax.cond(
         condition,
-        lambda: jax.debug.print("{}: {}", place, message),
+        lambda: jax.debug.print(text),
         lambda: None,
     )
 
@@ -35,6 +39,10 @@ def dump_restart_files(
     suffix="",
     directory=None,
 ):
+    """Pickle solver objects, one file per object.
+
+    See `CheckpointManager` for versioned checkpoints written asynchronously.
+    """
     import pickle
 
     if directory is None:
@@ -63,6 +71,185 @@ def dump_restart_files(
         dump(forces_stack, "forces_stack")
 
 
+def permute_particle_stacks(
+    obj, permutation: jnp.ndarray, num_particles: int = None
+):
+    """Permute all per-particle arrays of a dataclass.
+
+    Per-particle arrays are entries ending with `_stack` whose leading
+    dimension is the number of particles, e.g., `Particles.position_stack`,
+    `ModifiedCamClay.p_c_stack` or `USL_APIC.Bp_stack`.
+
+    Args:
+        obj: Chex dataclass e.g., particles, a material or a solver.
+        permutation: Gather ids of the new order `(num_particles,)`.
+        num_particles (optional): Number of particles of `obj`, if
+            `permutation` selects a different number of particles. Defaults
+            to the length of `permutation`.
+
+    Returns:
+        The dataclass with permuted per-particle arrays.
+    """
+    if num_particles is None:
+        num_particles = permutation.shape[0]
+
+    permuted = {}
+    for key in obj:
+        stack = obj[key]
+        if not key.endswith("_stack") or not hasattr(stack, "shape"):
+            continue
+        if (stack.ndim == 0) or (stack.shape[0] != num_particles):
+            continue
+        permuted[key] = stack.at[permutation].get()
+
+    return obj.replace(**permuted)
+
+
+def scatter_particle_stacks(obj, id_stack: jnp.ndarray, source):
+    """Set per-particle arrays of a dataclass from another of the same type.
+
+    Inverse of `permute_particle_stacks`, i.e., entry `i` of each per-particle
+    array of `source` is written to entry `id_stack[i]` of `obj`. Out of range
+    ids are dropped.
+
+    Args:
+        obj: Chex dataclass to write to.
+        id_stack: Target ids, one per particle of `source`.
+        source: Chex dataclass to read from.
+
+    Returns:
+        The dataclass with updated per-particle arrays.
+    """
+    num_particles = id_stack.shape[0]
+
+    updated = {}
+    for key in source:
+        stack = source[key]
+        if not key.endswith("_stack") or not hasattr(stack, "shape"):
+            continue
+        if (stack.ndim == 0) or (stack.shape[0] != num_particles):
+            continue
+        updated[key] = obj[key].at[id_stack].set(stack, mode="drop")
+
+    return obj.replace(**updated)
+
+
+def select_particle_stacks(active_mask_stack: jnp.ndarray, obj, obj_prev):
+    """Select per-particle arrays of active particles from one of two dataclasses.
+
+    Args:
+        active_mask_stack: Active particles `(num_particles,)`.
+        obj: Chex dataclass to take active particles from.
+        obj_prev: Chex dataclass of the same type to take inactive particles
+            from.
+
+    Returns:
+        The dataclass `obj` with per-particle arrays of inactive particles
+        from `obj_prev`.
+    """
+    num_particles = active_mask_stack.shape[0]
+
+    selected = {}
+    for key in obj:
+        stack = obj[key]
+        if not key.endswith("_stack") or not hasattr(stack, "shape"):
+            continue
+        if (stack.ndim == 0) or (stack.shape[0] != num_particles):
+            continue
+        mask_stack = active_mask_stack.reshape((-1,) + (1,) * (stack.ndim - 1))
+        selected[key] = jnp.where(mask_stack, stack, obj_prev[key])
+
+    return obj.replace(**selected)
+
+
+def get_particle_partition_spec(obj, num_particles: int, axis_name: str):
+    """Get partition specs that split the per-particle arrays of a dataclass.
+
+    Entries ending with `_stack` whose leading dimension is a multiple of the
+    number of particles are split over `axis_name`. This includes interaction
+    arrays of shape functions `(num_particles*stencil_size, ...)`. All other
+    entries are replicated.
+
+    Args:
+        obj: Chex dataclass e.g., particles, shape functions, a material or a
+            solver.
+        num_particles: Total number of particles.
+        axis_name: Name of the mesh axis to split particles over.
+
+    Returns:
+        The dataclass with `PartitionSpec` entries, to be used as `shard_map`
+        specs.
+    """
+    specs = {}
+    for field in dataclasses.fields(obj):
+        stack = getattr(obj, field.name)
+        if stack is None:
+            continue
+        if (
+            field.name.endswith("_stack")
+            and hasattr(stack, "shape")
+            and stack.ndim > 0
+            and stack.shape[0] % num_particles == 0
+        ):
+            specs[field.name] = PartitionSpec(axis_name)
+        else:
+            specs[field.name] = PartitionSpec()
+
+    return obj.replace(**specs)
+
+
+def unsort_particle_stack(stack: jnp.ndarray, id_stack: jnp.ndarray):
+    """Return a per-particle array in the original particle id order.
+
+    Args:
+        stack: Per-particle array in (possibly) sorted order.
+        id_stack: Original particle ids, see `Particles.id_stack`.
+
+    Returns:
+        Array ordered by original particle id.
+    """
+    return jnp.zeros_like(stack).at[id_stack].set(stack)
+
+
+def is_sorted_particle_stack(obj, key: str) -> bool:
+    """Check if an entry is a per-particle array sorted with the particles.
+
+    These are the entries ending with `_stack` of particles, and of materials
+    that do not own their particles. Materials owning their particles keep
+    the order of the particle ids, see `Material.assign_particles`.
+
+    Args:
+        obj: Particles or a material.
+        key: Entry of `obj`, e.g., an output key.
+
+    Returns:
+        bool: Whether `key` of `obj` is reordered by `Solver.sort_particles`.
+    """
+    stack = obj.get(key)
+
+    if not key.endswith("_stack") or not hasattr(stack, "shape"):
+        return False
+
+    if key == "particle_id_stack" or stack.ndim == 0:
+        return False
+
+    return obj.get("particle_id_stack") is None
+
+
+def stack_ensemble(members):
+    """Stack states of ensemble members along a leading ensemble axis.
+
+    Args:
+        members: List of states of the same structure and shapes, e.g.,
+            particles of each member of an ensemble.
+
+    Returns:
+        State with every array stacked along a new leading axis, see
+        `run_solver_ensemble`.
+    """
+    return jax.tree_util.tree_map(lambda *stacks: jnp.stack(stacks), *members)
+
+
 def scan_kth(f, init, xs=None, reverse=False, unroll=1, store_every=1):
     """https://github.com/google/jax/discussions/12157"""
     store_every = operator.index(store_every)
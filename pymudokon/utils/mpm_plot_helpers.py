@@ -46,20 +46,16 @@ class PvPointHelper:
         if scalar_stack is not None:
             timeseries_options.setdefault("scalars",scalar_name)
         
+        # frames are converted one by one, so `position_stack` may be a
+        # `LazyFrameStack` read from disk
         num_frames, num_points, dim = position_stack.shape
-        if dim == 3:
-            position_stack = np.array(position_stack)
-        elif dim == 2:
-            position_stack = np.pad(position_stack, [(0,0),(0, 0), (0, 1)], mode="constant")
+        if dim == 2:
             origin = np.pad(origin,(0,1))
             end = np.pad(end,(0,1))
-        
-        
 
-        
         timeseries = pv.MultiBlock()
         for ti, positions in enumerate(position_stack):
-            polydata =  pv.PolyData(positions)
+            polydata =  pv.PolyData(points_to_3D(positions, dim))
             
             if scalar_stack is not None:
                 polydata.point_data[scalar_name] = scalar_stack[ti]
@@ -0,0 +1,393 @@
+"""Stream solver outputs to disk and read them back lazily.
+
+Frames are written to a directory with one subdirectory per output, e.g.,
+`particles.position_stack/`. Each subdirectory holds `.npy` chunks of
+`frames_per_chunk` consecutive frames, and `step/` holds the step of each
+frame. Chunks are written to a temporary file first and renamed when
+complete, so a directory can be read while a simulation is still running.
+"""
+
+import dataclasses
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Tuple
+
+import jax
+import jax.numpy as jnp
+import numpy as np
+
+from .jax_helpers import is_sorted_particle_stack, unsort_particle_stack
+
+
+def get_output_frame(
+    particles,
+    nodes,
+    material_stack: List,
+    forces_stack: List,
+    particles_output: Tuple[str] = (),
+    nodes_output: Tuple[str] = (),
+    materials_output: Tuple[str] = (),
+    forces_output: Tuple[str] = (),
+    is_sorted: bool = False,
+    particle_id_stack: jax.Array = None,
+) -> Dict[str, jax.Array]:
+    """Get the selected outputs of one step, keyed by source and entry.
+
+    Keys are e.g., `particles.position_stack`, `nodes.mass_stack`,
+    `material0.eps_e_stack` or `forces1.num_removed`, where the number is the
+    position in the material or forces stack. Per-particle arrays (see
+    `is_sorted_particle_stack`) are in the original particle id order if
+    `is_sorted`, and reduced to the particles in `particle_id_stack` if given.
+    """
+
+    def get_particle_stack(obj, key):
+        stack = obj.get(key)
+        if not is_sorted_particle_stack(obj, key):
+            return stack
+        if is_sorted:
+            stack = unsort_particle_stack(stack, particles.id_stack)
+        if particle_id_stack is not None:
+            stack = stack.at[particle_id_stack].get()
+        return stack
+
+    frame = {}
+
+    for key in particles_output:
+        frame[f"particles.{key}"] = get_particle_stack(particles, key)
+
+    for key in nodes_output:
+        frame[f"nodes.{key}"] = nodes.get(key)
+
+    for key in materials_output:
+        for material_id, material in enumerate(material_stack):
+            if key in material:
+                frame[f"material{material_id}.{key}"] = get_particle_stack(
+                    material, key
+                )
+
+    for key in forces_output:
+        for forces_id, forces in enumerate(forces_stack):
+            if key in forces:
+                frame[f"forces{forces_id}.{key}"] = forces.get(key)
+
+    return frame
+
+
+@dataclasses.dataclass
+class OutputSpec:
+    """Declarative selection of the outputs transferred to the host.
+
+    Attributes:
+        particles_output: Entries of the particles e.g., `position_stack`.
+        nodes_output: Entries of the nodes e.g., `mass_stack`.
+        materials_output: Entries of the materials e.g., `eps_e_stack`.
+        forces_output: Entries of the forces e.g., `num_removed`.
+        dtype: Pairs of output key, as in `get_output_frame`, and data type,
+            e.g., `(("particles.position_stack", jnp.float16),)`. Outputs not
+            listed keep their data type.
+        particle_id_stack: Original ids of the particles to output, or `None`
+            to output all particles.
+
+    Example:
+    >>> import pymudokon as pm
+    >>> import jax.numpy as jnp
+    >>> output_spec = pm.OutputSpec.create(
+    ...     particles_output=("position_stack",),
+    ...     dtype={"particles.position_stack": jnp.float16},
+    ...     particle_id_stack=jnp.arange(0, 10000, 10),
+    ... )
+    """
+
+    particles_output: Tuple[str]
+    nodes_output: Tuple[str]
+    materials_output: Tuple[str]
+    forces_output: Tuple[str]
+    dtype: Tuple[Tuple[str, jnp.dtype]]
+    particle_id_stack: jax.Array
+
+    @classmethod
+    def create(
+        cls,
+        particles_output: Tuple[str] = None,
+        nodes_output: Tuple[str] = None,
+        materials_output: Tuple[str] = None,
+        forces_output: Tuple[str] = None,
+        dtype: Dict[str, jnp.dtype] = None,
+        particle_id_stack: jax.Array = None,
+    ):
+        """Create an output spec, unset outputs are empty.
+
+        Args:
+            dtype (optional): Data type of outputs keyed as in
+                `get_output_frame`, e.g., `{"particles.position_stack":
+                jnp.float16}`.
+
+        See `OutputSpec` for the remaining arguments.
+        """
+        return cls(
+            particles_output=particles_output or (),
+            nodes_output=nodes_output or (),
+            materials_output=materials_output or (),
+            forces_output=forces_output or (),
+            dtype=tuple(sorted((dtype or {}).items())),
+            particle_id_stack=particle_id_stack,
+        )
+
+    def get_frame(
+        self,
+        particles,
+        nodes,
+        material_stack: List,
+        forces_stack: List,
+        is_sorted: bool = False,
+    ) -> Dict[str, jax.Array]:
+        """Get the selected outputs of one step, see `get_output_frame`."""
+        frame = get_output_frame(
+            particles,
+            nodes,
+            material_stack,
+            forces_stack,
+            particles_output=self.particles_output,
+            nodes_output=self.nodes_output,
+            materials_output=self.materials_output,
+            forces_output=self.forces_output,
+            is_sorted=is_sorted,
+            particle_id_stack=self.particle_id_stack,
+        )
+
+        for key, dtype in self.dtype:
+            if key in frame:
+                frame[key] = frame[key].astype(dtype)
+
+        return frame
+
+
+# Output keys and data types are static, particle ids are traced
+jax.tree_util.register_dataclass(
+    OutputSpec,
+    data_fields=["particle_id_stack"],
+    meta_fields=[
+        "particles_output",
+        "nodes_output",
+        "materials_output",
+        "forces_output",
+        "dtype",
+    ],
+)
+
+
+def write_chunk(directory: str, key: str, chunk_id: int, frame_stack: List):
+    """Stack frames and write them as one `.npy` chunk."""
+    key_directory = os.path.join(directory, key)
+    os.makedirs(key_directory, exist_ok=True)
+
+    file_path = os.path.join(key_directory, f"chunk_{chunk_id:06d}.npy")
+
+    with open(file_path + ".tmp", "wb") as handle:
+        np.save(handle, np.stack(frame_stack))
+
+    os.replace(file_path + ".tmp", file_path)
+
+
+@dataclasses.dataclass(eq=False)
+class OutputWriter:
+    """Write stored frames of a simulation to disk on a host thread pool.
+
+    Used as `output_writer` of `run_solver_io`, which passes the selected
+    outputs of every stored step through `jax.debug.callback`. Frames are
+    buffered on the host and every `frames_per_chunk` frames are written as
+    one chunk per output in the background, so the device loop is only
+    blocked by the device to host copy.
+
+    Attributes:
+        directory: Output directory.
+        frames_per_chunk: Number of frames in each chunk.
+        executor: Thread pool writing the chunks.
+        buffer: Frames of each output not written yet.
+        futures: Pending chunk writes.
+        num_chunks: Number of chunks submitted.
+
+    Example:
+    >>> import pymudokon as pm
+    >>> with pm.OutputWriter.create("output") as writer:
+    ...     carry = pm.run_solver_io(
+    ...         ..., particles_output=("position_stack",), output_writer=writer
+    ...     )
+    >>> reader = pm.OutputReader.create("output")
+    >>> position_stack = reader["particles.position_stack"]
+    """
+
+    directory: str
+    frames_per_chunk: int
+    executor: ThreadPoolExecutor
+    buffer: Dict[str, List[np.ndarray]]
+    futures: List[Future]
+    num_chunks: int = 0
+
+    @classmethod
+    def create(
+        cls, directory: str, frames_per_chunk: int = 16, max_workers: int = 2
+    ):
+        """Create an output writer.
+
+        Args:
+            directory: Output directory, created if it does not exist.
+            frames_per_chunk (optional): Number of frames in each chunk,
+                defaults to 16.
+            max_workers (optional): Number of writer threads, defaults to 2.
+
+        Returns:
+            OutputWriter: Output writer.
+        """
+        os.makedirs(directory, exist_ok=True)
+
+        return cls(
+            directory=directory,
+            frames_per_chunk=frames_per_chunk,
+            executor=ThreadPoolExecutor(max_workers=max_workers),
+            buffer={},
+            futures=[],
+        )
+
+    def __call__(self, frame: Dict[str, np.ndarray], step: int):
+        """Buffer a frame, and submit a chunk write if the buffer is full.
+
+        Args:
+            frame: Arrays of one stored step, keyed by output name.
+            step: Step of the frame.
+        """
+        frame = dict(frame, step=step)
+
+        for key, stack in frame.items():
+            self.buffer.setdefault(key, []).append(np.asarray(stack))
+
+        if len(self.buffer["step"]) >= self.frames_per_chunk:
+            self.flush()
+
+    def flush(self):
+        """Submit writes of all buffered frames."""
+        if not self.buffer.get("step"):
+            return
+
+        for key, frame_stack in self.buffer.items():
+            self.futures.append(
+                self.executor.submit(
+                    write_chunk, self.directory, key, self.num_chunks, frame_stack
+                )
+            )
+
+        self.buffer = {}
+        self.num_chunks += 1
+
+    def close(self):
+        """Wait for pending callbacks, write remaining frames and stop the pool."""
+        jax.effects_barrier()
+
+        self.flush()
+
+        for future in self.futures:
+            future.result()
+
+        self.futures = []
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+@dataclasses.dataclass
+class LazyFrameStack:
+    """Frames of one output, memory-mapped from chunks on access.
+
+    Behaves like a read only array of shape `(num_frames, ...)` for indexing
+    single frames and iterating over frames, e.g., in `PvPointHelper.create`.
+
+    Attributes:
+        file_path_stack: Chunk files in order.
+        chunk_size_stack: Number of frames of each chunk.
+        shape: Shape of the stacked frames.
+        dtype: Data type of the frames.
+    """
+
+    file_path_stack: List[str]
+    chunk_size_stack: List[int]
+    shape: tuple
+    dtype: np.dtype
+
+    @classmethod
+    def create(cls, key_directory: str):
+        """Find the chunks of an output directory."""
+        file_path_stack = sorted(
+            os.path.join(key_directory, file_name)
+            for file_name in os.listdir(key_directory)
+            if file_name.endswith(".npy")
+        )
+
+        chunk_stack = [np.load(path, mmap_mode="r") for path in file_path_stack]
+
+        chunk_size_stack = [chunk.shape[0] for chunk in chunk_stack]
+
+        return cls(
+            file_path_stack=file_path_stack,
+            chunk_size_stack=chunk_size_stack,
+            shape=(sum(chunk_size_stack),) + chunk_stack[0].shape[1:],
+            dtype=chunk_stack[0].dtype,
+        )
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, frame_id: int) -> np.ndarray:
+        """Memory-map a single frame."""
+        if frame_id < 0:
+            frame_id += len(self)
+
+        if not 0 <= frame_id < len(self):
+            raise IndexError("Frame index out of range")
+
+        for file_path, chunk_size in zip(self.file_path_stack, self.chunk_size_stack):
+            if frame_id < chunk_size:
+                return np.load(file_path, mmap_mode="r")[frame_id]
+            frame_id -= chunk_size
+
+    def __iter__(self):
+        for file_path in self.file_path_stack:
+            yield from np.load(file_path, mmap_mode="r")
+
+    def __array__(self, dtype=None):
+        stack = np.concatenate(
+            [np.load(file_path) for file_path in self.file_path_stack]
+        )
+        if dtype is not None:
+            return stack.astype(dtype)
+        return stack
+
+
+@dataclasses.dataclass
+class OutputReader:
+    """Read outputs written by `OutputWriter` lazily.
+
+    Attributes:
+        directory: Output directory.
+        keys: Names of the outputs, e.g., `particles.position_stack`.
+    """
+
+    directory: str
+    keys: List[str]
+
+    @classmethod
+    def create(cls, directory: str):
+        """Create a reader of an output directory."""
+        keys = sorted(
+            key
+            for key in os.listdir(directory)
+            if os.path.isdir(os.path.join(directory, key))
+        )
+        return cls(directory=directory, keys=keys)
+
+    def __getitem__(self, key: str) -> LazyFrameStack:
+        """Get the lazily loaded frames of an output."""
+        return LazyFrameStack.create(os.path.join(self.directory, key))
@@ -0,0 +1,11 @@
+"""Test configuration shared by all test modules."""
+
+import os
+
+# Split the host CPU into several devices, so the sharded and slab solvers
+# exchange data between devices instead of taking the single device path.
+# This must run before jax is imported.
+if "xla_force_host_platform_device_count" not in os.environ.get("XLA_FLAGS", ""):
+    os.environ["XLA_FLAGS"] = (
+        os.environ.get("XLA_FLAGS", "") + " --xla_force_host_platform_device_count=4"
+    ).strip()
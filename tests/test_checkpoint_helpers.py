@@ -0,0 +1,139 @@
+"""Unit tests for the CheckpointManager."""
+
+import json
+import os
+
+import jax
+import jax.numpy as jnp
+import numpy as np
+import pytest
+
+import pymudokon as pm
+
+
+def create_system():
+    particles = pm.Particles.create(
+        position_stack=jnp.array([[0.4, 0.4], [0.5, 0.45], [0.55, 0.6]]),
+        velocity_stack=jnp.array([[1.0, 0.5], [0.0, 1.0], [-0.5, 0.0]]),
+    )
+
+    nodes = pm.Nodes.create(origin=jnp.zeros(2), end=jnp.ones(2), node_spacing=0.1)
+
+    shapefunctions = pm.LinearShapeFunction.create(3, 2)
+
+    particles, nodes, shapefunctions = pm.discretize(
+        particles, nodes, shapefunctions, ppc=1
+    )
+
+    material = pm.ModifiedCamClay.create(
+        nu=0.2,
+        M=1.2,
+        R=1.0,
+        lam=0.1,
+        kap=0.01,
+        Vs=2.0,
+        phi_c=0.6,
+        rho_p=2000.0,
+        stress_ref_stack=jnp.stack([-jnp.eye(3) * 1000.0] * 3),
+        dim=2,
+    )
+
+    return (
+        pm.USL.create(alpha=0.99, dt=0.001, sort_every=4),
+        particles,
+        nodes,
+        shapefunctions,
+        [material],
+        [pm.Gravity.create(gravity=jnp.array([0.0, -9.8]))],
+    )
+
+
+def test_save_restore(tmp_path):
+    """Unit test to save, prune and restore checkpoints."""
+    state = {"a": jnp.arange(4.0), "b": (jnp.ones((2, 3), dtype=jnp.int32), 7)}
+
+    manager = pm.CheckpointManager.create(str(tmp_path), max_to_keep=2)
+
+    for step in [10, 20, 30]:
+        manager.save(step, jax.tree_util.tree_map(lambda x: x * step, state))
+    manager.wait()
+
+    assert manager.get_steps() == [20, 30]
+
+    with open(tmp_path / "step_000000030" / "manifest.json") as handle:
+        manifest = json.load(handle)
+
+    assert manifest["version"] == 1
+    assert [leaf["path"] for leaf in manifest["leaves"]] == [
+        "['a']",
+        "['b'][0]",
+        "['b'][1]",
+    ]
+
+    step, restored = manager.restore(state)
+
+    assert step == 30
+    assert isinstance(restored["a"], np.memmap)
+    assert restored["b"][1] == 210
+    assert isinstance(restored["b"][1], int)
+    np.testing.assert_allclose(restored["a"], jnp.arange(4.0) * 30)
+
+    step, restored = manager.restore(jax.eval_shape(lambda: state), step=20)
+
+    assert step == 20
+    np.testing.assert_array_equal(restored["b"][0], np.ones((2, 3)) * 20)
+
+    with pytest.raises(ValueError):
+        manager.restore({"a": jnp.arange(5.0), "b": state["b"]})
+
+    with pytest.raises(ValueError):
+        manager.restore({"a": state["a"]})
+
+
+def test_resume_run_solver_io(tmp_path):
+    """A run resumed from a checkpoint matches an uninterrupted run."""
+    solver, particles, nodes, shapefunctions, material_stack, forces_stack = (
+        create_system()
+    )
+
+    carry_ref = pm.run_solver_io(
+        solver,
+        particles,
+        nodes,
+        shapefunctions,
+        material_stack,
+        forces_stack,
+        num_steps=20,
+        store_every=5,
+    )
+
+    manager = pm.CheckpointManager.create(str(tmp_path), max_to_keep=1, save_every=10)
+
+    carry = pm.run_solver_io(
+        solver,
+        particles,
+        nodes,
+        shapefunctions,
+        material_stack,
+        forces_stack,
+        num_steps=10,
+        store_every=5,
+        callback=manager,
+    )
+    manager.wait()
+
+    assert manager.get_steps() == [10]
+
+    step, restored = manager.restore(carry)
+
+    assert step == 10
+    assert os.path.isdir(tmp_path / "step_000000010")
+
+    carry = pm.run_solver_io(
+        *restored, num_steps=10, store_every=5, start_step=step
+    )
+
+    for leaf, leaf_ref in zip(
+        jax.tree_util.tree_leaves(carry), jax.tree_util.tree_leaves(carry_ref)
+    ):
+        np.testing.assert_allclose(leaf, leaf_ref, rtol=1e-5, atol=1e-6)
@@ -0,0 +1,105 @@
+"""Unit tests for the ahead-of-time solver compilation."""
+
+import dataclasses
+import os
+
+import jax
+import jax.numpy as jnp
+import numpy as np
+import pytest
+
+import pymudokon as pm
+from pymudokon.utils.compile_helpers import get_run_signature, get_static_signature
+
+
+def create_system(num_particles=3):
+    particles = pm.Particles.create(
+        position_stack=jnp.linspace(0.3, 0.6, num_particles * 2).reshape(-1, 2),
+        velocity_stack=jnp.ones((num_particles, 2)),
+    )
+
+    nodes = pm.Nodes.create(origin=jnp.zeros(2), end=jnp.ones(2), node_spacing=0.1)
+
+    shapefunctions = pm.LinearShapeFunction.create(num_particles, 2)
+
+    particles, nodes, shapefunctions = pm.discretize(
+        particles, nodes, shapefunctions, ppc=1
+    )
+
+    material = pm.LinearIsotropicElastic.create(E=1000.0, nu=0.2)
+
+    return (
+        pm.USL.create(alpha=0.99, dt=0.001),
+        particles,
+        nodes,
+        shapefunctions,
+        [material],
+        [pm.Gravity.create(gravity=jnp.array([0.0, -9.8]))],
+    )
+
+
+def test_compile_solver(tmp_path):
+    """Unit test to compile, cache and load a solver executable."""
+    system = create_system()
+
+    # store_every > 1 prints the progress with a host callback
+    static_kwargs = dict(
+        num_steps=10, store_every=1, particles_output=("position_stack",)
+    )
+
+    compiled = pm.compile_solver(
+        pm.run_solver, *system, cache_dir=str(tmp_path), **static_kwargs
+    )
+
+    file_name_stack = os.listdir(tmp_path)
+    assert len(file_name_stack) == 1
+    assert file_name_stack[0].startswith("run_solver-")
+
+    loaded = pm.compile_solver(
+        pm.run_solver, *system, cache_dir=str(tmp_path), **static_kwargs
+    )
+
+    assert os.listdir(tmp_path) == file_name_stack
+
+    ref = pm.run_solver(*system, **static_kwargs)
+
+    for executable in [compiled, loaded]:
+        for leaf, leaf_ref in zip(
+            jax.tree_util.tree_leaves(executable(*system)),
+            jax.tree_util.tree_leaves(ref),
+        ):
+            np.testing.assert_allclose(leaf, leaf_ref, rtol=1e-6)
+
+    # a different number of particles is a different executable
+    pm.compile_solver(
+        pm.run_solver, *create_system(4), cache_dir=str(tmp_path), **static_kwargs
+    )
+
+    assert len(os.listdir(tmp_path)) == 2
+
+    with pytest.raises(TypeError):
+        loaded(*create_system(4))
+
+
+
+def test_get_run_signature_static():
+    """Unit test that static arguments are keyed by value."""
+    system = create_system()
+
+    signature = get_run_signature(pm.run_solver, (*system, 10), {})
+
+    # static arguments passed by position
+    assert get_run_signature(pm.run_solver, (*system, 10), {}) == signature
+    assert get_run_signature(pm.run_solver, (*system, 20), {}) != signature
+
+    @dataclasses.dataclass(frozen=True)
+    class StaticOption:
+        value: int
+
+    # static objects of the same type
+    assert get_static_signature(StaticOption(1)) == get_static_signature(
+        StaticOption(1)
+    )
+    assert get_static_signature(StaticOption(1)) != get_static_signature(
+        StaticOption(2)
+    )
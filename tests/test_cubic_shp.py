@@ -286,3 +286,37 @@ def test_calc_shp_3d():
     np.testing.assert_allclose(
         expected_shapef_grad_stack, shapefunction.intr_shapef_grad_stack
     )
+
+
+def test_calc_shp_separable():
+    """Separable and per-interaction evaluation give identical results."""
+    for dim in [2, 3]:
+        position_stack = jnp.linspace(0.15, 0.85, 7 * dim).reshape(7, dim)
+
+        shapefunction = pm.CubicShapeFunction.create(num_particles=7, dim=dim)
+
+        args = (
+            jnp.zeros(dim),
+            10.0,
+            jnp.array([11] * dim),
+            position_stack,
+            jnp.zeros(11**dim, dtype=jnp.int32),
+        )
+
+        separable, intr_dist_3d_stack = shapefunction.calculate_shapefunction(
+            *args, separable=True
+        )
+        reference, intr_dist_3d_ref = shapefunction.calculate_shapefunction(
+            *args, separable=False
+        )
+
+        np.testing.assert_array_equal(
+            separable.intr_shapef_stack, reference.intr_shapef_stack
+        )
+        np.testing.assert_array_equal(
+            separable.intr_shapef_grad_stack, reference.intr_shapef_grad_stack
+        )
+        np.testing.assert_array_equal(
+            separable.intr_hash_stack, reference.intr_hash_stack
+        )
+        np.testing.assert_array_equal(intr_dist_3d_stack, intr_dist_3d_ref)
@@ -2,8 +2,11 @@
 
 import jax.numpy as jnp
 import numpy as np
+import pytest
 
 import pymudokon as pm
+from pymudokon.materials.druckerprager import yield_function
+from pymudokon.utils.math_helpers import get_pressure_stack, get_q_vm_stack
 
 
 def test_create():
@@ -67,3 +70,195 @@ def test_update_stress_2d():
     import warnings
 
     warnings.warn("Test not implemented")
+
+
+def test_update_stress_compacted():
+    """Compacted return mapping gives the same stresses as the full update."""
+    num_particles = 8
+
+    particles = pm.Particles.create(position_stack=jnp.zeros((num_particles, 3)))
+
+    L_stack = (
+        jnp.zeros((num_particles, 3, 3))
+        .at[:, 0, 1]
+        .set(jnp.linspace(0.0, 1.0, num_particles))
+    )
+
+    particles = particles.replace(L_stack=L_stack)
+
+    material = pm.DruckerPrager.create(
+        E=1e7,
+        nu=0.2,
+        M=1.2,
+        M2=1.0,
+        M_hat=0.8,
+        c0=0.0,
+        H=0.1,
+        num_particles=num_particles,
+        stress_ref_stack=jnp.stack([jnp.eye(3) * -1e5] * num_particles),
+    )
+
+    particles_ref, material_ref = material.update_from_particles(particles, 0.1)
+
+    assert material_ref.plastic_id_buffer is None
+
+    # 6 particles yield, a capacity of 2 falls back to the full update
+    for capacity in [2, 8]:
+        particles_next, material_next = material.compact(
+            capacity
+        ).update_from_particles(particles, 0.1)
+
+        np.testing.assert_allclose(
+            particles_next.stress_stack, particles_ref.stress_stack, rtol=1e-5
+        )
+        np.testing.assert_allclose(
+            material_next.eps_e_stack, material_ref.eps_e_stack, rtol=1e-5, atol=1e-8
+        )
+
+    np.testing.assert_array_equal(
+        material_next.plastic_id_buffer, [2, 3, 4, 5, 6, 7, 8, 8]
+    )
+
+
+def test_return_mapping_shear_path():
+    """Stresses stay on the yield surface along sheared and extended paths."""
+    stress_ref = -1e4 * jnp.eye(3)
+
+    def run(c0, H, y_rate):
+        material = pm.DruckerPrager.create(
+            E=1e6,
+            nu=0.3,
+            M=0.8,
+            M2=1.0,
+            M_hat=0.3,
+            c0=c0,
+            H=H,
+            num_particles=1,
+            stress_ref_stack=stress_ref.reshape(1, 3, 3),
+        )
+
+        benchmark = pm.MPBenchmark.create_volume_control_shear(
+            material,
+            total_time=0.5,
+            dt=0.001,
+            x_range=(0.05, 0.05),
+            y_range=(y_rate, y_rate),
+            store_every=1,
+            output=("stress", "eps_p_acc_stack"),
+        ).run()
+
+        stress_stack, eps_p_acc_stack = benchmark.accumulated
+
+        p_stack = get_pressure_stack(stress_stack)
+        q_stack = get_q_vm_stack(stress_stack)
+
+        return p_stack, q_stack, c0 + H * eps_p_acc_stack
+
+    # cone return with linear hardening
+    p_stack, q_stack, c_stack = run(c0=500.0, H=1e4, y_rate=0.0)
+
+    yf_stack = yield_function(
+        q_stack, p_stack, 0.8, 1.0, c_stack
+    )
+
+    assert jnp.all(yf_stack < 1e-2)
+    np.testing.assert_allclose(yf_stack[-100:], 0.0, atol=1e-2)
+
+    # apex return in extension
+    p_stack, q_stack, c_stack = run(c0=2000.0, H=0.0, y_rate=-0.02)
+
+    np.testing.assert_allclose(p_stack[-1], -2500.0, rtol=1e-4)
+    np.testing.assert_allclose(q_stack[-1], 0.0, atol=1.0)
+
+
+# Pressure, von Mises stress and accumulated plastic strain every 50 steps of
+# the volume control shear paths below, computed with the previous Optax
+# minimiser return mapping.
+BASELINE_SHEAR_PATHS = {
+    "hardening": (
+        (500.0, 1e4, 0.0),
+        [
+            10000.0, 10000.0, 10000.0, 10449.295, 11418.045,
+            12385.295, 13345.129, 14314.507, 15279.147, 16237.873,
+        ],
+        [
+            66.61734, 3397.4841, 6728.345, 8861.974, 9611.409,
+            10364.851, 11138.064, 11885.836, 12646.218, 13422.348,
+        ],
+        [
+            0.0, 0.0, 0.0, -0.00053915, -0.00170165,
+            -0.00286235, -0.00401415, -0.0051774, -0.00633497, -0.00748545,
+        ],
+    ),
+    "perfect": (
+        (0.0, 0.0, 0.0),
+        [
+            10000.0, 10000.0, 10000.0, 10592.592, 11553.1875,
+            12510.409, 13477.818, 14441.053, 15398.765, 16355.639,
+        ],
+        [
+            66.61734, 3397.4841, 6728.345, 8480.125, 9251.275,
+            10031.429, 10784.425, 11548.546, 12327.364, 13108.423,
+        ],
+        [
+            0.0, 0.0, 0.0, -0.00071111, -0.00186383,
+            -0.0030125, -0.00417339, -0.00532928, -0.00647855, -0.00762681,
+        ],
+    ),
+    "compression": (
+        (500.0, 1e4, 0.01),
+        [
+            10025.0, 11274.999, 12525.002, 13774.996, 15276.016,
+            17204.34, 19120.457, 21045.973, 22970.941, 24899.371,
+        ],
+        [
+            66.61734, 3397.4841, 6728.345, 10059.206, 12721.165,
+            14244.502, 15800.364, 17331.123, 18863.314, 20386.271,
+        ],
+        [
+            0.0, 0.0, 0.0, 0.0, -0.00030123,
+            -0.00111522, -0.00191455, -0.00272519, -0.00353518, -0.00434934,
+        ],
+    ),
+}
+
+
+@pytest.mark.parametrize("path", BASELINE_SHEAR_PATHS.keys())
+def test_return_mapping_baseline(path):
+    """Closed-form return mapping follows the stress paths of the minimiser."""
+    (c0, H, y_rate), p_ref_stack, q_ref_stack, eps_p_acc_ref_stack = (
+        BASELINE_SHEAR_PATHS[path]
+    )
+
+    material = pm.DruckerPrager.create(
+        E=1e6,
+        nu=0.3,
+        M=0.8,
+        M2=1.0,
+        M_hat=0.3,
+        c0=c0,
+        H=H,
+        num_particles=1,
+        stress_ref_stack=(-1e4 * jnp.eye(3)).reshape(1, 3, 3),
+    )
+
+    benchmark = pm.MPBenchmark.create_volume_control_shear(
+        material,
+        total_time=0.5,
+        dt=0.001,
+        x_range=(0.05, 0.05),
+        y_range=(y_rate, y_rate),
+        store_every=50,
+        output=("stress", "eps_p_acc_stack"),
+    ).run()
+
+    stress_stack, eps_p_acc_stack = benchmark.accumulated
+
+    # the minimiser stopped within about 0.2% of the yield surface
+    np.testing.assert_allclose(
+        get_pressure_stack(stress_stack), p_ref_stack, rtol=2e-3
+    )
+    np.testing.assert_allclose(get_q_vm_stack(stress_stack), q_ref_stack, rtol=3e-3)
+    np.testing.assert_allclose(
+        eps_p_acc_stack.reshape(-1), eps_p_acc_ref_stack, atol=2e-5
+    )
@@ -1,4 +1,6 @@
+import jax
 import jax.numpy as jnp
+import numpy as np
 
 import pymudokon as pm
 
@@ -24,3 +26,83 @@ def test_mix_control():
 
 
 # %%
+
+
+def test_mix_control_sweep():
+    """Batched runs match sequential runs of mix_control."""
+    E_stack = jnp.array([1e6, 2e6, 5e6])
+
+    material = jax.vmap(lambda E: pm.LinearIsotropicElastic.create(E=E, nu=0.3))(
+        E_stack
+    )
+
+    L = jnp.zeros((3, 3)).at[[0, 1], [1, 0]].set(0.1)
+
+    L_control_stack = jnp.array([L] * 20)
+
+    stress_mask_indices = jnp.where(jnp.eye(3, dtype=bool))
+
+    stress_control_stack = jnp.array([-jnp.eye(3) * 1e3] * 20)
+
+    kwargs = dict(
+        dt=0.01,
+        stress_control_stack=stress_control_stack,
+        stress_mask_indices=stress_mask_indices,
+        stress_ref=-jnp.eye(3) * 1e3,
+        phi_ref=0.7,
+        output=("stress", "L"),
+    )
+
+    # load paths are batched, the stress control is shared
+    L_control_batch = jnp.stack([L_control_stack * (i + 1) for i in range(3)])
+
+    carry, (stress_stack, L_stack) = pm.mix_control_sweep(
+        material, L_control_stack=L_control_batch, chunk_size=2, **kwargs
+    )
+
+    assert stress_stack.shape == (3, 20, 3, 3)
+    np.testing.assert_array_equal(carry[4], [20, 20, 20])
+
+    for i, E in enumerate(E_stack):
+        _, (stress_ref_stack, L_ref_stack) = pm.mix_control(
+            pm.LinearIsotropicElastic.create(E=E, nu=0.3),
+            L_control_stack=L_control_batch[i],
+            **kwargs,
+        )
+
+        np.testing.assert_allclose(stress_stack[i], stress_ref_stack, rtol=1e-5)
+        np.testing.assert_allclose(L_stack[i], L_ref_stack, rtol=1e-5, atol=1e-7)
+
+
+def test_mix_control_store_every():
+    """Stored frames and reductions match a run storing every step."""
+    material = pm.LinearIsotropicElastic.create(E=1e6, nu=0.3)
+
+    L = jnp.zeros((3, 3)).at[[0, 1], [1, 0]].set(0.1).at[2, 2].set(-0.05)
+
+    kwargs = dict(
+        material=material,
+        dt=0.01,
+        L_control_stack=jnp.array([L] * 20),
+        stress_ref=-jnp.eye(3) * 1e3,
+        phi_ref=0.7,
+    )
+
+    carry_ref, (stress_ref_stack, phi_ref_stack) = pm.mix_control(
+        **kwargs, output=("stress", "phi")
+    )
+
+    # 20 steps are stored as 3 full blocks of 6 steps and one of 2 steps
+    carry, (stress_stack, phi_max, phi_final) = pm.mix_control(
+        **kwargs,
+        output=("stress", "phi", "phi"),
+        store_every=6,
+        output_reduce=(None, "max", "final"),
+    )
+
+    np.testing.assert_allclose(stress_stack, stress_ref_stack[::6], rtol=1e-6)
+    np.testing.assert_allclose(phi_max, phi_ref_stack.max(), rtol=1e-6)
+    np.testing.assert_allclose(phi_final, phi_ref_stack[-1], rtol=1e-6)
+    np.testing.assert_allclose(carry[1], carry_ref[1], rtol=1e-6)
+
+    assert carry[4] == 20
@@ -1,9 +1,12 @@
 """Unit tests for the modified cam clay material module."""
 
+import jax
 import jax.numpy as jnp
 import numpy as np
 
 import pymudokon as pm
+from pymudokon.materials.modifiedcamclay import yield_function
+from pymudokon.utils.math_helpers import get_pressure_stack, get_q_vm_stack
 
 
 def test_create():
@@ -62,3 +65,157 @@ def test_update_stress_2d():
     import warnings
 
     warnings.warn("Test not implemented")
+
+
+def test_update_stress_compacted():
+    """Compacted return mapping gives the same stresses as the full update."""
+    num_particles = 8
+
+    stress_ref_stack = jnp.stack([jnp.eye(3) * -1e5] * num_particles)
+
+    particles = pm.Particles.create(position_stack=jnp.zeros((num_particles, 3)))
+
+    particles = particles.replace(
+        L_stack=-jnp.eye(3) * jnp.linspace(0.0, 0.5, num_particles)[:, None, None],
+        stress_stack=stress_ref_stack,
+    )
+
+    material = pm.ModifiedCamClay.create(
+        nu=0.2,
+        M=1.2,
+        R=1.5,
+        lam=0.8,
+        kap=0.1,
+        Vs=2.0,
+        phi_c=0.6,
+        rho_p=1000.0,
+        stress_ref_stack=stress_ref_stack,
+    )
+
+    particles_ref, material_ref = material.update_from_particles(particles, 0.1)
+
+    # 6 particles yield, a capacity of 2 falls back to the full update.
+    # Strongly softened particles differ by the Newton tolerance.
+    for capacity in [2, 8]:
+        particles_next, material_next = material.compact(
+            capacity
+        ).update_from_particles(particles, 0.1)
+
+        np.testing.assert_allclose(
+            particles_next.stress_stack,
+            particles_ref.stress_stack,
+            rtol=1e-3,
+            atol=1e-1,
+        )
+        np.testing.assert_allclose(
+            material_next.p_c_stack, material_ref.p_c_stack, rtol=1e-3
+        )
+
+    np.testing.assert_array_equal(
+        material_next.plastic_id_buffer, [2, 3, 4, 5, 6, 7, 8, 8]
+    )
+
+
+def test_update_stress_newton():
+    """Plastic particles end on the yield surface, or are flagged as failed."""
+    num_particles = 8
+
+    stress_ref_stack = jnp.stack([jnp.eye(3) * -1e5] * num_particles)
+
+    particles = pm.Particles.create(position_stack=jnp.zeros((num_particles, 3)))
+
+    particles = particles.replace(
+        L_stack=-jnp.eye(3) * jnp.linspace(0.0, 0.25, num_particles)[:, None, None],
+        stress_stack=stress_ref_stack,
+    )
+
+    def update(newton_iterations):
+        material = pm.ModifiedCamClay.create(
+            nu=0.2,
+            M=1.2,
+            R=1.5,
+            lam=0.8,
+            kap=0.1,
+            Vs=2.0,
+            phi_c=0.6,
+            rho_p=1000.0,
+            stress_ref_stack=stress_ref_stack,
+            newton_iterations=newton_iterations,
+        )
+        return material.update_from_particles(particles, 0.1)
+
+    particles_next, material_next = update(20)
+
+    assert not jnp.any(material_next.newton_failed_stack)
+
+    p_stack = get_pressure_stack(particles_next.stress_stack)
+    q_stack = get_q_vm_stack(particles_next.stress_stack)
+
+    yf_stack = yield_function(p_stack, material_next.p_c_stack, q_stack, 1.2)
+
+    # 4 particles yield and harden
+    is_plastic_stack = material_next.p_c_stack > 1.5e5 + 1.0
+
+    assert jnp.sum(is_plastic_stack) == 4
+    np.testing.assert_allclose(
+        (yf_stack / material_next.p_c_stack**2)[is_plastic_stack], 0.0, atol=1e-4
+    )
+
+    # a single iteration does not converge
+    _, material_next = update(1)
+
+    np.testing.assert_array_equal(
+        material_next.newton_failed_stack, [False] * 4 + [True] * 4
+    )
+
+    # iterations are static and unrolled, not a traced loop count
+    material = pm.ModifiedCamClay.create(
+        nu=0.2,
+        M=1.2,
+        R=1.5,
+        lam=0.8,
+        kap=0.1,
+        Vs=2.0,
+        phi_c=0.6,
+        rho_p=1000.0,
+        stress_ref_stack=stress_ref_stack,
+        newton_iterations=3,
+    )
+
+    jaxpr = jax.make_jaxpr(
+        lambda material: material.update_from_particles(particles, 0.1)
+    )(material)
+
+    assert "while" not in str(jaxpr)
+
+
+def test_update_stress_grad():
+    """Gradients through the return mapping match finite differences."""
+    stress_ref_stack = jnp.stack([jnp.eye(3) * -1e5])
+
+    material = pm.ModifiedCamClay.create(
+        nu=0.2,
+        M=1.2,
+        R=1.5,
+        lam=0.8,
+        kap=0.1,
+        Vs=2.0,
+        phi_c=0.6,
+        rho_p=1000.0,
+        stress_ref_stack=stress_ref_stack,
+    )
+
+    def get_q_p(rate):
+        L_stack = (-jnp.eye(3) * rate).at[0, 1].set(rate)[None]
+
+        stress_stack, _ = material.update(stress_ref_stack, None, L_stack, None, 0.1)
+        return get_q_vm_stack(stress_stack)[0] / get_pressure_stack(stress_stack)[0]
+
+    rate, eps = 0.2, 1e-3
+
+    grad = jax.grad(get_q_p)(rate)
+
+    grad_fd = (get_q_p(rate + eps) - get_q_p(rate - eps)) / (2 * eps)
+
+    assert jnp.abs(grad) > 0.1
+    np.testing.assert_allclose(grad, grad_fd, rtol=1e-2)
@@ -36,3 +36,91 @@ def test_refresh():
     nodes = nodes.refresh()
 
     np.testing.assert_allclose(nodes.mass_stack, jnp.zeros(9))
+
+
+@pytest.mark.parametrize("dim, exp_num_blocks", [(2, 4), (3, 8)])
+def test_sparse_create(dim, exp_num_blocks):
+    """Unit test to create sparse grid nodes with block capacity."""
+    nodes = pm.SparseNodes.create(
+        origin=jnp.zeros(dim),
+        end=jnp.ones(dim),
+        node_spacing=0.2,
+        block_size=4,
+    )
+
+    assert isinstance(nodes, pm.SparseNodes)
+
+    assert nodes.num_nodes_total == 6**dim
+
+    assert nodes.block_hash_stack.shape == (exp_num_blocks,)
+
+    assert nodes.mass_stack.shape == (exp_num_blocks * 4**dim,)
+
+
+def test_sparse_activate():
+    """Unit test to activate blocks touched by particles."""
+    nodes = pm.SparseNodes.create(
+        origin=jnp.zeros(2),
+        end=jnp.ones(2),
+        node_spacing=0.1,
+        block_size=4,
+        num_blocks=8,
+    )
+
+    shapefunctions = pm.LinearShapeFunction.create(2, 2)
+
+    shapefunctions, _ = shapefunctions.calculate_shapefunction(
+        origin=nodes.origin,
+        inv_node_spacing=nodes.inv_node_spacing,
+        grid_size=nodes.grid_size,
+        position_stack=jnp.array([[0.15, 0.15], [0.35, 0.85]]),
+        species_stack=nodes.species_stack,
+    )
+
+    dense_hash_stack = shapefunctions.intr_hash_stack
+
+    nodes, shapefunctions = nodes.activate(shapefunctions)
+
+    # base blocks (0, 0) and (0, 2) are activated with their neighbours
+    assert nodes.num_active_blocks == 6
+
+    np.testing.assert_array_equal(
+        nodes.block_hash_stack[:6], jnp.array([0, 1, 2, 3, 4, 5])
+    )
+
+    # slots map back to the same node coordinates as the dense grid
+    dense_coordinate_stack = pm.Nodes.create(
+        origin=jnp.zeros(2), end=jnp.ones(2), node_spacing=0.1
+    ).get_coordinate_stack(dim=2)
+
+    np.testing.assert_allclose(
+        nodes.get_coordinate_stack(dim=2).at[shapefunctions.intr_hash_stack].get(),
+        dense_coordinate_stack.at[dense_hash_stack].get(),
+        rtol=1e-6,
+    )
+
+
+def test_create_slabs():
+    """Unit test to split nodes into slabs with halos."""
+    nodes = pm.Nodes.create(
+        origin=jnp.zeros(2),
+        end=jnp.ones(2),
+        node_spacing=0.1,
+    )
+
+    slab_stack = pm.SlabNodes.create_slabs(nodes, num_slabs=2, halo_width=2)
+
+    assert len(slab_stack) == 2
+
+    # 11 nodes along x are split into slabs of 6 owned nodes and 2 halo nodes
+    np.testing.assert_array_equal(slab_stack[1].grid_size, jnp.array([10, 11]))
+
+    np.testing.assert_allclose(slab_stack[1].origin, jnp.array([0.4, 0.0]), atol=1e-6)
+
+    assert slab_stack[1].lower_layer_id_stack.shape == (4 * 11,)
+
+    # global node (6, 3) is local node (2, 3) on the second slab
+    np.testing.assert_array_equal(
+        slab_stack[1].get_node_index_stack(jnp.array([3 + 6 * 11, 0])),
+        jnp.array([3 + 2 * 11, 10 * 11]),
+    )
@@ -0,0 +1,34 @@
+"""Unit tests for streaming outputs to disk."""
+
+import numpy as np
+import pytest
+
+import pymudokon as pm
+
+
+def test_write_read(tmp_path):
+    """Unit test to write frames in chunks and read them back lazily."""
+    frame_stack = np.arange(7 * 3 * 2, dtype=np.float32).reshape(7, 3, 2)
+
+    with pm.OutputWriter.create(str(tmp_path), frames_per_chunk=3) as writer:
+        for step, frame in enumerate(frame_stack):
+            writer({"particles.position_stack": frame}, step * 10)
+
+    reader = pm.OutputReader.create(str(tmp_path))
+
+    assert reader.keys == ["particles.position_stack", "step"]
+
+    position_stack = reader["particles.position_stack"]
+
+    assert len(position_stack.file_path_stack) == 3
+    assert position_stack.shape == (7, 3, 2)
+    assert position_stack.dtype == np.float32
+
+    np.testing.assert_allclose(position_stack[4], frame_stack[4])
+    np.testing.assert_allclose(position_stack[-1], frame_stack[-1])
+    np.testing.assert_allclose(np.stack(list(position_stack)), frame_stack)
+    np.testing.assert_allclose(np.asarray(position_stack), frame_stack)
+    np.testing.assert_array_equal(np.asarray(reader["step"]), np.arange(7) * 10)
+
+    with pytest.raises(IndexError):
+        position_stack[7]
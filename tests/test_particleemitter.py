@@ -0,0 +1,80 @@
+"""Unit tests for the ParticleEmitter data class."""
+
+import jax.numpy as jnp
+import numpy as np
+
+import pymudokon as pm
+
+
+def test_create():
+    """Unit test to initialize a particle emitter."""
+    inlet = pm.Particles.create(position_stack=jnp.array([[0.5, 0.9]]))
+
+    emitter = pm.ParticleEmitter.create(particles=inlet, emit_every=10)
+
+    assert isinstance(emitter, pm.ParticleEmitter)
+
+
+def test_apply_on_particles():
+    """Unit test to emit particles into the free slots of a pool."""
+    particles = pm.Particles.create(position_stack=jnp.zeros((2, 2)), capacity=5)
+
+    inlet = pm.Particles.create(
+        position_stack=jnp.array([[0.5, 0.9], [0.6, 0.9]]),
+        velocity_stack=jnp.array([[0.0, -1.0], [0.0, -1.0]]),
+        mass_stack=jnp.array([1.0, 2.0]),
+    )
+
+    material = pm.ModifiedCamClay.create(
+        nu=0.2,
+        M=1.2,
+        R=1.0,
+        lam=0.1,
+        kap=0.01,
+        Vs=2.0,
+        phi_c=0.6,
+        rho_p=2000.0,
+        stress_ref_stack=jnp.zeros((5, 3, 3)),
+    )
+    template = pm.ModifiedCamClay.create(
+        nu=0.2,
+        M=1.2,
+        R=1.0,
+        lam=0.1,
+        kap=0.01,
+        Vs=2.0,
+        phi_c=0.6,
+        rho_p=2000.0,
+        stress_ref_stack=jnp.stack([-jnp.eye(3)] * 2),
+    )
+
+    emitter = pm.ParticleEmitter.create(
+        particles=inlet, material_stack=[template], emit_every=2
+    )
+
+    # no emission on odd steps
+    particles_next, _, emitter_next = emitter.apply_on_particles(
+        particles, [material], step=1
+    )
+    np.testing.assert_array_equal(
+        particles_next.active_mask_stack, particles.active_mask_stack
+    )
+
+    particles, (material,), emitter = emitter.apply_on_particles(
+        particles, [material], step=0
+    )
+
+    np.testing.assert_array_equal(
+        particles.active_mask_stack, jnp.array([True, True, True, True, False])
+    )
+    np.testing.assert_allclose(particles.position_stack[2:4], inlet.position_stack)
+    np.testing.assert_allclose(particles.mass_stack, jnp.array([0, 0, 1, 2, 0]))
+    np.testing.assert_array_equal(particles.id_stack, jnp.arange(5))
+    np.testing.assert_allclose(material.p_c_stack[2:4], template.p_c_stack)
+    assert emitter.num_dropped == 0
+
+    # one slot left for two particles
+    particles, _, emitter = emitter.apply_on_particles(particles, [material], step=2)
+
+    assert jnp.all(particles.active_mask_stack)
+    assert emitter.num_dropped == 1
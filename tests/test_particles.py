@@ -53,3 +53,22 @@ def test_refresh():
     particles = particles.refresh()
 
     np.testing.assert_allclose(particles.L_stack, jnp.zeros((2, 2, 2)))
+
+
+def test_create_capacity():
+    """Unit test to initialize a particle pool with free slots."""
+    particles = pm.Particles.create(
+        position_stack=jnp.ones((2, 2)),
+        velocity_stack=jnp.ones((2, 2)),
+        capacity=5,
+    )
+
+    assert particles.num_particles == 5
+    assert particles.position_stack.shape == (5, 2)
+    assert particles.F_stack.shape == (5, 3, 3)
+
+    np.testing.assert_array_equal(
+        particles.active_mask_stack, jnp.array([True, True, False, False, False])
+    )
+    np.testing.assert_allclose(particles.velocity_stack[2:], 0.0)
+    np.testing.assert_allclose(particles.F_stack[4], jnp.eye(3))
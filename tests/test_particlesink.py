@@ -0,0 +1,30 @@
+"""Unit tests for the ParticleSink data class."""
+
+import jax.numpy as jnp
+import numpy as np
+
+import pymudokon as pm
+
+
+def test_create():
+    """Unit test to initialize a particle sink."""
+    sink = pm.ParticleSink.create(origin=jnp.zeros(2), end=jnp.ones(2))
+
+    assert isinstance(sink, pm.ParticleSink)
+
+
+def test_apply_on_particles():
+    """Unit test to remove particles leaving the box."""
+    particles = pm.Particles.create(
+        position_stack=jnp.array([[0.5, 0.5], [0.5, -0.1], [1.2, 0.5]]),
+        capacity=4,
+    )
+
+    sink = pm.ParticleSink.create(origin=jnp.zeros(2), end=jnp.ones(2))
+
+    particles, _, sink = sink.apply_on_particles(particles, [])
+
+    np.testing.assert_array_equal(
+        particles.active_mask_stack, jnp.array([True, False, False, False])
+    )
+    assert sink.num_removed == 2
@@ -0,0 +1,158 @@
+"""Unit tests for the quadratic shape functions."""
+
+import jax
+import jax.numpy as jnp
+import numpy as np
+import pytest
+
+import pymudokon as pm
+
+
+def test_create():
+    """Unit test to test initialization."""
+    # 3D quadratic element stencil size of 27
+    shapefunction = pm.QuadraticShapeFunction.create(num_particles=2, dim=3)
+
+    assert isinstance(shapefunction, pm.QuadraticShapeFunction)
+
+    assert shapefunction.stencil.shape == (27, 3)
+
+    np.testing.assert_allclose(
+        shapefunction.intr_shapef_stack, jnp.zeros((54), dtype=jnp.float32)
+    )
+
+    np.testing.assert_allclose(
+        shapefunction.intr_shapef_grad_stack,
+        jnp.zeros((54, 3), dtype=jnp.float32),
+    )
+
+
+def test_calc_shp_1d():
+    """Unit test of the middle and boundary splines in 1D."""
+    position_stack = jnp.array([[0.52], [0.02], [0.98]])
+
+    shapefunction = pm.QuadraticShapeFunction.create(num_particles=3, dim=1)
+
+    shapefunction, intr_dist_3d_stack = shapefunction.calculate_shapefunction(
+        origin=jnp.array([0.0]),
+        inv_node_spacing=10.0,
+        grid_size=jnp.array([11]),
+        position_stack=position_stack,
+        species_stack=jnp.zeros(11, dtype=jnp.int16),
+    )
+
+    np.testing.assert_allclose(
+        shapefunction.intr_hash_stack, jnp.array([4, 5, 6, 0, 0, 1, 9, 10, 10])
+    )
+
+    np.testing.assert_allclose(
+        intr_dist_3d_stack[:3, 0], jnp.array([1.2, 0.2, -0.8]), rtol=1e-5
+    )
+
+    # middle: 1/2 (3/2 - |x|)**2, 3/4 - x**2
+    # boundary: 1 - 4/3 x**2, 0 + h: 4/3 (x + 1)**2
+    expected_shapef_stack = jnp.array(
+        [0.045, 0.71, 0.245, 0.0, 1.0 - 4.0 / 3.0 * 0.04, 4.0 / 3.0 * 0.04, 0.0, 0.0, 0.0]
+    )
+    expected_shapef_stack = expected_shapef_stack.at[6:].set(
+        expected_shapef_stack[3:6][::-1]
+    )
+    np.testing.assert_allclose(
+        shapefunction.intr_shapef_stack, expected_shapef_stack, rtol=1e-5, atol=1e-6
+    )
+
+
+@pytest.mark.parametrize("dim", [2, 3])
+def test_calc_shp_partition_of_unity(dim):
+    """Shape functions sum to one and gradients to zero, up to the boundary."""
+    num_particles = 50
+
+    position_stack = jax.random.uniform(jax.random.key(0), (num_particles, dim))
+
+    nodes = pm.Nodes.create(
+        origin=jnp.zeros(dim), end=jnp.ones(dim), node_spacing=0.1
+    )
+
+    shapefunction = pm.QuadraticShapeFunction.create(num_particles, dim)
+
+    shapefunction, _ = shapefunction.calculate_shapefunction(
+        origin=nodes.origin,
+        inv_node_spacing=nodes.inv_node_spacing,
+        grid_size=nodes.grid_size,
+        position_stack=position_stack,
+        species_stack=nodes.species_stack,
+    )
+
+    stencil_size = 3**dim
+
+    np.testing.assert_allclose(
+        shapefunction.intr_shapef_stack.reshape(-1, stencil_size).sum(axis=1),
+        jnp.ones(num_particles),
+        rtol=1e-5,
+    )
+
+    np.testing.assert_allclose(
+        shapefunction.intr_shapef_grad_stack.reshape(-1, stencil_size, 3).sum(
+            axis=1
+        ),
+        jnp.zeros((num_particles, 3)),
+        atol=1e-4,
+    )
+
+    assert jnp.all(shapefunction.intr_shapef_stack >= 0.0)
+    assert jnp.all(shapefunction.intr_hash_stack >= 0)
+    assert jnp.all(shapefunction.intr_hash_stack < nodes.num_nodes_total)
+
+
+@pytest.mark.parametrize("solver_cls", [pm.USL, pm.USL_APIC, pm.USL_ASFLIP])
+def test_update_solvers(solver_cls):
+    """Quadratic shape functions run with the USL, APIC and ASFLIP solvers."""
+    num_particles = 20
+
+    particles = pm.Particles.create(
+        position_stack=jax.random.uniform(jax.random.key(0), (num_particles, 3))
+        * 0.5
+        + 0.25,
+        velocity_stack=jnp.ones((num_particles, 3)) * 0.1,
+    )
+
+    nodes = pm.Nodes.create(origin=jnp.zeros(3), end=jnp.ones(3), node_spacing=0.1)
+
+    shapefunctions = pm.QuadraticShapeFunction.create(num_particles, 3)
+
+    particles, nodes, shapefunctions = pm.discretize(
+        particles, nodes, shapefunctions, density_ref=1000.0
+    )
+
+    if solver_cls is pm.USL:
+        solver = pm.USL.create(alpha=0.99, dt=0.001)
+    else:
+        solver = solver_cls.create(
+            cell_size=0.1,
+            dim=3,
+            num_particles=num_particles,
+            dt=0.001,
+            shapefunction="quadratic",
+        )
+
+    np.testing.assert_allclose(
+        getattr(solver, "Dp", jnp.eye(3) * 0.0025), jnp.eye(3) * 0.0025
+    )
+
+    solver, particles, nodes, *_ = solver.update(
+        particles=particles,
+        nodes=nodes,
+        shapefunctions=shapefunctions,
+        material_stack=[pm.LinearIsotropicElastic.create(E=1000.0, nu=0.3)],
+        forces_stack=[],
+        step=0,
+    )
+
+    np.testing.assert_allclose(
+        nodes.mass_stack.sum(), particles.mass_stack.sum(), rtol=1e-5
+    )
+
+    # rigid translation is kept by the transfer
+    np.testing.assert_allclose(
+        particles.velocity_stack, jnp.ones((num_particles, 3)) * 0.1, rtol=1e-4
+    )
@@ -1,6 +1,18 @@
+from functools import partial
+
+import chex
+import jax
 import jax.numpy as jnp
+import numpy as np
+import pytest
+from jax.experimental.shard_map import shard_map
+from jax.sharding import Mesh
+from jax.sharding import PartitionSpec as P
 
 import pymudokon as pm
+from pymudokon.solvers.run_solver import run_solver_frame
+from pymudokon.solvers.run_solver_slab import migrate_particles, scan_solver_slab
+from pymudokon.utils.jax_helpers import get_particle_partition_spec
 
 
 def test_run_solver():
@@ -44,3 +56,744 @@ def test_run_solver():
         material_stack=[],
         forces_stack=[],
     )
+
+
+@pytest.mark.parametrize("material_name", ["elastic", "drucker_prager"])
+def test_run_solver_sharded(material_name):
+    assert jax.device_count() > 1, "tests/conftest.py should force several devices"
+
+    num_particles = jax.device_count() * 8
+
+    position_stack = jax.random.uniform(jax.random.key(0), (num_particles, 2))
+
+    particles = pm.Particles.create(
+        position_stack=position_stack * 0.5 + 0.25,
+        velocity_stack=jnp.ones((num_particles, 2)),
+    )
+
+    nodes = pm.Nodes.create(
+        origin=jnp.array([0.0, 0.0]),
+        end=jnp.array([1.0, 1.0]),
+        node_spacing=0.1,
+    )
+
+    shapefunction = pm.LinearShapeFunction.create(num_particles, 2)
+
+    particles, nodes, shapefunction = pm.discretize(particles, nodes, shapefunction)
+
+    if material_name == "elastic":
+        material = pm.LinearIsotropicElastic.create(E=1000.0, nu=0.3)
+    else:
+        material = pm.DruckerPrager.create(
+            E=1000.0,
+            nu=0.3,
+            M=0.5,
+            M2=0.5,
+            M_hat=0.5,
+            num_particles=num_particles,
+        )
+
+    gravity = pm.Gravity.create(gravity=jnp.array([0.0, -9.8]))
+
+    usl = pm.USL.create(alpha=0.99, dt=0.001)
+
+    kwargs = dict(
+        solver=usl,
+        particles=particles,
+        nodes=nodes,
+        shapefunctions=shapefunction,
+        material_stack=[material],
+        forces_stack=[gravity],
+        num_steps=4,
+        particles_output=("position_stack",),
+        nodes_output=("mass_stack",),
+    )
+
+    _, (position_ref_stack, mass_ref_stack) = pm.run_solver(**kwargs)
+
+    _, (position_stack, mass_stack) = pm.run_solver_sharded(**kwargs)
+
+    assert np.all(np.isfinite(position_stack))
+
+    np.testing.assert_allclose(position_stack, position_ref_stack, rtol=1e-5)
+
+    np.testing.assert_allclose(mass_stack, mass_ref_stack, rtol=1e-5)
+
+
+def test_run_solver_slab():
+    assert jax.device_count() > 1, "tests/conftest.py should force several devices"
+
+    num_particles = 32
+
+    position_stack = jax.random.uniform(jax.random.key(0), (num_particles, 2))
+
+    particles = pm.Particles.create(
+        position_stack=position_stack * 0.5 + 0.25,
+        velocity_stack=jnp.ones((num_particles, 2)),
+    )
+
+    nodes = pm.Nodes.create(
+        origin=jnp.array([0.0, 0.0]),
+        end=jnp.array([1.0, 1.0]),
+        node_spacing=0.05,
+    )
+
+    shapefunction = pm.CubicShapeFunction.create(num_particles, 2)
+
+    particles, nodes, shapefunction = pm.discretize(particles, nodes, shapefunction)
+
+    material = pm.LinearIsotropicElastic.create(E=1000.0, nu=0.3)
+
+    forces_stack = [
+        pm.Gravity.create(gravity=jnp.array([0.0, -9.8])),
+        pm.DirichletBox.create(nodes),
+    ]
+
+    usl = pm.USL.create(alpha=0.99, dt=0.001)
+
+    _, (position_ref_stack,) = pm.run_solver(
+        usl,
+        particles,
+        nodes,
+        shapefunction,
+        [material],
+        forces_stack,
+        4,
+        1,
+        ("position_stack",),
+    )
+
+    def run(gather):
+        return pm.run_solver_slab(
+            usl,
+            particles,
+            nodes,
+            shapefunction,
+            [material],
+            forces_stack,
+            num_steps=4,
+            particles_output=("position_stack",),
+            gather=gather,
+        )
+
+    (_, particles_out, _, num_dropped), (position_stack,) = run(True)
+
+    assert num_dropped == 0
+
+    np.testing.assert_allclose(position_stack, position_ref_stack, rtol=1e-5)
+
+    np.testing.assert_allclose(
+        particles_out.position_stack, position_ref_stack[-1], rtol=1e-5
+    )
+
+    # slots stay split over the devices, and the scan is compiled once
+    num_compiled = scan_solver_slab._cache_size()
+
+    (_, slab_particles, _, _), (id_stack, is_active_stack, slab_position_stack) = (
+        run(False)
+    )
+
+    assert scan_solver_slab._cache_size() == num_compiled
+
+    assert len(slab_particles.position_stack.sharding.device_set) > 1
+    assert len(slab_position_stack.sharding.device_set) > 1
+
+    np.testing.assert_allclose(
+        slab_position_stack[-1][is_active_stack[-1]],
+        position_ref_stack[-1][id_stack[-1][is_active_stack[-1]]],
+        rtol=1e-5,
+    )
+
+
+def test_migrate_particles_small_buffer(capfd):
+    """Particles beyond the buffer size wait, and are dropped on a full slab."""
+    nodes = pm.Nodes.create(origin=jnp.zeros(2), end=jnp.ones(2), node_spacing=0.1)
+
+    slab_nodes = jax.tree_util.tree_map(
+        lambda *x: jnp.stack(x), *pm.SlabNodes.create_slabs(nodes, 2, 1)
+    )
+
+    # Four slots per slab, the boundary between the slabs is at x=0.6. Three
+    # particles of the lower slab crossed it, and the upper slab has two
+    # empty slots.
+    particles = pm.Particles.create(
+        position_stack=jnp.array(
+            [
+                [0.2, 0.5],
+                [0.65, 0.5],
+                [0.7, 0.5],
+                [0.75, 0.5],
+                [0.8, 0.5],
+                [0.85, 0.5],
+                [0.5, 0.5],
+                [0.5, 0.5],
+            ]
+        ),
+        mass_stack=jnp.array([1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 0.0, 0.0]),
+    )
+
+    solver = pm.USL.create(alpha=0.99, dt=0.01)
+
+    mesh = Mesh(np.array(jax.devices()[:2]), ("slabs",))
+
+    particles_spec = get_particle_partition_spec(particles, 8, "slabs")
+
+    @jax.jit
+    @partial(
+        shard_map,
+        mesh=mesh,
+        in_specs=(particles_spec, P("slabs")),
+        out_specs=(particles_spec, P()),
+        check_rep=False,
+    )
+    def migrate(particles, nodes):
+        nodes = jax.tree_util.tree_map(lambda x: x[0], nodes)
+        _, particles, _, num_dropped = migrate_particles(
+            solver, particles, [], nodes, "slabs", buffer_size=2
+        )
+        return particles, jax.lax.psum(num_dropped, "slabs")
+
+    # Two particles are sent and fill the empty slots, one waits
+    particles, num_dropped = migrate(particles, slab_nodes)
+    assert num_dropped == 0
+    np.testing.assert_array_equal(particles.id_stack, [0, 1, 2, 3, 4, 5, 1, 2])
+    np.testing.assert_array_equal(
+        particles.mass_stack, [1.0, 0.0, 0.0, 1.0, 1.0, 1.0, 1.0, 1.0]
+    )
+    assert "increase buffer_size" in capfd.readouterr().out
+
+    # The waiting particle is sent, but the upper slab is full
+    particles, num_dropped = migrate(particles, slab_nodes)
+    assert num_dropped == 1
+    np.testing.assert_array_equal(
+        particles.mass_stack, [1.0, 0.0, 0.0, 0.0, 1.0, 1.0, 1.0, 1.0]
+    )
+    assert "increase buffer_size" not in capfd.readouterr().out
+
+
+def test_run_solver_inflow_outflow():
+    """Particles are emitted and removed inside the scan of a particle pool."""
+    capacity = 16
+
+    particles = pm.Particles.create(
+        position_stack=jnp.array([[0.45, 0.5], [0.55, 0.5]]),
+        velocity_stack=jnp.array([[0.0, -5.0], [0.0, -5.0]]),
+        capacity=capacity,
+    )
+
+    nodes = pm.Nodes.create(origin=jnp.zeros(2), end=jnp.ones(2), node_spacing=0.1)
+
+    shapefunctions = pm.LinearShapeFunction.create(capacity, 2)
+
+    particles, nodes, shapefunctions = pm.discretize(
+        particles, nodes, shapefunctions, ppc=1
+    )
+
+    inlet = pm.Particles.create(
+        position_stack=jnp.array([[0.45, 0.85], [0.55, 0.85]]),
+        velocity_stack=jnp.array([[0.0, -5.0], [0.0, -5.0]]),
+        mass_stack=particles.mass_stack[:2],
+        volume_stack=particles.volume_stack[:2],
+    )
+
+    forces_stack = [
+        pm.Gravity.create(gravity=jnp.array([0.0, -9.8])),
+        pm.ParticleEmitter.create(particles=inlet, emit_every=10),
+        pm.ParticleSink.create(origin=jnp.array([0.0, 0.2]), end=jnp.ones(2)),
+    ]
+
+    carry, _ = pm.run_solver(
+        solver=pm.USL.create(alpha=0.99, dt=0.01, sort_every=5),
+        particles=particles,
+        nodes=nodes,
+        shapefunctions=shapefunctions,
+        material_stack=[pm.LinearIsotropicElastic.create(E=1000.0, nu=0.3)],
+        forces_stack=forces_stack,
+        num_steps=60,
+    )
+
+    particles = carry[2]
+    _, emitter, sink = carry[6]
+
+    num_emitted = 6 * 2 - emitter.num_dropped
+
+    assert sink.num_removed > 0
+    assert jnp.sum(particles.active_mask_stack) == 2 + num_emitted - sink.num_removed
+    assert jnp.all(jnp.isfinite(particles.position_stack))
+
+
+def test_run_solver_io_output_writer(tmp_path):
+    """Outputs streamed to disk match the outputs stacked by run_solver."""
+    particles = pm.Particles.create(
+        position_stack=jnp.array([[0.4, 0.4], [0.5, 0.45], [0.55, 0.6]]),
+        velocity_stack=jnp.array([[1.0, 0.5], [0.0, 1.0], [-0.5, 0.0]]),
+    )
+
+    nodes = pm.Nodes.create(origin=jnp.zeros(2), end=jnp.ones(2), node_spacing=0.1)
+
+    shapefunctions = pm.LinearShapeFunction.create(3, 2)
+
+    particles, nodes, shapefunctions = pm.discretize(
+        particles, nodes, shapefunctions, ppc=1
+    )
+
+    kwargs = dict(
+        solver=pm.USL.create(alpha=0.99, dt=0.001, sort_every=2),
+        particles=particles,
+        nodes=nodes,
+        shapefunctions=shapefunctions,
+        material_stack=[pm.LinearIsotropicElastic.create(E=1000.0, nu=0.3)],
+        forces_stack=[pm.Gravity.create(gravity=jnp.array([0.0, -9.8]))],
+        num_steps=20,
+        store_every=2,
+        particles_output=("position_stack", "stress_stack"),
+        nodes_output=("mass_stack",),
+    )
+
+    _, (position_stack, stress_stack, mass_stack) = pm.run_solver(**kwargs)
+
+    with pm.OutputWriter.create(str(tmp_path), frames_per_chunk=4) as writer:
+        pm.run_solver_io(**kwargs, output_writer=writer)
+
+    reader = pm.OutputReader.create(str(tmp_path))
+
+    np.testing.assert_array_equal(np.asarray(reader["step"]), np.arange(2, 22, 2))
+    np.testing.assert_allclose(
+        np.asarray(reader["particles.position_stack"]), position_stack, rtol=1e-6
+    )
+    np.testing.assert_allclose(
+        np.asarray(reader["particles.stress_stack"]),
+        stress_stack,
+        rtol=1e-5,
+        atol=1e-6,
+    )
+    np.testing.assert_allclose(
+        np.asarray(reader["nodes.mass_stack"]), mass_stack, rtol=1e-6
+    )
+
+
+def test_run_solver_sorted_outputs():
+    """Sorted outputs are unsorted by source, not by their number of entries.
+
+    The material owns all particles, so its per-particle state has one entry
+    per particle, but is not sorted with them.
+    """
+    num_particles = 8
+
+    particles = pm.Particles.create(
+        position_stack=jax.random.uniform(jax.random.key(1), (num_particles, 2))
+        * 0.4
+        + 0.3,
+        velocity_stack=jax.random.normal(jax.random.key(2), (num_particles, 2)),
+        material_id_stack=jnp.zeros(num_particles, dtype=jnp.int32),
+    )
+
+    nodes = pm.Nodes.create(origin=jnp.zeros(2), end=jnp.ones(2), node_spacing=0.1)
+
+    shapefunctions = pm.LinearShapeFunction.create(num_particles, 2)
+
+    particles, nodes, shapefunctions = pm.discretize(
+        particles, nodes, shapefunctions, ppc=1
+    )
+
+    material = pm.DruckerPrager.create(
+        E=1e5, nu=0.2, M=1.2, M2=1.0, M_hat=0.8, num_particles=num_particles
+    ).assign_particles(particles, 0)
+
+    def run(sort_every):
+        return pm.run_solver(
+            solver=pm.USL.create(alpha=0.99, dt=0.001, sort_every=sort_every),
+            particles=particles,
+            nodes=nodes,
+            shapefunctions=shapefunctions,
+            material_stack=[material],
+            num_steps=6,
+            store_every=2,
+            particles_output=("position_stack",),
+            materials_output=("eps_e_stack",),
+        )
+
+    _, outputs_ref = run(None)
+    (_, _, particles_sorted, *_), outputs_sorted = run(1)
+
+    assert not jnp.all(particles_sorted.id_stack == jnp.arange(num_particles))
+
+    for output_sorted, output_ref in zip(outputs_sorted, outputs_ref):
+        np.testing.assert_allclose(output_sorted, output_ref, rtol=1e-5, atol=1e-7)
+
+
+def test_run_solver_stream():
+    """Frames transferred asynchronously match the outputs of run_solver."""
+    num_particles = 12
+
+    position_stack = (
+        jax.random.uniform(jax.random.key(0), (num_particles, 2)) * 0.4 + 0.3
+    )
+
+    particles = pm.Particles.create(
+        position_stack=position_stack,
+        velocity_stack=jnp.ones((num_particles, 2)) * 0.5,
+    )
+
+    nodes = pm.Nodes.create(origin=jnp.zeros(2), end=jnp.ones(2), node_spacing=0.1)
+
+    shapefunctions = pm.LinearShapeFunction.create(num_particles, 2)
+
+    particles, nodes, shapefunctions = pm.discretize(
+        particles, nodes, shapefunctions, ppc=1
+    )
+
+    kwargs = dict(
+        solver=pm.USL.create(alpha=0.99, dt=0.001, sort_every=3),
+        particles=particles,
+        nodes=nodes,
+        shapefunctions=shapefunctions,
+        material_stack=[pm.LinearIsotropicElastic.create(E=1000.0, nu=0.3)],
+        forces_stack=[pm.Gravity.create(gravity=jnp.array([0.0, -9.8]))],
+        num_steps=20,
+        store_every=4,
+    )
+
+    carry_ref, (position_stack, velocity_stack) = pm.run_solver(
+        **kwargs, particles_output=("position_stack", "velocity_stack")
+    )
+
+    particle_id_stack = jnp.array([1, 5, 7])
+
+    output_spec = pm.OutputSpec.create(
+        particles_output=("position_stack", "velocity_stack"),
+        dtype={"particles.position_stack": jnp.float16},
+        particle_id_stack=particle_id_stack,
+    )
+
+    frame_stack = []
+    step_stack = []
+
+    def callback(frame, step):
+        frame_stack.append(frame)
+        step_stack.append(step)
+
+    num_compiled = run_solver_frame._cache_size()
+
+    carry = pm.run_solver_stream(**kwargs, output_spec=output_spec, callback=callback)
+
+    # the cast initial state has the types of the updated state
+    assert run_solver_frame._cache_size() == num_compiled + 1
+
+    assert step_stack == [4, 8, 12, 16, 20]
+
+    assert frame_stack[0]["particles.position_stack"].dtype == np.float16
+    assert frame_stack[0]["particles.position_stack"].shape == (3, 2)
+
+    np.testing.assert_allclose(
+        np.stack([frame["particles.position_stack"] for frame in frame_stack]),
+        position_stack[:, particle_id_stack],
+        rtol=1e-3,
+    )
+    np.testing.assert_allclose(
+        np.stack([frame["particles.velocity_stack"] for frame in frame_stack]),
+        velocity_stack[:, particle_id_stack],
+        rtol=1e-5,
+    )
+    np.testing.assert_allclose(
+        carry[1].position_stack, carry_ref[2].position_stack, rtol=1e-6
+    )
+
+
+def test_run_solver_adaptive():
+    """Adaptive steps follow the CFL condition and end on the output times."""
+    num_particles = 12
+
+    position_stack = (
+        jax.random.uniform(jax.random.key(0), (num_particles, 2)) * 0.4 + 0.3
+    )
+
+    particles = pm.Particles.create(
+        position_stack=position_stack,
+        velocity_stack=jnp.ones((num_particles, 2)) * 0.5,
+    )
+
+    nodes = pm.Nodes.create(origin=jnp.zeros(2), end=jnp.ones(2), node_spacing=0.1)
+
+    shapefunctions = pm.LinearShapeFunction.create(num_particles, 2)
+
+    particles, nodes, shapefunctions = pm.discretize(
+        particles, nodes, shapefunctions, ppc=1, density_ref=1000.0
+    )
+
+    material = pm.LinearIsotropicElastic.create(E=1000.0, nu=0.3)
+
+    kwargs = dict(
+        particles=particles,
+        nodes=nodes,
+        shapefunctions=shapefunctions,
+        material_stack=[material],
+        forces_stack=[pm.Gravity.create(gravity=jnp.array([0.0, -9.8]))],
+    )
+
+    # c = 1.16 m/s and |v| = 0.71 m/s, so the stable time step is 0.0027
+    usl = pm.USL.create(alpha=0.99, dt=0.1, sort_every=3)
+
+    dt = usl.get_stable_dt(particles, nodes, [material], cfl=0.05)
+
+    wave_speed = jnp.sqrt((material.K + 4.0 / 3.0 * material.G) / 1000.0)
+
+    np.testing.assert_allclose(
+        dt, 0.05 * 0.1 / (wave_speed + jnp.sqrt(0.5)), rtol=1e-5
+    )
+
+    time_stack = []
+
+    (step, time, solver, *_), (position_stack,) = pm.run_solver_adaptive(
+        usl,
+        **kwargs,
+        total_time=0.02,
+        store_interval=0.005,
+        cfl=0.05,
+        particles_output=("position_stack",),
+        callback=lambda state, time: time_stack.append(float(time)),
+    )
+
+    np.testing.assert_allclose(time_stack, [0.005, 0.01, 0.015, 0.02], rtol=1e-6)
+    np.testing.assert_allclose(time, 0.02, rtol=1e-6)
+
+    assert position_stack.shape == (4, num_particles, 2)
+    assert step >= 8
+    assert solver.dt < dt
+
+    # A time step below the stable one is used as is
+    (step, *_), (position_ref_stack,) = pm.run_solver_adaptive(
+        usl.replace(dt=0.001),
+        **kwargs,
+        total_time=0.02,
+        store_interval=0.005,
+        particles_output=("position_stack",),
+    )
+
+    _, (position_stack,) = pm.run_solver(
+        usl.replace(dt=0.001),
+        **kwargs,
+        num_steps=20,
+        store_every=5,
+        particles_output=("position_stack",),
+    )
+
+    np.testing.assert_allclose(position_ref_stack, position_stack, rtol=1e-4)
+
+    with pytest.raises(ValueError):
+        pm.run_solver_adaptive(usl, **kwargs, total_time=0.02, store_interval=0.003)
+
+    # Materials without a wave speed are rejected before the run
+    @chex.dataclass
+    class Rigid(pm.Material):
+        pass
+
+    with pytest.raises(ValueError, match="Rigid does not provide a wave speed"):
+        pm.run_solver_adaptive(
+            usl,
+            **dict(kwargs, material_stack=[Rigid(absolute_density=1000.0)]),
+            total_time=0.02,
+        )
+
+    # The incompressible mu I rheology uses the bulk modulus of its pressure
+    mu_i_incompressible = pm.MuI_incompressible.create(
+        mu_s=0.38, mu_d=0.64, I_0=0.279, rho_p=2000, d=0.0053, K=50.0
+    )
+
+    np.testing.assert_allclose(
+        usl.get_stable_dt(particles, nodes, [mu_i_incompressible], cfl=0.05),
+        0.05 * 0.1 / (jnp.sqrt(50.0 / 1000.0) + jnp.sqrt(0.5)),
+        rtol=1e-5,
+    )
+
+    (step, time, *_), _ = pm.run_solver_adaptive(
+        usl, **dict(kwargs, material_stack=[mu_i_incompressible]), total_time=0.02
+    )
+
+    np.testing.assert_allclose(time, 0.02, rtol=1e-6)
+
+
+def test_run_solver_until():
+    """Settling under gravity stops early once the particles are at rest."""
+    num_particles = 32
+
+    position_stack = jax.random.uniform(
+        jax.random.key(0), (num_particles, 2)
+    ) * jnp.array([0.8, 0.3]) + jnp.array([0.1, 0.1])
+
+    particles = pm.Particles.create(
+        position_stack=position_stack,
+        velocity_stack=jnp.zeros((num_particles, 2)),
+    )
+
+    nodes = pm.Nodes.create(origin=jnp.zeros(2), end=jnp.ones(2), node_spacing=0.1)
+
+    shapefunctions = pm.LinearShapeFunction.create(num_particles, 2)
+
+    particles, nodes, shapefunctions = pm.discretize(
+        particles, nodes, shapefunctions, ppc=1, density_ref=1000.0
+    )
+
+    kwargs = dict(
+        solver=pm.USL.create(alpha=0.99, dt=0.001),
+        particles=particles,
+        nodes=nodes,
+        shapefunctions=shapefunctions,
+        material_stack=[pm.LinearIsotropicElastic.create(E=1e4, nu=0.3)],
+        forces_stack=[
+            pm.Gravity.create(gravity=jnp.array([0.0, -9.8])),
+            pm.DirichletBox.create(nodes),
+        ],
+        num_steps=5000,
+    )
+
+    (step, _, particles_next, *_), termination = pm.run_solver_until(
+        **kwargs,
+        termination=pm.Termination.create(ke_ratio=1e-2),
+        check_every=10,
+    )
+
+    assert 0 < step < 5000
+    assert step % 10 == 0
+    np.testing.assert_allclose(termination.time, step * 0.001, rtol=1e-4)
+
+    assert termination.get_ke(particles_next) <= 1e-2 * termination.ke_peak
+
+    # same state as running the reached number of steps
+    kwargs["num_steps"] = int(step)
+
+    (_, _, particles_ref, *_), _ = pm.run_solver(**kwargs)
+
+    np.testing.assert_allclose(
+        particles_next.position_stack, particles_ref.position_stack, rtol=1e-5
+    )
+
+    (step, *_), termination = pm.run_solver_until(
+        **kwargs, termination=pm.Termination.create(end_time=0.05)
+    )
+
+    assert step == 50
+
+
+def test_run_solver_ensemble():
+    """Ensemble members match independent runs."""
+    num_particles = 12
+
+    position_stack = (
+        jax.random.uniform(jax.random.key(0), (num_particles, 2)) * 0.4 + 0.3
+    )
+
+    nodes = pm.Nodes.create(origin=jnp.zeros(2), end=jnp.ones(2), node_spacing=0.1)
+
+    shapefunctions = pm.LinearShapeFunction.create(num_particles, 2)
+
+    def create_member(E, velocity):
+        particles = pm.Particles.create(
+            position_stack=position_stack,
+            velocity_stack=jnp.ones((num_particles, 2)) * velocity,
+        )
+
+        return (
+            pm.USL.create(alpha=0.99, dt=0.001, sort_every=3),
+            *pm.discretize(particles, nodes, shapefunctions, ppc=1),
+            [pm.LinearIsotropicElastic.create(E=E, nu=0.3)],
+            [pm.Gravity.create(gravity=jnp.array([0.0, -9.8]))],
+        )
+
+    members = [create_member(E, v) for E, v in [(1e3, 0.5), (1e4, -0.5), (1e5, 0.1)]]
+
+    kwargs = dict(
+        num_steps=20,
+        store_every=5,
+        particles_output=("position_stack",),
+        materials_output=("E",),
+    )
+
+    carry, (position_stack, E_stack) = pm.run_solver_ensemble(
+        *pm.stack_ensemble(members), **kwargs, chunk_size=2
+    )
+
+    carry_map, (position_map_stack, _) = pm.run_solver_ensemble(
+        *pm.stack_ensemble(members), **kwargs, vectorize=False
+    )
+
+    np.testing.assert_allclose(position_map_stack, position_stack, rtol=1e-5)
+
+    assert position_stack.shape == (3, 4, num_particles, 2)
+    np.testing.assert_array_equal(carry[0], [20, 20, 20])
+    np.testing.assert_allclose(E_stack[:, -1], [1e3, 1e4, 1e5])
+
+    for member_id, member in enumerate(members):
+        carry_ref, (position_ref_stack, _) = pm.run_solver(*member, **kwargs)
+
+        np.testing.assert_allclose(
+            position_stack[member_id], position_ref_stack, rtol=1e-5
+        )
+        np.testing.assert_allclose(
+            carry[2].stress_stack[member_id],
+            carry_ref[2].stress_stack,
+            rtol=1e-4,
+            atol=1e-3,
+        )
+
+
+def test_run_solver_checkpointed():
+    """Checkpointed runs give the gradients of run_solver with fewer residuals."""
+    num_particles = 12
+
+    position_stack = (
+        jax.random.uniform(jax.random.key(0), (num_particles, 2)) * 0.4 + 0.3
+    )
+
+    particles = pm.Particles.create(
+        position_stack=position_stack,
+        velocity_stack=jnp.ones((num_particles, 2)) * 0.5,
+    )
+
+    nodes = pm.Nodes.create(origin=jnp.zeros(2), end=jnp.ones(2), node_spacing=0.1)
+
+    shapefunctions = pm.CubicShapeFunction.create(num_particles, 2)
+
+    particles, nodes, shapefunctions = pm.discretize(
+        particles, nodes, shapefunctions, ppc=1, density_ref=1000.0
+    )
+
+    def get_loss(E, run_solver, **kwargs):
+        carry, (position_stack,) = run_solver(
+            pm.USL.create(alpha=0.99, dt=0.001, sort_every=5),
+            particles,
+            nodes,
+            shapefunctions,
+            [pm.LinearIsotropicElastic.create(E=E, nu=0.3)],
+            [pm.Gravity.create(gravity=jnp.array([0.0, -9.8]))],
+            num_steps=40,
+            particles_output=("position_stack",),
+            **kwargs,
+        )
+        return jnp.sum(carry[2].stress_stack[:, 0, 0]) + jnp.sum(
+            position_stack[-1] ** 2
+        )
+
+    def get_residual_size(vjp_fn):
+        leaves = jax.tree_util.tree_leaves(vjp_fn)
+        return sum(jnp.asarray(leaf).nbytes for leaf in leaves)
+
+    loss_ref, vjp_ref = jax.vjp(partial(get_loss, run_solver=pm.run_solver), 1e3)
+
+    for checkpoint_every in [(8,), (20, 4)]:
+        loss, vjp = jax.vjp(
+            partial(
+                get_loss,
+                run_solver=pm.run_solver_checkpointed,
+                checkpoint_every=checkpoint_every,
+            ),
+            1e3,
+        )
+
+        np.testing.assert_allclose(loss, loss_ref, rtol=1e-6)
+        np.testing.assert_allclose(vjp(1.0), vjp_ref(1.0), rtol=1e-4)
+
+        assert get_residual_size(vjp) < get_residual_size(vjp_ref) / 10
+
+    with pytest.raises(ValueError):
+        get_loss(1e3, pm.run_solver_checkpointed, checkpoint_every=(7,))
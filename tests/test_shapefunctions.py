@@ -1,7 +1,9 @@
 """Unit tests for the Interactions state."""
 
+import jax
 import jax.numpy as jnp
 import numpy as np
+import pytest
 
 import pymudokon as pm
 
@@ -105,3 +107,171 @@ def test_vmap_intr():
     np.testing.assert_allclose(
         intr_hash_stack, jnp.array([0, 3, 1, 4, 0, 3, 1, 4, 3, 6, 4, 7])
     )
+
+
+@pytest.mark.parametrize(
+    "shapefunction_cls, dim, max_cell_changes",
+    [
+        (pm.LinearShapeFunction, 2, 4),
+        (pm.QuadraticShapeFunction, 2, 6),
+        (pm.CubicShapeFunction, 3, 4),
+        (pm.CubicShapeFunction, 2, 2),
+    ],
+)
+def test_update_shapefunction_incremental(shapefunction_cls, dim, max_cell_changes):
+    """Unit test that a partial move gives the same result as a recalculation.
+
+    With fewer `max_cell_changes` than moved particles, all hashes are
+    recalculated.
+    """
+    num_particles = 12
+
+    nodes = pm.Nodes.create(origin=jnp.zeros(dim), end=jnp.ones(dim), node_spacing=0.1)
+
+    position_stack = (
+        jax.random.uniform(jax.random.key(0), (num_particles, dim)) * 0.8 + 0.1
+    )
+
+    # a third of the particles move to another cell, the rest within their cell
+    move_stack = jnp.zeros((num_particles, dim))
+    move_stack = move_stack.at[:4, 0].set(0.1).at[4:, 1].set(0.001)
+
+    # sorted particles, as after `Solver.sort_particles_every`
+    id_stack = jnp.roll(jnp.arange(num_particles), 5)
+
+    kwargs = dict(
+        origin=nodes.origin,
+        inv_node_spacing=nodes.inv_node_spacing,
+        grid_size=nodes.grid_size,
+        species_stack=nodes.species_stack,
+    )
+
+    shapefunctions = shapefunction_cls.create(num_particles, dim)
+
+    shapefunctions_incremental, _ = shapefunctions.incremental(
+        num_particles, max_cell_changes
+    ).update_shapefunction(position_stack=position_stack, **kwargs)
+
+    shapefunctions_incremental, _ = shapefunctions_incremental.update_shapefunction(
+        position_stack=(position_stack + move_stack)[id_stack],
+        id_stack=id_stack,
+        **kwargs,
+    )
+
+    shapefunctions_ref, _ = shapefunctions.calculate_shapefunction(
+        position_stack=(position_stack + move_stack)[id_stack], **kwargs
+    )
+
+    assert shapefunctions_incremental.num_cell_changes == 4
+
+    for key in ["intr_hash_stack", "intr_shapef_stack", "intr_shapef_grad_stack"]:
+        np.testing.assert_allclose(
+            getattr(shapefunctions_incremental, key),
+            getattr(shapefunctions_ref, key),
+            rtol=1e-6,
+        )
+
+
+def test_update_shapefunction_incremental_reuse():
+    """Unit test that only the hashes of changed particles are recalculated."""
+    num_particles, dim = 4, 2
+
+    nodes = pm.Nodes.create(origin=jnp.zeros(dim), end=jnp.ones(dim), node_spacing=0.1)
+
+    kwargs = dict(
+        origin=nodes.origin,
+        inv_node_spacing=nodes.inv_node_spacing,
+        grid_size=nodes.grid_size,
+        species_stack=nodes.species_stack,
+    )
+
+    position_stack = jnp.array([[0.15, 0.15], [0.35, 0.35], [0.55, 0.55], [0.75, 0.75]])
+
+    shapefunctions, _ = (
+        pm.LinearShapeFunction.create(num_particles, dim)
+        .incremental(num_particles, 2)
+        .update_shapefunction(position_stack=position_stack, **kwargs)
+    )
+
+    # mark the cached hashes, particle 2 moves to another cell
+    shapefunctions = shapefunctions.replace(
+        intr_hash_stack=jnp.full_like(shapefunctions.intr_hash_stack, -1)
+    )
+
+    shapefunctions, _ = shapefunctions.update_shapefunction(
+        position_stack=position_stack.at[:, 1].add(0.01).at[2, 0].add(0.1),
+        **kwargs,
+    )
+
+    intr_hash_stack = shapefunctions.intr_hash_stack.reshape(num_particles, -1)
+
+    np.testing.assert_array_equal(shapefunctions.cell_change_id_stack, [2, 4])
+    np.testing.assert_array_equal(intr_hash_stack[jnp.array([0, 1, 3])], -1)
+    np.testing.assert_array_equal(intr_hash_stack[2], [71, 72, 82, 83])
+
+
+@pytest.mark.parametrize(
+    "shapefunction_cls",
+    [pm.LinearShapeFunction, pm.QuadraticShapeFunction, pm.CubicShapeFunction],
+)
+@pytest.mark.parametrize("dim", [2, 3])
+def test_get_stencil_shapefunction(shapefunction_cls, dim):
+    """Unit test that stencil nodes give the same interactions as a calculation.
+
+    Nodes outside the grid get zero weight.
+    """
+    num_particles = 7
+
+    nodes = pm.Nodes.create(origin=jnp.zeros(dim), end=jnp.ones(dim), node_spacing=0.1)
+
+    position_stack = jax.random.uniform(jax.random.key(1), (num_particles, dim))
+
+    shapefunctions = shapefunction_cls.create(num_particles, dim)
+
+    shapefunctions_ref, _ = shapefunctions.calculate_shapefunction(
+        origin=nodes.origin,
+        inv_node_spacing=nodes.inv_node_spacing,
+        grid_size=nodes.grid_size,
+        position_stack=position_stack,
+        species_stack=nodes.species_stack,
+    )
+
+    rel_pos_stack = (position_stack - nodes.origin) * nodes.inv_node_spacing
+
+    base_cell_stack = shapefunctions.get_base_cell_stack(rel_pos_stack)
+
+    stencil_stack = [
+        shapefunctions.get_stencil_shapefunction(
+            rel_pos_stack,
+            base_cell_stack,
+            stencil_id,
+            nodes.inv_node_spacing,
+            nodes.grid_size,
+        )
+        for stencil_id in range(shapefunctions.stencil.shape[0])
+    ]
+
+    # in the interaction order of the particles
+    shapef_stack, shapef_grad_stack, hash_stack = [
+        jnp.stack(stack, axis=1).reshape(-1, *stack[0].shape[1:])
+        for stack in zip(*stencil_stack)
+    ]
+
+    # the hashes of calculated interactions outside the grid may be clipped
+    is_on_grid_stack = hash_stack < nodes.num_nodes_total
+
+    np.testing.assert_allclose(
+        shapef_stack[is_on_grid_stack],
+        shapefunctions_ref.intr_shapef_stack[is_on_grid_stack],
+        atol=1e-6,
+    )
+    np.testing.assert_allclose(
+        shapef_grad_stack[is_on_grid_stack],
+        shapefunctions_ref.intr_shapef_grad_stack[is_on_grid_stack],
+        atol=1e-4,
+    )
+    np.testing.assert_array_equal(
+        hash_stack[is_on_grid_stack],
+        shapefunctions_ref.intr_hash_stack[is_on_grid_stack],
+    )
+    np.testing.assert_array_equal(shapef_stack[~is_on_grid_stack], 0.0)
@@ -1,9 +1,13 @@
 """Unit tests for the USL Solver."""
 
+import chex
+import jax
 import jax.numpy as jnp
 import numpy as np
+import pytest
 
 import pymudokon as pm
+from pymudokon.nodes.nodes import get_hash_from_index
 
 
 def test_create():
@@ -320,3 +324,725 @@ def test_update():
         material_stack=[],
         forces_stack=[],
     )
+
+
+def test_update_sort_particles():
+    """Unit test to check sorting particles by cell does not change the result."""
+    particles = pm.Particles.create(
+        position_stack=jnp.array([[0.8, 0.7], [0.1, 0.1], [0.6, 0.2], [0.3, 0.9]]),
+        velocity_stack=jnp.array([[1.0, 2.0], [0.3, 0.1], [0.0, -1.0], [0.5, 0.5]]),
+        volume_stack=jnp.array([0.1, 0.2, 0.1, 0.2]),
+        mass_stack=jnp.array([1.0, 3.0, 2.0, 1.0]),
+    )
+
+    nodes = pm.Nodes.create(
+        origin=jnp.array([0.0, 0.0]),
+        end=jnp.array([1.0, 1.0]),
+        node_spacing=0.5,
+    )
+
+    shapefunctions = pm.LinearShapeFunction.create(4, 2)
+
+    material = pm.DruckerPrager.create(E=1000.0, nu=0.3, num_particles=4)
+
+    def run(usl):
+        return usl.update(
+            particles=particles,
+            nodes=nodes,
+            shapefunctions=shapefunctions,
+            material_stack=[material],
+            forces_stack=[],
+            step=0,
+        )
+
+    _, particles_ref, *_ = run(pm.USL.create(alpha=0.99, dt=0.001))
+    _, particles_sorted, _, _, material_stack, _ = run(
+        pm.USL.create(alpha=0.99, dt=0.001, sort_every=1)
+    )
+
+    np.testing.assert_array_equal(particles_sorted.id_stack, jnp.array([1, 3, 2, 0]))
+
+    for key in ["position_stack", "velocity_stack", "stress_stack", "F_stack"]:
+        np.testing.assert_allclose(
+            pm.unsort_particle_stack(particles_sorted[key], particles_sorted.id_stack),
+            particles_ref[key],
+            rtol=1e-5,
+        )
+
+    assert material_stack[0].eps_e_stack.shape == (4, 3, 3)
+
+
+@pytest.mark.parametrize(
+    "shapefunction_cls, dim",
+    [
+        (pm.LinearShapeFunction, 2),
+        (pm.LinearShapeFunction, 3),
+        (pm.QuadraticShapeFunction, 2),
+        (pm.QuadraticShapeFunction, 3),
+        (pm.CubicShapeFunction, 2),
+        (pm.CubicShapeFunction, 3),
+    ],
+)
+def test_p2g_segment_sum(shapefunction_cls, dim):
+    """Unit test to compare the segment sum and scatter-add P2G backends."""
+    position_stack = jax.random.uniform(jax.random.key(0), (20, dim)) * 0.5 + 0.25
+
+    particles = pm.Particles.create(
+        position_stack=position_stack,
+        velocity_stack=jnp.ones((20, dim)),
+        mass_stack=jnp.arange(20) + 1.0,
+        volume_stack=jnp.ones(20) * 0.01,
+        stress_stack=jnp.stack([jnp.eye(3)] * 20),
+    )
+
+    nodes = pm.Nodes.create(
+        origin=jnp.zeros(dim), end=jnp.ones(dim), node_spacing=0.125
+    )
+
+    shapefunctions = shapefunction_cls.create(20, dim)
+
+    shapefunctions, _ = shapefunctions.calculate_shapefunction(
+        origin=nodes.origin,
+        inv_node_spacing=nodes.inv_node_spacing,
+        grid_size=nodes.grid_size,
+        position_stack=particles.position_stack,
+        species_stack=nodes.species_stack,
+    )
+
+    nodes_ref = pm.USL.create(dt=0.1).p2g(
+        particles=particles, nodes=nodes, shapefunctions=shapefunctions
+    )
+
+    nodes_segment_sum = pm.USL.create(dt=0.1, p2g_backend="segment_sum").p2g(
+        particles=particles, nodes=nodes, shapefunctions=shapefunctions
+    )
+
+    for key in ["mass_stack", "moment_stack", "moment_nt_stack"]:
+        np.testing.assert_allclose(
+            nodes_segment_sum[key], nodes_ref[key], rtol=1e-5, atol=1e-6
+        )
+
+
+def test_p2g_backend_static():
+    """Only the selected P2G backend is traced, also under vmap."""
+    particles = pm.Particles.create(
+        position_stack=jnp.array([[0.1, 0.25], [0.6, 0.4]]),
+        mass_stack=jnp.array([0.1, 0.3]),
+    )
+
+    nodes = pm.Nodes.create(
+        origin=jnp.array([0.0, 0.0]), end=jnp.array([1.0, 1.0]), node_spacing=0.5
+    )
+
+    shapefunctions = pm.LinearShapeFunction.create(2, 2)
+
+    shapefunctions, _ = shapefunctions.calculate_shapefunction(
+        origin=nodes.origin,
+        inv_node_spacing=nodes.inv_node_spacing,
+        grid_size=nodes.grid_size,
+        position_stack=particles.position_stack,
+        species_stack=nodes.species_stack,
+    )
+
+    for p2g_backend, has_sort in [("scatter_add", False), ("segment_sum", True)]:
+        solver_stack = pm.stack_ensemble(
+            [pm.USL.create(dt=dt, p2g_backend=p2g_backend) for dt in [0.1, 0.2]]
+        )
+
+        jaxpr = jax.make_jaxpr(
+            jax.vmap(
+                lambda solver: solver.p2g(
+                    particles=particles, nodes=nodes, shapefunctions=shapefunctions
+                )
+            )
+        )(solver_stack)
+
+        assert (" sort[" in str(jaxpr)) == has_sort
+
+
+@pytest.mark.parametrize(
+    "shapefunction_cls, dim",
+    [
+        (pm.LinearShapeFunction, 2),
+        (pm.LinearShapeFunction, 3),
+        (pm.QuadraticShapeFunction, 2),
+        (pm.QuadraticShapeFunction, 3),
+        (pm.CubicShapeFunction, 2),
+        (pm.CubicShapeFunction, 3),
+    ],
+)
+def test_update_sparse_nodes(shapefunction_cls, dim):
+    """Unit test to check the sparse grid gives the same result as the dense grid."""
+    num_particles = 20
+
+    position_stack = (
+        jax.random.uniform(jax.random.key(0), (num_particles, dim)) * 0.3 + 0.3
+    )
+
+    particles = pm.Particles.create(
+        position_stack=position_stack,
+        velocity_stack=jnp.ones((num_particles, dim)) * 0.3,
+    )
+
+    material = pm.LinearIsotropicElastic.create(E=1000.0, nu=0.3)
+
+    def run(nodes):
+        shapefunctions = shapefunction_cls.create(num_particles, dim)
+
+        _particles, nodes, shapefunctions = pm.discretize(
+            particles, nodes, shapefunctions
+        )
+
+        forces_stack = [
+            pm.Gravity.create(gravity=jnp.ones(dim) * -9.8),
+            pm.DirichletBox.create(nodes),
+        ]
+
+        return pm.USL.create(alpha=0.99, dt=0.001).update(
+            particles=_particles,
+            nodes=nodes,
+            shapefunctions=shapefunctions,
+            material_stack=[material],
+            forces_stack=forces_stack,
+            step=0,
+        )
+
+    kwargs = dict(origin=jnp.zeros(dim), end=jnp.ones(dim), node_spacing=0.05)
+
+    _, particles_ref, nodes_ref, *_ = run(pm.Nodes.create(**kwargs))
+    _, particles_sparse, nodes_sparse, *_ = run(
+        pm.SparseNodes.create(**kwargs, num_blocks=3**dim)
+    )
+
+    assert nodes_sparse.mass_stack.shape[0] < nodes_ref.mass_stack.shape[0]
+
+    assert nodes_sparse.num_active_blocks <= 3**dim
+
+    np.testing.assert_allclose(
+        nodes_sparse.mass_stack.sum(), nodes_ref.mass_stack.sum(), rtol=1e-5
+    )
+
+    for key in ["position_stack", "velocity_stack", "stress_stack", "F_stack"]:
+        np.testing.assert_allclose(
+            particles_sparse[key], particles_ref[key], rtol=1e-5, atol=1e-6
+        )
+
+
+@pytest.mark.parametrize(
+    "shapefunction_cls", [pm.LinearShapeFunction, pm.CubicShapeFunction]
+)
+@pytest.mark.parametrize("is_fused", [False, True])
+def test_p2g_sparse_nodes_boundary(shapefunction_cls, is_fused):
+    """Particles at the domain edges map to the same nodes as on the dense grid.
+
+    Cubic stencils of these particles reach outside the grid. Fused shape
+    functions activate the sparse blocks from the base cells instead.
+    """
+    particles = pm.Particles.create(
+        position_stack=jnp.array(
+            [[0.05, 0.85], [0.92, 0.85], [0.35, 0.02], [0.97, 0.97]]
+        ),
+        velocity_stack=jnp.ones((4, 2)),
+        mass_stack=jnp.ones(4),
+    )
+
+    solver = pm.USL.create(alpha=0.0, dt=0.1)
+
+    def run(nodes, is_fused):
+        shapefunctions = shapefunction_cls.create(4, 2)
+
+        if is_fused:
+            nodes, shapefunctions, _ = solver.activate_shapefunctions(
+                particles, nodes, shapefunctions.fuse(), []
+            )
+            return solver.p2g_fused(
+                particles=particles, nodes=nodes, shapefunctions=shapefunctions
+            )
+
+        shapefunctions, _ = shapefunctions.calculate_shapefunction(
+            origin=nodes.origin,
+            inv_node_spacing=nodes.inv_node_spacing,
+            grid_size=nodes.grid_size,
+            position_stack=particles.position_stack,
+            species_stack=nodes.species_stack,
+        )
+
+        nodes, shapefunctions = nodes.activate(shapefunctions)
+
+        return solver.p2g(
+            particles=particles, nodes=nodes, shapefunctions=shapefunctions
+        )
+
+    kwargs = dict(origin=jnp.zeros(2), end=jnp.ones(2), node_spacing=0.1)
+
+    nodes_ref = run(pm.Nodes.create(**kwargs), False)
+    nodes_sparse = run(pm.SparseNodes.create(**kwargs, block_size=4), is_fused)
+
+    # dense nodes of the slots of active blocks, blocks may reach beyond the grid
+    slot_index_stack = nodes_sparse.get_slot_index_stack()
+
+    is_active_stack = jnp.all(
+        slot_index_stack < nodes_sparse.grid_size, axis=1
+    ) & jnp.repeat(
+        jnp.arange(nodes_sparse.block_hash_stack.shape[0])
+        < nodes_sparse.num_active_blocks,
+        4**2,
+    )
+    slot_hash_stack = jnp.where(
+        is_active_stack,
+        get_hash_from_index(slot_index_stack, nodes_sparse.grid_size),
+        nodes_ref.num_nodes_total,
+    )
+
+    np.testing.assert_allclose(
+        nodes_sparse.mass_stack.sum(), nodes_ref.mass_stack.sum(), rtol=1e-6
+    )
+
+    for key in ["mass_stack", "moment_stack"]:
+        np.testing.assert_allclose(
+            nodes_sparse[key],
+            nodes_ref[key].at[slot_hash_stack].get(mode="fill", fill_value=0.0),
+            rtol=1e-6,
+            atol=1e-7,
+        )
+
+
+def test_g2p_sparse_nodes_overflow(capfd):
+    """Interactions beyond the block capacity read zero mass in G2P."""
+    nodes = pm.SparseNodes.create(
+        origin=jnp.zeros(2),
+        end=jnp.ones(2),
+        node_spacing=0.1,
+        block_size=4,
+        num_blocks=4,
+    )
+
+    # the blocks of the second particle do not fit in the block table
+    particles = pm.Particles.create(
+        position_stack=jnp.array([[0.15, 0.15], [0.85, 0.85]]),
+        velocity_stack=jnp.ones((2, 2)),
+        mass_stack=jnp.ones(2),
+    )
+
+    shapefunctions = pm.LinearShapeFunction.create(2, 2)
+
+    shapefunctions, _ = shapefunctions.calculate_shapefunction(
+        origin=nodes.origin,
+        inv_node_spacing=nodes.inv_node_spacing,
+        grid_size=nodes.grid_size,
+        position_stack=particles.position_stack,
+        species_stack=nodes.species_stack,
+    )
+
+    nodes, shapefunctions = nodes.activate(shapefunctions)
+
+    assert nodes.num_active_blocks > 4
+
+    assert "SparseNodes.activate" in capfd.readouterr().out
+
+    usl = pm.USL.create(alpha=0.0, dt=0.1)
+
+    nodes = usl.p2g(particles=particles, nodes=nodes, shapefunctions=shapefunctions)
+
+    # an out-of-range gather must not read the last slot
+    nodes = nodes.replace(
+        mass_stack=nodes.mass_stack.at[-1].set(1.0),
+        moment_stack=nodes.moment_stack.at[-1].set(5.0),
+        moment_nt_stack=nodes.moment_nt_stack.at[-1].set(5.0),
+    )
+
+    particles = usl.g2p(particles=particles, nodes=nodes, shapefunctions=shapefunctions)
+
+    np.testing.assert_allclose(particles.velocity_stack[0], jnp.ones(2), rtol=1e-5)
+
+    np.testing.assert_allclose(particles.velocity_stack[1], jnp.zeros(2))
+
+
+def test_update_inactive_particles():
+    """Unit test to check inactive slots of a particle pool are skipped."""
+    num_particles = 20
+    dim = 2
+
+    position_stack = (
+        jax.random.uniform(jax.random.key(0), (num_particles, dim)) * 0.3 + 0.3
+    )
+
+    material = pm.LinearIsotropicElastic.create(E=1000.0, nu=0.3)
+
+    def run(capacity):
+        particles = pm.Particles.create(
+            position_stack=position_stack,
+            velocity_stack=jnp.ones((num_particles, dim)) * 0.3,
+            capacity=capacity,
+        )
+
+        nodes = pm.Nodes.create(
+            origin=jnp.zeros(dim), end=jnp.ones(dim), node_spacing=0.05
+        )
+
+        shapefunctions = pm.LinearShapeFunction.create(particles.num_particles, dim)
+
+        particles, nodes, shapefunctions = pm.discretize(
+            particles, nodes, shapefunctions
+        )
+
+        return pm.USL.create(alpha=0.99, dt=0.001).update(
+            particles=particles,
+            nodes=nodes,
+            shapefunctions=shapefunctions,
+            material_stack=[material],
+            forces_stack=[pm.Gravity.create(gravity=jnp.ones(dim) * -9.8)],
+            step=0,
+        )
+
+    _, particles_ref, nodes_ref, *_ = run(None)
+    _, particles_pool, nodes_pool, *_ = run(32)
+
+    np.testing.assert_allclose(nodes_pool.mass_stack, nodes_ref.mass_stack)
+
+    for key in ["position_stack", "velocity_stack", "stress_stack", "F_stack"]:
+        np.testing.assert_allclose(
+            particles_pool[key][:num_particles], particles_ref[key], rtol=1e-6
+        )
+
+    # inactive slots keep their initial state
+    np.testing.assert_allclose(particles_pool.position_stack[num_particles:], 0.0)
+    np.testing.assert_allclose(particles_pool.stress_stack[num_particles:], 0.0)
+    np.testing.assert_allclose(
+        particles_pool.F_stack[num_particles:],
+        jnp.stack([jnp.eye(3)] * (32 - num_particles)),
+    )
+
+
+@pytest.mark.parametrize(
+    "shapefunction_cls, dim",
+    [
+        (pm.LinearShapeFunction, 2),
+        (pm.QuadraticShapeFunction, 3),
+        (pm.CubicShapeFunction, 3),
+    ],
+)
+def test_run_solver_fused(shapefunction_cls, dim):
+    """Fused shape functions give the same result without stored interactions."""
+    num_particles = 20
+
+    particles = pm.Particles.create(
+        position_stack=jax.random.uniform(jax.random.key(0), (num_particles, dim))
+        * 0.4
+        + 0.3,
+        velocity_stack=jnp.ones((num_particles, dim)) * 0.3,
+    )
+
+    nodes = pm.Nodes.create(
+        origin=jnp.zeros(dim), end=jnp.ones(dim), node_spacing=0.1
+    )
+
+    material = pm.LinearIsotropicElastic.create(E=10000.0, nu=0.3)
+
+    def run(shapefunctions):
+        _particles, _nodes, shapefunctions = pm.discretize(
+            particles, nodes, shapefunctions, density_ref=1000.0
+        )
+
+        carry, _ = pm.run_solver(
+            pm.USL.create(alpha=0.99, dt=0.001),
+            _particles,
+            _nodes,
+            shapefunctions,
+            [material],
+            [pm.Gravity.create(gravity=jnp.ones(dim) * -9.8)],
+            num_steps=5,
+        )
+        return carry
+
+    shapefunctions = shapefunction_cls.create(num_particles, dim)
+
+    assert not shapefunctions.is_fused()
+    assert shapefunctions.fuse().is_fused()
+
+    carry_ref = run(shapefunctions)
+    carry_fused = run(shapefunctions.fuse())
+
+    _, _, particles_ref, nodes_ref, *_ = carry_ref
+    _, _, particles_fused, nodes_fused, shapefunctions_fused, *_ = carry_fused
+
+    assert shapefunctions_fused.intr_hash_stack.shape == (0,)
+    assert shapefunctions_fused.intr_shapef_grad_stack.shape == (0, 3)
+
+    for key in ["mass_stack", "moment_nt_stack"]:
+        np.testing.assert_allclose(
+            nodes_fused[key], nodes_ref[key], rtol=1e-5, atol=1e-6
+        )
+
+    for key in ["position_stack", "velocity_stack", "stress_stack", "F_stack"]:
+        np.testing.assert_allclose(
+            particles_fused[key], particles_ref[key], rtol=1e-4, atol=1e-4
+        )
+
+
+@pytest.mark.parametrize("solver_cls", [pm.USL, pm.USL_Implicit])
+def test_update_fused_no_interactions(solver_cls):
+    """Fused steps build no arrays of size `num_particles*stencil_size`."""
+    num_particles, dim = 7, 2
+
+    particles = pm.Particles.create(
+        position_stack=jax.random.uniform(jax.random.key(0), (num_particles, dim))
+        * 0.4
+        + 0.3,
+    )
+
+    nodes = pm.Nodes.create(origin=jnp.zeros(dim), end=jnp.ones(dim), node_spacing=0.1)
+
+    shapefunctions = pm.CubicShapeFunction.create(num_particles, dim)
+
+    particles, nodes, shapefunctions = pm.discretize(
+        particles, nodes, shapefunctions, density_ref=1000.0
+    )
+
+    num_interactions = num_particles * shapefunctions.stencil.shape[0]
+
+    solver = solver_cls.create(dt=0.001)
+
+    material = pm.LinearIsotropicElastic.create(E=10000.0, nu=0.3)
+
+    def get_shapes(jaxpr):
+        for eqn in jaxpr.eqns:
+            for var in eqn.outvars:
+                yield getattr(var.aval, "shape", ())
+            for param in eqn.params.values():
+                for sub_jaxpr in param if isinstance(param, (list, tuple)) else [param]:
+                    if isinstance(sub_jaxpr, jax.core.ClosedJaxpr):
+                        yield from get_shapes(sub_jaxpr.jaxpr)
+                    elif isinstance(sub_jaxpr, jax.core.Jaxpr):
+                        yield from get_shapes(sub_jaxpr)
+
+    def get_sizes(shapefunctions):
+        closed_jaxpr = jax.make_jaxpr(
+            lambda particles, nodes, shapefunctions: solver.update(
+                particles, nodes, shapefunctions, [material], [], 0
+            )
+        )(particles, nodes, shapefunctions)
+        return {size for shape in get_shapes(closed_jaxpr.jaxpr) for size in shape}
+
+    assert num_interactions in get_sizes(shapefunctions)
+    assert num_interactions not in get_sizes(shapefunctions.fuse())
+
+
+@pytest.mark.parametrize("solver_cls", [pm.USL_APIC, pm.USL_ASFLIP])
+def test_fused_unsupported(solver_cls):
+    """Solvers without fused kernels reject fused shape functions."""
+    particles = pm.Particles.create(
+        position_stack=jnp.array([[0.45, 0.45], [0.55, 0.55]]),
+    )
+
+    nodes = pm.Nodes.create(origin=jnp.zeros(2), end=jnp.ones(2), node_spacing=0.1)
+
+    shapefunctions = pm.CubicShapeFunction.create(2, 2)
+
+    particles, nodes, shapefunctions = pm.discretize(
+        particles, nodes, shapefunctions
+    )
+
+    solver = solver_cls.create(cell_size=0.1, dim=2, num_particles=2, dt=0.001)
+
+    with pytest.raises(ValueError, match="fused"):
+        solver.update(particles, nodes, shapefunctions.fuse(), [], [], 0)
+
+
+@pytest.mark.parametrize(
+    "shapefunction_cls, sort_every",
+    [
+        (pm.LinearShapeFunction, None),
+        (pm.QuadraticShapeFunction, None),
+        (pm.CubicShapeFunction, 2),
+    ],
+)
+def test_run_solver_incremental(shapefunction_cls, sort_every):
+    """Incremental shape functions count cell changes and give the same result."""
+    num_particles, dim = 20, 2
+
+    particles = pm.Particles.create(
+        position_stack=jax.random.uniform(jax.random.key(0), (num_particles, dim))
+        * 0.4
+        + 0.3,
+        velocity_stack=jnp.zeros((num_particles, dim)).at[:5, 0].set(20.0),
+    )
+
+    nodes = pm.Nodes.create(
+        origin=jnp.zeros(dim), end=jnp.ones(dim), node_spacing=0.1
+    )
+
+    material = pm.LinearIsotropicElastic.create(E=10.0, nu=0.3)
+
+    def run(shapefunctions):
+        _particles, _nodes, shapefunctions = pm.discretize(
+            particles, nodes, shapefunctions, density_ref=1000.0
+        )
+
+        return pm.run_solver(
+            pm.USL.create(alpha=1.0, dt=0.001, sort_every=sort_every),
+            _particles,
+            _nodes,
+            shapefunctions,
+            [material],
+            num_steps=6,
+            particles_output=("position_stack",),
+            shapefunctions_output=("num_cell_changes",)
+            if shapefunctions.is_incremental()
+            else None,
+        )
+
+    shapefunctions = shapefunction_cls.create(num_particles, dim)
+
+    assert not shapefunctions.is_incremental()
+
+    _, (position_ref_stack,) = run(shapefunctions)
+    _, (position_stack, num_cell_changes_stack) = run(
+        shapefunctions.incremental(num_particles)
+    )
+
+    np.testing.assert_allclose(position_stack, position_ref_stack, rtol=1e-6)
+
+    # all particles enter their cell in the first step
+    assert num_cell_changes_stack[0] == num_particles
+
+    # cells are counted at the start of each step, before particles move
+    position_ref_stack = jnp.concatenate(
+        [particles.position_stack[None], position_ref_stack[:-1]]
+    )
+    base_cell_stack = jax.vmap(shapefunctions.get_base_cell_stack)(
+        (position_ref_stack - nodes.origin) * nodes.inv_node_spacing
+    )
+    expected_stack = jnp.sum(
+        jnp.any(base_cell_stack[1:] != base_cell_stack[:-1], axis=-1), axis=-1
+    )
+
+    assert jnp.any(expected_stack > 0) and jnp.any(expected_stack == 0)
+
+    np.testing.assert_array_equal(num_cell_changes_stack[1:], expected_stack)
+
+
+def test_update_materials_grouped():
+    """Each material updates only the particles it owns."""
+    num_particles = 6
+
+    material_id_stack = jnp.array([0, 1, 0, 1, 1, 0])
+    owned_id_stack = jnp.array([1, 3, 4])
+
+    L_stack = (
+        jnp.zeros((num_particles, 3, 3))
+        .at[:, 0, 1]
+        .set(jnp.linspace(0.1, 0.6, num_particles))
+    )
+
+    particles = pm.Particles.create(
+        position_stack=jnp.zeros((num_particles, 2)),
+        L_stack=L_stack,
+        material_id_stack=material_id_stack,
+    )
+
+    elastic = pm.LinearIsotropicElastic.create(E=1000.0, nu=0.3)
+
+    drucker_prager = pm.DruckerPrager.create(
+        E=1e7, nu=0.2, M=1.2, M2=1.0, M_hat=0.8, num_particles=3
+    )
+
+    material_stack = [
+        elastic.assign_particles(particles, 0),
+        drucker_prager.assign_particles(particles, 1),
+    ]
+
+    np.testing.assert_array_equal(material_stack[1].particle_id_stack, [1, 3, 4])
+
+    with pytest.raises(ValueError):
+        drucker_prager.assign_particles(particles, 2)
+
+    solver = pm.USL.create(alpha=0.99, dt=0.1)
+
+    def update(particles):
+        return jax.jit(solver.update_materials)(particles, material_stack)
+
+    particles_next, material_stack_next = update(particles)
+
+    stress_elastic_stack, _ = elastic.update(
+        particles.stress_stack, particles.F_stack, L_stack, None, 0.1
+    )
+    stress_drucker_prager_stack, drucker_prager_next = drucker_prager.update(
+        particles.stress_stack[owned_id_stack],
+        particles.F_stack[owned_id_stack],
+        L_stack[owned_id_stack],
+        None,
+        0.1,
+    )
+
+    expected_stress_stack = stress_elastic_stack.at[owned_id_stack].set(
+        stress_drucker_prager_stack
+    )
+
+    np.testing.assert_allclose(particles_next.stress_stack, expected_stress_stack)
+    np.testing.assert_allclose(
+        material_stack_next[1].eps_e_stack, drucker_prager_next.eps_e_stack
+    )
+
+    # Materials follow their particles by id after sorting
+    position_stack = jnp.linspace(0.9, 0.1, num_particles)[:, None] * jnp.ones(2)
+
+    _, particles_sorted, material_stack_sorted = solver.sort_particles(
+        particles.replace(position_stack=position_stack),
+        pm.Nodes.create(origin=jnp.zeros(2), end=jnp.ones(2), node_spacing=0.1),
+        material_stack,
+    )
+
+    np.testing.assert_array_equal(particles_sorted.id_stack, [5, 4, 3, 2, 1, 0])
+
+    assert material_stack_sorted[1] is material_stack[1]
+
+    particles_next, _ = update(particles_sorted)
+
+    np.testing.assert_allclose(
+        particles_next.stress_stack,
+        expected_stress_stack.at[particles_sorted.id_stack].get(),
+    )
+
+
+@chex.dataclass
+class DampedElastic(pm.LinearIsotropicElastic):
+    """Elastic material that also damps the velocities of its particles."""
+
+    written_particle_keys = ("stress_stack", "velocity_stack")
+
+    def update_from_particles(self, particles, dt):
+        particles, self = pm.LinearIsotropicElastic.update_from_particles(
+            self, particles, dt
+        )
+
+        # not declared, so not scattered back
+        particles = particles.replace(mass_stack=particles.mass_stack * 2.0)
+
+        return particles.replace(velocity_stack=particles.velocity_stack * 0.5), self
+
+
+def test_update_materials_written_keys():
+    """Owned particles get exactly the entries their material writes."""
+    particles = pm.Particles.create(
+        position_stack=jnp.zeros((4, 2)),
+        velocity_stack=jnp.ones((4, 2)),
+        mass_stack=jnp.ones(4),
+        L_stack=jnp.zeros((4, 3, 3)).at[:, 0, 1].set(0.1),
+        material_id_stack=jnp.array([0, 1, 0, 1]),
+    )
+
+    material_stack = [
+        pm.LinearIsotropicElastic.create(E=1000.0, nu=0.3).assign_particles(
+            particles, 0
+        ),
+        DampedElastic.create(E=1000.0, nu=0.3).assign_particles(particles, 1),
+    ]
+
+    solver = pm.USL.create(alpha=0.99, dt=0.1)
+
+    particles_next, _ = jax.jit(solver.update_materials)(particles, material_stack)
+
+    np.testing.assert_allclose(particles_next.velocity_stack[:, 0], [1, 0.5, 1, 0.5])
+    np.testing.assert_allclose(particles_next.mass_stack, particles.mass_stack)
+    assert jnp.all(particles_next.stress_stack[:, 0, 1] != 0.0)
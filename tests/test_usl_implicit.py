@@ -0,0 +1,123 @@
+"""Unit tests for the implicit USL Solver."""
+
+import jax
+import jax.numpy as jnp
+import numpy as np
+import pytest
+
+import pymudokon as pm
+
+
+def create_column(solver):
+    """Elastic column on a sticky floor between slip walls, under gravity."""
+    nodes = pm.Nodes.create(
+        origin=jnp.array([0.0, 0.0]), end=jnp.array([0.5, 1.0]), node_spacing=0.05
+    )
+
+    x_stack, y_stack = jnp.meshgrid(
+        jnp.arange(0.1125, 0.4, 0.025), jnp.arange(0.0625, 0.55, 0.025)
+    )
+
+    position_stack = jnp.stack([x_stack.reshape(-1), y_stack.reshape(-1)], axis=-1)
+
+    particles = pm.Particles.create(position_stack=position_stack)
+
+    shapefunctions = pm.LinearShapeFunction.create(position_stack.shape[0], 2)
+
+    particles, nodes, shapefunctions = pm.discretize(
+        particles, nodes, shapefunctions, ppc=4, density_ref=1000
+    )
+
+    material = pm.LinearIsotropicElastic.create(E=1e6, nu=0.0)
+
+    box = pm.DirichletBox.create(
+        nodes,
+        boundary_types=(
+            ("slip_negative_normal", "slip_positive_normal"),
+            ("stick", "stick"),
+        ),
+        width=2,
+    )
+
+    gravity = pm.Gravity.create(gravity=jnp.array([0.0, -9.8]))
+
+    return solver, particles, nodes, shapefunctions, [material], [gravity, box]
+
+
+def test_create():
+    """Unit test to initialize the implicit usl solver."""
+    solver = pm.USL_Implicit.create(alpha=0.0, dt=0.01, linear_solver="cg")
+
+    assert isinstance(solver, pm.USL_Implicit)
+
+    assert solver.linear_solver == 1
+
+    # static, so only the selected Krylov solver is traced
+    assert jax.tree_util.tree_structure(solver) != jax.tree_util.tree_structure(
+        pm.USL_Implicit.create(alpha=0.0, dt=0.01)
+    )
+
+    with pytest.raises(ValueError):
+        pm.USL_Implicit.create(linear_solver="lu")
+
+
+def test_update_small_dt():
+    """Implicit and explicit steps agree for small time steps."""
+    dt = 1e-6
+
+    usl_state = create_column(pm.USL.create(alpha=0.0, dt=dt))
+
+    _, particles, *_ = usl_state[0].update(*usl_state[1:], 0)
+
+    implicit_state = create_column(pm.USL_Implicit.create(alpha=0.0, dt=dt))
+
+    solver, implicit_particles, *_ = implicit_state[0].update(*implicit_state[1:], 0)
+
+    np.testing.assert_allclose(
+        implicit_particles.velocity_stack,
+        particles.velocity_stack,
+        rtol=1e-3,
+        atol=1e-9,
+    )
+
+    assert solver.newton_iterations <= 2
+
+
+def test_run_solver_column():
+    """Column settles under gravity with 100 times the explicit time step."""
+    # explicit time step of the elastic wave speed
+    dt = 100 * 0.1 * 0.05 / jnp.sqrt(1e6 / 1000)
+
+    solver = pm.USL_Implicit.create(alpha=0.0, dt=dt)
+
+    (_, solver, particles, *_), _ = jax.jit(pm.run_solver, static_argnums=6)(
+        *create_column(solver), 100
+    )
+
+    assert jnp.all(jnp.isfinite(particles.stress_stack))
+
+    assert jnp.abs(particles.velocity_stack).max() < 1e-4
+
+    # mean vertical stress of a column of height 0.5 is half of rho g H
+    np.testing.assert_allclose(
+        particles.stress_stack[:, 1, 1].mean(), -0.5 * 1000 * 9.8 * 0.5, rtol=0.05
+    )
+
+    assert solver.residual_norm < 1e-3
+
+
+def test_run_solver_free_fall_cg():
+    """Unconstrained column falls freely with the conjugate gradient solver."""
+    solver = pm.USL_Implicit.create(alpha=0.0, dt=0.001, linear_solver="cg")
+
+    solver, particles, nodes, shapefunctions, material_stack, forces_stack = (
+        create_column(solver)
+    )
+
+    (_, solver, particles, *_), _ = jax.jit(pm.run_solver, static_argnums=6)(
+        solver, particles, nodes, shapefunctions, material_stack, forces_stack[:1], 10
+    )
+
+    np.testing.assert_allclose(particles.velocity_stack[:, 1], -9.8 * 0.01, rtol=1e-3)
+
+    np.testing.assert_allclose(particles.velocity_stack[:, 0], 0.0, atol=1e-6)